@@ -6,7 +6,9 @@
 
 import time
 import os
+import asyncio
 import logging
+from contextlib import asynccontextmanager
 from typing import Dict, Any, Optional
 import yaml
 from pathlib import Path
@@ -19,9 +21,28 @@
 import sys
 sys.path.insert(0, str(Path(__file__).parent.parent.parent))
 from src.utils.logger import get_logger
+from src.utils.config import get_config
+from src.core.vectorstore import warm_up_vectorstore
+from src.models.async_deepseek_client import close_async_deepseek_clients
 
 logger = get_logger(__name__)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Load shared resources before serving the first request and release them on shutdown."""
+    if get_config().section('vector_db').get('preload', True):
+        start_time = time.time()
+        try:
+            # Pay the FAISS and embedding model cold-load cost at startup, not on the first query
+            stats = await asyncio.to_thread(warm_up_vectorstore)
+            app.state.startup_metrics = {"vectorstore_warm_up_seconds": time.time() - start_time, "vectorstore": stats}
+            logger.info(f"Vector store warm-up completed in {time.time() - start_time:.2f}s "
+                        f"(cold load: {stats.get('cold_load_seconds')}s, generation {stats.get('generation')})")
+        except Exception as e:
+            logger.error(f"Vector store warm-up failed: {str(e)}", exc_info=True)
+    yield
+    await close_async_deepseek_clients()
+
 def create_app() -> FastAPI:
     """Create a FastAPI application with all routes configured"""
     app = FastAPI(
@@ -30,6 +51,7 @@ def create_app() -> FastAPI:
         version="1.0.0",
         docs_url="/docs",
         redoc_url="/redoc",
+        lifespan=lifespan,
     )
 
     # Add middleware
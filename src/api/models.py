@@ -56,6 +56,7 @@ class AdminAction(str, Enum):
     REBUILD_INDEX = "rebuild_index"
     CLEAR_CACHES = "clear_caches"
     GET_SYSTEM_STATUS = "get_system_status"
+    RELOAD_CONFIG = "reload_config"
 
 
 class AdminRequest(BaseModel):
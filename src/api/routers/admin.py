@@ -11,7 +11,7 @@
 from fastapi.responses import JSONResponse
 
 from src.api.models import AdminAction, AdminRequest, AdminResponse, ErrorResponse
-from src.api.services.admin import rebuild_index, clear_caches, get_system_status
+from src.api.services.admin import rebuild_index, clear_caches, get_system_status, reload_config
 from src.utils.logger import get_logger
 
 logger = get_logger(__name__)
@@ -25,7 +25,8 @@ async def admin_action(request: AdminRequest = Body(...)):
     Perform an administrative action.
     
     This endpoint allows authorized users to perform administrative actions
-    such as rebuilding the index, clearing caches, or getting system status.
+    such as rebuilding the index, clearing caches, getting system status,
+    or reloading the configuration file.
     """
     try:
         # Start timing
@@ -38,6 +39,8 @@ async def admin_action(request: AdminRequest = Body(...)):
             result = clear_caches()
         elif request.action == AdminAction.GET_SYSTEM_STATUS:
             result = get_system_status()
+        elif request.action == AdminAction.RELOAD_CONFIG:
+            result = reload_config()
         else:
             raise ValueError(f"Unsupported action: {request.action}")
         
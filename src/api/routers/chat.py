@@ -17,7 +17,7 @@
 sys.path.insert(0, str(Path(__file__).parent.parent.parent.parent))
 
 from src.api.models import ChatRequest, ChatResponse, ErrorResponse
-from src.api.services.chat import process_chat, get_conversation_history
+from src.api.services.chat import process_chat, process_chat_stream, get_conversation_history
 from src.api.services.streaming import StreamManager, StreamCallbackHandler, SyncToAsyncAdapter, StreamEvent
 from src.utils.logger import get_logger
 
@@ -46,8 +46,10 @@ async def chat_query(request: ChatRequest):
             from fastapi.responses import RedirectResponse
             return RedirectResponse(url=url, status_code=307)
         
-        # Process the query
-        answer, conversation_id, thinking_steps, documents, duration = process_chat(
+        # Process the query in a worker thread so concurrent requests (and coalesced
+        # duplicates waiting on them) don't block the event loop
+        answer, conversation_id, thinking_steps, documents, duration = await asyncio.to_thread(
+            process_chat,
             query=request.query,
             use_web_search=request.use_web_search,
             conversation_id=request.conversation_id
@@ -88,12 +90,13 @@ async def chat_query_stream(
         # Set up the background task
         adapter = SyncToAsyncAdapter(stream_manager)
         
-        # Start processing in the background
+        # Start processing in the background; answer tokens are streamed on the event loop
         adapter.run_in_background(
-            process_chat,
+            process_chat_stream,
             query,
             use_web_search,
             conversation_id,
+            stream_manager,
             callback_handler
         )
         
@@ -9,9 +9,19 @@
 from typing import Dict, Any, List, Optional, Tuple
 
 from src.utils.logger import get_logger
-from src.api.services.documents import clear_document_cache
+from src.utils.config import reload_config as reload_config_snapshot, get_config_stats
+from src.utils.http_pool import get_pool_stats
+from src.utils.resilience import get_resilience_stats
+from src.utils.web_search import clear_web_search_cache, get_web_search_stats
+from src.core.vectorstore import get_vectorstore_stats
+from src.core.prompt_builder import get_prompt_stats
+from src.models.embedding_cache import get_embedding_cache_stats
+from src.models.response_cache import clear_response_cache, get_response_cache_stats
+from src.api.services.documents import clear_document_cache, get_document_registry_stats
 from src.api.services.chat import get_agent
 from src.api.services.cache.cache_service import clear_semantic_cache, get_cache_stats
+from src.api.services.coalescing import get_coalescing_stats
+from src.api.services.conversation_store import get_conversation_store_stats
 
 logger = get_logger(__name__)
 
@@ -58,6 +68,12 @@ def clear_caches() -> Dict[str, Any]:
     # Clear semantic cache if available
     semantic_cache_count = clear_semantic_cache()
     
+    # Clear LLM response cache
+    response_cache_count = clear_response_cache()
+    
+    # Clear cached web search results
+    web_search_count = clear_web_search_cache()
+    
     # Clear agent cache if possible
     agent = get_agent()
     agent_cache_cleared = False
@@ -73,6 +89,8 @@ def clear_caches() -> Dict[str, Any]:
         "details": {
             "documents_cleared": doc_count,
             "semantic_cache_cleared": semantic_cache_count,
+            "llm_response_cache_cleared": response_cache_count,
+            "web_search_cache_cleared": web_search_count,
             "agent_cache_cleared": agent_cache_cleared
         },
         "duration_seconds": duration
@@ -124,5 +142,43 @@ def get_system_status() -> Dict[str, Any]:
         "python_version": python_version,
         "system_info": system_info,
         "cache_stats": cache_stats,
+        "config_stats": get_config_stats(),
+        "http_pool_stats": get_pool_stats(),
+        "vectorstore_stats": get_vectorstore_stats(),
+        "embedding_cache_stats": get_embedding_cache_stats(),
+        "coalescing_stats": get_coalescing_stats(),
+        "conversation_store_stats": get_conversation_store_stats(),
+        "document_registry_stats": get_document_registry_stats(),
+        "prompt_stats": get_prompt_stats(),
+        "llm_response_cache_stats": get_response_cache_stats(),
+        "resilience_stats": get_resilience_stats(),
+        "web_search_stats": get_web_search_stats(),
         "timestamp": time.time()
+    }
+
+
+def reload_config() -> Dict[str, Any]:
+    """
+    Force the shared configuration snapshot to be re-read from disk.
+    
+    Returns:
+        Status information
+    """
+    logger.info("Reloading configuration")
+    
+    start_time = time.time()
+    
+    snapshot = reload_config_snapshot()
+    
+    duration = time.time() - start_time
+    
+    return {
+        "success": True,
+        "message": f"Configuration reloaded (version {snapshot.version})",
+        "details": {
+            "path": snapshot.path,
+            "version": snapshot.version,
+            "config_stats": get_config_stats()
+        },
+        "duration_seconds": duration
     } 
\ No newline at end of file
@@ -0,0 +1,23 @@
+"""
+Caching services for the Kevin API.
+
+This package contains the semantic cache of chat responses.
+"""
+
+from src.api.services.cache.semantic_cache import SemanticCache
+from src.api.services.cache.cache_service import (
+    get_semantic_cache,
+    add_to_cache,
+    get_from_cache,
+    clear_semantic_cache,
+    get_cache_stats
+)
+
+__all__ = [
+    "SemanticCache",
+    "get_semantic_cache",
+    "add_to_cache",
+    "get_from_cache",
+    "clear_semantic_cache",
+    "get_cache_stats"
+]
@@ -0,0 +1,111 @@
+"""
+Semantic cache service for the Kevin API.
+
+Provides the process-wide semantic cache configured by the semantic_cache
+section of the config.
+"""
+
+import atexit
+import threading
+from typing import Any, Dict, Optional
+
+from src.utils.logger import get_logger
+from src.utils.config import get_config
+from src.api.services.cache.semantic_cache import SemanticCache, DEFAULT_MODEL_NAME, DEFAULT_SAVE_INTERVAL
+
+logger = get_logger(__name__)
+
+_semantic_cache: Optional[SemanticCache] = None
+_semantic_cache_lock = threading.Lock()
+
+
+def get_semantic_cache() -> Optional[SemanticCache]:
+    """
+    Get the shared semantic cache, creating it on first use.
+
+    Returns:
+        The SemanticCache, or None if the cache is disabled
+    """
+    global _semantic_cache
+    if _semantic_cache is not None:
+        return _semantic_cache
+
+    cache_config = get_config().section('semantic_cache')
+    if not cache_config.get('enabled', True):
+        return None
+
+    with _semantic_cache_lock:
+        if _semantic_cache is None:
+            _semantic_cache = SemanticCache(
+                model_name=cache_config.get('model_name', DEFAULT_MODEL_NAME),
+                similarity_threshold=cache_config.get('similarity_threshold', 0.92),
+                max_cache_size=cache_config.get('max_cache_size', 1000),
+                ttl_seconds=cache_config.get('ttl_seconds', 86400),
+                cache_file=cache_config.get('cache_file'),
+                index_type=cache_config.get('index_type', 'hnsw'),
+                save_interval_seconds=cache_config.get('save_interval_seconds', DEFAULT_SAVE_INTERVAL)
+            )
+            if _semantic_cache.cache_file:
+                atexit.register(_semantic_cache.save_cache)
+    return _semantic_cache
+
+
+def add_to_cache(query: str, response: Dict[str, Any], metadata: Optional[Dict[str, Any]] = None) -> bool:
+    """
+    Add a response to the semantic cache.
+
+    Args:
+        query: The query
+        response: The response to cache
+        metadata: Settings the response was produced with
+
+    Returns:
+        True if the response was cached
+    """
+    cache = get_semantic_cache()
+    if cache is None:
+        return False
+    return cache.add(query, response, metadata or {})
+
+
+def get_from_cache(query: str, metadata: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+    """
+    Get a cached response for a query or a similar one.
+
+    Args:
+        query: The query
+        metadata: Settings of the request
+
+    Returns:
+        The cached response, or None on a miss
+    """
+    cache = get_semantic_cache()
+    if cache is None:
+        return None
+    return cache.get(query, metadata)
+
+
+def clear_semantic_cache() -> int:
+    """
+    Remove all entries from the semantic cache.
+
+    Returns:
+        Number of entries removed
+    """
+    cache = get_semantic_cache()
+    if cache is None:
+        return 0
+    return cache.clear()
+
+
+def get_cache_stats() -> Dict[str, Any]:
+    """
+    Get semantic cache statistics.
+
+    Returns:
+        Dictionary of cache statistics
+    """
+    cache = get_semantic_cache()
+    if cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **cache.get_stats()}
@@ -0,0 +1,657 @@
+"""
+Semantic cache of chat responses.
+
+A cached response is served for any query whose embedding is close enough to
+the embedding of the query it was cached for. Embeddings are kept normalized
+in one contiguous float32 matrix, so a lookup is a single inner-product
+search: an HNSW graph (FAISS) when available, or one matrix-vector product.
+
+Evicting an entry (TTL or LRU) frees its row for reuse and never rebuilds the
+search index. HNSW cannot delete vectors, so evicted vectors are skipped at
+search time, and the graph is only rebuilt once they outnumber live ones.
+
+The cache is persisted as two files:
+
+    semantic_cache.json           metadata sidecar: queries, responses, rows
+    semantic_cache.vectors.f32    float32 rows, memory-mapped on load
+
+A save only writes the rows added since the previous save. Freed rows are not
+reused before the next save, so the sidecar on disk never points at a row
+that was overwritten.
+"""
+
+import os
+import json
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from src.utils.logger import get_logger
+from src.models.embedding_cache import normalize_text
+
+try:
+    import faiss
+except ImportError:
+    faiss = None
+
+logger = get_logger(__name__)
+
+SIDECAR_VERSION = 2
+VECTORS_SUFFIX = ".vectors.f32"
+
+DEFAULT_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+DEFAULT_SAVE_INTERVAL = 60.0
+
+# Nearest neighbours checked per lookup, so entries with other metadata can be skipped
+SEARCH_CANDIDATES = 8
+
+# Rows allocated when the matrix is first created; it doubles when full
+MIN_CAPACITY = 256
+
+# HNSW graph parameters
+HNSW_M = 32
+HNSW_EF_CONSTRUCTION = 80
+HNSW_EF_SEARCH = 64
+
+# Metadata keys that must match for a cached response to be served
+MATCH_METADATA_KEYS = ("use_web_search",)
+
+
+def _normalize(embedding: Any) -> Optional[np.ndarray]:
+    """
+    Center and normalize an embedding to a unit float32 vector.
+
+    Centering removes the offset shared by all components, which otherwise
+    makes unrelated queries look similar. Sentence-transformer embeddings are
+    already close to zero-mean, so for them the score is their cosine.
+
+    Args:
+        embedding: The raw embedding
+
+    Returns:
+        The normalized vector, or None if the embedding is constant or invalid
+    """
+    vector = np.asarray(embedding, dtype=np.float32).ravel()
+    if vector.size == 0:
+        return None
+    vector = vector - vector.mean()
+    norm = float(np.linalg.norm(vector))
+    if not np.isfinite(norm) or norm == 0.0:
+        return None
+    return vector / norm
+
+
+def _key(query: str) -> str:
+    """Exact-match key of a query."""
+    return normalize_text(query).casefold()
+
+
+class _Entry:
+    """A cached response and the row of its query embedding."""
+
+    __slots__ = ("query", "row", "response", "timestamp", "metadata")
+
+    def __init__(self, query: str, row: int, response: Dict[str, Any], timestamp: float,
+                 metadata: Dict[str, Any]):
+        self.query = query
+        self.row = row
+        self.response = response
+        self.timestamp = timestamp
+        self.metadata = metadata
+
+
+class SemanticCache:
+    """
+    Cache of responses looked up by query similarity.
+
+    All methods are thread-safe. A cache file should only be written by one
+    process at a time.
+    """
+
+    def __init__(
+        self,
+        model_name: str = DEFAULT_MODEL_NAME,
+        similarity_threshold: float = 0.92,
+        max_cache_size: int = 1000,
+        ttl_seconds: float = 86400,
+        cache_file: Optional[str] = None,
+        index_type: str = "hnsw",
+        save_interval_seconds: float = DEFAULT_SAVE_INTERVAL
+    ):
+        """
+        Initialize the semantic cache and load it from disk.
+
+        Args:
+            model_name: Sentence-transformer model used to embed queries
+            similarity_threshold: Minimum similarity for a cached response to be served
+            max_cache_size: Maximum number of cached responses
+            ttl_seconds: Age after which a response expires (0 disables expiry)
+            cache_file: Path of the metadata sidecar, or None for an in-memory cache
+            index_type: "hnsw" for an approximate FAISS index, "flat" for exact search
+            save_interval_seconds: Minimum time between automatic saves after an add
+        """
+        self.model_name = model_name
+        self.similarity_threshold = similarity_threshold
+        self.max_cache_size = max(1, int(max_cache_size))
+        self.ttl_seconds = ttl_seconds
+        self.cache_file = cache_file
+        self.save_interval_seconds = save_interval_seconds
+
+        if index_type == "hnsw" and faiss is None:
+            logger.info("FAISS is not installed, using exact search for the semantic cache")
+            index_type = "flat"
+        self.index_type = index_type
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._search_seconds = 0.0
+        self._searches = 0
+
+        self._lock = threading.RLock()
+        self._embeddings = None
+        self._reset()
+        self._last_save = float("-inf")
+
+        if cache_file:
+            self.load_cache()
+
+    @property
+    def vectors_file(self) -> Optional[str]:
+        if not self.cache_file:
+            return None
+        return os.path.splitext(self.cache_file)[0] + VECTORS_SUFFIX
+
+    def _reset(self) -> None:
+        """Drop all entries and rows."""
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._vectors: Optional[np.ndarray] = None
+        self._row_keys: List[Optional[str]] = []
+        self._free_rows: List[int] = []
+        # Rows freed since the last save; the sidecar on disk may still refer to them
+        self._released_rows: List[int] = []
+        self._dirty_rows = set()
+        self._hnsw = None
+        self._hnsw_rows: List[int] = []
+        self._row_hnsw: List[int] = []
+
+    # Embeddings
+
+    def compute_embedding(self, text: str) -> Optional[np.ndarray]:
+        """
+        Embed a query with the shared embedding model.
+
+        Args:
+            text: The query
+
+        Returns:
+            The embedding, or None if it could not be computed
+        """
+        try:
+            if self._embeddings is None:
+                from src.core.vectorstore import get_embeddings
+                self._embeddings = get_embeddings(self.model_name)
+            return np.asarray(self._embeddings.embed_query(text), dtype=np.float32)
+        except Exception as e:
+            logger.error(f"Error computing embedding for semantic cache: {e}")
+            return None
+
+    def _embed(self, query: str) -> Optional[np.ndarray]:
+        embedding = self.compute_embedding(query)
+        return None if embedding is None else _normalize(embedding)
+
+    # Rows and search index
+
+    def _allocate_row(self, dim: int) -> int:
+        """Get a free row of the matrix, growing it if needed."""
+        if self._free_rows:
+            return self._free_rows.pop()
+
+        row = len(self._row_keys)
+        if self._vectors is None or row >= self._vectors.shape[0]:
+            capacity = MIN_CAPACITY if self._vectors is None else 2 * self._vectors.shape[0]
+            vectors = np.zeros((capacity, dim), dtype=np.float32)
+            if self._vectors is not None:
+                vectors[:row] = self._vectors[:row]
+            self._vectors = vectors
+        self._row_keys.append(None)
+        self._row_hnsw.append(-1)
+        return row
+
+    def _release_row(self, row: int) -> None:
+        """Free the row of a removed entry."""
+        self._row_keys[row] = None
+        self._row_hnsw[row] = -1
+        self._vectors[row] = 0.0
+        self._dirty_rows.discard(row)
+        if self.cache_file:
+            self._released_rows.append(row)
+        else:
+            self._free_rows.append(row)
+
+    def _index_add(self, row: int) -> None:
+        """Add a row to the HNSW graph."""
+        if self.index_type != "hnsw":
+            return
+        if self._hnsw is None:
+            self._hnsw = faiss.IndexHNSWFlat(self._vectors.shape[1], HNSW_M, faiss.METRIC_INNER_PRODUCT)
+            self._hnsw.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+            self._hnsw.hnsw.efSearch = HNSW_EF_SEARCH
+        self._row_hnsw[row] = len(self._hnsw_rows)
+        self._hnsw_rows.append(row)
+        self._hnsw.add(self._vectors[row:row + 1])
+
+    def _rebuild_index(self) -> None:
+        """Rebuild the HNSW graph from the live rows."""
+        self._hnsw = None
+        self._hnsw_rows = []
+        self._row_hnsw = [-1] * len(self._row_keys)
+        for entry in self._entries.values():
+            self._index_add(entry.row)
+
+    def _maybe_rebuild_index(self) -> None:
+        """Rebuild the HNSW graph once evicted vectors outnumber live ones."""
+        if self._hnsw is not None and len(self._hnsw_rows) - len(self._entries) > max(len(self._entries), MIN_CAPACITY):
+            start_time = time.time()
+            self._rebuild_index()
+            logger.info(f"Rebuilt semantic cache index with {len(self._entries)} entries "
+                        f"in {time.time() - start_time:.2f}s")
+
+    def _search(self, vector: np.ndarray, k: int) -> List[Tuple[float, int]]:
+        """
+        Find the rows most similar to a normalized vector.
+
+        Args:
+            vector: The normalized query vector
+            k: Maximum number of rows to return
+
+        Returns:
+            (similarity, row) pairs of live rows, most similar first
+        """
+        if self._vectors is None or not self._entries or vector.shape[0] != self._vectors.shape[1]:
+            return []
+
+        start_time = time.perf_counter()
+        results = []
+        if self._hnsw is not None:
+            scores, ids = self._hnsw.search(vector.reshape(1, -1), min(k, self._hnsw.ntotal))
+            for score, hnsw_id in zip(scores[0], ids[0]):
+                if hnsw_id < 0:
+                    continue
+                row = self._hnsw_rows[hnsw_id]
+                if self._row_hnsw[row] == hnsw_id:
+                    results.append((float(score), row))
+        else:
+            scores = self._vectors[:len(self._row_keys)] @ vector
+            candidates = np.arange(len(scores))
+            if len(scores) > k:
+                candidates = np.argpartition(-scores, k - 1)[:k]
+            for row in candidates[np.argsort(-scores[candidates])]:
+                if self._row_keys[row] is not None:
+                    results.append((float(scores[row]), int(row)))
+
+        self._search_seconds += time.perf_counter() - start_time
+        self._searches += 1
+        return results
+
+    # Entries
+
+    def is_expired(self, timestamp: float) -> bool:
+        """
+        Check whether a response cached at a given time has expired.
+
+        Args:
+            timestamp: Time the response was cached
+
+        Returns:
+            True if the response is older than the TTL
+        """
+        return bool(self.ttl_seconds) and time.time() - timestamp > self.ttl_seconds
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key)
+        self._release_row(entry.row)
+
+    def _insert(self, key: str, query: str, vector: np.ndarray, response: Dict[str, Any],
+                timestamp: float, metadata: Dict[str, Any]) -> None:
+        """Store a new entry, evicting the least recently used ones if the cache is full."""
+        if self._vectors is not None and vector.shape[0] != self._vectors.shape[1]:
+            logger.warning(f"Embedding dimension changed from {self._vectors.shape[1]} to "
+                           f"{vector.shape[0]}, clearing the semantic cache")
+            self.clear()
+
+        if len(self._entries) >= self.max_cache_size:
+            self._clean_cache()
+        while len(self._entries) >= self.max_cache_size:
+            oldest_key = next(iter(self._entries))
+            self._remove(oldest_key)
+            self.evictions += 1
+
+        row = self._allocate_row(vector.shape[0])
+        self._vectors[row] = vector
+        self._row_keys[row] = key
+        self._dirty_rows.add(row)
+        self._entries[key] = _Entry(query, row, response, timestamp, metadata)
+        self._index_add(row)
+        self._maybe_rebuild_index()
+
+    def _matches(self, entry: _Entry, metadata: Optional[Dict[str, Any]]) -> bool:
+        """Check that an entry was cached under compatible settings."""
+        if not metadata:
+            return True
+        return all(
+            entry.metadata.get(name) == metadata[name]
+            for name in MATCH_METADATA_KEYS
+            if name in metadata and name in entry.metadata
+        )
+
+    def _serve(self, key: str, entry: _Entry) -> Optional[Dict[str, Any]]:
+        """Return an entry's response unless it has expired."""
+        if self.is_expired(entry.timestamp):
+            self._remove(key)
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry.response
+
+    def add(self, query: str, response: Dict[str, Any], metadata: Optional[Dict[str, Any]] = None) -> bool:
+        """
+        Cache a response for a query.
+
+        Args:
+            query: The query
+            response: The response to cache
+            metadata: Settings the response was produced with
+
+        Returns:
+            True if the response was cached
+        """
+        key = _key(query)
+        if not key:
+            return False
+        metadata = dict(metadata or {})
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry.response = response
+                entry.timestamp = time.time()
+                entry.metadata = metadata
+                self._entries.move_to_end(key)
+                self._maybe_save()
+                return True
+
+        vector = self._embed(query)
+        if vector is None:
+            return False
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._insert(key, query, vector, response, time.time(), metadata)
+            self._maybe_save()
+        return True
+
+    def get(self, query: str, metadata: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """
+        Get the cached response for a query or a similar one.
+
+        Args:
+            query: The query
+            metadata: Settings of the request; responses cached with different settings are skipped
+
+        Returns:
+            The cached response, or None on a miss
+        """
+        key = _key(query)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._matches(entry, metadata):
+                return self._serve(key, entry)
+            if not self._entries:
+                self.misses += 1
+                return None
+
+        vector = self._embed(query)
+        with self._lock:
+            if vector is not None:
+                for similarity, row in self._search(vector, SEARCH_CANDIDATES):
+                    if similarity < self.similarity_threshold:
+                        break
+                    row_key = self._row_keys[row]
+                    entry = self._entries.get(row_key)
+                    if entry is not None and self._matches(entry, metadata):
+                        logger.debug(f"Semantic cache hit for '{query}' ({similarity:.3f}): '{entry.query}'")
+                        return self._serve(row_key, entry)
+            self.misses += 1
+            return None
+
+    def _clean_cache(self) -> int:
+        """
+        Remove expired entries.
+
+        Returns:
+            Number of entries removed
+        """
+        with self._lock:
+            expired = [key for key, entry in self._entries.items() if self.is_expired(entry.timestamp)]
+            for key in expired:
+                self._remove(key)
+            self.expirations += len(expired)
+            return len(expired)
+
+    def clear(self) -> int:
+        """
+        Remove all entries, on disk as well.
+
+        Returns:
+            Number of entries removed
+        """
+        with self._lock:
+            count = len(self._entries)
+            self._reset()
+            if self.cache_file:
+                self.save_cache()
+                if os.path.exists(self.vectors_file):
+                    os.truncate(self.vectors_file, 0)
+            logger.info(f"Cleared {count} entries from the semantic cache")
+            return count
+
+    @property
+    def cache(self) -> Dict[str, Tuple[np.ndarray, Dict[str, Any], float, Dict[str, Any]]]:
+        """Cached entries as {query: (embedding, response, timestamp, metadata)}."""
+        with self._lock:
+            return {
+                entry.query: (self._vectors[entry.row].copy(), entry.response, entry.timestamp, entry.metadata)
+                for entry in self._entries.values()
+            }
+
+    @cache.setter
+    def cache(self, entries: Dict[str, Tuple[Any, Dict[str, Any], float, Dict[str, Any]]]) -> None:
+        with self._lock:
+            self._replace_entries(
+                (query, embedding, response, timestamp, metadata)
+                for query, (embedding, response, timestamp, metadata) in entries.items()
+            )
+
+    def _replace_entries(self, items: Iterable[Tuple[str, Any, Dict[str, Any], float, Dict[str, Any]]]) -> None:
+        """Replace all entries, oldest first; every row is written on the next save."""
+        self._reset()
+        for query, embedding, response, timestamp, metadata in items:
+            vector = _normalize(embedding)
+            key = _key(query)
+            if vector is not None and key:
+                if key in self._entries:
+                    self._remove(key)
+                self._insert(key, query, vector, response, timestamp, metadata or {})
+
+    # Persistence
+
+    def _maybe_save(self) -> None:
+        if self.cache_file and time.monotonic() - self._last_save >= self.save_interval_seconds:
+            self.save_cache()
+
+    def _write_rows(self) -> None:
+        """Write the rows added since the last save into the vectors file."""
+        dim = self._vectors.shape[1]
+        row_bytes = dim * np.dtype(np.float32).itemsize
+        fd = os.open(self.vectors_file, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            for row in sorted(self._dirty_rows):
+                os.pwrite(fd, self._vectors[row].tobytes(), row * row_bytes)
+            size = len(self._row_keys) * row_bytes
+            if os.fstat(fd).st_size < size:
+                os.ftruncate(fd, size)
+        finally:
+            os.close(fd)
+
+    def save_cache(self) -> bool:
+        """
+        Save the cache: new rows into the vectors file, then the metadata sidecar.
+
+        Returns:
+            True if the cache was saved
+        """
+        if not self.cache_file:
+            return False
+
+        with self._lock:
+            start_time = time.time()
+            try:
+                directory = os.path.dirname(self.cache_file)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                if self._vectors is not None and self._dirty_rows:
+                    self._write_rows()
+
+                sidecar = {
+                    "version": SIDECAR_VERSION,
+                    "model_name": self.model_name,
+                    "dim": None if self._vectors is None else int(self._vectors.shape[1]),
+                    "rows": len(self._row_keys),
+                    "entries": [
+                        {
+                            "query": entry.query,
+                            "row": entry.row,
+                            "response": entry.response,
+                            "timestamp": entry.timestamp,
+                            "metadata": entry.metadata
+                        }
+                        for entry in self._entries.values()
+                    ]
+                }
+                # Replace the sidecar atomically so a crash never leaves it half written
+                tmp_path = self.cache_file + ".tmp"
+                with open(tmp_path, "w") as f:
+                    json.dump(sidecar, f, separators=(",", ":"), default=str)
+                os.replace(tmp_path, self.cache_file)
+            except (OSError, TypeError, ValueError) as e:
+                logger.error(f"Error saving semantic cache to {self.cache_file}: {e}")
+                return False
+
+            # The sidecar no longer refers to released rows, so they can be reused
+            self._free_rows.extend(self._released_rows)
+            self._released_rows = []
+            self._dirty_rows = set()
+            self._last_save = time.monotonic()
+            logger.debug(f"Saved {len(self._entries)} semantic cache entries in {time.time() - start_time:.3f}s")
+            return True
+
+    def _restore(self, sidecar: Dict[str, Any]) -> None:
+        """Restore entries and rows from a sidecar and its memory-mapped vectors."""
+        self._reset()
+        dim, rows = sidecar.get("dim"), int(sidecar.get("rows") or 0)
+        if not dim or not rows:
+            return
+
+        mapped = np.memmap(self.vectors_file, dtype=np.float32, mode="r", shape=(rows, dim))
+        self._vectors = np.zeros((max(rows, MIN_CAPACITY), dim), dtype=np.float32)
+        self._vectors[:rows] = mapped
+        del mapped
+        self._row_keys = [None] * rows
+        self._row_hnsw = [-1] * rows
+
+        # Keep the most recently used entries if the cache shrank
+        for item in sidecar["entries"][-self.max_cache_size:]:
+            key, row = _key(item["query"]), int(item["row"])
+            if not key or not 0 <= row < rows or self._row_keys[row] is not None:
+                continue
+            self._entries.pop(key, None)
+            self._row_keys[row] = key
+            self._entries[key] = _Entry(item["query"], row, item["response"], item["timestamp"],
+                                        item.get("metadata") or {})
+
+        live_rows = {entry.row for entry in self._entries.values()}
+        self._row_keys = [key if row in live_rows else None for row, key in enumerate(self._row_keys)]
+        self._free_rows = [row for row in range(rows) if row not in live_rows]
+        self._vectors[self._free_rows] = 0.0
+        self._rebuild_index()
+
+    def load_cache(self) -> bool:
+        """
+        Load the cache from disk.
+
+        Also reads the older format that stored embeddings inline in the JSON file.
+
+        Returns:
+            True if the cache was loaded
+        """
+        if not self.cache_file or not os.path.exists(self.cache_file):
+            return False
+
+        with self._lock:
+            start_time = time.time()
+            try:
+                with open(self.cache_file, "r") as f:
+                    data = json.load(f)
+
+                if isinstance(data, dict) and data.get("version") == SIDECAR_VERSION:
+                    self._restore(data)
+                else:
+                    items = sorted(
+                        ((query, item["embedding"], item["response"], item["timestamp"], item.get("metadata"))
+                         for query, item in data.items()),
+                        key=lambda item: item[3]
+                    )
+                    self._replace_entries(items)
+            except (OSError, TypeError, ValueError, KeyError, AttributeError) as e:
+                logger.error(f"Error loading semantic cache from {self.cache_file}: {e}")
+                self._reset()
+                return False
+
+            expired = self._clean_cache()
+            logger.info(f"Loaded {len(self._entries)} semantic cache entries ({expired} expired) "
+                        f"in {time.time() - start_time:.2f}s")
+            return True
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get cache statistics.
+
+        Returns:
+            Dictionary of cache statistics
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_cache_size": self.max_cache_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "similarity_threshold": self.similarity_threshold,
+                "ttl_seconds": self.ttl_seconds,
+                "index_type": self.index_type,
+                "dimension": None if self._vectors is None else int(self._vectors.shape[1]),
+                "rows": len(self._row_keys),
+                "avg_search_ms": 1000 * self._search_seconds / self._searches if self._searches else 0.0,
+                "cache_file": self.cache_file
+            }
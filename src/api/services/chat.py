@@ -9,26 +9,22 @@
 import yaml
 import sys
 import json
+import asyncio
 from functools import lru_cache
 from typing import Dict, Any, List, Optional, Tuple, Union
 from pathlib import Path
-import threading
 
 # Add path fix to ensure src is in the Python path
 sys.path.insert(0, str(Path(__file__).parent.parent.parent.parent))
 
-from src.core.agent import UniversityAgent
+from src.core.agent import UniversityAgent, build_llm_messages
+from src.models.async_deepseek_client import get_async_deepseek_client
 from src.utils.logger import get_logger
 from src.api.services.documents import cache_document
 from src.api.services.cache.cache_service import get_from_cache, add_to_cache
-
-# Global conversation storage (in-memory for now)
-# In a production environment, this would be replaced with a database
-_conversations: Dict[str, List[Dict[str, Any]]] = {}
-
-# Memory cache to avoid repeated history processing
-# Maps conversation_id to a tuple of (timestamp, formatted_history)
-_memory_cache: Dict[str, Tuple[float, List[Any]]] = {}
+from src.api.services.streaming import StreamManager, StreamEvent, stream_tokens
+from src.api.services.conversation_store import get_conversation_store
+from src.api.services.coalescing import StreamFlight, coalescing_key, get_chat_flights, get_stream_flights
 
 # Global agent instance
 _agent = None
@@ -39,12 +35,10 @@
 # Enable/disable memory feature (from config)
 _memory_enabled = True
 _memory_max_messages = 10  # Maximum number of messages to include in history
-_memory_cache_ttl = 300.0   # Cache TTL in seconds (increased to 5 minutes)
 
-# Maximum number of recent messages to process for better performance
-_max_recent_messages = 5  # Reduced from 10 for better performance
-# Cache lock for thread safety
-_cache_lock = threading.RLock()
+# Number of recent turns read for the prompt; the prompt builder keeps the newest
+# ones that fit its token budget and rolls the others into a running summary
+_max_recent_messages = 16
 
 logger = get_logger(__name__)
 
@@ -65,12 +59,10 @@
                 memory_config = config.get('memory', {})
                 _memory_enabled = memory_config.get('enabled', True)
                 _memory_max_messages = memory_config.get('max_messages', 10)
-                _memory_cache_ttl = memory_config.get('cache_ttl', 300.0)
     
     logger.info(f"Semantic cache enabled: {_semantic_cache_enabled}")
     logger.info(f"Memory feature enabled: {_memory_enabled}")
     logger.info(f"Memory max messages: {_memory_max_messages}")
-    logger.info(f"Memory cache TTL: {_memory_cache_ttl}")
 except Exception as e:
     logger.error(f"Error loading config: {str(e)}")
     logger.warning("Defaulting to semantic_cache_enabled=True and memory_enabled=True")
@@ -100,12 +92,9 @@ def get_conversation_history(conversation_id: str) -> List[Dict[str, Any]]:
         conversation_id: The conversation ID.
         
     Returns:
-        The conversation history.
+        The conversation history, empty if the conversation doesn't exist.
     """
-    if conversation_id not in _conversations:
-        _conversations[conversation_id] = []
-    
-    return _conversations[conversation_id]
+    return get_conversation_store().get_messages(conversation_id)
 
 
 def add_message_to_history(
@@ -127,28 +116,18 @@ def add_message_to_history(
         documents: Optional documents.
         is_cached: Whether the message was retrieved from cache.
     """
-    # Use cache lock for thread safety
-    with _cache_lock:
-        if conversation_id not in _conversations:
-            _conversations[conversation_id] = []
-        
-        message = {
-            "role": role,
-            "content": content,
-            "timestamp": time.time()
-        }
-        
-        if role == "assistant":
-            message["thinking_steps"] = thinking_steps if thinking_steps else []
-            # Store only document IDs rather than full documents to reduce memory
-            message["documents"] = documents if documents else [] 
-            message["from_cache"] = is_cached
-        
-        _conversations[conversation_id].append(message)
-        
-        # Invalidate memory cache when a new message is added
-        if conversation_id in _memory_cache:
-            del _memory_cache[conversation_id]
+    message = {
+        "role": role,
+        "content": content,
+        "timestamp": time.time()
+    }
+    
+    if role == "assistant":
+        message["thinking_steps"] = thinking_steps if thinking_steps else []
+        message["documents"] = documents if documents else []
+        message["from_cache"] = is_cached
+    
+    get_conversation_store().append(conversation_id, message)
 
 
 def _format_history_for_agent(history: List[Dict[str, Any]], max_messages: int = 5) -> List[Any]:
@@ -190,7 +169,10 @@ def _format_history_for_agent(history: List[Dict[str, Any]], max_messages: int =
 
 def _get_formatted_history(conversation_id: str) -> List[Any]:
     """
-    Get the formatted history for a conversation, using cache if available.
+    Get the formatted history for a conversation.
+    
+    Only the first message and the most recent ones are read from the
+    conversation store.
     
     Args:
         conversation_id: The conversation ID.
@@ -198,38 +180,197 @@ def _get_formatted_history(conversation_id: str) -> List[Any]:
     Returns:
         Formatted history for the agent.
     """
-    current_time = time.time()
-    
-    # Use cache lock for thread safety
-    with _cache_lock:
-        # Check if we have a valid cached version
-        if conversation_id in _memory_cache:
-            cache_time, formatted_history = _memory_cache[conversation_id]
-            if current_time - cache_time < _memory_cache_ttl:
-                return formatted_history
-        
-        # Get and format the history
-        history = get_conversation_history(conversation_id)
-        
-        # Exclude the most recent message (it's the query we're processing)
-        if history and len(history) > 1:
-            history = history[:-1]
+    # Keep the first message for context from the start of the conversation,
+    # plus the most recent turns (*2 because each turn has user+assistant messages)
+    history = get_conversation_store().get_recent(conversation_id, _max_recent_messages * 2, keep_first=True)
+    
+    # Exclude the most recent message (it's the query we're processing)
+    if len(history) > 1:
+        history = history[:-1]
+    
+    return _format_history_for_agent(history, _max_recent_messages)
+
+
+def _format_documents(retrieved_documents: List[Any]) -> List[Dict[str, Any]]:
+    """
+    Cache retrieved documents and format them for the response.
+    
+    Args:
+        retrieved_documents: Documents returned by the agent.
         
-        # Optimize history length for performance
-        if len(history) > _max_recent_messages * 2:  # *2 because each turn has user+assistant messages
-            # Modified approach: Always keep the first message plus most recent messages
-            # This ensures context from the start of the conversation is maintained
-            first_message = history[0:1]  # Get the first message
-            recent_messages = history[-((_max_recent_messages * 2) - 1):]  # Get recent messages, leaving room for the first
-            history = first_message + recent_messages
+    Returns:
+        List of document summaries with their cache IDs.
+    """
+    documents = []
+    for doc in retrieved_documents:
+        # Cache the document
+        doc_id = cache_document(doc)
         
-        # Format the history
-        formatted_history = _format_history_for_agent(history, _max_recent_messages)
+        # Add to formatted documents
+        documents.append({
+            "id": doc_id,
+            "title": doc.metadata.get("title", "Unknown"),
+            "url": doc.metadata.get("url", ""),
+            "source": doc.metadata.get("source", "Unknown"),
+            "content_preview": doc.page_content[:200] + "..." if len(doc.page_content) > 200 else doc.page_content
+        })
+    return documents
+
+
+def _add_response_to_cache(
+    query: str,
+    answer: str,
+    thinking_steps: List[Dict[str, Any]],
+    documents: List[Dict[str, Any]],
+    use_web_search: bool,
+    conversation_id: str
+) -> None:
+    """Add a response to the semantic cache if it is enabled."""
+    if not _semantic_cache_enabled:
+        return
+    
+    logger.info(f"Adding response to semantic cache for query: '{query}'")
+    
+    # Create a cacheable version of the response
+    cache_data = {
+        "answer": answer,
+        "thinking_steps": thinking_steps,
+        "documents": documents
+    }
+    
+    # Add metadata for the cache
+    cache_metadata = {
+        "use_web_search": use_web_search,
+        "conversation_id": conversation_id
+    }
+    
+    try:
+        add_to_cache(query, cache_data, cache_metadata)
+    except Exception as e:
+        logger.error(f"Error adding to cache: {str(e)}")
+
+
+def _answer_query(
+    query: str,
+    use_web_search: bool,
+    recent_history: Optional[List[Any]],
+    thinking_step_callback: Optional[Any],
+    conversation_id: str
+) -> Tuple[str, List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    Answer a query with the agent and cache the response.
+    
+    Runs once for all coalesced requests; the response is cached before they
+    are released, so later identical queries hit the semantic cache.
+    
+    Args:
+        query: The query to process.
+        use_web_search: Whether to use web search.
+        recent_history: Conversation history to send with the query, if any.
+        thinking_step_callback: Optional callback for thinking steps as they happen.
+        conversation_id: Conversation ID, recorded with the cached response and
+            used to reuse the conversation's running summary.
         
-        # Cache the formatted history
-        _memory_cache[conversation_id] = (current_time, formatted_history)
+    Returns:
+        The answer, the thinking steps and the formatted documents.
+    """
+    agent = get_agent()
+    
+    # Configure the agent to use web search if requested
+    agent.use_web = use_web_search
+    
+    thinking_steps = []
+    step_callback = None
+    if thinking_step_callback:
+        # Process thinking steps (scoped to this query, not the shared agent)
+        def step_callback(step):
+            thinking_steps.append(step)
+            thinking_step_callback(step)
+    
+    # Process the query with conversation history if memory is enabled
+    if recent_history:
+        logger.info(f"Sending query with {len(recent_history)} history messages")
+        result = agent.query(query, use_web_search=use_web_search, conversation_history=recent_history,
+                             thinking_step_callback=step_callback, conversation_id=conversation_id)
+    else:
+        logger.info("Sending query without conversation history")
+        result = agent.query(query, use_web_search=use_web_search, thinking_step_callback=step_callback,
+                             conversation_id=conversation_id)
+    
+    # Extract information from the result
+    answer = result["answer"]
+    documents = _format_documents(result.get("documents", []))
+    if not thinking_steps:
+        thinking_steps = result.get("thinking_steps", [])
+    
+    # Cache the response if semantic cache is enabled
+    _add_response_to_cache(query, answer, thinking_steps, documents, use_web_search, conversation_id)
+    return answer, thinking_steps, documents
+
+
+async def _generate_answer_stream(
+    query: str,
+    use_web_search: bool,
+    recent_history: Optional[List[Any]],
+    conversation_id: str,
+    flight: StreamFlight
+) -> Tuple[str, List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    Answer a query, publishing thinking updates and answer tokens to a flight.
+    
+    Runs once for all coalesced streaming requests. Retrieval runs in a
+    worker thread; the answer is generated with the async DeepSeek client on
+    the event loop.
+    
+    Args:
+        query: The query to process.
+        use_web_search: Whether to use web search.
+        recent_history: Conversation history to send with the query, if any.
+        conversation_id: Conversation ID, recorded with the cached response and
+            used to reuse the conversation's running summary.
+        flight: The flight to publish events to.
         
-        return formatted_history
+    Returns:
+        The answer, the thinking steps and the formatted documents.
+    """
+    loop = asyncio.get_running_loop()
+    agent = get_agent()
+    agent.use_web = use_web_search
+    
+    thinking_steps = []
+    await flight.add_event(StreamEvent.THINKING_START, {"query": query})
+    
+    def thinking_step_callback(step):
+        thinking_steps.append(step)
+        loop.call_soon_threadsafe(flight.publish, StreamEvent.THINKING_UPDATE, step)
+    
+    # Retrieval is blocking (vector store and web search), so it runs in a worker thread
+    state = await asyncio.to_thread(
+        agent.prepare_query,
+        query,
+        use_web_search,
+        recent_history,
+        thinking_step_callback,
+        conversation_id
+    )
+    
+    if not thinking_steps:
+        thinking_steps = state.get("thinking_steps", [])
+    await flight.add_event(StreamEvent.THINKING_END, {"steps": len(thinking_steps)})
+    
+    # Generate the answer on the event loop, token by token
+    messages = build_llm_messages(state)
+    llm = get_async_deepseek_client()
+    answer = await stream_tokens(flight, llm.astream(messages))
+    if not answer:
+        answer = "I'm unable to generate a response at this time. Please try again."
+    
+    documents = _format_documents(state.get("documents", []) + state.get("web_documents", []))
+    
+    await asyncio.to_thread(
+        _add_response_to_cache, query, answer, thinking_steps, documents, use_web_search, conversation_id
+    )
+    return answer, thinking_steps, documents
 
 
 def process_chat(
@@ -307,10 +448,20 @@ def process_chat(
                 documents=documents,
                 is_cached=True
             )
-            
+
+            # Replay the cached response through the callback handler if provided
+            if callback_handler:
+                callback_handler.on_thinking_start({"query": query, "cached": True})
+                for step in thinking_steps:
+                    callback_handler.on_thinking_update(step)
+                callback_handler.on_answer(answer)
+                if documents:
+                    callback_handler.on_documents(documents)
+                callback_handler.on_complete()
+
             # Calculate duration
             duration = time.time() - start_time
-            
+
             logger.info(f"Returned cached response in {duration:.2f}s")
             return answer, conversation_id, thinking_steps, documents, duration
         
@@ -340,59 +491,30 @@ def process_chat(
                 logger.info("Continuing without conversation history")
                 recent_history = []
         
-        # Get the agent
-        agent = get_agent()
-        
-        # Configure the agent to use web search if requested
-        agent.use_web = use_web_search
-        
-        # Add callback handler if provided
-        thinking_steps = []
+        thinking_step_callback = None
         if callback_handler:
             # Start thinking
             callback_handler.on_thinking_start({"query": query})
-            
-            # Process thinking steps
-            def thinking_step_callback(step):
-                thinking_steps.append(step)
-                callback_handler.on_thinking_update(step)
-                
-            # Set the thinking step callback
-            agent.set_thinking_step_callback(thinking_step_callback)
-        
-        # Process the query with conversation history if memory is enabled
-        if should_use_memory and recent_history:
-            logger.info(f"Sending query with {len(recent_history)} history messages")
-            result = agent.query(query, use_web_search=use_web_search, conversation_history=recent_history)
-        else:
-            logger.info("Sending query without conversation history")
-            result = agent.query(query, use_web_search=use_web_search)
+            thinking_step_callback = callback_handler.on_thinking_update
         
-        # Extract information from the result
-        answer = result["answer"]
-        retrieved_documents = result.get("documents", [])
-        
-        # Format documents
-        documents = []
-        for doc in retrieved_documents:
-            # Cache the document
-            doc_id = cache_document(doc)
-            
-            # Add to formatted documents
-            documents.append({
-                "id": doc_id,
-                "title": doc.metadata.get("title", "Unknown"),
-                "url": doc.metadata.get("url", ""),
-                "source": doc.metadata.get("source", "Unknown"),
-                "content_preview": doc.page_content[:200] + "..." if len(doc.page_content) > 200 else doc.page_content
-            })
+        # Identical queries already in flight share one agent run
+        history = recent_history if should_use_memory and recent_history else None
+        (answer, thinking_steps, documents), shared = get_chat_flights().do(
+            coalescing_key(query, use_web_search, history),
+            lambda: _answer_query(query, use_web_search, history, thinking_step_callback, conversation_id)
+        )
+        if shared:
+            logger.info(f"Coalesced query with an identical request in flight: '{query}'")
+            if callback_handler:
+                for step in thinking_steps:
+                    callback_handler.on_thinking_update(step)
             
         # Add to conversation history
         add_message_to_history(
             conversation_id,
             "assistant",
             answer,
-            thinking_steps=thinking_steps if thinking_steps else result.get("thinking_steps", []),
+            thinking_steps=thinking_steps,
             documents=documents
         )
         
@@ -410,30 +532,8 @@ def thinking_step_callback(step):
         # Calculate duration
         duration = time.time() - start_time
         
-        # Cache the response if semantic cache is enabled
-        if _semantic_cache_enabled:
-            logger.info(f"Adding response to semantic cache for query: '{query}'")
-            
-            # Create a cacheable version of the response
-            cache_data = {
-                "answer": answer,
-                "thinking_steps": thinking_steps if thinking_steps else result.get("thinking_steps", []),
-                "documents": documents
-            }
-            
-            # Add metadata for the cache
-            cache_metadata = {
-                "use_web_search": use_web_search,
-                "conversation_id": conversation_id
-            }
-            
-            try:
-                add_to_cache(query, cache_data, cache_metadata)
-            except Exception as e:
-                logger.error(f"Error adding to cache: {str(e)}")
-        
         logger.info(f"Processed query in {duration:.2f}s")
-        return answer, conversation_id, thinking_steps if thinking_steps else result.get("thinking_steps", []), documents, duration
+        return answer, conversation_id, thinking_steps, documents, duration
     
     except Exception as e:
         logger.error(f"Error processing chat: {str(e)}", exc_info=True)
@@ -445,4 +545,140 @@ def thinking_step_callback(step):
         answer = f"I encountered an error processing your request. Please try again."
         add_message_to_history(conversation_id, "assistant", answer)
         
-        return answer, conversation_id, [], [], duration 
\ No newline at end of file
+        return answer, conversation_id, [], [], duration 
+
+
+async def process_chat_stream(
+    query: str,
+    use_web_search: bool = False,
+    conversation_id: Optional[str] = None,
+    stream_manager: Optional[StreamManager] = None,
+    callback_handler: Optional[Any] = None,
+    use_memory: Optional[bool] = None
+) -> Tuple[str, str, List[Dict[str, Any]], List[Dict[str, Any]], float]:
+    """
+    Process a chat query, streaming answer tokens as they are generated.
+    
+    Retrieval and the conversation history reads and writes run in worker
+    threads; the answer is generated with the async DeepSeek client on the
+    event loop and each token is added to the stream directly. Concurrent identical queries share one generation and receive
+    the same thinking and token events.
+    
+    Args:
+        query: The query to process.
+        use_web_search: Whether to use web search.
+        conversation_id: Optional conversation ID for context.
+        stream_manager: The stream manager to add events to.
+        callback_handler: Not used; thinking updates are added to stream_manager directly.
+        use_memory: Whether to use conversation memory feature. If None, uses global setting.
+        
+    Returns:
+        The same tuple as process_chat.
+    """
+    start_time = time.time()
+    
+    # Get or create the conversation ID
+    if not conversation_id:
+        conversation_id = str(uuid.uuid4())
+        logger.info(f"Created new conversation: {conversation_id}")
+    else:
+        logger.info(f"Using existing conversation: {conversation_id}")
+    
+    should_use_memory = _memory_enabled if use_memory is None else use_memory
+    
+    # Check semantic cache (computes an embedding, so keep it off the event loop)
+    cached_response = None
+    if _semantic_cache_enabled:
+        metadata = {
+            "use_web_search": use_web_search,
+            "conversation_id": conversation_id
+        }
+        try:
+            cached_response = await asyncio.to_thread(get_from_cache, query, metadata)
+        except Exception as e:
+            logger.error(f"Error retrieving from semantic cache: {str(e)}", exc_info=True)
+            cached_response = None
+    
+    # The conversation store is SQLite; keep its calls off the event loop
+    await asyncio.to_thread(add_message_to_history, conversation_id, "user", query)
+    
+    try:
+        if cached_response:
+            logger.info(f"Cache hit for query: '{query}'")
+            answer = cached_response.get("answer", "")
+            thinking_steps = cached_response.get("thinking_steps", [])
+            documents = cached_response.get("documents", [])
+            
+            await asyncio.to_thread(
+                add_message_to_history,
+                conversation_id,
+                "assistant",
+                answer,
+                thinking_steps=thinking_steps,
+                documents=documents,
+                is_cached=True
+            )
+            
+            await stream_manager.add_event(StreamEvent.ANSWER, {"answer": answer})
+            if documents:
+                await stream_manager.add_event(StreamEvent.DOCUMENTS, {"documents": documents})
+            
+            duration = time.time() - start_time
+            await stream_manager.add_event(
+                StreamEvent.DONE,
+                {"conversation_id": conversation_id, "duration_seconds": duration}
+            )
+            return answer, conversation_id, thinking_steps, documents, duration
+        
+        recent_history = []
+        if should_use_memory:
+            try:
+                recent_history = await asyncio.to_thread(_get_formatted_history, conversation_id)
+            except Exception as e:
+                logger.error(f"Error retrieving conversation history: {str(e)}")
+                recent_history = []
+        
+        # Identical queries already in flight subscribe to the same token stream
+        history = recent_history if should_use_memory and recent_history else None
+        flight = get_stream_flights().join(
+            coalescing_key(query, use_web_search, history),
+            lambda flight: _generate_answer_stream(query, use_web_search, history, conversation_id, flight)
+        )
+        if flight.subscribers > 1:
+            logger.info(f"Coalesced streaming query with an identical request in flight: '{query}'")
+        
+        async for event_type, data in flight.subscribe():
+            await stream_manager.add_event(event_type, data)
+        answer, thinking_steps, documents = flight.result()
+        
+        await asyncio.to_thread(
+            add_message_to_history,
+            conversation_id,
+            "assistant",
+            answer,
+            thinking_steps=thinking_steps,
+            documents=documents
+        )
+        
+        await stream_manager.add_event(StreamEvent.ANSWER, {"answer": answer})
+        if documents:
+            await stream_manager.add_event(StreamEvent.DOCUMENTS, {"documents": documents})
+        
+        duration = time.time() - start_time
+        await stream_manager.add_event(
+            StreamEvent.DONE,
+            {"conversation_id": conversation_id, "duration_seconds": duration}
+        )
+        
+        logger.info(f"Processed streaming query in {duration:.2f}s")
+        return answer, conversation_id, thinking_steps, documents, duration
+    
+    except Exception as e:
+        logger.error(f"Error processing streaming chat: {str(e)}", exc_info=True)
+        
+        duration = time.time() - start_time
+        answer = f"I encountered an error processing your request. Please try again."
+        await asyncio.to_thread(add_message_to_history, conversation_id, "assistant", answer)
+        
+        await stream_manager.add_event(StreamEvent.ERROR, {"error": str(e)})
+        return answer, conversation_id, [], [], duration
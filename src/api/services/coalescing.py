@@ -0,0 +1,262 @@
+"""
+Request coalescing for the Kevin API.
+
+Identical queries that arrive while the first one is still being answered
+wait for that answer instead of running the agent and the LLM again.
+SingleFlight does this for blocking calls. StreamFlights does it for
+streaming requests: the answer is generated once, and every request for
+the same query receives the same thinking and token events, including the
+ones sent before it arrived.
+"""
+
+import json
+import asyncio
+import hashlib
+import threading
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+from src.utils.logger import get_logger
+from src.models.embedding_cache import normalize_text
+
+logger = get_logger(__name__)
+
+
+def coalescing_key(query: str, use_web_search: bool, history: Optional[Sequence[Any]] = None) -> str:
+    """
+    Key under which identical requests are coalesced.
+
+    Args:
+        query: The query
+        use_web_search: Whether web search is used
+        history: Conversation history sent with the query, if any
+
+    Returns:
+        Hex digest of the normalized query and the options that change the answer
+    """
+    parts = {
+        "query": normalize_text(query).casefold(),
+        "use_web_search": bool(use_web_search),
+        "history": [
+            (getattr(message, "type", None), getattr(message, "content", message))
+            for message in history or []
+        ]
+    }
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class _Call:
+    """A computation in progress and the callers waiting for it."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """Runs one computation per key at a time; concurrent callers share its result."""
+
+    def __init__(self):
+        self._calls: Dict[str, _Call] = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.coalesced = 0
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        Run fn, or wait for the run already in progress for the same key.
+
+        Args:
+            key: Key identifying the computation
+            fn: The computation
+
+        Returns:
+            The result of fn, and whether it was shared with an earlier caller
+
+        Raises:
+            Exception: Whatever fn raised, in every caller that waited for it
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+                self.leaders += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+            return call.result, False
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"leaders": self.leaders, "coalesced": self.coalesced, "in_flight": len(self._calls)}
+
+
+class StreamFlight:
+    """
+    Events and result of one shared streaming computation.
+
+    Events are buffered for the life of the flight, so a subscriber that joins
+    late first receives everything that was already sent.
+    """
+
+    def __init__(self):
+        self.events: List[Tuple[str, Dict[str, Any]]] = []
+        self.subscribers = 1
+        self.done = False
+        self._result: Any = None
+        self._error: Optional[BaseException] = None
+        self._changed = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+
+    def _notify(self) -> None:
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def publish(self, event_type: str, data: Dict[str, Any]) -> None:
+        """
+        Send an event to all subscribers. Must be called on the event loop.
+
+        Args:
+            event_type: The type of event (see StreamEvent)
+            data: The data to include in the event
+        """
+        self.events.append((event_type, data))
+        self._notify()
+
+    async def add_event(self, event_type: str, data: Dict[str, Any]) -> None:
+        """Publish an event; lets a flight stand in for a StreamManager."""
+        self.publish(event_type, data)
+
+    def finish(self, result: Any = None, error: Optional[BaseException] = None) -> None:
+        self._result, self._error = result, error
+        self.done = True
+        self._notify()
+
+    async def subscribe(self) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Iterate over all events of the flight until it finishes.
+
+        Yields:
+            (event type, data) tuples
+        """
+        position = 0
+        while True:
+            while position < len(self.events):
+                yield self.events[position]
+                position += 1
+            if self.done:
+                return
+            await self._changed.wait()
+
+    def result(self) -> Any:
+        """
+        Get the result of the finished computation.
+
+        Raises:
+            Exception: Whatever the computation raised
+        """
+        if self._error is not None:
+            raise self._error
+        return self._result
+
+
+class StreamFlights:
+    """Runs one streaming computation per key at a time on the event loop."""
+
+    def __init__(self):
+        self._flights: Dict[str, StreamFlight] = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    def join(self, key: str, produce: Callable[[StreamFlight], Awaitable[Any]]) -> StreamFlight:
+        """
+        Subscribe to the flight for a key, starting it if none is in progress.
+
+        Must be called on the event loop. The computation runs as its own
+        task, so it finishes for the other subscribers even if the request
+        that started it goes away.
+
+        Args:
+            key: Key identifying the computation
+            produce: Coroutine function computing the result; it receives the
+                flight to publish its events to
+
+        Returns:
+            The flight to subscribe to
+        """
+        flight = self._flights.get(key)
+        if flight is not None:
+            flight.subscribers += 1
+            self.coalesced += 1
+            return flight
+
+        flight = StreamFlight()
+        self._flights[key] = flight
+        self.leaders += 1
+        flight.task = asyncio.get_running_loop().create_task(self._run(key, flight, produce))
+        return flight
+
+    async def _run(self, key: str, flight: StreamFlight, produce: Callable[[StreamFlight], Awaitable[Any]]) -> None:
+        try:
+            result = await produce(flight)
+        except asyncio.CancelledError as e:
+            flight.finish(error=e)
+            raise
+        except Exception as e:
+            logger.error(f"Error in shared streaming computation: {e}", exc_info=True)
+            flight.finish(error=e)
+        else:
+            flight.finish(result)
+        finally:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"leaders": self.leaders, "coalesced": self.coalesced, "in_flight": len(self._flights)}
+
+
+_chat_flights = SingleFlight()
+_stream_flights = StreamFlights()
+
+
+def get_chat_flights() -> SingleFlight:
+    """Get the shared coalescer for blocking chat requests."""
+    return _chat_flights
+
+
+def get_stream_flights() -> StreamFlights:
+    """Get the shared coalescer for streaming chat requests."""
+    return _stream_flights
+
+
+def get_coalescing_stats() -> Dict[str, Any]:
+    """
+    Get request coalescing statistics.
+
+    Returns:
+        Counts of computations run (leaders) and requests that joined one (coalesced)
+    """
+    chat = _chat_flights.get_stats()
+    stream = _stream_flights.get_stats()
+    return {
+        "chat": chat,
+        "stream": stream,
+        "coalesced": chat["coalesced"] + stream["coalesced"]
+    }
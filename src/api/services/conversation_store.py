@@ -0,0 +1,448 @@
+"""
+Conversation storage for the Kevin API.
+
+Conversations are append-only lists of messages. ConversationStore defines
+the operations the chat service needs, and the backend is chosen in the
+conversations section of the config:
+
+    sqlite   Messages in a SQLite database in WAL mode. Several uvicorn
+             workers on one host can share the file, so it also stands in
+             locally for a shared store.
+    memory   Messages in process memory, bounded to the most recently used
+             conversations. For tests and single-process development.
+
+Appending a message is a single insert. Reading the last N messages reads
+only those rows, and only their role, content and timestamp; the thinking steps
+and documents of a message are decoded only when the full conversation is
+requested. The SQLite backend keeps the tails of recently used conversations
+in a bounded in-memory LRU, validated against the last sequence number on disk
+so that messages appended by other workers are never missed.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import threading
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, List, Optional
+
+from src.utils.logger import get_logger
+from src.utils.config import get_config
+
+logger = get_logger(__name__)
+
+DEFAULT_BACKEND = "sqlite"
+DEFAULT_DB_PATH = os.path.join("data", "conversations", "conversations.sqlite")
+DEFAULT_HOT_CONVERSATIONS = 1000
+DEFAULT_TAIL_SIZE = 32
+DEFAULT_MAX_CONVERSATIONS = 10000
+
+# Message fields stored in their own columns; everything else goes to the JSON data column
+_COLUMNS = ("role", "content", "timestamp")
+
+
+class ConversationStore:
+    """Interface of conversation storage backends."""
+
+    def append(self, conversation_id: str, message: Dict[str, Any]) -> int:
+        """
+        Append a message to a conversation, creating it if needed.
+
+        Args:
+            conversation_id: The conversation ID
+            message: The message, with at least role and content
+
+        Returns:
+            Number of messages in the conversation after the append
+        """
+        raise NotImplementedError
+
+    def get_messages(self, conversation_id: str) -> List[Dict[str, Any]]:
+        """
+        Get all messages of a conversation.
+
+        Args:
+            conversation_id: The conversation ID
+
+        Returns:
+            The messages, oldest first; empty if the conversation does not exist
+        """
+        raise NotImplementedError
+
+    def get_recent(self, conversation_id: str, limit: int, keep_first: bool = False) -> List[Dict[str, Any]]:
+        """
+        Get the role, content and timestamp of the last messages of a conversation.
+
+        Args:
+            conversation_id: The conversation ID
+            limit: Maximum number of recent messages
+            keep_first: Also return the first message if it is not among the recent ones
+
+        Returns:
+            The messages, oldest first
+        """
+        raise NotImplementedError
+
+    def delete(self, conversation_id: str) -> bool:
+        """
+        Delete a conversation.
+
+        Args:
+            conversation_id: The conversation ID
+
+        Returns:
+            True if the conversation existed
+        """
+        raise NotImplementedError
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get store statistics."""
+        raise NotImplementedError
+
+    def close(self) -> None:
+        """Release the resources of the store."""
+
+
+def _summary(message: Dict[str, Any]) -> Dict[str, Any]:
+    return {name: message.get(name) for name in _COLUMNS}
+
+
+class MemoryConversationStore(ConversationStore):
+    """Conversations in process memory, evicting the least recently used ones."""
+
+    def __init__(self, max_conversations: int = DEFAULT_MAX_CONVERSATIONS):
+        """
+        Initialize the store.
+
+        Args:
+            max_conversations: Maximum number of conversations kept
+        """
+        self.max_conversations = max_conversations
+        self._conversations: "OrderedDict[str, List[Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def append(self, conversation_id: str, message: Dict[str, Any]) -> int:
+        with self._lock:
+            messages = self._conversations.get(conversation_id)
+            if messages is None:
+                messages = self._conversations[conversation_id] = []
+                while len(self._conversations) > self.max_conversations:
+                    self._conversations.popitem(last=False)
+                    self.evictions += 1
+            self._conversations.move_to_end(conversation_id)
+            messages.append(dict(message))
+            return len(messages)
+
+    def get_messages(self, conversation_id: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            messages = self._conversations.get(conversation_id)
+            if messages is None:
+                return []
+            self._conversations.move_to_end(conversation_id)
+            return [dict(message) for message in messages]
+
+    def get_recent(self, conversation_id: str, limit: int, keep_first: bool = False) -> List[Dict[str, Any]]:
+        with self._lock:
+            messages = self._conversations.get(conversation_id)
+            if not messages or limit <= 0:
+                return []
+            self._conversations.move_to_end(conversation_id)
+            recent = messages[-limit:]
+            if keep_first and len(messages) > limit:
+                recent = messages[:1] + recent
+            return [_summary(message) for message in recent]
+
+    def delete(self, conversation_id: str) -> bool:
+        with self._lock:
+            return self._conversations.pop(conversation_id, None) is not None
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "backend": "memory",
+                "conversations": len(self._conversations),
+                "max_conversations": self.max_conversations,
+                "messages": sum(len(messages) for messages in self._conversations.values()),
+                "evictions": self.evictions
+            }
+
+
+class _Tail:
+    """The first and last messages of a conversation, as of a sequence number."""
+
+    __slots__ = ("first", "messages", "last_seq")
+
+    def __init__(self, first: Optional[Dict[str, Any]], messages: Deque[Dict[str, Any]], last_seq: int):
+        self.first = first
+        self.messages = messages
+        self.last_seq = last_seq
+
+
+class SQLiteConversationStore(ConversationStore):
+    """
+    Conversations in an append-only SQLite table.
+
+    All methods are thread-safe, and several processes may share a database.
+    """
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH, hot_conversations: int = DEFAULT_HOT_CONVERSATIONS,
+                 tail_size: int = DEFAULT_TAIL_SIZE):
+        """
+        Initialize the store.
+
+        Args:
+            db_path: Path of the SQLite database
+            hot_conversations: Number of conversation tails kept in memory
+            tail_size: Number of recent messages kept in memory per conversation
+        """
+        self.db_path = db_path
+        self.hot_conversations = hot_conversations
+        self.tail_size = tail_size
+
+        self._lock = threading.RLock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._hot: "OrderedDict[str, _Tail]" = OrderedDict()
+
+        # Metrics
+        self.appends = 0
+        self.tail_hits = 0
+        self.tail_misses = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open the database, creating the schema on first use."""
+        if self._conn is None:
+            directory = os.path.dirname(self.db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS messages (
+                    conversation_id TEXT NOT NULL,
+                    seq INTEGER NOT NULL,
+                    role TEXT NOT NULL,
+                    content TEXT NOT NULL,
+                    timestamp REAL NOT NULL,
+                    data TEXT,
+                    PRIMARY KEY (conversation_id, seq)
+                );
+            """)
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def _last_seq(self, conn: sqlite3.Connection, conversation_id: str) -> int:
+        row = conn.execute(
+            "SELECT MAX(seq) FROM messages WHERE conversation_id = ?", (conversation_id,)
+        ).fetchone()
+        return row[0] or 0
+
+    def _remember(self, conversation_id: str, tail: _Tail) -> None:
+        """Keep a conversation tail in the LRU."""
+        self._hot[conversation_id] = tail
+        self._hot.move_to_end(conversation_id)
+        while len(self._hot) > self.hot_conversations:
+            self._hot.popitem(last=False)
+
+    def append(self, conversation_id: str, message: Dict[str, Any]) -> int:
+        extra = {name: value for name, value in message.items() if name not in _COLUMNS}
+        summary = _summary(message)
+        if summary["timestamp"] is None:
+            summary["timestamp"] = time.time()
+
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                # The sequence number is assigned inside the insert, so concurrent writers can't collide
+                seq = conn.execute(
+                    """
+                    INSERT INTO messages (conversation_id, seq, role, content, timestamp, data)
+                    SELECT ?, COALESCE(MAX(seq), 0) + 1, ?, ?, ?, ?
+                    FROM messages WHERE conversation_id = ?
+                    RETURNING seq
+                    """,
+                    (conversation_id, summary["role"], summary["content"], summary["timestamp"],
+                     json.dumps(extra, default=str) if extra else None, conversation_id)
+                ).fetchone()[0]
+            self.appends += 1
+
+            tail = self._hot.get(conversation_id)
+            if tail is not None and tail.last_seq == seq - 1:
+                tail.messages.append(summary)
+                tail.last_seq = seq
+                self._hot.move_to_end(conversation_id)
+            elif seq == 1:
+                self._remember(conversation_id, _Tail(summary, deque([summary], maxlen=self.tail_size), seq))
+            else:
+                # Another writer appended in between; reload the tail on the next read
+                self._hot.pop(conversation_id, None)
+            return seq
+
+    def get_messages(self, conversation_id: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT role, content, timestamp, data FROM messages WHERE conversation_id = ? ORDER BY seq",
+                (conversation_id,)
+            ).fetchall()
+
+        messages = []
+        for role, content, timestamp, data in rows:
+            message = {"role": role, "content": content, "timestamp": timestamp}
+            if data:
+                message.update(json.loads(data))
+            messages.append(message)
+        return messages
+
+    def _load_tail(self, conn: sqlite3.Connection, conversation_id: str, size: int) -> _Tail:
+        """Read the first and the last size messages of a conversation."""
+        rows = conn.execute(
+            """
+            SELECT seq, role, content, timestamp FROM messages
+            WHERE conversation_id = ? ORDER BY seq DESC LIMIT ?
+            """,
+            (conversation_id, size)
+        ).fetchall()
+        rows.reverse()
+        messages = deque(
+            ({"role": role, "content": content, "timestamp": timestamp} for _, role, content, timestamp in rows),
+            maxlen=max(size, self.tail_size)
+        )
+        if not rows:
+            return _Tail(None, messages, 0)
+
+        if rows[0][0] == 1:
+            first = messages[0]
+        else:
+            role, content, timestamp = conn.execute(
+                "SELECT role, content, timestamp FROM messages WHERE conversation_id = ? AND seq = 1",
+                (conversation_id,)
+            ).fetchone()
+            first = {"role": role, "content": content, "timestamp": timestamp}
+        return _Tail(first, messages, rows[-1][0])
+
+    def get_recent(self, conversation_id: str, limit: int, keep_first: bool = False) -> List[Dict[str, Any]]:
+        if limit <= 0:
+            return []
+
+        with self._lock:
+            conn = self._connect()
+            last_seq = self._last_seq(conn, conversation_id)
+            tail = self._hot.get(conversation_id)
+            if tail is not None and tail.last_seq == last_seq and limit <= tail.messages.maxlen:
+                self.tail_hits += 1
+                self._hot.move_to_end(conversation_id)
+            else:
+                self.tail_misses += 1
+                tail = self._load_tail(conn, conversation_id, max(limit, self.tail_size))
+                if tail.last_seq:
+                    self._remember(conversation_id, tail)
+
+            recent = list(tail.messages)[-limit:]
+            if keep_first and tail.last_seq > limit:
+                recent.insert(0, tail.first)
+            return [dict(message) for message in recent]
+
+    def delete(self, conversation_id: str) -> bool:
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                deleted = conn.execute(
+                    "DELETE FROM messages WHERE conversation_id = ?", (conversation_id,)
+                ).rowcount
+            self._hot.pop(conversation_id, None)
+            return deleted > 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.tail_hits + self.tail_misses
+            return {
+                "backend": "sqlite",
+                "db_path": self.db_path,
+                "hot_conversations": len(self._hot),
+                "max_hot_conversations": self.hot_conversations,
+                "appends": self.appends,
+                "tail_hits": self.tail_hits,
+                "tail_misses": self.tail_misses,
+                "tail_hit_rate": self.tail_hits / lookups if lookups else 0.0
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+            self._hot.clear()
+
+
+_store: Optional[ConversationStore] = None
+_store_lock = threading.Lock()
+
+
+def create_conversation_store(settings: Optional[Dict[str, Any]] = None) -> ConversationStore:
+    """
+    Create a conversation store from configuration settings.
+
+    Args:
+        settings: The conversations config section (defaults to the loaded config)
+
+    Returns:
+        A new ConversationStore
+    """
+    if settings is None:
+        settings = get_config().section('conversations')
+
+    backend = settings.get('backend', DEFAULT_BACKEND)
+    if backend == "memory":
+        return MemoryConversationStore(settings.get('max_conversations', DEFAULT_MAX_CONVERSATIONS))
+    if backend != "sqlite":
+        raise ValueError(f"Unknown conversation store backend: {backend}")
+    return SQLiteConversationStore(
+        settings.get('db_path', DEFAULT_DB_PATH),
+        hot_conversations=settings.get('hot_conversations', DEFAULT_HOT_CONVERSATIONS),
+        tail_size=settings.get('tail_size', DEFAULT_TAIL_SIZE)
+    )
+
+
+def get_conversation_store() -> ConversationStore:
+    """
+    Get the shared conversation store, creating it on first use.
+
+    Returns:
+        The process-wide ConversationStore
+    """
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = create_conversation_store()
+                logger.info(f"Using {type(_store).__name__} for conversations")
+    return _store
+
+
+def set_conversation_store(store: Optional[ConversationStore]) -> Optional[ConversationStore]:
+    """
+    Replace the shared conversation store, e.g. with a MemoryConversationStore in tests.
+
+    Args:
+        store: The new store, or None to create one from the config on next use
+
+    Returns:
+        The previous store
+    """
+    global _store
+    with _store_lock:
+        previous, _store = _store, store
+    return previous
+
+
+def get_conversation_store_stats() -> Dict[str, Any]:
+    """
+    Get conversation store statistics.
+
+    Returns:
+        Dictionary of store statistics, empty if the store is not open yet
+    """
+    return _store.get_stats() if _store is not None else {}
@@ -2,40 +2,340 @@
 Documents service for Kevin API.
 
 This module provides services for retrieving and managing documents.
+
+Documents returned by searches and chats are kept in a DocumentRegistry, an
+LRU bounded by the approximate size of the documents in bytes. Document IDs
+are the chunk IDs of the vector store, so the same chunk always gets the same
+ID. Documents evicted from memory are written to a SQLite file, so that
+get_document and get_document_by_url still resolve IDs handed out earlier.
+The registry is configured in the document_registry section of the config.
 """
 
 import os
+import json
 import time
-import hashlib
-from typing import Dict, Any, List, Optional, Tuple
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+
+from langchain_core.documents import Document
 
+from src.core.incremental_index import chunk_id
 from src.utils.logger import get_logger
+from src.utils.config import get_config
+from src.utils.web_search import normalize_url
 
 logger = get_logger(__name__)
 
-# Document cache
-_document_cache: Dict[str, Dict[str, Any]] = {}
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_DB_PATH = os.path.join("data", "documents", "documents.sqlite")
+
+
+def _document_dict(document: Any) -> Dict[str, Any]:
+    """Convert a langchain Document to the API's document dictionary."""
+    if isinstance(document, dict):
+        return document
+    return {
+        "id": getattr(document, "id", None) or document.metadata.get("id", ""),
+        "content": document.page_content,
+        "metadata": document.metadata
+    }
+
+
+def make_document_id(document: Dict[str, Any]) -> str:
+    """
+    Get the stable ID of a document.
+
+    The ID given by the vector store is used if there is one; otherwise the
+    chunk fingerprint the vector store uses for the same source and content.
+
+    Args:
+        document: Document dictionary with content and metadata
+
+    Returns:
+        The document ID
+    """
+    metadata = document.get("metadata") or {}
+    explicit = document.get("id") or metadata.get("id")
+    if explicit:
+        return str(explicit)
+    return chunk_id(Document(page_content=document.get("content", ""), metadata=metadata))
+
+
+def _document_url(document: Dict[str, Any]) -> Optional[str]:
+    """Get the normalized URL of a document, if it has one."""
+    metadata = document.get("metadata") or {}
+    for key in ("url", "source"):
+        value = metadata.get(key)
+        if isinstance(value, str) and value.startswith(("http://", "https://")):
+            return normalize_url(value)
+    return None
+
+
+def _estimate_size(document: Dict[str, Any]) -> int:
+    """Approximate the memory held by a document, in bytes."""
+    size = len(document.get("content", ""))
+    for name, value in (document.get("metadata") or {}).items():
+        size += len(str(name)) + len(str(value))
+    return size + 200  # Dictionary and string object overhead
+
+
+class DocumentRegistry:
+    """
+    Recently returned documents, bounded by their approximate size in bytes.
+
+    The least recently used documents are evicted beyond max_bytes. If a
+    database path is given, evicted documents are written there and read back
+    on lookup. All methods are thread-safe.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES, db_path: Optional[str] = DEFAULT_DB_PATH):
+        """
+        Initialize the registry.
+
+        Args:
+            max_bytes: Approximate size of the documents kept in memory
+            db_path: Path of the SQLite file for evicted documents, or None to drop them
+        """
+        self.max_bytes = max_bytes
+        self.db_path = db_path
+
+        # document ID -> (document, estimated size), least recently used first
+        self._documents: "OrderedDict[str, Tuple[Dict[str, Any], int]]" = OrderedDict()
+        self._urls: Dict[str, str] = {}
+        self._bytes = 0
+        self._lock = threading.RLock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+        # Metrics
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _connect(self) -> Optional[sqlite3.Connection]:
+        """Open the database, creating the schema on first use."""
+        if self.db_path is None:
+            return None
+        if self._conn is None:
+            directory = os.path.dirname(self.db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS documents (
+                    id TEXT PRIMARY KEY,
+                    url TEXT,
+                    data TEXT NOT NULL,
+                    stored_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS documents_url ON documents (url);
+            """)
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def _evict(self) -> None:
+        """Move least recently used documents to disk until the registry fits in max_bytes."""
+        spilled = []
+        while self._bytes > self.max_bytes and len(self._documents) > 1:
+            doc_id, (document, size) = self._documents.popitem(last=False)
+            self._bytes -= size
+            self.evictions += 1
+            url = _document_url(document)
+            if url is not None and self._urls.get(url) == doc_id:
+                del self._urls[url]
+            spilled.append((doc_id, url, json.dumps(document, default=str), time.time()))
+
+        conn = self._connect() if spilled else None
+        if conn is not None:
+            with conn:
+                conn.executemany("INSERT OR REPLACE INTO documents VALUES (?, ?, ?, ?)", spilled)
+
+    def add(self, document: Any) -> str:
+        """
+        Register a document.
+
+        Args:
+            document: Document dictionary or langchain Document
+
+        Returns:
+            The document ID
+        """
+        document = _document_dict(document)
+        doc_id = make_document_id(document)
+        with self._lock:
+            if doc_id in self._documents:
+                self._documents.move_to_end(doc_id)
+                return doc_id
+
+            size = _estimate_size(document)
+            self._documents[doc_id] = (document, size)
+            self._bytes += size
+            url = _document_url(document)
+            if url is not None:
+                self._urls[url] = doc_id
+            self._evict()
+        return doc_id
+
+    def _load(self, column: str, value: str) -> Optional[Dict[str, Any]]:
+        """Read an evicted document from disk and make it recently used again."""
+        conn = self._connect()
+        if conn is None:
+            return None
+        row = conn.execute(
+            f"SELECT data FROM documents WHERE {column} = ? ORDER BY stored_at DESC LIMIT 1", (value,)
+        ).fetchone()
+        if row is None:
+            return None
+        document = json.loads(row[0])
+        self.add(document)
+        return document
+
+    def get(self, doc_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get a document by ID.
+
+        Args:
+            doc_id: The document ID
+
+        Returns:
+            The document, or None if it is not known
+        """
+        with self._lock:
+            entry = self._documents.get(doc_id)
+            if entry is not None:
+                self._documents.move_to_end(doc_id)
+                self.hits += 1
+                return entry[0]
+            document = self._load("id", doc_id)
+            if document is not None:
+                self.disk_hits += 1
+            else:
+                self.misses += 1
+            return document
+
+    def get_by_url(self, url: str) -> Optional[Dict[str, Any]]:
+        """
+        Get the most recently registered document for a URL.
+
+        Args:
+            url: The document URL; spellings of the same page are equivalent
+
+        Returns:
+            The document, or None if none is known for the URL
+        """
+        normalized = normalize_url(url)
+        with self._lock:
+            doc_id = self._urls.get(normalized)
+            if doc_id is not None:
+                self._documents.move_to_end(doc_id)
+                self.hits += 1
+                return self._documents[doc_id][0]
+            document = self._load("url", normalized)
+            if document is not None:
+                self.disk_hits += 1
+            else:
+                self.misses += 1
+            return document
+
+    def clear(self) -> int:
+        """
+        Remove all documents, in memory and on disk.
+
+        Returns:
+            Number of documents removed
+        """
+        with self._lock:
+            count = len(self._documents)
+            self._documents.clear()
+            self._urls.clear()
+            self._bytes = 0
+            conn = self._connect()
+            if conn is not None:
+                with conn:
+                    count += conn.execute("DELETE FROM documents").rowcount
+            return count
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "documents": len(self._documents),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "db_path": self.db_path,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+                "evictions": self.evictions
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+_registry: Optional[DocumentRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_document_registry() -> DocumentRegistry:
+    """
+    Get the shared document registry, creating it on first use.
+
+    Returns:
+        The process-wide DocumentRegistry
+    """
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                settings = get_config().section('document_registry')
+                _registry = DocumentRegistry(
+                    max_bytes=settings.get('max_bytes', DEFAULT_MAX_BYTES),
+                    db_path=settings.get('db_path', DEFAULT_DB_PATH)
+                )
+    return _registry
+
+
+def set_document_registry(registry: Optional[DocumentRegistry]) -> Optional[DocumentRegistry]:
+    """
+    Replace the shared document registry, e.g. with one without a disk tier in tests.
+
+    Args:
+        registry: The new registry, or None to create one from the config on next use
+
+    Returns:
+        The previous registry
+    """
+    global _registry
+    with _registry_lock:
+        previous, _registry = _registry, registry
+    return previous
 
 
 def get_document(document_id: str) -> Dict[str, Any]:
     """
     Get a document by ID.
-    
+
     Args:
         document_id: The document ID
-        
+
     Returns:
         Document object or None if not found
     """
-    # Check cache first
-    if document_id in _document_cache:
+    document = get_document_registry().get(document_id)
+    if document is not None:
         logger.info(f"Retrieved document from cache: {document_id}")
-        return _document_cache[document_id]
-    
-    # If not in cache, we need to locate it
-    # For now, this is a stub - in a real implementation, this would
-    # query a database or file system
-    
+        return document
+
     # Raise exception if not found
     logger.error(f"Document not found: {document_id}")
     raise ValueError(f"Document not found: {document_id}")
@@ -44,62 +344,55 @@ def get_document(document_id: str) -> Dict[str, Any]:
 def get_document_by_url(url: str) -> Dict[str, Any]:
     """
     Get a document by URL.
-    
+
     Args:
         url: The document URL
-        
+
     Returns:
         Document object or None if not found
     """
-    # Generate a document ID from the URL
-    document_id = hashlib.md5(url.encode()).hexdigest()
-    
-    # Check cache first
-    if document_id in _document_cache:
-        logger.info(f"Retrieved document from cache: {document_id} (URL: {url})")
-        return _document_cache[document_id]
-    
-    # If not in cache, we need to fetch it
-    # For now, this is a stub - in a real implementation, this would
-    # fetch the document from the URL or a cache
-    
+    document = get_document_registry().get_by_url(url)
+    if document is not None:
+        logger.info(f"Retrieved document from cache for URL: {url}")
+        return document
+
     # Raise exception if not found
     logger.error(f"Document not found for URL: {url}")
     raise ValueError(f"Document not found for URL: {url}")
 
 
-def cache_document(document: Dict[str, Any]) -> str:
+def cache_document(document: Any) -> str:
     """
     Cache a document for future retrieval.
-    
+
     Args:
-        document: The document to cache
-        
+        document: The document to cache, as a dictionary or langchain Document
+
     Returns:
         Document ID
     """
-    # Generate a document ID
-    content = document.get("content", "")
-    metadata = document.get("metadata", {})
-    document_id = hashlib.md5((content + str(metadata)).encode()).hexdigest()
-    
-    # Store in cache
-    _document_cache[document_id] = document
-    
-    logger.info(f"Cached document: {document_id}")
-    
+    document_id = get_document_registry().add(document)
+    logger.debug(f"Cached document: {document_id}")
     return document_id
 
 
 def clear_document_cache() -> int:
     """
     Clear the document cache.
-    
+
     Returns:
         Number of documents cleared
     """
-    global _document_cache
-    count = len(_document_cache)
-    _document_cache = {}
+    count = get_document_registry().clear()
     logger.info(f"Cleared document cache ({count} documents)")
-    return count 
\ No newline at end of file
+    return count
+
+
+def get_document_registry_stats() -> Dict[str, Any]:
+    """
+    Get document registry statistics.
+
+    Returns:
+        Dictionary of registry statistics, empty if the registry is not created yet
+    """
+    return _registry.get_stats() if _registry is not None else {}
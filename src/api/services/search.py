@@ -30,8 +30,10 @@ def search_documents(query: str, limit: int = 5) -> List[Dict[str, Any]]:
         
         logger.info(f"Searching documents for query: {query} (limit: {limit})")
         
-        # Get the vector store
+        # Get the shared vector store
         vectorstore = get_vectorstore()
+        if vectorstore is None:
+            raise ValueError("Vector store is not available")
         
         # Perform the search
         raw_docs = vectorstore.similarity_search(query, k=limit)
@@ -41,13 +43,13 @@ def search_documents(query: str, limit: int = 5) -> List[Dict[str, Any]]:
         for doc in raw_docs:
             # Create a document dictionary
             document = {
-                "id": doc.metadata.get("id", ""),
+                "id": getattr(doc, "id", None) or doc.metadata.get("id", ""),
                 "content": doc.page_content,
                 "metadata": doc.metadata
             }
             
-            # Cache the document
-            cache_document(document)
+            # Cache the document under its stable chunk ID
+            document["id"] = cache_document(document)
             
             # Add to the results
             documents.append(document)
@@ -73,12 +75,12 @@ def search_web(query: str, limit: int = 5) -> List[Dict[str, Any]]:
     """
     try:
         # Import here to avoid circular imports
-        from src.core.web_search import web_search
+        from src.utils.web_search import search_web as web_search
         
         logger.info(f"Searching web for query: {query} (limit: {limit})")
         
         # Perform the search
-        raw_docs = web_search(query, num_results=limit)
+        raw_docs = web_search(query, max_results=limit)
         
         # Convert to dictionaries and cache the documents
         documents = []
@@ -94,8 +96,8 @@ def search_web(query: str, limit: int = 5) -> List[Dict[str, Any]]:
                     "metadata": doc.metadata
                 }
             
-            # Cache the document
-            cache_document(document)
+            # Cache the document under its stable ID
+            document["id"] = cache_document(document)
             
             # Add to the results
             documents.append(document)
@@ -8,7 +8,7 @@
 import asyncio
 import threading
 import time
-from typing import Dict, Any, List, Optional, Callable, AsyncGenerator
+from typing import Dict, Any, List, Optional, Callable, AsyncGenerator, AsyncIterator
 from queue import Queue
 from concurrent.futures import ThreadPoolExecutor
 
@@ -96,6 +96,29 @@ async def get_stream(self) -> AsyncGenerator[str, None]:
                 break
 
 
+async def stream_tokens(stream_manager: StreamManager, tokens: AsyncIterator[str]) -> str:
+    """
+    Forward tokens from an async token generator to the stream.
+    
+    The tokens are added to the stream on the event loop, without handing them
+    over from a background thread.
+    
+    Args:
+        stream_manager: The stream manager to add events to.
+        tokens: An async iterator of answer tokens.
+        
+    Returns:
+        The complete answer.
+    """
+    chunks = []
+    await stream_manager.add_event(StreamEvent.ANSWER_START, {})
+    async for token in tokens:
+        chunks.append(token)
+        await stream_manager.add_event(StreamEvent.ANSWER_CHUNK, {"chunk": token})
+    await stream_manager.add_event(StreamEvent.ANSWER_END, {})
+    return "".join(chunks)
+
+
 class StreamCallbackHandler:
     """
     Callback handler for streaming responses.
@@ -198,6 +221,8 @@ class SyncToAsyncAdapter:
     
     This class provides utilities for running synchronous functions
     in a background thread and communicating with the async world.
+    Coroutine functions are run as tasks on the event loop instead,
+    so they don't need a thread of their own.
     """
     
     def __init__(self, stream_manager: StreamManager):
@@ -209,19 +234,44 @@ def __init__(self, stream_manager: StreamManager):
         """
         self.stream_manager = stream_manager
         self.loop = asyncio.get_event_loop()
-        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.executor = None
+        self.task = None
         
     def run_in_background(self, func: Callable, *args, **kwargs) -> None:
         """
-        Run a synchronous function in a background thread.
+        Run a function in the background.
+        
+        Coroutine functions are scheduled on the event loop; synchronous
+        functions run in a background thread.
         
         Args:
             func: The function to run.
             *args: Positional arguments to pass to the function.
             **kwargs: Keyword arguments to pass to the function.
         """
+        if asyncio.iscoroutinefunction(func):
+            self.task = self.loop.create_task(self._run_coroutine_and_handle_exceptions(func, *args, **kwargs))
+            return
+        
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=1)
         self.executor.submit(self._run_and_handle_exceptions, func, *args, **kwargs)
         
+    async def _run_coroutine_and_handle_exceptions(self, func: Callable, *args, **kwargs) -> None:
+        """
+        Run a coroutine function and handle any exceptions.
+        
+        Args:
+            func: The coroutine function to run.
+            *args: Positional arguments to pass to the function.
+            **kwargs: Keyword arguments to pass to the function.
+        """
+        try:
+            await func(*args, **kwargs)
+        except Exception as e:
+            logger.error(f"Error in background task: {e}", exc_info=True)
+            await self.stream_manager.add_event(StreamEvent.ERROR, {"error": str(e)})
+        
     def _run_and_handle_exceptions(self, func: Callable, *args, **kwargs) -> None:
         """
         Run a function and handle any exceptions.
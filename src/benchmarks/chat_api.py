@@ -0,0 +1,544 @@
+"""
+Offline latency and throughput benchmark for the chat API.
+
+The benchmark drives the FastAPI app from create_app() in-process, through
+its ASGI interface, with the vector store, the DeepSeek clients and the web
+search provider replaced by the deterministic stubs in
+src.benchmarks.stubs. Everything else (routers, chat service, agent
+workflow, prompt builder, semantic cache, conversation store, coalescing,
+SSE streaming) is the real code.
+
+It sweeps concurrency, conversation history length and semantic cache hit
+ratio, and reports for every combination:
+
+    latency_ms      p50/p95/p99/mean/max of the full response
+    ttft_ms         time to the first answer event of the SSE stream
+    throughput_rps  completed requests per second of wall time
+    rss_mb          resident set size of the process after the scenario
+
+Results are written to a JSON file stamped with the schema version, the
+package version and the git commit, and can be compared against a baseline
+file with a regression threshold:
+
+    python -m src.benchmarks.chat_api --concurrency 1,8 --history 0,16 \\
+        --hit-ratio 0,0.5 --baseline data/benchmarks/baseline.json
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import platform
+import subprocess
+import urllib.parse
+from contextlib import ExitStack, contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+from unittest.mock import patch
+
+from src.benchmarks.stubs import DEFAULT_ANSWER_TOKENS, DEFAULT_LATENCIES, StubLLM, StubSearchProvider, StubVectorStore
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+SCHEMA_VERSION = 1
+DEFAULT_THRESHOLD = 0.15
+DEFAULT_OUTPUT_DIR = os.path.join("data", "benchmarks")
+
+# Metrics checked for regressions; latencies must not grow, throughput must not drop
+LOWER_IS_BETTER = (("latency_ms", "p50"), ("latency_ms", "p95"), ("latency_ms", "p99"),
+                   ("ttft_ms", "p50"), ("ttft_ms", "p95"))
+HIGHER_IS_BETTER = (("throughput_rps", None),)
+
+# Queries whose answers are in the semantic cache before a scenario starts
+WARM_QUERIES = [
+    "What are the admission requirements for computer science at UBC?",
+    "How much is international tuition at the University of Toronto?",
+    "Which scholarships can first-year students apply for at McGill?",
+    "When is the application deadline for engineering at Waterloo?",
+    "Does Queen's University offer guaranteed residence for first-years?",
+    "What co-op programs does Simon Fraser University have?",
+    "What IELTS score does the University of Alberta require?",
+    "How do I transfer credits from a college to York University?",
+]
+
+MISS_TOPICS = ["admissions", "tuition", "scholarships", "residence", "co-op", "language tests", "transfers"]
+
+
+def percentile(values: Sequence[float], q: float) -> Optional[float]:
+    """
+    Get a percentile of values with linear interpolation.
+
+    Args:
+        values: The values
+        q: The percentile, from 0 to 100
+
+    Returns:
+        The percentile, or None if there are no values
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q / 100.0
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def summarize(seconds: Sequence[float]) -> Dict[str, Optional[float]]:
+    """Summarize durations in seconds as milliseconds."""
+    if not seconds:
+        return {"p50": None, "p95": None, "p99": None, "mean": None, "max": None}
+    return {
+        "p50": percentile(seconds, 50) * 1000,
+        "p95": percentile(seconds, 95) * 1000,
+        "p99": percentile(seconds, 99) * 1000,
+        "mean": sum(seconds) / len(seconds) * 1000,
+        "max": max(seconds) * 1000
+    }
+
+
+def rss_mb() -> float:
+    """Get the resident set size of this process in megabytes."""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / (1024 * 1024)
+    except ImportError:
+        import resource
+        # ru_maxrss is the peak, in kilobytes on Linux and bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def version_info() -> Dict[str, Any]:
+    """Get the package version, git commit and Python version the benchmark ran with."""
+    try:
+        from importlib.metadata import version
+        kevin_version = version("kevin")
+    except Exception:
+        kevin_version = "unknown"
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5, check=True
+        ).stdout.strip() or None
+    except Exception:
+        commit = None
+    return {"kevin": kevin_version, "git_commit": commit, "python": platform.python_version()}
+
+
+async def asgi_request(app, method: str, path: str, params: Optional[Dict[str, Any]] = None,
+                       body: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Send one request to an ASGI app and time its response.
+
+    Args:
+        app: The ASGI application
+        method: HTTP method
+        path: Request path
+        params: Query parameters
+        body: JSON body
+
+    Returns:
+        Dictionary with the status, the body, the latency and, for SSE
+        responses, the time to the first answer event (all in seconds)
+    """
+    payload = json.dumps(body).encode() if body is not None else b""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": urllib.parse.urlencode(params or {}).encode(),
+        "root_path": "",
+        "headers": [(b"host", b"benchmark"), (b"content-type", b"application/json"),
+                    (b"content-length", str(len(payload)).encode())],
+        "client": ("127.0.0.1", 50000),
+        "server": ("benchmark", 80),
+    }
+    request_sent = False
+    response_done = asyncio.Event()
+    result = {"status": None, "body": b"", "ttft": None}
+    start_time = time.perf_counter()
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": payload, "more_body": False}
+        await response_done.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            result["status"] = message["status"]
+        elif message["type"] == "http.response.body":
+            chunk = message.get("body", b"")
+            if result["ttft"] is None and (b"event: answer_chunk" in chunk or b"event: answer\n" in chunk):
+                result["ttft"] = time.perf_counter() - start_time
+            result["body"] += chunk
+            if not message.get("more_body", False):
+                response_done.set()
+
+    await app(scope, receive, send)
+    response_done.set()
+    result["latency"] = time.perf_counter() - start_time
+    return result
+
+
+@contextmanager
+def stub_services(latencies: Optional[Dict[str, float]] = None,
+                  answer_tokens: int = DEFAULT_ANSWER_TOKENS) -> Iterator[Dict[str, Any]]:
+    """
+    Replace the external services of the chat pipeline with deterministic stubs.
+
+    Conversations, documents, the semantic cache and the agent are fresh
+    in-memory instances, restored when the context exits.
+
+    Args:
+        latencies: Overrides for the stub latencies
+        answer_tokens: Number of tokens in every answer
+
+    Yields:
+        The stubs and caches in use, by name
+    """
+    from src.api.services import chat
+    from src.api.services.cache import cache_service
+    from src.api.services.cache.semantic_cache import SemanticCache
+    from src.api.services.conversation_store import MemoryConversationStore, set_conversation_store
+    from src.api.services.documents import DocumentRegistry, set_document_registry
+    from src.models.embeddings import SimpleEmbeddings
+    from src.utils.web_search import WebSearchService
+
+    latencies = {**DEFAULT_LATENCIES, **(latencies or {})}
+    llm = StubLLM(latencies, answer_tokens)
+    vectorstore = StubVectorStore(latencies["retrieval"])
+    web_search = WebSearchService(StubSearchProvider(latencies["web_search"]))
+    semantic_cache = SemanticCache(cache_file=None, index_type="flat")
+    semantic_cache._embeddings = SimpleEmbeddings()  # Hash-based, so only repeated queries are hits
+
+    with ExitStack() as stack:
+        stack.enter_context(patch("src.core.agent.get_vectorstore", return_value=vectorstore))
+        stack.enter_context(patch("src.core.agent.get_llm", return_value=llm))
+        stack.enter_context(patch.object(chat, "get_async_deepseek_client", return_value=llm))
+        stack.enter_context(patch("src.utils.web_search.get_web_search_service", return_value=web_search))
+        stack.enter_context(patch.object(cache_service, "_semantic_cache", semantic_cache))
+        stack.enter_context(patch.object(chat, "_semantic_cache_enabled", True))
+        stack.enter_context(patch.object(chat, "_agent", None))
+
+        previous_store = set_conversation_store(MemoryConversationStore())
+        previous_registry = set_document_registry(DocumentRegistry(db_path=None))
+        try:
+            yield {"llm": llm, "vectorstore": vectorstore, "web_search": web_search,
+                   "semantic_cache": semantic_cache}
+        finally:
+            set_conversation_store(previous_store)
+            set_document_registry(previous_registry)
+
+
+class Scenario:
+    """One point of the sweep."""
+
+    def __init__(self, concurrency: int, history_turns: int, cache_hit_ratio: float):
+        self.concurrency = concurrency
+        self.history_turns = history_turns
+        self.cache_hit_ratio = cache_hit_ratio
+
+    @property
+    def name(self) -> str:
+        return f"c{self.concurrency}-h{self.history_turns}-hit{self.cache_hit_ratio:g}"
+
+    def queries(self, count: int) -> List[str]:
+        """
+        Get the queries of the scenario.
+
+        Exactly round(count * cache_hit_ratio) of them repeat a warm query,
+        spread evenly over the run; the others are unique.
+        """
+        queries = []
+        for i in range(count):
+            if int((i + 1) * self.cache_hit_ratio) > int(i * self.cache_hit_ratio):
+                queries.append(WARM_QUERIES[i % len(WARM_QUERIES)])
+            else:
+                topic = MISS_TOPICS[i % len(MISS_TOPICS)]
+                queries.append(f"Question {i} of {self.name} about {topic} at Canadian universities")
+        return queries
+
+
+def _seed(stubs: Dict[str, Any], scenario: Scenario, conversations: Sequence[str], use_web_search: bool) -> None:
+    """Fill the semantic cache with the warm queries and the conversations with history."""
+    from src.api.services.conversation_store import get_conversation_store
+
+    for query in WARM_QUERIES:
+        stubs["semantic_cache"].add(
+            query,
+            {"answer": f"Cached answer to: {query}", "thinking_steps": [], "documents": []},
+            {"use_web_search": use_web_search}
+        )
+
+    store = get_conversation_store()
+    for conversation_id in conversations:
+        for turn in range(scenario.history_turns):
+            store.append(conversation_id, {"role": "user", "content": f"Earlier question {turn} about programs."})
+            store.append(conversation_id, {
+                "role": "assistant",
+                "content": f"Earlier answer {turn}. " + "Programs differ by faculty and campus. " * 6
+            })
+
+
+async def _run_scenario(app, scenario: Scenario, requests: int, endpoint: str, use_web_search: bool,
+                        warmup: int, latencies: Optional[Dict[str, float]],
+                        answer_tokens: int) -> Dict[str, Any]:
+    """Run one scenario and summarize its measurements."""
+    with stub_services(latencies, answer_tokens) as stubs:
+        queries = scenario.queries(warmup + requests)
+        conversations = [f"bench-{scenario.name}-{i}" for i in range(len(queries))]
+        _seed(stubs, scenario, conversations, use_web_search)
+
+        async def send(i: int) -> Dict[str, Any]:
+            if endpoint == "stream":
+                params = {"query": queries[i], "conversation_id": conversations[i]}
+                if use_web_search:
+                    params["use_web_search"] = "true"
+                return await asgi_request(app, "GET", "/api/chat/query/stream", params=params)
+            body = {"query": queries[i], "conversation_id": conversations[i], "use_web_search": use_web_search}
+            return await asgi_request(app, "POST", "/api/chat/query", body=body)
+
+        # Warm-up requests create the agent and fill lazily initialized state
+        for i in range(warmup):
+            await send(i)
+        cache_hits_before = stubs["semantic_cache"].hits
+        llm_calls_before = stubs["llm"].calls
+
+        results: List[Dict[str, Any]] = []
+        next_index = warmup
+
+        async def worker():
+            nonlocal next_index
+            while next_index < len(queries):
+                i = next_index
+                next_index += 1
+                results.append(await send(i))
+
+        start_time = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(scenario.concurrency)))
+        wall_seconds = time.perf_counter() - start_time
+
+        ok = [result for result in results if result["status"] == 200 and b"event: error" not in result["body"]]
+        return {
+            "name": scenario.name,
+            "concurrency": scenario.concurrency,
+            "history_turns": scenario.history_turns,
+            "cache_hit_ratio": scenario.cache_hit_ratio,
+            "requests": len(results),
+            "errors": len(results) - len(ok),
+            "latency_ms": summarize([result["latency"] for result in ok]),
+            "ttft_ms": summarize([result["ttft"] for result in ok if result["ttft"] is not None]),
+            "throughput_rps": len(ok) / wall_seconds if wall_seconds > 0 else None,
+            "wall_seconds": wall_seconds,
+            "rss_mb": rss_mb(),
+            "semantic_cache_hits": stubs["semantic_cache"].hits - cache_hits_before,
+            "llm_calls": stubs["llm"].calls - llm_calls_before
+        }
+
+
+def run_benchmark(
+    concurrency: Sequence[int] = (1, 4, 16),
+    history_turns: Sequence[int] = (0, 8, 32),
+    cache_hit_ratios: Sequence[float] = (0.0, 0.5, 0.9),
+    requests: int = 40,
+    endpoint: str = "stream",
+    use_web_search: bool = False,
+    warmup: int = 2,
+    latencies: Optional[Dict[str, float]] = None,
+    answer_tokens: int = DEFAULT_ANSWER_TOKENS
+) -> Dict[str, Any]:
+    """
+    Run the benchmark sweep.
+
+    Args:
+        concurrency: Numbers of requests in flight at once
+        history_turns: Numbers of earlier turns in each conversation
+        cache_hit_ratios: Fractions of queries answered from the semantic cache
+        requests: Measured requests per scenario
+        endpoint: "stream" for /api/chat/query/stream, "query" for /api/chat/query
+        use_web_search: Whether the requests ask for web search
+        warmup: Unmeasured requests before each scenario
+        latencies: Overrides for the stub latencies
+        answer_tokens: Number of tokens in every stub answer
+
+    Returns:
+        The results, in the format written by write_results
+    """
+    if endpoint not in ("stream", "query"):
+        raise ValueError(f"Unknown endpoint: {endpoint}")
+
+    from src.api.app import create_app
+    app = create_app()
+
+    scenarios = [
+        Scenario(c, h, r) for c in concurrency for h in history_turns for r in cache_hit_ratios
+    ]
+
+    async def run_all() -> List[Dict[str, Any]]:
+        # One event loop for all scenarios, like a long-running server
+        results = []
+        for scenario in scenarios:
+            logger.info(f"Running benchmark scenario {scenario.name}")
+            results.append(await _run_scenario(
+                app, scenario, requests, endpoint, use_web_search, warmup, latencies, answer_tokens
+            ))
+        return results
+
+    results = asyncio.run(run_all())
+
+    return {
+        "schema_version": SCHEMA_VERSION,
+        "benchmark": "chat_api",
+        "version": version_info(),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "settings": {
+            "endpoint": endpoint,
+            "use_web_search": use_web_search,
+            "requests_per_scenario": requests,
+            "warmup": warmup,
+            "latencies": {**DEFAULT_LATENCIES, **(latencies or {})},
+            "answer_tokens": answer_tokens
+        },
+        "scenarios": results
+    }
+
+
+def default_output_path(results: Dict[str, Any]) -> str:
+    """Get the default results file for a run, named after its version and commit."""
+    version = results["version"]
+    stamp = version.get("git_commit") or results["created_at"].replace(":", "")
+    return os.path.join(DEFAULT_OUTPUT_DIR, f"chat_api-{version['kevin']}-{stamp}.json")
+
+
+def write_results(results: Dict[str, Any], path: Optional[str] = None) -> str:
+    """
+    Write benchmark results to a JSON file.
+
+    Args:
+        results: Results of run_benchmark
+        path: Output file (defaults to data/benchmarks/chat_api-<version>-<commit>.json)
+
+    Returns:
+        The path written
+    """
+    path = path or default_output_path(results)
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2)
+    return path
+
+
+def compare_results(current: Dict[str, Any], baseline: Dict[str, Any],
+                    threshold: float = DEFAULT_THRESHOLD) -> List[Dict[str, Any]]:
+    """
+    Find metrics that regressed against a baseline run.
+
+    Scenarios are matched by name; scenarios missing from either run are skipped.
+
+    Args:
+        current: Results of the run to check
+        baseline: Results to compare against
+        threshold: Allowed relative change, e.g. 0.15 for 15%
+
+    Returns:
+        One entry per regressed metric with the scenario, metric, both values and the change
+
+    Raises:
+        ValueError: If the files have different schema versions or settings
+    """
+    if current.get("schema_version") != baseline.get("schema_version"):
+        raise ValueError(f"Cannot compare schema version {current.get('schema_version')} "
+                         f"with baseline schema version {baseline.get('schema_version')}")
+    if current.get("settings") != baseline.get("settings"):
+        raise ValueError("Cannot compare runs with different benchmark settings")
+
+    def value(scenario: Dict[str, Any], metric: str, key: Optional[str]) -> Optional[float]:
+        found = scenario.get(metric)
+        return found.get(key) if key is not None and isinstance(found, dict) else found
+
+    baseline_scenarios = {scenario["name"]: scenario for scenario in baseline.get("scenarios", [])}
+    regressions = []
+    for scenario in current.get("scenarios", []):
+        reference = baseline_scenarios.get(scenario["name"])
+        if reference is None:
+            continue
+        checks = [(metric, key, 1) for metric, key in LOWER_IS_BETTER] + \
+                 [(metric, key, -1) for metric, key in HIGHER_IS_BETTER]
+        for metric, key, direction in checks:
+            old, new = value(reference, metric, key), value(scenario, metric, key)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            if change * direction > threshold:
+                regressions.append({
+                    "scenario": scenario["name"],
+                    "metric": f"{metric}.{key}" if key else metric,
+                    "baseline": old,
+                    "current": new,
+                    "change": change
+                })
+    return regressions
+
+
+def _numbers(text: str, cast) -> List[Any]:
+    return [cast(part) for part in text.split(",") if part.strip()]
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the chat API offline with stubbed LLM and search")
+    parser.add_argument("--concurrency", default="1,4,16", help="Comma-separated concurrency levels")
+    parser.add_argument("--history", default="0,8,32", help="Comma-separated history lengths in turns")
+    parser.add_argument("--hit-ratio", default="0,0.5,0.9", help="Comma-separated semantic cache hit ratios")
+    parser.add_argument("--requests", type=int, default=40, help="Measured requests per scenario")
+    parser.add_argument("--endpoint", choices=["stream", "query"], default="stream")
+    parser.add_argument("--web-search", action="store_true", help="Ask for web search in every request")
+    parser.add_argument("--output", help="Results file (default: data/benchmarks/chat_api-<version>-<commit>.json)")
+    parser.add_argument("--baseline", help="Results file to check for regressions against")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Allowed relative regression, e.g. 0.15 for 15%%")
+    args = parser.parse_args(argv)
+
+    results = run_benchmark(
+        concurrency=_numbers(args.concurrency, int),
+        history_turns=_numbers(args.history, int),
+        cache_hit_ratios=_numbers(args.hit_ratio, float),
+        requests=args.requests,
+        endpoint=args.endpoint,
+        use_web_search=args.web_search
+    )
+    path = write_results(results, args.output)
+
+    print(f"{'scenario':<22} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'ttft p50':>9} {'req/s':>8} {'rss MB':>8}")
+    for scenario in results["scenarios"]:
+        latency, ttft = scenario["latency_ms"], scenario["ttft_ms"]
+        print(f"{scenario['name']:<22} {latency['p50'] or 0:>9.1f} {latency['p95'] or 0:>9.1f} "
+              f"{latency['p99'] or 0:>9.1f} {ttft['p50'] or 0:>9.1f} {scenario['throughput_rps'] or 0:>8.1f} "
+              f"{scenario['rss_mb']:>8.1f}")
+    print(f"Results written to {path}")
+
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+        regressions = compare_results(results, baseline, args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression['scenario']} {regression['metric']}: "
+                  f"{regression['baseline']:.2f} -> {regression['current']:.2f} ({regression['change']:+.0%})")
+        if regressions:
+            return 1
+        print(f"No regressions beyond {args.threshold:.0%} against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,146 @@
+"""
+Deterministic stand-ins for the external services of the chat pipeline.
+
+The stubs replace the vector store, the DeepSeek clients and the web search
+provider with fixed-latency fakes, so that benchmarks measure the API, the
+agent workflow and the caches rather than the network. Latencies and
+answers depend only on the inputs, never on random state.
+"""
+
+import time
+import asyncio
+import hashlib
+from typing import Any, AsyncGenerator, Dict, List, Tuple, Union
+
+from langchain_core.documents import Document
+from langchain_core.messages import AIMessage
+
+from src.utils.web_search import FakeSearchProvider
+
+# Latencies of the stubs, in seconds
+DEFAULT_LATENCIES = {
+    "retrieval": 0.010,      # Vector store search
+    "web_search": 0.050,     # Search provider round trip
+    "first_token": 0.150,    # LLM time to first token, before the prompt is read
+    "prompt_token": 0.00002, # LLM time per prompt token
+    "answer_token": 0.004    # LLM time per generated token
+}
+DEFAULT_ANSWER_TOKENS = 60
+
+
+def _digest(text: str) -> int:
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=4).digest(), "little")
+
+
+def _message_text(message: Any) -> str:
+    if isinstance(message, dict):
+        return str(message.get("content", ""))
+    return str(getattr(message, "content", message))
+
+
+def count_prompt_tokens(messages: Union[str, List[Any]]) -> int:
+    """Approximate the number of tokens of a prompt (four characters per token)."""
+    if isinstance(messages, str):
+        return len(messages) // 4
+    return sum(len(_message_text(message)) for message in messages) // 4
+
+
+class StubVectorStore:
+    """Vector store returning the same documents for the same query after a fixed delay."""
+
+    def __init__(self, latency: float = DEFAULT_LATENCIES["retrieval"]):
+        """
+        Initialize the store.
+
+        Args:
+            latency: Time each search takes
+        """
+        self.latency = latency
+        self.searches = 0
+
+    def similarity_search_with_score(self, query: str, k: int = 4, **kwargs) -> List[Tuple[Document, float]]:
+        time.sleep(self.latency)
+        self.searches += 1
+        topic = _digest(query) % 50
+        return [
+            (
+                Document(
+                    page_content=f"Knowledge base passage {i + 1} on topic {topic}. " * 8,
+                    metadata={
+                        "source": f"https://kb.example.com/topics/{topic}/{i + 1}",
+                        "title": f"Topic {topic}, part {i + 1}"
+                    }
+                ),
+                0.2 + 0.1 * i
+            )
+            for i in range(k)
+        ]
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, **kwargs)]
+
+
+class StubSearchProvider(FakeSearchProvider):
+    """Offline search provider that takes a fixed time per search."""
+
+    name = "stub"
+
+    def __init__(self, latency: float = DEFAULT_LATENCIES["web_search"]):
+        """
+        Initialize the provider.
+
+        Args:
+            latency: Time each search takes
+        """
+        super().__init__()
+        self.latency = latency
+
+    def search(self, query: str, search_depth: str, max_results: int) -> Dict[str, Any]:
+        time.sleep(self.latency)
+        return super().search(query, search_depth, max_results)
+
+
+class StubLLM:
+    """
+    LLM with the sync interface of DeepSeekAPI and the streaming interface of AsyncDeepSeekAPI.
+
+    A call waits for the time to first token plus a per-token cost of the
+    prompt, then produces answer_tokens tokens at a fixed rate. The answer
+    depends only on the last message.
+    """
+
+    def __init__(self, latencies: Dict[str, float] = None, answer_tokens: int = DEFAULT_ANSWER_TOKENS):
+        """
+        Initialize the LLM.
+
+        Args:
+            latencies: Overrides for the first_token, prompt_token and answer_token latencies
+            answer_tokens: Number of tokens in every answer
+        """
+        self.latencies = {**DEFAULT_LATENCIES, **(latencies or {})}
+        self.answer_tokens = answer_tokens
+        self.calls = 0
+        self.prompt_tokens = 0
+
+    def _prepare(self, messages: Union[str, List[Any]]) -> Tuple[float, List[str]]:
+        """Get the time before the first token and the tokens of the answer."""
+        prompt_tokens = count_prompt_tokens(messages)
+        self.calls += 1
+        self.prompt_tokens += prompt_tokens
+
+        last = messages if isinstance(messages, str) else (_message_text(messages[-1]) if messages else "")
+        words = [f"w{(_digest(last) + i) % 997}" for i in range(self.answer_tokens)]
+        tokens = [word if i == 0 else f" {word}" for i, word in enumerate(words)]
+        return self.latencies["first_token"] + prompt_tokens * self.latencies["prompt_token"], tokens
+
+    def invoke(self, messages: Union[str, List[Any]], **kwargs) -> AIMessage:
+        delay, tokens = self._prepare(messages)
+        time.sleep(delay + len(tokens) * self.latencies["answer_token"])
+        return AIMessage(content="".join(tokens))
+
+    async def astream(self, messages: Union[str, List[Any]], **kwargs) -> AsyncGenerator[str, None]:
+        delay, tokens = self._prepare(messages)
+        await asyncio.sleep(delay)
+        for token in tokens:
+            await asyncio.sleep(self.latencies["answer_token"])
+            yield token
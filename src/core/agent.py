@@ -4,15 +4,17 @@
 
 import os
 import sys
-import yaml
 import operator
 import time
 import traceback
-from typing import List, Dict, Any, Optional, Annotated, Tuple, TypedDict, Sequence, Union, cast
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import List, Dict, Any, Callable, Iterator, Optional, Annotated, Tuple, TypedDict, Sequence, Union, cast
 from pydantic import BaseModel, Field
 from langchain.schema import Document
 from langchain.prompts import PromptTemplate
-from langchain_core.messages import HumanMessage, AIMessage, SystemMessage, FunctionMessage
+from langchain_core.messages import BaseMessage, HumanMessage, AIMessage, SystemMessage, FunctionMessage
 from langchain_community.llms.huggingface_pipeline import HuggingFacePipeline
 # Conditionally import transformers only if not using DeepSeek only
 if not os.environ.get('USE_DEEPSEEK_ONLY') == '1':
@@ -24,21 +26,22 @@
 from langgraph.graph import END, StateGraph
 from langgraph.prebuilt import ToolNode
 from dotenv import load_dotenv
-import inspect
 # Removing the problematic import temporarily
 # from langchain.callbacks.base import BaseCallbackHandler
 # from langchain.callbacks.manager import CallbackManager
 from pathlib import Path
-from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor, wait
 
 # Add parent directory to path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
 
 # Import project modules
-from src.core.document_processor import DocumentProcessor
-from src.models.deepseek_client import DeepSeekAPI
-from src.utils.web_search import search_web
+from src.core.vectorstore import get_vectorstore
+from src.core.prompt_builder import get_prompt_builder
+from src.models.deepseek_client import get_deepseek_client
+from src.utils.web_search import exclude_known_sources, search_web
 from src.utils.logger import get_logger, workflow_logger, api_logger
+from src.utils.config import get_config
 
 # Configure module logger
 logger = get_logger(__name__)
@@ -49,6 +52,12 @@
 # Global variable to store the last answer for backup
 _LAST_ANSWER = None
 
+# Default time to wait for parallel retrieval sources before dropping their results
+DEFAULT_RETRIEVAL_DEADLINE = 8.0
+
+# Shared pool for running retrieval sources concurrently
+_RETRIEVAL_EXECUTOR = ThreadPoolExecutor(max_workers=8, thread_name_prefix="retrieval")
+
 # Define state for the graph
 class AgentState(TypedDict):
     """State for the agent graph."""
@@ -61,6 +70,7 @@ class AgentState(TypedDict):
     response: Optional[str]  # Generated response
     search_starttime: Optional[float]  # Start time for performance tracking
     thinking_steps: List[Dict[str, Any]]  # Captures internal thinking process for UI
+    conversation_id: Optional[str]  # Conversation the query belongs to, if any
 
 # Initialize LLM based on configuration
 def get_llm():
@@ -71,13 +81,10 @@ def get_llm():
         # Check for environment variable to force DeepSeek API usage
         if os.getenv('USE_DEEPSEEK_ONLY', 'false').lower() in ('true', '1', 't'):
             logger.info("USE_DEEPSEEK_ONLY is set - only using DeepSeek API")
-            return DeepSeekAPI()
+            return get_deepseek_client()
             
-        # Load configuration
-        with open("config.yaml", 'r') as file:
-            config = yaml.safe_load(file)
-        
-        llm_config = config.get('llm', {})
+        # Use the shared configuration snapshot
+        llm_config = get_config().section('llm')
         provider = llm_config.get('provider', 'deepseek')
         
         logger.info(f"LLM provider configured as: {provider}")
@@ -86,7 +93,7 @@ def get_llm():
             try:
                 # Initialize DeepSeek LLM using our client
                 logger.info("Attempting to initialize DeepSeek API client")
-                return DeepSeekAPI()
+                return get_deepseek_client()
             except Exception as e:
                 logger.error(f"Error initializing DeepSeek API: {str(e)}", exc_info=True)
                 # No fallback to HuggingFace, force DeepSeek API usage
@@ -97,7 +104,7 @@ def get_llm():
             logger.warning(f"Provider '{provider}' is not supported. Only DeepSeek API is allowed. Switching to DeepSeek.")
             try:
                 logger.info("Attempting to initialize DeepSeek API client")
-                return DeepSeekAPI()
+                return get_deepseek_client()
             except Exception as e:
                 logger.error(f"Error initializing DeepSeek API: {str(e)}", exc_info=True)
                 raise RuntimeError(f"DeepSeek API must be configured properly: {str(e)}")
@@ -105,24 +112,71 @@ def get_llm():
         logger.critical(f"Failed to initialize LLM: {str(e)}", exc_info=True)
         raise RuntimeError(f"Failed to initialize LLM: {str(e)}")
 
-def _update_thinking_steps(agent_instance, state, new_thinking_step):
-    """Update the thinking steps in both the state and the agent instance for real-time tracking."""
-    if "thinking_steps" not in state:
-        state["thinking_steps"] = []
+class RequestContext:
+    """
+    Execution context for a single agent query.
     
-    # Add the new thinking step to the state
-    state["thinking_steps"].append(new_thinking_step)
+    Holds the thinking-step sink and callback for one request, so that
+    concurrent queries on a shared agent do not see each other's steps.
+    """
     
-    # Update the agent's latest_thinking_steps for real-time display in the UI
-    if agent_instance:
-        if hasattr(agent_instance, '_record_thinking_step'):
-            # Use the new method which also triggers callbacks
-            agent_instance._record_thinking_step(new_thinking_step)
-        elif hasattr(agent_instance, 'latest_thinking_steps'):
-            # Fallback to direct update for backward compatibility
-            agent_instance.latest_thinking_steps = state["thinking_steps"].copy()
+    def __init__(self, thinking_step_callback: Optional[Callable[[Dict[str, Any]], None]] = None):
+        """
+        Initialize the request context.
+        
+        Args:
+            thinking_step_callback: Function called once for every new thinking step
+        """
+        self.thinking_steps: List[Dict[str, Any]] = []
+        self.thinking_step_callback = thinking_step_callback
+        self.last_answer: Optional[str] = None
+        self._published = set()
+        # Retrieval branches publish from worker threads
+        self._lock = threading.Lock()
+    
+    def record(self, step: Dict[str, Any]) -> None:
+        """
+        Record a thinking step and call the callback if it has not been seen yet.
+        
+        Args:
+            step: A thinking step dictionary with at least a 'description' key
+        """
+        with self._lock:
+            if id(step) in self._published:
+                return
+            self._published.add(id(step))
+            self.thinking_steps.append(step)
+        
+        if self.thinking_step_callback:
+            try:
+                self.thinking_step_callback(step)
+            except Exception as e:
+                logger.error(f"Error in thinking step callback: {e}")
     
-    return state
+    def publish(self, thinking_steps: List[Dict[str, Any]]) -> None:
+        """
+        Record all steps of a thinking step list that have not been recorded yet.
+        
+        Args:
+            thinking_steps: The thinking steps of the current state
+        """
+        for step in list(thinking_steps):
+            self.record(step)
+
+# Context of the query running in the current thread or task
+_request_context: contextvars.ContextVar[Optional[RequestContext]] = contextvars.ContextVar(
+    "agent_request_context", default=None
+)
+
+def get_request_context() -> Optional[RequestContext]:
+    """Get the context of the query being processed, if any."""
+    return _request_context.get()
+
+def _publish_thinking_steps(thinking_steps: List[Dict[str, Any]]) -> None:
+    """Publish new thinking steps to the current request for real-time display in the UI."""
+    context = _request_context.get()
+    if context is not None:
+        context.publish(thinking_steps)
 
 def router(state: AgentState) -> AgentState:
     """Route the conversation based on the query type."""
@@ -135,10 +189,6 @@ def router(state: AgentState) -> AgentState:
     try:
         # Track performance
         state["search_starttime"] = time.time()
-    
-        # Get configuration
-        with open("config.yaml", 'r') as file:
-            config = yaml.safe_load(file)
         
         # Get the last message
         last_message = state["messages"][-1]
@@ -161,13 +211,6 @@ def router(state: AgentState) -> AgentState:
         end_time = time.time()
         duration_ms = int((end_time - state["search_starttime"]) * 1000)
         
-        # Get the agent instance to update real-time thinking steps
-        agent_instance = None
-        for frame in inspect.stack():
-            if 'self' in frame.frame.f_locals and isinstance(frame.frame.f_locals['self'], UniversityAgent):
-                agent_instance = frame.frame.f_locals['self']
-                break
-        
         # Add thinking step for routing decision
         thinking = {
             "type": "router",
@@ -182,9 +225,8 @@ def router(state: AgentState) -> AgentState:
             state["thinking_steps"] = []
         state["thinking_steps"].append(thinking)
         
-        # Update the agent's real-time thinking steps
-        if agent_instance and hasattr(agent_instance, 'latest_thinking_steps'):
-            agent_instance.latest_thinking_steps = state["thinking_steps"].copy()
+        # Update the request's real-time thinking steps
+        _publish_thinking_steps(state["thinking_steps"])
         
         if needs_web or state.get("use_web_search", False):
             workflow_logger.info(f"Routing query to web search: {query}")
@@ -233,9 +275,8 @@ def router(state: AgentState) -> AgentState:
             }
             state["thinking_steps"].append(thinking)
             
-            # Update the agent's real-time thinking steps
-            if agent_instance and hasattr(agent_instance, 'latest_thinking_steps'):
-                agent_instance.latest_thinking_steps = state["thinking_steps"].copy()
+            # Update the request's real-time thinking steps
+            _publish_thinking_steps(state["thinking_steps"])
         
         # Instead of returning a string, set a routing key in the state
         state["next"] = "vector_search"
@@ -261,11 +302,13 @@ def retrieve_from_vectorstore(state: AgentState) -> AgentState:
     try:
         docs = []
         try:
-            # Create document processor instance
-            doc_processor = DocumentProcessor()
+            # Use the shared vector store instead of loading the index per query
+            vectorstore = get_vectorstore()
+            if vectorstore is None:
+                raise ValueError("Vector store is not available")
             
             # Get similarity search method
-            similarity_search = getattr(doc_processor.get_vectorstore(), "similarity_search_with_score", None)
+            similarity_search = getattr(vectorstore, "similarity_search_with_score", None)
             if similarity_search:
                 search_results = similarity_search(query, k=6)
                 
@@ -284,7 +327,7 @@ def retrieve_from_vectorstore(state: AgentState) -> AgentState:
                     }
                 })
             else:
-                docs = doc_processor.get_vectorstore().similarity_search(query, k=5)
+                docs = vectorstore.similarity_search(query, k=5)
                 thinking_steps.append({
                     "step": "search_results",
                     "time": time.strftime("%H:%M:%S"),
@@ -350,6 +393,7 @@ def retrieve_from_vectorstore(state: AgentState) -> AgentState:
     
     # Update thinking steps
     state["thinking_steps"] = thinking_steps
+    _publish_thinking_steps(thinking_steps)
     return state
 
 # Node for web search
@@ -368,13 +412,6 @@ def web_search(state: AgentState) -> AgentState:
     
     logger.info(f"Performing web search for: {query}")
     
-    # Get the agent instance to update real-time thinking steps
-    agent_instance = None
-    for frame in inspect.stack():
-        if 'self' in frame.frame.f_locals and isinstance(frame.frame.f_locals['self'], UniversityAgent):
-            agent_instance = frame.frame.f_locals['self']
-            break
-    
     try:
         # Get thinking steps list
         thinking_steps = state.get("thinking_steps", [])
@@ -393,13 +430,13 @@ def web_search(state: AgentState) -> AgentState:
         thinking_steps.append(search_step)
         
         # Update real-time thinking steps
-        if agent_instance and hasattr(agent_instance, 'latest_thinking_steps'):
-            agent_instance.latest_thinking_steps = thinking_steps.copy()
+        _publish_thinking_steps(thinking_steps)
         
         # Perform the web search
-        from src.utils.web_search import search_web
+        from src.utils.web_search import document_urls, search_web
         search_start = time.time()
-        results = search_web(query)
+        # Pages already retrieved from the vector store are not returned again
+        results = search_web(query, exclude_urls=document_urls(state.get("documents", [])))
         search_duration = time.time() - search_start
         
         # Update the search step with duration
@@ -448,8 +485,7 @@ def web_search(state: AgentState) -> AgentState:
         state["thinking_steps"] = thinking_steps
         
         # Update real-time thinking steps
-        if agent_instance and hasattr(agent_instance, 'latest_thinking_steps'):
-            agent_instance.latest_thinking_steps = thinking_steps.copy()
+        _publish_thinking_steps(thinking_steps)
         
         logger.info(f"Web search returned {len(web_documents)} documents")
         return state
@@ -474,18 +510,137 @@ def web_search(state: AgentState) -> AgentState:
         state["thinking_steps"] = thinking_steps
         
         # Update real-time thinking steps
-        if agent_instance and hasattr(agent_instance, 'latest_thinking_steps'):
-            agent_instance.latest_thinking_steps = thinking_steps.copy()
+        _publish_thinking_steps(thinking_steps)
         
         return state
 
+def _run_retrieval_branch(node, state: AgentState) -> AgentState:
+    """Run a retrieval node on a private copy of the state."""
+    branch_state = dict(state)
+    branch_state["thinking_steps"] = []
+    return node(branch_state)
+
+def parallel_retrieve(state: AgentState, deadline: float = DEFAULT_RETRIEVAL_DEADLINE) -> AgentState:
+    """
+    Run vector store retrieval and web search at the same time.
+    
+    Each source runs on its own copy of the state. Sources that do not finish
+    within the deadline are dropped: their results are ignored and a thinking
+    step records what was skipped.
+    
+    Args:
+        state: Agent state to retrieve documents for
+        deadline: Seconds to wait for the sources to finish
+        
+    Returns:
+        The state with documents and web_documents from the sources that finished in time
+    """
+    thinking_steps = state.get("thinking_steps", [])
+    start_time = time.time()
+    workflow_logger.info(f"Starting parallel retrieval with a {deadline:.1f}s deadline")
+    
+    # Each branch runs in a copy of the caller's context so it publishes to the same request
+    branches = [
+        ("vector store", "documents", _RETRIEVAL_EXECUTOR.submit(
+            contextvars.copy_context().run, _run_retrieval_branch, retrieve_from_vectorstore, state)),
+        ("web search", "web_documents", _RETRIEVAL_EXECUTOR.submit(
+            contextvars.copy_context().run, _run_retrieval_branch, web_search, state))
+    ]
+    wait([future for _, _, future in branches], timeout=deadline)
+    
+    for name, key, future in branches:
+        if not future.done():
+            # The source keeps running in the background, but its results are discarded
+            future.cancel()
+            workflow_logger.warning(f"Dropping {name} results: not ready within {deadline:.1f}s")
+            thinking_steps.append({
+                "type": "retrieval_deadline",
+                "time": time.strftime("%H:%M:%S"),
+                "description": f"Dropped late {name} results",
+                "duration_ms": int((time.time() - start_time) * 1000),
+                "content": f"{name.capitalize()} did not finish within {deadline:.1f}s"
+            })
+            continue
+        
+        try:
+            branch_state = future.result()
+        except Exception as e:
+            logger.error(f"Error in parallel {name} retrieval: {e}", exc_info=True)
+            thinking_steps.append({
+                "type": "error",
+                "time": time.strftime("%H:%M:%S"),
+                "description": f"Error in {name} retrieval",
+                "duration_ms": int((time.time() - start_time) * 1000),
+                "content": f"Error: {str(e)}",
+                "error": True
+            })
+            continue
+        
+        state[key] = branch_state.get(key, [])
+        thinking_steps.extend(branch_state.get("thinking_steps", []))
+    
+    # The web search branch could not see the vector results, so drop its
+    # "no results" note if the knowledge base found something
+    if state.get("documents"):
+        thinking_steps[:] = [step for step in thinking_steps if step.get("type") != "no_results"]
+    
+    thinking_steps.append({
+        "type": "parallel_retrieval",
+        "time": time.strftime("%H:%M:%S"),
+        "description": "Parallel retrieval complete",
+        "duration_ms": int((time.time() - start_time) * 1000),
+        "content": f"{len(state.get('documents', []))} knowledge base and {len(state.get('web_documents', []))} web documents"
+    })
+    
+    state["thinking_steps"] = thinking_steps
+    _publish_thinking_steps(thinking_steps)
+    return state
+
 # Generate answer based on available documents
+def _combine_documents(state: AgentState) -> List[Document]:
+    """Combine documents from retrieval and web search."""
+    documents = state.get("documents", []).copy()
+    if "web_documents" in state and state["web_documents"]:
+        # Web results may repeat pages the vector store returned when both ran in parallel
+        documents.extend(exclude_known_sources(state["web_documents"], documents))
+    return documents
+
+def build_llm_messages(state: AgentState, documents: Optional[List[Document]] = None) -> List[BaseMessage]:
+    """
+    Build the messages sent to the LLM for answer generation.
+    
+    Args:
+        state: Agent state after retrieval
+        documents: Documents to include, defaults to all retrieved documents
+        
+    Returns:
+        The system prompt followed by the latest user message
+    """
+    if documents is None:
+        documents = _combine_documents(state)
+    
+    # Create the prompt with conversation history using the fallback mechanism
+    prompt = create_prompt_with_fallback(
+        state["query"], 
+        documents, 
+        state.get("messages", []),
+        conversation_id=state.get("conversation_id")
+    )
+    
+    # Log the prompt for debugging
+    if os.environ.get('LOG_PROMPTS'):
+        logger.debug(f"Prompt: {prompt}")
+    
+    messages = [SystemMessage(content=prompt)]
+    if len(state.get("messages", [])) >= 1:
+        # Add the last user message if available
+        messages.append(state["messages"][-1])
+    return messages
+
 def generate_answer(state: AgentState) -> AgentState:
     """Generate an answer using the LLM."""
     query = state["query"]
-    agent_instance = None
-    if "agent_instance" in state:
-        agent_instance = state["agent_instance"]
+    context = _request_context.get()
     
     # Initialize thinking steps if not present
     if "thinking_steps" not in state:
@@ -493,9 +648,7 @@ def generate_answer(state: AgentState) -> AgentState:
     thinking_steps = state["thinking_steps"]
     
     # Combine documents from retrieval and web search
-    documents = state.get("documents", []).copy()
-    if "web_documents" in state and state["web_documents"]:
-        documents.extend(state["web_documents"])
+    documents = _combine_documents(state)
     
     # If no documents were retrieved, add a note
     if not documents:
@@ -508,8 +661,7 @@ def generate_answer(state: AgentState) -> AgentState:
         })
         
         # Update real-time thinking steps
-        if agent_instance and hasattr(agent_instance, 'latest_thinking_steps'):
-            agent_instance.latest_thinking_steps = thinking_steps.copy()
+        _publish_thinking_steps(thinking_steps)
     else:
         # Count and describe retrieved documents
         num_docs = len(documents)
@@ -522,19 +674,10 @@ def generate_answer(state: AgentState) -> AgentState:
         })
         
         # Update real-time thinking steps
-        if agent_instance and hasattr(agent_instance, 'latest_thinking_steps'):
-            agent_instance.latest_thinking_steps = thinking_steps.copy()
-    
-    # Now create the prompt with conversation history from state messages using the fallback mechanism
-    prompt = create_prompt_with_fallback(
-        query, 
-        documents, 
-        state.get("messages", [])
-    )
+        _publish_thinking_steps(thinking_steps)
     
-    # Log the prompt for debugging
-    if os.environ.get('LOG_PROMPTS'):
-        logger.debug(f"Prompt: {prompt}")
+    # Now create the prompt with conversation history from state messages
+    messages = build_llm_messages(state, documents)
     
     # Update thinking step right before LLM call
     llm_start_time = time.time()
@@ -547,8 +690,7 @@ def generate_answer(state: AgentState) -> AgentState:
     })
     
     # Update real-time thinking steps
-    if agent_instance and hasattr(agent_instance, 'latest_thinking_steps'):
-        agent_instance.latest_thinking_steps = thinking_steps.copy()
+    _publish_thinking_steps(thinking_steps)
     
     # Get the LLM instance
     try:
@@ -571,12 +713,6 @@ def generate_answer(state: AgentState) -> AgentState:
         state["thinking_steps"] = thinking_steps
         return state
     
-    # Generate the answer using the LLM
-    messages = [SystemMessage(content=prompt)]
-    if len(state["messages"]) >= 1:
-        # Add the last user message if available
-        messages.append(state["messages"][-1])
-    
     # Create a streaming callback handler to update thinking steps
     streaming_content = []
     first_token_received = False
@@ -593,8 +729,7 @@ def on_llm_new_token(self, token: str, **kwargs) -> None:
                 thinking_steps[-1]["description"] = "Receiving answer stream from LLM"
                 thinking_steps[-1]["content"] = f"First token received in {first_token_time - llm_start_time:.2f}s"
                 # Update real-time thinking steps when first token arrives
-                if agent_instance and hasattr(agent_instance, 'latest_thinking_steps'):
-                    agent_instance.latest_thinking_steps = thinking_steps.copy()
+                _publish_thinking_steps(thinking_steps)
             
             # Add token to streaming content
             streaming_content.append(token)
@@ -606,8 +741,7 @@ def on_llm_new_token(self, token: str, **kwargs) -> None:
                 thinking_steps[-1]["content"] = f"Answer being generated: {preview}"
                 thinking_steps[-1]["duration_ms"] = int((time.time() - llm_start_time) * 1000)
                 # Update real-time thinking steps
-                if agent_instance and hasattr(agent_instance, 'latest_thinking_steps'):
-                    agent_instance.latest_thinking_steps = thinking_steps.copy()
+                _publish_thinking_steps(thinking_steps)
     
     # Create simplified callback handler - just an instance, not a manager
     callback_handler = StreamingCallbackHandler()
@@ -694,8 +828,7 @@ def on_llm_new_token(self, token: str, **kwargs) -> None:
     })
     
     # Update real-time thinking steps
-    if agent_instance and hasattr(agent_instance, 'latest_thinking_steps'):
-        agent_instance.latest_thinking_steps = thinking_steps.copy()
+    _publish_thinking_steps(thinking_steps)
     
     # Store the answer in the state - double check that it's not None
     if answer is None:
@@ -710,9 +843,9 @@ def on_llm_new_token(self, token: str, **kwargs) -> None:
     # Make sure we mark the state as having answered
     state["has_answered"] = True
     
-    # Store the answer directly in the agent instance if available
-    if agent_instance:
-        agent_instance.last_answer = answer
+    # Store the answer in the request context if available
+    if context is not None:
+        context.last_answer = answer
     
     # Add thinking step for completion
     thinking_steps.append({
@@ -727,8 +860,7 @@ def on_llm_new_token(self, token: str, **kwargs) -> None:
     state["thinking_steps"] = thinking_steps
     
     # Update real-time thinking steps
-    if agent_instance and hasattr(agent_instance, 'latest_thinking_steps'):
-        agent_instance.latest_thinking_steps = thinking_steps.copy()
+    _publish_thinking_steps(thinking_steps)
     
     return state
 
@@ -741,12 +873,7 @@ def finalize_response(state: AgentState) -> AgentState:
     logger.info(f"Finalizing response and updating message history")
     logger.info(f"State keys: {list(state.keys())}")
     
-    # Extract the agent instance to update real-time thinking steps
-    agent_instance = None
-    for frame in inspect.stack():
-        if 'self' in frame.frame.f_locals and isinstance(frame.frame.f_locals['self'], UniversityAgent):
-            agent_instance = frame.frame.f_locals['self']
-            break
+    context = _request_context.get()
     
     # Check if we have an output or answer
     output = state.get("output")
@@ -765,10 +892,10 @@ def finalize_response(state: AgentState) -> AgentState:
     elif "response" in state and state["response"]:
         logger.info(f"Checking response key: Found")
         response = state["response"]
-    elif agent_instance and hasattr(agent_instance, 'last_answer') and agent_instance.last_answer:
-        # Try getting from agent instance
-        logger.info(f"Using agent instance last_answer")
-        response = agent_instance.last_answer
+    elif context is not None and context.last_answer:
+        # Try getting from the request context
+        logger.info(f"Using request context last_answer")
+        response = context.last_answer
     else:
         # If no response in state, generate a default one
         logger.warning("No response found in state, using default message")
@@ -908,13 +1035,10 @@ def __init__(self):
                 logger.info("Using uncompiled graph (LangGraph >= v0.1.x)")
                 self._run_method = self._run_directly
             
-            # Initialize thinking steps for real-time updates
-            self.latest_thinking_steps = []
-            
-            # Initialize last_answer for state preservation
-            self.last_answer = None
+            # Context of the most recent query, for callers polling thinking steps
+            self._last_context: Optional[RequestContext] = None
             
-            # Initialize callback for thinking steps
+            # Default callback for queries that do not pass their own
             self._thinking_step_callback = None
             
             # Run a sanity check to make sure the graph is configured correctly
@@ -926,7 +1050,10 @@ def __init__(self):
             raise RuntimeError(f"Failed to initialize agent: {e}")
     
     def set_thinking_step_callback(self, callback_function):
-        """Set a callback function to be called for each thinking step.
+        """Set a default callback function to be called for each thinking step.
+        
+        The default is shared by every query on this agent. Concurrent callers
+        should pass thinking_step_callback to query() or prepare_query() instead.
         
         Args:
             callback_function: A function that takes a thinking step as an argument.
@@ -935,21 +1062,37 @@ def set_thinking_step_callback(self, callback_function):
         logger.debug("Setting thinking step callback")
         self._thinking_step_callback = callback_function
 
-    def _record_thinking_step(self, step):
-        """Record a thinking step and call the callback if set.
+    @property
+    def latest_thinking_steps(self) -> List[Dict[str, Any]]:
+        """Thinking steps of the current query, or of the most recent one outside a query."""
+        context = _request_context.get() or self._last_context
+        return context.thinking_steps if context is not None else []
+
+    @property
+    def last_answer(self) -> Optional[str]:
+        """Answer of the current query, or of the most recent one outside a query."""
+        context = _request_context.get() or self._last_context
+        return context.last_answer if context is not None else None
+
+    @contextmanager
+    def _request(self, thinking_step_callback=None) -> Iterator[RequestContext]:
+        """
+        Run the body in a new request context.
         
         Args:
-            step: A thinking step dictionary with at least a 'description' key.
+            thinking_step_callback: Callback for this query's thinking steps
+                (defaults to the agent-wide callback)
+            
+        Yields:
+            The request context
         """
-        # Add to our internal record
-        self.latest_thinking_steps.append(step)
-        
-        # Call the callback if set
-        if self._thinking_step_callback:
-            try:
-                self._thinking_step_callback(step)
-            except Exception as e:
-                logger.error(f"Error in thinking step callback: {e}")
+        context = RequestContext(thinking_step_callback or self._thinking_step_callback)
+        self._last_context = context
+        token = _request_context.set(context)
+        try:
+            yield context
+        finally:
+            _request_context.reset(token)
 
     def _run_compiled(self, state):
         """Run the graph using the compiled instance (LangGraph v0.0.x)"""
@@ -961,31 +1104,33 @@ def _run_directly(self, state):
         logger.debug("Running graph directly")
         return self.graph.run(state)
         
-    def _custom_workflow(self, state: AgentState) -> AgentState:
+    def _retrieve(self, state: AgentState) -> AgentState:
         """
-        Custom workflow implementation for improved performance and control.
-        This method orchestrates the execution of the agent workflow.
+        Run the retrieval part of the workflow (vector store and web search).
         
         Args:
-            state: The initial state to use
+            state: The state to retrieve documents for
             
         Returns:
-            The final agent state after processing
+            The state with retrieved documents
         """
-        try:
-            workflow_logger.info("Starting custom workflow execution")
-            
-            # Inject agent instance into state for thinking step updates
-            state["agent_instance"] = self
-            
-            # Make the routing decision
-            initial_routing = decide_search_method(state)
-            
-            # Log the routing decision
-            workflow_logger.info(f"Initial routing decision: {initial_routing}")
+        # Make the routing decision
+        initial_routing = decide_search_method(state)
+        
+        # Log the routing decision
+        workflow_logger.info(f"Initial routing decision: {initial_routing}")
+        
+        # Execute the appropriate pathway based on routing decision
+        if initial_routing in ["vector_search", "vectorstore", "hybrid"]:
+            retrieval_config = get_config().section('retrieval')
             
-            # Execute the appropriate pathway based on routing decision
-            if initial_routing in ["vector_search", "vectorstore", "hybrid"]:
+            if state.get("use_web_search", False) and retrieval_config.get('parallel_web_search', True):
+                # Query the knowledge base and the web at the same time
+                state = parallel_retrieve(
+                    state,
+                    deadline=retrieval_config.get('deadline_seconds', DEFAULT_RETRIEVAL_DEADLINE)
+                )
+            else:
                 # Retrieve documents
                 state = retrieve_from_vectorstore(state)
                 
@@ -993,19 +1138,29 @@ def _custom_workflow(self, state: AgentState) -> AgentState:
                 if state.get("use_web_search", False) or len(state.get("documents", [])) == 0:
                     state = web_search(state)
                 
-                # Generate the final answer
-                state = generate_answer(state)
-                
-            elif initial_routing == "websearch" or initial_routing == "web_search":
-                # Perform web search first
-                state = web_search(state)
-                
-                # Generate the final answer
-                state = generate_answer(state)
-                
-            else:
-                # Default path - just generate an answer with what we have
-                state = generate_answer(state)
+        elif initial_routing == "websearch" or initial_routing == "web_search":
+            # Perform web search first
+            state = web_search(state)
+        
+        return state
+    
+    def _custom_workflow(self, state: AgentState) -> AgentState:
+        """
+        Custom workflow implementation for improved performance and control.
+        This method orchestrates the execution of the agent workflow.
+        
+        Args:
+            state: The initial state to use
+            
+        Returns:
+            The final agent state after processing
+        """
+        try:
+            workflow_logger.info("Starting custom workflow execution")
+            
+            # Retrieve context, then generate the final answer
+            state = self._retrieve(state)
+            state = generate_answer(state)
                 
             # Ensure there's an answer in the output
             if "answer" not in state or not state["answer"]:
@@ -1015,10 +1170,6 @@ def _custom_workflow(self, state: AgentState) -> AgentState:
             # Save the response for later reference
             state["response"] = state.get("answer", state.get("output", "I couldn't generate an answer."))
             
-            # Remove the agent instance reference to avoid circular dependencies
-            if "agent_instance" in state:
-                del state["agent_instance"]
-            
             workflow_logger.info("Custom workflow completed successfully")
             return state
         
@@ -1044,13 +1195,10 @@ def _custom_workflow(self, state: AgentState) -> AgentState:
                 "content": f"Error: {str(e)}"
             })
             
-            # Remove the agent instance reference to avoid circular dependencies
-            if "agent_instance" in state:
-                del state["agent_instance"]
-            
             return state
         
-    def query(self, question: str, use_web_search: bool = False, conversation_history=None) -> Dict[str, Any]:
+    def query(self, question: str, use_web_search: bool = False, conversation_history=None,
+              thinking_step_callback=None, conversation_id: Optional[str] = None) -> Dict[str, Any]:
         """
         Process a query through the agent.
         
@@ -1058,14 +1206,114 @@ def query(self, question: str, use_web_search: bool = False, conversation_histor
             question: The query to process
             use_web_search: Whether to use web search
             conversation_history: Optional list of previous messages for context
+            thinking_step_callback: Optional function called with each thinking step of this query
+            conversation_id: Optional conversation the query belongs to
             
         Returns:
             Dict containing the answer and other information
         """
+        with self._request(thinking_step_callback):
+            return self._run_query(question, use_web_search, conversation_history, conversation_id)
+    
+    def _run_query(self, question: str, use_web_search: bool, conversation_history,
+                   conversation_id: Optional[str] = None) -> Dict[str, Any]:
+        """Process a query inside the current request context."""
         # Generate a unique ID for this query
         query_id = f"query_{int(time.time())}"
         logger.info(f"Processing query ID {query_id}: {question}")
         
+        state = self._build_state(question, use_web_search, conversation_history, query_id, conversation_id)
+        
+        # Set default result in case execution fails
+        result = {
+            "answer": "I'm sorry, but I wasn't able to process your query.",
+            "query": question,
+            "thinking": state["thinking_steps"],
+        }
+        
+        # Wrap in try-except to handle any errors
+        try:
+            workflow_logger.info(f"[{query_id}] Starting new query: {question}")
+            if use_web_search:
+                workflow_logger.info(f"[{query_id}] Web search explicitly requested")
+            
+            workflow_logger.info(f"[{query_id}] Executing agent graph")
+            
+            # Execute custom workflow instead of using the graph
+            end_state = self._custom_workflow(state)
+            
+            # Log ALL state keys at the end for debugging
+            logger.info(f"End state keys: {list(end_state.keys())}")
+            
+            # Extract answer from all possible locations
+            answer = None
+            
+            # Check each possible key for an answer
+            for key in ['answer', 'output', 'response']:
+                if key in end_state and end_state[key]:
+                    answer = end_state[key]
+                    logger.info(f"Found answer in '{key}': {answer[:100]}...")
+                    break
+            
+            # If answer is still None, check messages as a last resort
+            if answer is None and 'messages' in end_state and len(end_state['messages']) > 1:
+                for msg in reversed(end_state['messages']):
+                    if hasattr(msg, 'content') and getattr(msg, 'type', '') == 'ai':
+                        answer = msg.content
+                        logger.info(f"Extracted answer from AI message: {answer[:100]}...")
+                        break
+                    elif isinstance(msg, dict) and 'content' in msg and msg.get('role') == 'assistant':
+                        answer = msg['content']
+                        logger.info(f"Extracted answer from assistant message dict: {answer[:100]}...")
+                        break
+            
+            if answer:
+                logger.info(f"[{query_id}] Generated answer: {answer[:100]}...")
+            else:
+                logger.warning(f"[{query_id}] No answer found in result messages")
+                workflow_logger.warning(f"[{query_id}] Query failed: No answer generated")
+                answer = "I'm sorry, I wasn't able to process your query correctly."
+            
+            # Create result dict
+            result = {
+                "answer": answer,
+                "output": answer,  # For backwards compatibility
+                "query": question,
+                "duration": time.time() - state["search_starttime"],
+                "thinking": end_state.get("thinking_steps", []),
+                "has_error": False
+            }
+            
+            workflow_logger.info(f"[{query_id}] Query completed in {result['duration']:.2f} seconds")
+        except Exception as e:
+            logger.error(f"Error in agent execution: {e}", exc_info=True)
+            result = {
+                "answer": f"I'm sorry, but an error occurred: {str(e)}",
+                "output": f"I'm sorry, but an error occurred: {str(e)}",
+                "query": question,
+                "duration": time.time() - state["search_starttime"],
+                "thinking": state.get("thinking_steps", []),
+                "has_error": True
+            }
+            workflow_logger.error(f"[{query_id}] Query failed with error: {e}")
+        
+        return result
+
+    def _build_state(self, question: str, use_web_search: bool, conversation_history, query_id: str,
+                     conversation_id: Optional[str] = None) -> AgentState:
+        """
+        Build the initial state for a query.
+        
+        Args:
+            question: The query to process
+            use_web_search: Whether to use web search
+            conversation_history: Optional list of previous messages for context
+            query_id: Identifier used in log messages
+            conversation_id: Optional conversation the query belongs to
+            
+        Returns:
+            The initial agent state
+        """
         # Initialize messages with conversation history if available
         messages = []
         if conversation_history:
@@ -1137,7 +1385,8 @@ def query(self, question: str, use_web_search: bool = False, conversation_histor
             "thinking_steps": [],
             "output": None,  # Initialize both output and answer fields
             "answer": None,
-            "response": None
+            "response": None,
+            "conversation_id": conversation_id
         }
         
         # Initialize thinking steps with query start
@@ -1160,145 +1409,44 @@ def query(self, question: str, use_web_search: bool = False, conversation_histor
             })
             logger.info(f"[{query_id}] Web search explicitly requested")
         
-        # Reset latest thinking steps for UI
-        self.latest_thinking_steps = []
-        for step in state["thinking_steps"]:
-            self._record_thinking_step(step)
+        # Publish the initial thinking steps for UI
+        _publish_thinking_steps(state["thinking_steps"])
         
-        # Set default result in case execution fails
-        result = {
-            "answer": "I'm sorry, but I wasn't able to process your query.",
-            "query": question,
-            "thinking": state["thinking_steps"],
-        }
+        return state
+    
+    def prepare_query(self, question: str, use_web_search: bool = False, conversation_history=None,
+                      thinking_step_callback=None, conversation_id: Optional[str] = None) -> AgentState:
+        """
+        Run retrieval for a query without generating the answer.
         
-        # Wrap in try-except to handle any errors
-        try:
-            workflow_logger.info(f"[{query_id}] Starting new query: {question}")
-            if use_web_search:
-                workflow_logger.info(f"[{query_id}] Web search explicitly requested")
-            
-            workflow_logger.info(f"[{query_id}] Executing agent graph")
-            
-            # Execute custom workflow instead of using the graph
-            end_state = self._custom_workflow(state)
-            
-            # Log ALL state keys at the end for debugging
-            logger.info(f"End state keys: {list(end_state.keys())}")
-            
-            # Extract answer from all possible locations
-            answer = None
-            
-            # Check each possible key for an answer
-            for key in ['answer', 'output', 'response']:
-                if key in end_state and end_state[key]:
-                    answer = end_state[key]
-                    logger.info(f"Found answer in '{key}': {answer[:100]}...")
-                    break
-            
-            # If answer is still None, check messages as a last resort
-            if answer is None and 'messages' in end_state and len(end_state['messages']) > 1:
-                for msg in reversed(end_state['messages']):
-                    if hasattr(msg, 'content') and getattr(msg, 'type', '') == 'ai':
-                        answer = msg.content
-                        logger.info(f"Extracted answer from AI message: {answer[:100]}...")
-                        break
-                    elif isinstance(msg, dict) and 'content' in msg and msg.get('role') == 'assistant':
-                        answer = msg['content']
-                        logger.info(f"Extracted answer from assistant message dict: {answer[:100]}...")
-                        break
-            
-            if answer:
-                logger.info(f"[{query_id}] Generated answer: {answer[:100]}...")
-            else:
-                logger.warning(f"[{query_id}] No answer found in result messages")
-                workflow_logger.warning(f"[{query_id}] Query failed: No answer generated")
-                answer = "I'm sorry, I wasn't able to process your query correctly."
-            
-            # Create result dict
-            result = {
-                "answer": answer,
-                "output": answer,  # For backwards compatibility
-                "query": question,
-                "duration": time.time() - state["search_starttime"],
-                "thinking": end_state.get("thinking_steps", []),
-                "has_error": False
-            }
+        The returned state can be turned into LLM messages with
+        build_llm_messages(), so the answer can be generated by a streaming
+        client instead of inside the workflow.
+        
+        Args:
+            question: The query to process
+            use_web_search: Whether to use web search
+            conversation_history: Optional list of previous messages for context
+            thinking_step_callback: Optional function called with each thinking step of this query
+            conversation_id: Optional conversation the query belongs to
             
-            workflow_logger.info(f"[{query_id}] Query completed in {result['duration']:.2f} seconds")
-        except Exception as e:
-            logger.error(f"Error in agent execution: {e}", exc_info=True)
-            result = {
-                "answer": f"I'm sorry, but an error occurred: {str(e)}",
-                "output": f"I'm sorry, but an error occurred: {str(e)}",
-                "query": question,
-                "duration": time.time() - state["search_starttime"],
-                "thinking": state.get("thinking_steps", []),
-                "has_error": True
-            }
-            workflow_logger.error(f"[{query_id}] Query failed with error: {e}")
+        Returns:
+            The agent state with retrieved documents and thinking steps
+        """
+        query_id = f"query_{int(time.time())}"
+        logger.info(f"Preparing query ID {query_id}: {question}")
         
-        return result
-
-@lru_cache(maxsize=128)
-def _create_cached_prompt_part(content: str, role: str) -> str:
-    """Cached version of prompt part creation for better performance"""
-    role_name = "User" if role == "user" else "Assistant"
-    return f"{role_name}: {content[:500] + '...' if len(content) > 500 else content}"
+        with self._request(thinking_step_callback):
+            state = self._build_state(question, use_web_search, conversation_history, query_id, conversation_id)
+            return self._retrieve(state)
 
 # Create a copy of the original function for fallback
 def create_original_prompt_for_llm(query: str, documents: List[Document]) -> str:
     """Create a prompt for the LLM based on the query and retrieved documents, without conversation history."""
-    # Define maximum content length for documents
-    MAX_DOCUMENT_CONTENT_LENGTH = 800  # Characters per document
-    MAX_TOTAL_DOCUMENT_LENGTH = 6000   # Total characters for all documents
-    
-    # Format documents with limited content length
-    formatted_docs = []
-    total_doc_length = 0
-    
-    # Only process documents if they exist and if we're under the length limit
-    if documents:
-        # More efficient document processing
-        for i, doc in enumerate(documents[:10]):  # Limit to 10 docs maximum
-            # Extract content and relevant metadata
-            doc_content = doc.page_content
-            
-            # Truncate content if needed
-            if len(doc_content) > MAX_DOCUMENT_CONTENT_LENGTH:
-                doc_content = doc_content[:MAX_DOCUMENT_CONTENT_LENGTH] + "..."
-            
-            # Format document with metadata
-            doc_source = doc.metadata.get("source", "Unknown")
-            doc_title = doc.metadata.get("title", f"Document {i+1}")
-            formatted_doc = f"Document {i+1}: {doc_title}\nSource: {doc_source}\nContent: {doc_content}\n"
-            
-            # Check length limit
-            if total_doc_length + len(formatted_doc) > MAX_TOTAL_DOCUMENT_LENGTH:
-                formatted_docs.append("(Additional documents omitted due to length constraints)")
-                break
-                
-            formatted_docs.append(formatted_doc)
-            total_doc_length += len(formatted_doc)
-    
-    # Build the prompt
-    system_message = "You are a university information assistant. Answer questions based on the provided documents. If you can't find the answer in the documents, acknowledge that you don't know instead of making up information."
-    
-    # Join prompt parts efficiently
-    prompt_parts = [
-        system_message,
-        "\n\nRELEVANT DOCUMENTS:" if formatted_docs else "",
-    ]
-    prompt_parts.extend(formatted_docs)
-    prompt_parts.extend([
-        "\n\nCURRENT QUERY:",
-        f"User: {query}",
-        "\n\nPlease provide a helpful response to the query based on the relevant documents. If the documents don't contain relevant information, use your general knowledge but make it clear when you're doing so."
-    ])
-    
-    return "\n".join(prompt_parts)
+    return get_prompt_builder().build(query, documents)
 
-def create_prompt_with_fallback(query: str, documents: List[Document], messages=None) -> str:
+def create_prompt_with_fallback(query: str, documents: List[Document], messages=None,
+                                conversation_id: Optional[str] = None) -> str:
     """
     Create a prompt with fallback to original prompt format if conversation history processing fails.
     This function provides a safe wrapper around create_prompt_for_llm to ensure we always get a valid prompt.
@@ -1307,6 +1455,7 @@ def create_prompt_with_fallback(query: str, documents: List[Document], messages=
         query: The query to process
         documents: List of documents to include
         messages: Optional conversation history
+        conversation_id: Optional conversation the history belongs to
         
     Returns:
         A formatted prompt with or without conversation history
@@ -1314,7 +1463,7 @@ def create_prompt_with_fallback(query: str, documents: List[Document], messages=
     try:
         # Try to create prompt with conversation history
         if messages and len(messages) > 1:
-            return create_prompt_for_llm(query, documents, messages)
+            return create_prompt_for_llm(query, documents, messages, conversation_id=conversation_id)
         else:
             # If no history, use original prompt format
             return create_original_prompt_for_llm(query, documents)
@@ -1324,152 +1473,30 @@ def create_prompt_with_fallback(query: str, documents: List[Document], messages=
         logger.info("Falling back to original prompt format without history")
         return create_original_prompt_for_llm(query, documents)
 
-def create_prompt_for_llm(query: str, documents: List[Document], messages=None) -> str:
+def create_prompt_for_llm(query: str, documents: List[Document], messages=None,
+                          conversation_id: Optional[str] = None) -> str:
     """
     Create a prompt for the LLM based on the query, retrieved documents, and conversation history.
     
+    Documents and history are packed into the token budget of the prompt
+    section of the config; older messages are replaced by a running summary
+    of the conversation.
+    
     Args:
         query: The query to process
         documents: Retrieved documents
         messages: Optional conversation history
+        conversation_id: Optional conversation the history belongs to, used
+            to reuse its running summary
         
     Returns:
         A prompt string for the LLM
     """
-    # Performance optimization - use try-except for faster error handling
     try:
         # Early exit if there's no history - use the original prompt
         if not messages or len(messages) <= 1:
             return create_original_prompt_for_llm(query, documents)
-            
-        # Define maximum content length for documents and history
-        MAX_DOCUMENT_CONTENT_LENGTH = 800  # Characters per document
-        MAX_TOTAL_DOCUMENT_LENGTH = 6000   # Total characters for all documents
-        MAX_HISTORY_LENGTH = 2000  # Characters for conversation history
-        
-        # Format documents with limited content length
-        formatted_docs = []
-        total_doc_length = 0
-        
-        # Only process documents if they exist and if we're under the length limit
-        if documents:
-            # More efficient document processing with index tracking
-            for i, doc in enumerate(documents[:8]):  # Limit to 8 documents for performance
-                # Extract content and relevant metadata
-                doc_content = doc.page_content
-                
-                # Truncate content if needed
-                if len(doc_content) > MAX_DOCUMENT_CONTENT_LENGTH:
-                    doc_content = doc_content[:MAX_DOCUMENT_CONTENT_LENGTH] + "..."
-                
-                # Format document with metadata
-                doc_source = doc.metadata.get("source", "Unknown")
-                doc_title = doc.metadata.get("title", f"Document {i+1}")
-                formatted_doc = f"Document {i+1}: {doc_title}\nSource: {doc_source}\nContent: {doc_content}\n"
-                
-                # Check length limit for better performance
-                if total_doc_length + len(formatted_doc) > MAX_TOTAL_DOCUMENT_LENGTH:
-                    formatted_docs.append("(Additional documents omitted due to length constraints)")
-                    break
-                    
-                formatted_docs.append(formatted_doc)
-                total_doc_length += len(formatted_doc)
-        
-        # Skip history processing if no messages or just the current query
-        if not messages or len(messages) <= 1:
-            # Build the prompt without history
-            prompt_parts = [
-                "You are a university information assistant. Answer questions based on the provided documents. If you can't find the answer in the documents, acknowledge that you don't know instead of making up information."
-            ]
-            
-            if formatted_docs:
-                prompt_parts.append("\n\nRELEVANT DOCUMENTS:")
-                prompt_parts.extend(formatted_docs)
-            
-            prompt_parts.append("\n\nCURRENT QUERY:")
-            prompt_parts.append(f"User: {query}")
-            prompt_parts.append("\n\nPlease provide a helpful response to the current query based on the relevant documents. If the documents don't contain relevant information, use your general knowledge but make it clear when you're doing so.")
-            
-            return "\n".join(prompt_parts)
-        
-        # Process conversation history efficiently for inclusion in the prompt
-        # Only include the most recent 4-6 messages for performance
-        selected_msgs = messages[:-1]  # Exclude current query which is handled separately
-        
-        # Modified: Always include the first message plus the most recent ones
-        MAX_HISTORY_MSGS = 5
-        if len(selected_msgs) > MAX_HISTORY_MSGS:
-            # Keep the first message plus most recent messages (preserving context)
-            first_message = selected_msgs[:1]
-            recent_messages = selected_msgs[-(MAX_HISTORY_MSGS-1):]
-            selected_msgs = first_message + recent_messages
-        
-        # Format history with cached prompt parts for better performance
-        conversation_parts = []
-        total_history_length = 0
-        is_truncated = False
-        
-        # Process messages in a single pass for better performance
-        for msg in selected_msgs:
-            # Handle special case for ellipsis placeholder
-            if msg == "...":
-                placeholder = "[Several messages omitted for brevity]"
-                conversation_parts.append(placeholder)
-                total_history_length += len(placeholder)
-                continue
-            
-            # Determine role
-            role = "user" if isinstance(msg, HumanMessage) else "assistant"
-            
-            # Quick content access with failsafe
-            try:
-                content = msg.content
-            except (AttributeError, TypeError):
-                continue
-            
-            # Use cached prompt part creation
-            formatted_msg = _create_cached_prompt_part(content, role)
-            
-            # Check if adding would exceed limit
-            if total_history_length + len(formatted_msg) <= MAX_HISTORY_LENGTH:
-                conversation_parts.append(formatted_msg)
-                total_history_length += len(formatted_msg)
-            else:
-                # Mark that the conversation was truncated
-                if not conversation_parts:
-                    # Can't fit any messages
-                    conversation_parts.append("[Conversation truncated due to length]")
-                else:
-                    # Mark as truncated
-                    conversation_parts.append("[Earlier conversation truncated due to length limits]")
-                is_truncated = True
-                break
-        
-        # Build the prompt - optimized for efficiency
-        system_instruction = "You are a university information assistant. Answer questions based on the provided documents and conversation history. If you can't find the answer in the documents or conversation history, acknowledge that you don't know instead of making up information."
-        
-        prompt_parts = [system_instruction]
-        
-        # Add documents section if available
-        if formatted_docs:
-            prompt_parts.append("\n\nRELEVANT DOCUMENTS:")
-            prompt_parts.extend(formatted_docs)
-        
-        # Add conversation history if available
-        if conversation_parts:
-            prompt_parts.append("\n\nCONVERSATION HISTORY:")
-            prompt_parts.extend(conversation_parts)
-        
-        # Always add the current query section
-        prompt_parts.append("\n\nCURRENT QUERY:")
-        prompt_parts.append(f"User: {query}")
-        
-        # Add final instruction
-        prompt_parts.append("\n\nPlease provide a helpful response to the current query based on the conversation history and relevant documents. If you don't have enough information to answer, acknowledge that you don't know.")
-        
-        # Join and return prompt
-        return "\n".join(prompt_parts)
-        
+        return get_prompt_builder().build(query, documents, messages, conversation_id)
     except Exception as e:
         # Fallback to original prompt in case of any errors
         logger.error(f"Error creating prompt with history: {str(e)}. Falling back to original prompt.")
@@ -19,9 +19,9 @@
 import platform
 import concurrent.futures
 from pathlib import Path
-from typing import List, Dict, Any, Optional, Tuple, Set, Union
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Tuple, Set, Union
 from datetime import datetime
-from collections import defaultdict, Counter
+from collections import defaultdict, Counter, deque
 from tqdm import tqdm
 import uuid
 import sqlite3
@@ -29,14 +29,113 @@
 
 from langchain_core.documents import Document
 from langchain_core.vectorstores import VectorStore
-from langchain_community.vectorstores import FAISS
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 
 from src.utils.logger import get_logger
 from src.models.embeddings import SimpleEmbeddings
+from src.core.vectorstore import get_embeddings
+from src.core.incremental_index import IncrementalIndex, chunk_id, DEFAULT_EMBED_BATCH_SIZE
+from src.core.near_duplicates import NearDuplicateIndex, DEFAULT_MAX_DISTANCE
 
 logger = logging.getLogger(__name__)
 
+# Loader method for each supported file extension
+LOADER_METHODS = {
+    ".txt": "_load_text_file",
+    ".md": "_load_markdown_file",
+    ".pdf": "_load_pdf_file",
+    ".csv": "_load_csv_file",
+    ".json": "_load_json_file",
+    ".html": "_load_html_file",
+}
+
+# Documents sent to a worker process per chunking task
+CHUNK_BATCH_SIZE = 32
+
+# Text splitters of the current worker process, keyed by (chunk_size, chunk_overlap)
+_splitters: Dict[Tuple[int, int], RecursiveCharacterTextSplitter] = {}
+
+
+def _get_splitter(chunk_size: int, chunk_overlap: int) -> RecursiveCharacterTextSplitter:
+    """Get a text splitter for this process, creating it on first use."""
+    key = (chunk_size, chunk_overlap)
+    if key not in _splitters:
+        _splitters[key] = RecursiveCharacterTextSplitter(
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap,
+            length_function=len,
+            separators=["\n\n", "\n", ". ", " ", ""]
+        )
+    return _splitters[key]
+
+
+def _split_documents(documents: List[Document], chunk_size: int, chunk_overlap: int) -> List[Tuple[str, Any]]:
+    """
+    Split documents into chunks; runs in a worker process.
+    
+    Returns:
+        One (status, value) pair per document: ("ok", chunks), ("empty", None) or ("error", message)
+    """
+    splitter = _get_splitter(chunk_size, chunk_overlap)
+    results = []
+    for doc in documents:
+        if not doc.page_content or len(doc.page_content.strip()) == 0:
+            results.append(("empty", None))
+            continue
+        try:
+            results.append(("ok", splitter.split_documents([doc])))
+        except Exception as e:
+            results.append(("error", str(e)))
+    return results
+
+
+def _load_file(file_path: str, ext: str, split: bool, chunk_size: int,
+               chunk_overlap: int) -> Tuple[str, List[Document], Optional[str], List[str]]:
+    """
+    Load a file and optionally split it into chunks; runs in a worker process.
+    
+    Returns:
+        The file path, its documents (or chunks), an error message if loading
+        failed and the error messages of documents that could not be chunked
+    """
+    try:
+        docs = getattr(DocumentProcessor, LOADER_METHODS[ext])(file_path)
+        
+        # Add source metadata to each document
+        for doc in docs:
+            if "source" not in doc.metadata:
+                doc.metadata["source"] = file_path
+    except Exception as e:
+        return file_path, [], str(e), []
+    
+    chunk_errors = []
+    if split:
+        chunks = []
+        for status, value in _split_documents(docs, chunk_size, chunk_overlap):
+            if status == "ok":
+                chunks.extend(value)
+            elif status == "error":
+                chunk_errors.append(value)
+        docs = chunks
+    return file_path, docs, None, chunk_errors
+
+
+def _ordered_map(executor: concurrent.futures.Executor, fn, args_iter: Iterable[tuple], max_pending: int) -> Iterator[Any]:
+    """
+    Run fn over args_iter on an executor, yielding results in input order.
+    
+    At most max_pending tasks are queued or running at a time, and new tasks
+    are only submitted as results are consumed, so memory stays bounded.
+    """
+    pending = deque()
+    for args in args_iter:
+        pending.append(executor.submit(fn, *args))
+        if len(pending) >= max_pending:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
 class DocumentProcessor:
     """
     Class for processing university documents, chunking them, and 
@@ -76,56 +175,27 @@ def __init__(self, config: Dict[str, Any]):
         self.vectordb_dir.mkdir(exist_ok=True, parents=True)
         
         # Initialize text splitter for chunking
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=self.chunk_size,
-            chunk_overlap=self.chunk_overlap,
-            length_function=len,
-            separators=["\n\n", "\n", ". ", " ", ""]
-        )
+        self.text_splitter = _get_splitter(self.chunk_size, self.chunk_overlap)
+        
+        # Get ingest pipeline config
+        self.ingest_config = config.get('ingest', {})
+        self.max_workers = self.ingest_config.get('max_workers') or os.cpu_count() or 1
+        self.max_pending = self.ingest_config.get('max_pending') or 2 * self.max_workers
+        self.embed_batch_size = self.ingest_config.get('embed_batch_size') or DEFAULT_EMBED_BATCH_SIZE
+        self.near_duplicate_chunks = self.ingest_config.get('near_duplicate_chunks', True)
+        self.near_duplicate_distance = self.ingest_config.get('near_duplicate_distance', DEFAULT_MAX_DISTANCE)
+    
+    def _executor(self) -> concurrent.futures.Executor:
+        """Create the process pool used for parsing and splitting."""
+        return concurrent.futures.ProcessPoolExecutor(max_workers=self.max_workers)
             
-    def get_or_create_vectorstore(self, documents: Optional[List[Document]] = None) -> FAISS:
-        """Get an existing vector store or create a new one with the provided documents."""
-        logger = get_logger("doc_processor.vectorstore")
-        
-        # Define the path to the FAISS index
-        faiss_index_path = os.path.join(self.data_dir, "vectordb", "faiss_index")
-        
-        # Use HuggingFaceEmbeddings for better semantic search
-        logger.info(f"Initializing HuggingFaceEmbeddings with model {self.embedding_model}")
-        embedding_function = HuggingFaceEmbeddings(
-            model_name=self.embedding_model
-        )
-        
-        # Check if FAISS index exists
-        if os.path.exists(faiss_index_path):
-            try:
-                logger.info(f"Loading existing FAISS index from {faiss_index_path}")
-                return FAISS.load_local(faiss_index_path, embedding_function)
-            except Exception as e:
-                logger.error(f"Error loading existing FAISS index: {e}")
-                logger.info("Will create a new FAISS index")
-        
-        # Require documents to create a new vectorstore
-        if not documents:
-            raise ValueError("Documents must be provided to create a new vector store")
-        
-        # Create the vectordb directory if it doesn't exist
-        os.makedirs(os.path.join(self.data_dir, "vectordb"), exist_ok=True)
-        
-        # Create a new FAISS index
-        logger.info(f"Creating new FAISS index from {len(documents)} documents")
-        vectorstore = FAISS.from_documents(documents, embedding_function)
-        
-        # Save the index
-        vectorstore.save_local(faiss_index_path)
-        logger.info(f"FAISS index saved to {faiss_index_path}")
-        
-        return vectorstore
-                
     def chunk_documents(self, documents: List[Document]) -> List[Document]:
         """
         Split documents into smaller chunks for better retrieval.
         
+        Documents are split in batches on a process pool; chunks are returned
+        in the order of the input documents.
+        
         Args:
             documents: List of documents to chunk
             
@@ -143,112 +213,129 @@ def chunk_documents(self, documents: List[Document]) -> List[Document]:
         successful = 0
         failed = 0
         
+        batches = [
+            (documents[i:i + CHUNK_BATCH_SIZE], self.chunk_size, self.chunk_overlap)
+            for i in range(0, len(documents), CHUNK_BATCH_SIZE)
+        ]
+        
         # Progress bar for chunking
         with tqdm(total=len(documents), desc="Chunking documents") as pbar:
-            for i, doc in enumerate(documents):
-                try:
-                    # Skip empty documents
-                    if not doc.page_content or len(doc.page_content.strip()) == 0:
-                        logger.warning(f"Skipping empty document")
+            if self.max_workers > 1 and len(batches) > 1:
+                executor = self._executor()
+                results = _ordered_map(executor, _split_documents, batches, self.max_pending)
+            else:
+                # Not worth starting worker processes
+                executor = None
+                results = (_split_documents(*batch) for batch in batches)
+            
+            try:
+                for batch_results in results:
+                    for status, value in batch_results:
+                        if status == "empty":
+                            logger.warning(f"Skipping empty document")
+                        elif status == "error":
+                            logger.error(f"Error chunking document: {value}")
+                            failed += 1
+                        else:
+                            # Add to our collection
+                            chunked_docs.extend(value)
+                            total_chunks += len(value)
+                            successful += 1
                         pbar.update(1)
-                        continue
-                    
-                    # Chunk the document
-                    chunks = self.text_splitter.split_documents([doc])
-                    
-                    # Add to our collection
-                    chunked_docs.extend(chunks)
-                    total_chunks += len(chunks)
-                    successful += 1
                     
                     pbar.set_postfix({"Chunks": total_chunks, "Success": successful})
-                except Exception as e:
-                    logger.error(f"Error chunking document: {e}")
-                    failed += 1
-                
-                pbar.update(1)
+            finally:
+                if executor is not None:
+                    executor.shutdown(cancel_futures=True)
         
         elapsed_time = time.time() - start_time
         logger.info(f"Chunked {successful}/{len(documents)} documents into {total_chunks} chunks in {elapsed_time:.2f}s")
         
         return chunked_docs
                 
-    def add_documents(self, documents: List[Document]) -> None:
+    def add_documents(self, documents: Iterable[Document], replace_all: bool = False,
+                      unchanged_sources: Optional[Iterable[str]] = None) -> Dict[str, Any]:
         """
         Add documents to the vector database.
         
+        The index is updated incrementally: only documents that are not
+        already indexed are embedded, and documents that disappeared from the
+        given sources are deleted. Documents that are near-duplicates of
+        indexed ones, such as boilerplate repeated across pages, are skipped.
+        
         Args:
-            documents: List of documents to add
+            documents: Documents to add (a list or a stream from iter_documents)
+            replace_all: Whether documents is the complete corpus, so that
+                everything else is deleted from the index
+            unchanged_sources: Sources whose indexed documents are kept as they are,
+                such as pages that were not modified since the last crawl
+            
+        Returns:
+            Counts of added, unchanged, deleted and near-duplicate documents
         """
         logger = get_logger("core.document_processor")
         
-        if not documents:
+        if isinstance(documents, list) and not documents and not replace_all:
             logger.warning("No documents to add to vector database")
-            return
+            return {"added": 0, "unchanged": 0, "deleted": 0}
         
         try:
-            # Get or create the vector database
-            vectorstore = self.get_or_create_vectorstore(documents)
-            
-            # Add documents to the vector database
-            logger.info(f"Adding {len(documents)} documents to vector database")
+            faiss_index_path = str(self.vectordb_dir / "faiss_index")
+            index = IncrementalIndex(
+                faiss_index_path,
+                get_embeddings(self.embedding_model),
+                embedding_model=self.embedding_model,
+                embed_batch_size=self.embed_batch_size
+            )
             
-            # Add documents in batches to avoid memory issues
-            batch_size = 100
-            total_added = 0
+            near_duplicates = None
+            if self.near_duplicate_chunks:
+                near_duplicates = NearDuplicateIndex(
+                    db_path=str(self.vectordb_dir / "near_duplicates.sqlite"),
+                    namespace="chunks",
+                    max_distance=self.near_duplicate_distance
+                )
+                if index.rebuilds():
+                    # The indexed chunks are about to be dropped; they duplicate nothing
+                    near_duplicates.clear()
+                documents = self._skip_near_duplicates(documents, near_duplicates, index.chunks_by_source())
             
-            # Progress bar for adding documents
-            with tqdm(total=len(documents), desc="Adding documents to vector store") as pbar:
-                for i in range(0, len(documents), batch_size):
-                    batch = documents[i:i+batch_size]
-                    try:
-                        # Extract texts and metadatas from documents
-                        texts = [doc.page_content for doc in batch]
-                        metadatas = [doc.metadata for doc in batch]
-                        
-                        # Add batch to FAISS index
-                        vectorstore.add_texts(
-                            texts=texts,
-                            metadatas=metadatas
-                        )
-                        
-                        total_added += len(batch)
-                        logger.info(f"Added batch of {len(batch)} documents (total: {total_added}/{len(documents)})")
-                    except Exception as e:
-                        logger.error(f"Error adding batch to vector database: {str(e)}")
-                        # Try smaller batches if a batch fails
-                        smaller_batch_size = 10
-                        logger.info(f"Trying smaller batch size of {smaller_batch_size}")
-                        for j in range(i, min(i+batch_size, len(documents)), smaller_batch_size):
-                            smaller_batch = documents[j:j+smaller_batch_size]
-                            try:
-                                # Extract texts and metadatas from documents
-                                texts = [doc.page_content for doc in smaller_batch]
-                                metadatas = [doc.metadata for doc in smaller_batch]
-                                
-                                # Add smaller batch to FAISS index
-                                vectorstore.add_texts(
-                                    texts=texts,
-                                    metadatas=metadatas
-                                )
-                                total_added += len(smaller_batch)
-                                logger.info(f"Added smaller batch of {len(smaller_batch)} documents")
-                            except Exception as e2:
-                                logger.error(f"Error adding smaller batch: {str(e2)}")
-                    
-                    pbar.update(len(batch))
+            logger.info(f"Updating vector database at {faiss_index_path}")
+            stats = index.update(documents, replace_all=replace_all, unchanged_sources=unchanged_sources)
             
-            # Save the updated index
-            faiss_index_path = str(self.vectordb_dir / "faiss_index")
-            logger.info(f"Saving updated FAISS index to {faiss_index_path}")
-            vectorstore.save_local(faiss_index_path)
+            stats["near_duplicates"] = 0
+            if near_duplicates is not None:
+                # Forget chunks that are no longer indexed, so they don't hide new ones
+                near_duplicates.retain(index.read_manifest()["chunks"])
+                near_duplicates.close()
+                stats["near_duplicates"] = near_duplicates.duplicates
             
-            logger.info(f"Successfully added {total_added} documents to vector database")
+            logger.info(f"Added {stats['added']} documents to vector database "
+                        f"({stats['unchanged']} unchanged, {stats['deleted']} deleted, "
+                        f"{stats['near_duplicates']} near-duplicates not embedded)")
+            return stats
             
         except Exception as e:
             logger.error(f"Error adding documents to vector store: {str(e)}")
             raise e
 
+    @staticmethod
+    def _skip_near_duplicates(documents: Iterable[Document], near_duplicates: NearDuplicateIndex,
+                              indexed: Dict[str, Set[str]]) -> Iterator[Document]:
+        """
+        Yield the documents that are not near-duplicates of indexed or earlier ones.
+        
+        Indexed chunks of a document's own source are not compared with it: the
+        update may replace them, e.g. with an edited version of the document.
+        A document that duplicates a chunk of another source that this update
+        deletes is added by the next update, once the deleted chunk's
+        fingerprint has been dropped.
+        """
+        for doc in documents:
+            ignore = indexed.get(str(doc.metadata.get("source", "")), ())
+            if near_duplicates.check(chunk_id(doc), doc.page_content, ignore=ignore) is None:
+                yield doc
+
     def get_all_documents(self) -> List[Document]:
         """
         Get all documents from the data directory.
@@ -256,8 +343,24 @@ def get_all_documents(self) -> List[Document]:
         Returns:
             List of documents
         """
+        return list(self.iter_documents())
+    
+    def iter_documents(self, split: bool = False) -> Iterator[Document]:
+        """
+        Load the documents in the data directory as a stream.
+        
+        Files are parsed (and optionally split) on a process pool. Documents
+        are yielded in directory walk order as soon as they are ready, and
+        only a bounded number of files are in flight, so memory stays flat
+        however large the corpus is.
+        
+        Args:
+            split: Whether to yield chunks instead of whole documents
+            
+        Yields:
+            Documents, or chunks if split is set
+        """
         logger = get_logger("core.document_processor")
-        documents = []
         
         # Define the data path to scan for documents
         data_path = os.path.join(self.data_dir, "raw")
@@ -283,56 +386,87 @@ def get_all_documents(self) -> List[Document]:
             with open(sample_file, "w") as f:
                 f.write(sample_content)
         
-        # Define loaders for different file types
-        loaders = {
-            ".txt": self._load_text_file,
-            ".md": self._load_markdown_file,
-            ".pdf": self._load_pdf_file,
-            ".csv": self._load_csv_file,
-            ".json": self._load_json_file,
-            ".html": self._load_html_file,
-        }
-        
         # Find all files in the data directory
-        file_count = 0
-        loaded_count = 0
+        counts = {"files": 0, "loaded": 0, "documents": 0}
+        
+        def supported_files():
+            for root, _, files in os.walk(data_path):
+                for file in files:
+                    # Skip hidden files
+                    if file.startswith('.'):
+                        continue
+                    
+                    file_path = os.path.join(root, file)
+                    counts["files"] += 1
+                    
+                    # Get file extension
+                    ext = os.path.splitext(file)[1].lower()
+                    
+                    if ext in LOADER_METHODS:
+                        logger.info(f"Loading {file_path}")
+                        yield file_path, ext, split, self.chunk_size, self.chunk_overlap
+                    else:
+                        logger.warning(f"Unsupported file type: {file_path}")
         
         logger.info(f"Scanning directory {data_path} for documents")
-        for root, _, files in os.walk(data_path):
-            for file in files:
-                # Skip hidden files
-                if file.startswith('.'):
+        tasks = supported_files()
+        if self.max_workers > 1:
+            executor = self._executor()
+            results = _ordered_map(executor, _load_file, tasks, self.max_pending)
+        else:
+            executor = None
+            results = (_load_file(*task) for task in tasks)
+        
+        try:
+            for file_path, docs, error, chunk_errors in results:
+                if error is not None:
+                    logger.error(f"Error loading {file_path}: {error}")
                     continue
-                    
-                file_path = os.path.join(root, file)
-                file_count += 1
-                
-                # Get file extension
-                ext = os.path.splitext(file)[1].lower()
+                for chunk_error in chunk_errors:
+                    logger.error(f"Error chunking document from {file_path}: {chunk_error}")
                 
-                if ext in loaders:
-                    try:
-                        logger.info(f"Loading {file_path}")
-                        docs = loaders[ext](file_path)
-                        
-                        # Add source metadata to each document
-                        for doc in docs:
-                            if "source" not in doc.metadata:
-                                doc.metadata["source"] = file_path
-                        
-                        documents.extend(docs)
-                        loaded_count += 1
-                        logger.info(f"Loaded {len(docs)} documents from {file_path}")
-                    except Exception as e:
-                        logger.error(f"Error loading {file_path}: {e}")
-                else:
-                    logger.warning(f"Unsupported file type: {file_path}")
-        
-        logger.info(f"Loaded {loaded_count}/{file_count} files, total documents: {len(documents)}")
-        
-        return documents
+                counts["loaded"] += 1
+                counts["documents"] += len(docs)
+                logger.info(f"Loaded {len(docs)} {'chunks' if split else 'documents'} from {file_path}")
+                yield from docs
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+        
+        logger.info(f"Loaded {counts['loaded']}/{counts['files']} files, "
+                    f"total {'chunks' if split else 'documents'}: {counts['documents']}")
+
+    def ingest(self, replace_all: bool = True, unchanged_sources: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+        """
+        Load, split and index the data directory in one streaming pass.
+        
+        Args:
+            replace_all: Whether to delete indexed chunks whose files are gone
+            unchanged_sources: Sources whose indexed chunks are kept as they are,
+                such as UniversitySpider.unchanged_urls
+            
+        Returns:
+            Counts of added, unchanged and deleted chunks
+        """
+        return self.add_documents(self.iter_documents(split=True), replace_all=replace_all,
+                                  unchanged_sources=unchanged_sources)
+    
+    def indexed_sources(self) -> Set[str]:
+        """
+        Get the sources that have chunks in the vector database.
+        
+        Pass them to UniversitySpider, so that only pages whose content was
+        indexed are revalidated with conditional requests.
+        
+        Returns:
+            The sources, or an empty set if the next update rebuilds the index
+        """
+        # Only the manifest is read, so no embedding model is needed
+        index = IncrementalIndex(str(self.vectordb_dir / "faiss_index"), None, embedding_model=self.embedding_model)
+        return index.indexed_sources()
 
-    def _load_text_file(self, file_path: str) -> List[Document]:
+    @staticmethod
+    def _load_text_file(file_path: str) -> List[Document]:
         """
         Load a text file.
         
@@ -350,7 +484,8 @@ def _load_text_file(self, file_path: str) -> List[Document]:
             logger.error(f"Error loading text file {file_path}: {e}")
             return []
     
-    def _load_markdown_file(self, file_path: str) -> List[Document]:
+    @staticmethod
+    def _load_markdown_file(file_path: str) -> List[Document]:
         """
         Load a markdown file.
         
@@ -361,9 +496,10 @@ def _load_markdown_file(self, file_path: str) -> List[Document]:
             List of documents
         """
         # For this simple implementation, we'll treat markdown as plain text
-        return self._load_text_file(file_path)
+        return DocumentProcessor._load_text_file(file_path)
     
-    def _load_pdf_file(self, file_path: str) -> List[Document]:
+    @staticmethod
+    def _load_pdf_file(file_path: str) -> List[Document]:
         """
         Load a PDF file.
         
@@ -381,7 +517,8 @@ def _load_pdf_file(self, file_path: str) -> List[Document]:
             logger.error(f"Error loading PDF file {file_path}: {e}")
             return []
     
-    def _load_csv_file(self, file_path: str) -> List[Document]:
+    @staticmethod
+    def _load_csv_file(file_path: str) -> List[Document]:
         """
         Load a CSV file.
         
@@ -399,7 +536,8 @@ def _load_csv_file(self, file_path: str) -> List[Document]:
             logger.error(f"Error loading CSV file {file_path}: {e}")
             return []
     
-    def _load_json_file(self, file_path: str) -> List[Document]:
+    @staticmethod
+    def _load_json_file(file_path: str) -> List[Document]:
         """
         Load a JSON file.
         
@@ -417,7 +555,8 @@ def _load_json_file(self, file_path: str) -> List[Document]:
             logger.error(f"Error loading JSON file {file_path}: {e}")
             return []
     
-    def _load_html_file(self, file_path: str) -> List[Document]:
+    @staticmethod
+    def _load_html_file(file_path: str) -> List[Document]:
         """
         Load an HTML file.
         
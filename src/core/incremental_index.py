@@ -0,0 +1,364 @@
+"""
+Incremental FAISS index updates.
+
+A manifest next to the index records the ID of every chunk in the index. Chunk
+IDs are fingerprints of the chunk's source and content, so an unchanged chunk
+keeps its ID across re-scrapes. An update only embeds chunks with new IDs,
+and deletes chunks whose IDs are no longer produced.
+
+New chunks are written as small segment indexes, and deleted IDs are recorded
+as tombstones in the manifest, so an update never rewrites the full index.
+Chunks are embedded and written in batches as they are read, so an update
+only holds one batch of chunks in memory, plus the ID and source of each.
+Segments and tombstones are folded into the base index by a compaction once
+there are too many of them.
+
+Layout of an index directory:
+
+    index.faiss, index.pkl    base index (FAISS.save_local)
+    segments/<name>/          appended chunks (FAISS.save_local)
+    manifest.json             chunk IDs, segment names and tombstones
+"""
+
+import os
+import json
+import time
+import shutil
+import hashlib
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_community.vectorstores import FAISS
+
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+MANIFEST_FILE = "manifest.json"
+SEGMENTS_DIR = "segments"
+MANIFEST_VERSION = 1
+
+# Compact when there are more segments than this
+DEFAULT_MAX_SEGMENTS = 8
+# Compact when tombstones exceed this fraction of the live chunks
+DEFAULT_MAX_DELETED_FRACTION = 0.2
+# New chunks embedded and written as one segment at a time
+DEFAULT_EMBED_BATCH_SIZE = 1000
+
+
+def chunk_id(document: Document) -> str:
+    """
+    Fingerprint a chunk by its source and content.
+
+    Args:
+        document: The chunk
+
+    Returns:
+        Hex digest used as the chunk's ID in the index
+    """
+    source = str(document.metadata.get("source", ""))
+    return hashlib.sha256(f"{source}\0{document.page_content}".encode("utf-8")).hexdigest()
+
+
+class IncrementalIndex:
+    """FAISS index in a directory, updated in place by chunk fingerprint."""
+
+    def __init__(
+        self,
+        index_dir: str,
+        embeddings: Embeddings,
+        embedding_model: Optional[str] = None,
+        max_segments: int = DEFAULT_MAX_SEGMENTS,
+        max_deleted_fraction: float = DEFAULT_MAX_DELETED_FRACTION,
+        embed_batch_size: int = DEFAULT_EMBED_BATCH_SIZE
+    ):
+        """
+        Initialize the incremental index.
+
+        Args:
+            index_dir: Directory holding the index
+            embeddings: Embedding function for new chunks
+            embedding_model: Name of the embedding model; the index is rebuilt if it changes
+            max_segments: Number of segments that triggers a compaction
+            max_deleted_fraction: Fraction of tombstoned chunks that triggers a compaction
+            embed_batch_size: Number of new chunks embedded and written as one segment
+        """
+        self.index_dir = index_dir
+        self.embeddings = embeddings
+        self.embedding_model = embedding_model
+        self.max_segments = max_segments
+        self.max_deleted_fraction = max_deleted_fraction
+        self.embed_batch_size = max(1, embed_batch_size)
+
+    @property
+    def manifest_path(self) -> str:
+        return os.path.join(self.index_dir, MANIFEST_FILE)
+
+    def _empty_manifest(self) -> Dict[str, Any]:
+        return {
+            "version": MANIFEST_VERSION,
+            "embedding_model": self.embedding_model,
+            "chunks": {},
+            "segments": [],
+            "deleted": [],
+            "next_segment": 1,
+            "updated_at": None
+        }
+
+    def read_manifest(self) -> Dict[str, Any]:
+        """
+        Read the manifest, or an empty one if the index has none.
+
+        Returns:
+            The manifest dictionary
+        """
+        try:
+            with open(self.manifest_path, "r") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return self._empty_manifest()
+        if manifest.get("version") != MANIFEST_VERSION:
+            logger.warning(f"Unsupported manifest version in {self.index_dir}, starting a new index")
+            return self._empty_manifest()
+        return manifest
+
+    def _write_manifest(self, manifest: Dict[str, Any]) -> None:
+        """Write the manifest atomically, after the index files it refers to."""
+        manifest["updated_at"] = time.time()
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, self.manifest_path)
+
+    def _has_base(self) -> bool:
+        return os.path.exists(os.path.join(self.index_dir, "index.faiss"))
+
+    def _build_store(self, documents: List[Document], ids: List[str]) -> FAISS:
+        """Embed documents and build an in-memory FAISS store with the given IDs."""
+        texts = [doc.page_content for doc in documents]
+        vectors = self.embeddings.embed_documents(texts)
+        return FAISS.from_embeddings(
+            list(zip(texts, vectors)),
+            self.embeddings,
+            metadatas=[doc.metadata for doc in documents],
+            ids=ids
+        )
+
+    def _load_local(self, path: str) -> FAISS:
+        return FAISS.load_local(path, self.embeddings, allow_dangerous_deserialization=True)
+
+    def load(self) -> Optional[FAISS]:
+        """
+        Load the base index with all segments merged in and tombstones removed.
+
+        Returns:
+            The FAISS store, or None if the index is empty
+        """
+        if not self._has_base():
+            return None
+
+        manifest = self.read_manifest()
+        deleted = set(manifest["deleted"])
+
+        store = self._load_local(self.index_dir)
+        for name in manifest["segments"]:
+            store.merge_from(self._load_local(os.path.join(self.index_dir, SEGMENTS_DIR, name)))
+
+        if deleted:
+            present = [doc_id for doc_id in store.index_to_docstore_id.values() if doc_id in deleted]
+            if present:
+                store.delete(present)
+        return store
+
+    def compact(self) -> Optional[FAISS]:
+        """
+        Rewrite the base index with all segments and tombstones applied.
+
+        Returns:
+            The compacted store, or None if no chunks are left
+        """
+        manifest = self.read_manifest()
+        store = self.load()
+        start_time = time.time()
+
+        if store is None or not store.index_to_docstore_id:
+            # Nothing left to serve
+            for name in ("index.faiss", "index.pkl"):
+                path = os.path.join(self.index_dir, name)
+                if os.path.exists(path):
+                    os.remove(path)
+            store = None
+        else:
+            store.save_local(self.index_dir)
+
+        old_segments = manifest["segments"]
+        manifest["segments"] = []
+        manifest["deleted"] = []
+        self._write_manifest(manifest)
+
+        for name in old_segments:
+            shutil.rmtree(os.path.join(self.index_dir, SEGMENTS_DIR, name), ignore_errors=True)
+
+        logger.info(f"Compacted index {self.index_dir} ({len(old_segments)} segments) "
+                    f"in {time.time() - start_time:.2f}s")
+        return store
+
+    def reset(self) -> None:
+        """Remove the index so it can be rebuilt from scratch."""
+        for name in ("index.faiss", "index.pkl", MANIFEST_FILE):
+            path = os.path.join(self.index_dir, name)
+            if os.path.exists(path):
+                os.remove(path)
+        shutil.rmtree(os.path.join(self.index_dir, SEGMENTS_DIR), ignore_errors=True)
+
+    def rebuilds(self) -> bool:
+        """Whether the next update rebuilds the index, because it has no manifest or the embedding model changed."""
+        if self._has_base() and not os.path.exists(self.manifest_path):
+            return True
+        manifest = self.read_manifest()
+        return bool(self.embedding_model and manifest["chunks"]
+                    and manifest.get("embedding_model") != self.embedding_model)
+
+    def chunks_by_source(self) -> Dict[str, Set[str]]:
+        """
+        Get the IDs of the indexed chunks of each source.
+
+        Returns:
+            Sets of chunk IDs keyed by source
+        """
+        by_source: Dict[str, Set[str]] = {}
+        for doc_id, source in self.read_manifest()["chunks"].items():
+            by_source.setdefault(source, set()).add(doc_id)
+        return by_source
+
+    def indexed_sources(self) -> Set[str]:
+        """
+        Get the sources that have chunks in the index.
+
+        Returns:
+            The sources, or an empty set if the next update rebuilds the index
+        """
+        return set() if self.rebuilds() else set(self.chunks_by_source())
+
+    @staticmethod
+    def _stale(current: Dict[str, str], incoming: Dict[str, str], replace_all: bool,
+               kept_sources: Set[str]) -> List[str]:
+        """IDs of the current chunks that are no longer produced, given the source of each incoming chunk."""
+        if replace_all:
+            return [doc_id for doc_id, source in current.items()
+                    if doc_id not in incoming and source not in kept_sources]
+        sources = set(incoming.values())
+        return [doc_id for doc_id, source in current.items() if source in sources and doc_id not in incoming]
+
+    def update(self, documents: Iterable[Document], replace_all: bool = False,
+               unchanged_sources: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+        """
+        Bring the index in line with a set of chunks.
+
+        Only chunks that are not already in the index are embedded, a batch
+        at a time as documents is consumed, so it can be a stream. Chunks
+        that are no longer produced are deleted: with replace_all, every chunk
+        that is not in documents; otherwise only chunks from the sources that
+        appear in documents. Chunks of unchanged_sources are kept as they are.
+
+        Args:
+            documents: The current chunks
+            replace_all: Whether documents is the complete corpus
+            unchanged_sources: Sources known not to have changed, e.g. pages the
+                web server answered with 304 Not Modified, whose chunks are not in documents
+
+        Returns:
+            Counts of added, unchanged and deleted chunks, and whether the index was compacted
+        """
+        start_time = time.time()
+        os.makedirs(self.index_dir, exist_ok=True)
+        manifest = self.read_manifest()
+
+        if self._has_base() and not os.path.exists(self.manifest_path):
+            # Index written by a full rebuild: its chunk IDs are unknown
+            logger.warning(f"Index {self.index_dir} has no manifest, rebuilding it")
+            self.reset()
+        elif (self.embedding_model and manifest["chunks"]
+              and manifest.get("embedding_model") != self.embedding_model):
+            logger.warning(f"Embedding model changed from {manifest.get('embedding_model')} to "
+                           f"{self.embedding_model}, rebuilding index {self.index_dir}")
+            self.reset()
+            manifest = self._empty_manifest()
+        manifest["embedding_model"] = self.embedding_model or manifest.get("embedding_model")
+
+        current: Dict[str, str] = manifest["chunks"]
+        tombstones = set(manifest["deleted"])
+        # Source of every chunk produced, by ID; the chunks themselves are only kept until embedded
+        incoming: Dict[str, str] = {}
+        batch: List[Tuple[str, Document]] = []
+        added = 0
+        compacted = False
+
+        def append_batch() -> None:
+            """Embed the batch, write it as a segment and record it in the manifest."""
+            nonlocal added
+            ids = [doc_id for doc_id, _ in batch]
+            store = self._build_store([doc for _, doc in batch], ids)
+            if self._has_base():
+                name = f"{manifest['next_segment']:06d}"
+                store.save_local(os.path.join(self.index_dir, SEGMENTS_DIR, name))
+                manifest["segments"].append(name)
+                manifest["next_segment"] += 1
+            else:
+                store.save_local(self.index_dir)
+            for doc_id in ids:
+                current[doc_id] = incoming[doc_id]
+            added += len(ids)
+            batch.clear()
+            self._write_manifest(manifest)
+
+        for doc in documents:
+            doc_id = chunk_id(doc)
+            if doc_id in incoming:
+                # Deduplicate by fingerprint
+                continue
+            incoming[doc_id] = str(doc.metadata.get("source", ""))
+            if doc_id in current:
+                continue
+            if doc_id in tombstones:
+                # A tombstoned chunk came back; drop the old copy before re-adding it
+                if batch:
+                    append_batch()
+                self._write_manifest(manifest)
+                self.compact()
+                manifest = self.read_manifest()
+                current = manifest["chunks"]
+                tombstones = set()
+                compacted = True
+            batch.append((doc_id, doc))
+            if len(batch) >= self.embed_batch_size:
+                append_batch()
+        if batch:
+            append_batch()
+
+        kept_sources = set(unchanged_sources or ()) - set(incoming.values())
+        kept = sum(1 for source in current.values() if source in kept_sources)
+        stale = self._stale(current, incoming, replace_all, kept_sources)
+        for doc_id in stale:
+            del current[doc_id]
+        manifest["deleted"].extend(stale)
+
+        self._write_manifest(manifest)
+
+        if (len(manifest["segments"]) > self.max_segments
+                or len(manifest["deleted"]) > self.max_deleted_fraction * max(len(current), 1)):
+            self.compact()
+            compacted = True
+
+        stats = {
+            "added": added,
+            "unchanged": len(incoming) - added + kept,
+            "deleted": len(stale),
+            "total": len(current),
+            "compacted": compacted,
+            "duration_seconds": time.time() - start_time
+        }
+        logger.info(f"Updated index {self.index_dir}: {stats['added']} added, {stats['unchanged']} unchanged, "
+                    f"{stats['deleted']} deleted in {stats['duration_seconds']:.2f}s")
+        return stats
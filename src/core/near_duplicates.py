@@ -0,0 +1,345 @@
+"""
+Near-duplicate detection with SimHash.
+
+Pages and chunks that differ only in navigation, footers or timestamps are
+not worth indexing twice. A text is reduced to a 64-bit SimHash of its word
+shingles, and two texts whose fingerprints differ in at most max_distance
+bits are near-duplicates. For pages, digits can be folded before hashing,
+so that dates and counters don't count as differences.
+
+Lookups use the pigeonhole principle: fingerprints are split into
+max_distance + 1 blocks, and two fingerprints within max_distance bits of
+each other are equal on at least one block. Every block value is indexed,
+so a lookup only compares the fingerprints that share a block with it.
+
+Fingerprints can be kept in a SQLite file, so that the index persists
+across crawl and ingest runs.
+"""
+
+import os
+import re
+import sqlite3
+import hashlib
+import threading
+from collections import Counter
+from typing import Any, Callable, Collection, Dict, Iterable, List, Optional, Set
+
+import numpy as np
+
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+FINGERPRINT_BITS = 64
+DEFAULT_MAX_DISTANCE = 3
+DEFAULT_SHINGLE_SIZE = 4
+# Texts with fewer words than this are too short for similarity; only exact matches count
+DEFAULT_MIN_WORDS = 20
+# Fingerprints written to disk at once
+FLUSH_SIZE = 1000
+
+WORD_PATTERN = re.compile(r"\w+")
+DIGIT_PATTERN = re.compile(r"\d")
+
+
+def _words(text: str, fold_digits: bool) -> List[str]:
+    words = WORD_PATTERN.findall(text.lower())
+    if fold_digits:
+        words = [DIGIT_PATTERN.sub("0", word) for word in words]
+    return words
+
+
+def shingles(text: str, size: int = DEFAULT_SHINGLE_SIZE, fold_digits: bool = False) -> List[str]:
+    """
+    Split a text into overlapping word n-grams.
+
+    Args:
+        text: The text
+        size: Number of words per shingle
+        fold_digits: Whether to replace every digit with 0
+
+    Returns:
+        The shingles, or the whole text as one shingle if it has at most size words
+    """
+    words = _words(text, fold_digits)
+    if len(words) <= size:
+        return [" ".join(words)] if words else []
+    return [" ".join(words[i:i + size]) for i in range(len(words) - size + 1)]
+
+
+def simhash(text: str, shingle_size: int = DEFAULT_SHINGLE_SIZE, fold_digits: bool = False) -> int:
+    """
+    Compute the 64-bit SimHash of a text, weighting shingles by their count.
+
+    Args:
+        text: The text
+        shingle_size: Number of words per shingle
+        fold_digits: Whether to replace every digit with 0
+
+    Returns:
+        The fingerprint, 0 for a text without words
+    """
+    counts = Counter(shingles(text, shingle_size, fold_digits))
+    if not counts:
+        return 0
+    digests = b"".join(hashlib.blake2b(gram.encode("utf-8"), digest_size=8).digest() for gram in counts)
+    bits = np.unpackbits(np.frombuffer(digests, dtype=np.uint8).reshape(-1, 8), axis=1, bitorder="little")
+    weights = np.fromiter(counts.values(), dtype=np.int64, count=len(counts))
+    totals = weights @ (2 * bits.astype(np.int64) - 1)
+    return sum(1 << int(bit) for bit in np.flatnonzero(totals > 0))
+
+
+def hamming_distance(a: int, b: int) -> int:
+    """Number of bits in which two fingerprints differ."""
+    return bin(a ^ b).count("1")
+
+
+def _signed(fingerprint: int) -> int:
+    """Map a fingerprint to the signed 64-bit range of SQLite integers."""
+    return fingerprint - (1 << FINGERPRINT_BITS) if fingerprint >= 1 << (FINGERPRINT_BITS - 1) else fingerprint
+
+
+class NearDuplicateIndex:
+    """
+    SimHash fingerprints of the texts seen so far, keyed by page URL or chunk ID.
+
+    All methods are thread-safe.
+    """
+
+    def __init__(
+        self,
+        db_path: Optional[str] = None,
+        namespace: str = "default",
+        max_distance: int = DEFAULT_MAX_DISTANCE,
+        shingle_size: int = DEFAULT_SHINGLE_SIZE,
+        min_words: int = DEFAULT_MIN_WORDS,
+        fold_digits: bool = False
+    ):
+        """
+        Initialize the index.
+
+        Args:
+            db_path: Path of the SQLite file to persist fingerprints in, or None to keep them in memory
+            namespace: Name of the set of fingerprints in the file, e.g. "pages" or "chunks"
+            max_distance: Largest number of differing bits between near-duplicates
+            shingle_size: Number of words per shingle
+            min_words: Texts with fewer words only match identical fingerprints
+            fold_digits: Whether digits are ignored, so that texts differing only in dates match
+        """
+        self.db_path = db_path
+        self.namespace = namespace
+        self.max_distance = max_distance
+        self.shingle_size = shingle_size
+        self.min_words = min_words
+        self.fold_digits = fold_digits
+
+        # Bit offset and width of each block
+        blocks = max_distance + 1
+        widths = [FINGERPRINT_BITS // blocks + (1 if i < FINGERPRINT_BITS % blocks else 0) for i in range(blocks)]
+        self._blocks = [(sum(widths[:i]), width) for i, width in enumerate(widths)]
+
+        self._fingerprints: Dict[str, int] = {}
+        # Per block: block value -> keys of the fingerprints with that value
+        self._tables: List[Dict[int, Set[str]]] = [{} for _ in self._blocks]
+        self._pending: Dict[str, int] = {}
+        self._lock = threading.RLock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._loaded = False
+
+        # Metrics
+        self.checked = 0
+        self.duplicates = 0
+
+    def _block_values(self, fingerprint: int) -> List[int]:
+        return [(fingerprint >> offset) & ((1 << width) - 1) for offset, width in self._blocks]
+
+    def _connect(self) -> Optional[sqlite3.Connection]:
+        """Open the database, creating the schema on first use."""
+        if self.db_path is None:
+            return None
+        if self._conn is None:
+            directory = os.path.dirname(self.db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS fingerprints (
+                    namespace TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    fingerprint INTEGER NOT NULL,
+                    PRIMARY KEY (namespace, key)
+                )
+            """)
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def _load(self) -> None:
+        """Read the persisted fingerprints on first use."""
+        if self._loaded:
+            return
+        self._loaded = True
+        conn = self._connect()
+        if conn is None:
+            return
+        rows = conn.execute("SELECT key, fingerprint FROM fingerprints WHERE namespace = ?", (self.namespace,))
+        for key, fingerprint in rows:
+            self._insert(key, fingerprint % (1 << FINGERPRINT_BITS))
+
+    def _insert(self, key: str, fingerprint: int) -> None:
+        self._remove(key)
+        self._fingerprints[key] = fingerprint
+        for table, value in zip(self._tables, self._block_values(fingerprint)):
+            table.setdefault(value, set()).add(key)
+
+    def _remove(self, key: str) -> None:
+        fingerprint = self._fingerprints.pop(key, None)
+        if fingerprint is None:
+            return
+        for table, value in zip(self._tables, self._block_values(fingerprint)):
+            keys = table.get(value)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del table[value]
+
+    def fingerprint(self, text: str) -> int:
+        """Compute the fingerprint of a text with the settings of the index."""
+        return simhash(text, self.shingle_size, self.fold_digits)
+
+    def find(self, fingerprint: int, exclude: Optional[str] = None, max_distance: Optional[int] = None,
+             ignore: Collection[str] = ()) -> Optional[str]:
+        """
+        Find a near-duplicate of a fingerprint.
+
+        Args:
+            fingerprint: The fingerprint to look up
+            exclude: Key to ignore, usually that of the text being checked
+            max_distance: Largest distance to accept, at most the max_distance of the index
+            ignore: Further keys to ignore, e.g. of texts about to be replaced
+
+        Returns:
+            Key of a fingerprint within max_distance bits, or None if there is none
+        """
+        max_distance = self.max_distance if max_distance is None else min(max_distance, self.max_distance)
+        with self._lock:
+            self._load()
+            for table, value in zip(self._tables, self._block_values(fingerprint)):
+                for key in table.get(value, ()):
+                    if key != exclude and key not in ignore and hamming_distance(self._fingerprints[key], fingerprint) <= max_distance:
+                        return key
+        return None
+
+    def check(self, key: str, text: str, ignore: Collection[str] = ()) -> Optional[str]:
+        """
+        Check a text against the index, adding it if it is not a near-duplicate.
+
+        A text checked again under the same key, e.g. a page that is crawled
+        again, is never a duplicate of itself.
+
+        Args:
+            key: Key of the text, such as a page URL or a chunk ID
+            text: The text
+            ignore: Keys of texts that are not duplicated by it, such as the old versions
+                of chunks an index update replaces
+
+        Returns:
+            Key of the near-duplicate already in the index, or None if the text was added
+        """
+        words = len(_words(text, False))
+        if not words:
+            return None
+        fingerprint = self.fingerprint(text)
+        max_distance = 0 if words < self.min_words else None
+        with self._lock:
+            self._load()
+            self.checked += 1
+            if self._fingerprints.get(key) == fingerprint:
+                return None
+            duplicate = self.find(fingerprint, exclude=key, max_distance=max_distance, ignore=ignore)
+            if duplicate is not None:
+                self.duplicates += 1
+                return duplicate
+            self._insert(key, fingerprint)
+            self._pending[key] = fingerprint
+            if len(self._pending) >= FLUSH_SIZE:
+                self.flush()
+        return None
+
+    def flush(self) -> None:
+        """Write fingerprints added since the last flush to disk."""
+        with self._lock:
+            conn = self._connect()
+            if conn is not None and self._pending:
+                with conn:
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO fingerprints VALUES (?, ?, ?)",
+                        [(self.namespace, key, _signed(fp)) for key, fp in self._pending.items()]
+                    )
+            self._pending.clear()
+
+    def retain(self, keys: Iterable[str], scope: Optional[Callable[[str], bool]] = None) -> int:
+        """
+        Drop the fingerprints of all keys but the given ones, e.g. of chunks no longer indexed.
+
+        Args:
+            keys: Keys to keep
+            scope: Only keys for which this returns True are dropped, e.g. the
+                pages of the site just crawled; all keys if None
+
+        Returns:
+            Number of fingerprints dropped
+        """
+        keep = set(keys)
+        with self._lock:
+            self._load()
+            self.flush()
+            removed = [key for key in self._fingerprints
+                       if key not in keep and (scope is None or scope(key))]
+            for key in removed:
+                self._remove(key)
+            conn = self._connect()
+            if conn is not None and removed:
+                with conn:
+                    conn.executemany("DELETE FROM fingerprints WHERE namespace = ? AND key = ?",
+                                     [(self.namespace, key) for key in removed])
+        return len(removed)
+
+    def clear(self) -> int:
+        """
+        Remove all fingerprints of the namespace.
+
+        Returns:
+            Number of fingerprints removed
+        """
+        with self._lock:
+            self._load()
+            count = len(self._fingerprints)
+            self._fingerprints.clear()
+            self._pending.clear()
+            for table in self._tables:
+                table.clear()
+            conn = self._connect()
+            if conn is not None:
+                with conn:
+                    conn.execute("DELETE FROM fingerprints WHERE namespace = ?", (self.namespace,))
+            return count
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "fingerprints": len(self._fingerprints),
+                "max_distance": self.max_distance,
+                "db_path": self.db_path,
+                "checked": self.checked,
+                "duplicates": self.duplicates
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            self.flush()
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,494 @@
+"""
+Token-budgeted prompt building for the Kevin agent.
+
+Prompt sizes are measured in model tokens instead of characters. Retrieved
+documents are packed into the document budget most relevant first, and the
+conversation history into the history budget from the newest message
+backwards. Messages that no longer fit are rolled into a running summary,
+which is kept per conversation and only extended with the messages that
+dropped out since the previous request, so long conversations stop growing
+the prompt.
+"""
+
+import re
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from src.utils.logger import get_logger
+from src.utils.config import get_config
+from src.models.embedding_cache import normalize_text
+
+logger = get_logger(__name__)
+
+DEFAULT_ENCODING = "cl100k_base"
+APPROXIMATE_ENCODING = "approximate"
+
+# Token counts and truncations remembered per tokenizer
+TOKEN_CACHE_SIZE = 4096
+
+# Roughly how BPE tokenizers split text: words in pieces of up to 4
+# characters, each punctuation mark on its own, whitespace attached to the
+# following piece. Joining the pieces gives back the text.
+_APPROXIMATE_PIECES = re.compile(r"\s*(?:\w{1,4}|[^\w\s])|\s+$")
+_WORDS = re.compile(r"\w{3,}")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s")
+
+SYSTEM_INSTRUCTION = "You are a university information assistant. Answer questions based on the provided documents. If you can't find the answer in the documents, acknowledge that you don't know instead of making up information."
+SYSTEM_INSTRUCTION_WITH_HISTORY = "You are a university information assistant. Answer questions based on the provided documents and conversation history. If you can't find the answer in the documents or conversation history, acknowledge that you don't know instead of making up information."
+FINAL_INSTRUCTION = "\n\nPlease provide a helpful response to the query based on the relevant documents. If the documents don't contain relevant information, use your general knowledge but make it clear when you're doing so."
+FINAL_INSTRUCTION_WITH_HISTORY = "\n\nPlease provide a helpful response to the current query based on the conversation history and relevant documents. If you don't have enough information to answer, acknowledge that you don't know."
+
+DOCUMENTS_OMITTED = "(Additional documents omitted due to length constraints)"
+MESSAGES_OMITTED = "[Several messages omitted for brevity]"
+HISTORY_TRUNCATED = "[Earlier conversation truncated due to length limits]"
+SUMMARY_HEADER = "Summary of earlier conversation:"
+
+# Below this many tokens a document is dropped instead of truncated to fit
+MIN_DOCUMENT_TOKENS = 32
+
+
+class Tokenizer:
+    """
+    Counts and truncates text in model tokens.
+
+    Uses the tiktoken encoding when it can be loaded and an approximation of
+    BPE tokenization otherwise. Results are cached, since the same documents
+    and history messages are measured on every request.
+    """
+
+    def __init__(self, encoding_name: str = DEFAULT_ENCODING, cache_size: int = TOKEN_CACHE_SIZE):
+        """
+        Initialize the tokenizer.
+
+        Args:
+            encoding_name: tiktoken encoding name, or "approximate"
+            cache_size: Number of texts whose counts and truncations are cached
+        """
+        self.name = APPROXIMATE_ENCODING
+        self._encode = _APPROXIMATE_PIECES.findall
+        self._decode = "".join
+
+        if encoding_name != APPROXIMATE_ENCODING:
+            try:
+                import tiktoken
+                encoding = tiktoken.get_encoding(encoding_name)
+                self.name = encoding_name
+                self._encode = encoding.encode
+                self._decode = encoding.decode
+            except Exception as e:
+                logger.warning(f"Tokenizer {encoding_name} not available ({e}), using approximate token counts")
+
+        self.count = lru_cache(maxsize=cache_size)(self._count)
+        self.truncate = lru_cache(maxsize=cache_size)(self._truncate)
+
+    def _count(self, text: str) -> int:
+        """Number of tokens in a text."""
+        return len(self._encode(text)) if text else 0
+
+    def _truncate(self, text: str, max_tokens: int) -> str:
+        """
+        Cut a text to at most max_tokens tokens.
+
+        Args:
+            text: The text
+            max_tokens: Maximum number of tokens, including the "..." marking the cut
+
+        Returns:
+            The text, or its beginning followed by "..." if it was too long
+        """
+        if self.count(text) <= max_tokens:
+            return text
+        tokens = self._encode(text)
+        return self._decode(tokens[:max(max_tokens - self.count("..."), 0)]).rstrip() + "..."
+
+    def cache_info(self) -> Dict[str, int]:
+        info = self.count.cache_info()
+        return {"hits": info.hits, "misses": info.misses, "size": info.currsize}
+
+
+def _fingerprint(role: str, content: str) -> str:
+    return hashlib.sha1(f"{role}\0{content}".encode("utf-8")).hexdigest()
+
+
+class _Summary:
+    """Summary lines of the messages of a conversation up to a given message."""
+
+    __slots__ = ("last", "lines", "truncated")
+
+    def __init__(self):
+        self.last: Optional[str] = None
+        self.lines: List[str] = []
+        self.truncated = False
+
+
+class ConversationSummaries:
+    """
+    Running summaries of the messages that no longer fit in the prompt.
+
+    Each summarized message contributes its first sentence. A summary is
+    kept per conversation together with the fingerprint of the last message
+    it covers, so the next request only summarizes the messages that dropped
+    out of the prompt since then. The summary keeps the first line (the
+    opening of the conversation) and the newest lines that fit its budget.
+    """
+
+    def __init__(self, tokenizer: Tokenizer, summary_tokens: int = 200,
+                 line_tokens: int = 40, max_conversations: int = 1000):
+        """
+        Initialize the summaries.
+
+        Args:
+            tokenizer: Tokenizer used to measure the summary
+            summary_tokens: Maximum size of a summary
+            line_tokens: Maximum size of the line for one message
+            max_conversations: Number of conversations whose summary is kept
+        """
+        self.tokenizer = tokenizer
+        self.summary_tokens = summary_tokens
+        self.line_tokens = line_tokens
+        self.max_conversations = max_conversations
+        self._summaries: "OrderedDict[str, _Summary]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.updates = 0
+        self.rebuilds = 0
+
+    def _line(self, role: str, content: str) -> str:
+        first_sentence = _SENTENCE_END.split(normalize_text(content), 1)[0]
+        role_name = "User" if role == "user" else "Assistant"
+        return f"- {role_name}: {self.tokenizer.truncate(first_sentence, self.line_tokens)}"
+
+    def _extend(self, summary: _Summary, messages: Sequence[Tuple[str, str]]) -> None:
+        """Add lines for messages to a summary and drop the oldest lines that no longer fit."""
+        summary.lines.extend(self._line(role, content) for role, content in messages)
+
+        count = self.tokenizer.count
+        if sum(count(line) for line in summary.lines) <= self.summary_tokens:
+            return
+
+        # Keep the opening line and the newest lines that fit
+        budget = self.summary_tokens - count(summary.lines[0]) - count(HISTORY_TRUNCATED)
+        kept = []
+        for line in reversed(summary.lines[1:]):
+            budget -= count(line)
+            if budget < 0:
+                break
+            kept.append(line)
+        kept.reverse()
+        summary.truncated = summary.truncated or len(kept) < len(summary.lines) - 1
+        summary.lines = summary.lines[:1] + kept
+
+    def summarize(self, key: str, messages: Sequence[Tuple[str, str]]) -> List[str]:
+        """
+        Get the summary of the older messages of a conversation.
+
+        Args:
+            key: Conversation key
+            messages: (role, content) of the messages to summarize, oldest first
+
+        Returns:
+            Summary lines to place before the recent messages
+        """
+        if not messages:
+            return []
+        fingerprints = [_fingerprint(role, content) for role, content in messages]
+
+        with self._lock:
+            summary = self._summaries.get(key)
+            start = None
+            if summary is not None:
+                self._summaries.move_to_end(key)
+                # The history sent with a request is a window of the conversation,
+                # so look for the last summarized message instead of a fixed position
+                for i in range(len(fingerprints) - 1, -1, -1):
+                    if fingerprints[i] == summary.last:
+                        start = i + 1
+                        break
+
+            if start is None:
+                summary = _Summary()
+                self._extend(summary, messages)
+                self._summaries[key] = summary
+                self.rebuilds += 1
+                while len(self._summaries) > self.max_conversations:
+                    self._summaries.popitem(last=False)
+            elif start < len(messages):
+                self._extend(summary, messages[start:])
+                self.updates += 1
+            else:
+                self.hits += 1
+            summary.last = fingerprints[-1]
+
+            lines = [SUMMARY_HEADER] + summary.lines
+            if summary.truncated:
+                lines.insert(2, HISTORY_TRUNCATED)
+            return lines
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "conversations": len(self._summaries),
+                "hits": self.hits,
+                "updates": self.updates,
+                "rebuilds": self.rebuilds
+            }
+
+
+def _message_parts(message: Any) -> Optional[Tuple[str, str]]:
+    """(role, content) of a history message, or None if it has no content."""
+    if isinstance(message, dict):
+        role, content = message.get("role"), message.get("content")
+    else:
+        role, content = getattr(message, "type", None), getattr(message, "content", None)
+    if content is None:
+        return None
+    role = "user" if role in ("human", "user") else "assistant"
+    return role, content if isinstance(content, str) else str(content)
+
+
+class PromptBuilder:
+    """Builds the system prompt for a query within a token budget."""
+
+    def __init__(self, tokenizer: Optional[Tokenizer] = None, max_prompt_tokens: int = 2500,
+                 document_tokens: int = 1500, max_document_tokens: int = 250, max_documents: int = 10,
+                 history_tokens: int = 600, max_message_tokens: int = 150, summary_tokens: int = 200,
+                 summary_line_tokens: int = 40, max_summaries: int = 1000):
+        """
+        Initialize the prompt builder.
+
+        Args:
+            tokenizer: Tokenizer used to measure the prompt
+            max_prompt_tokens: Maximum size of the whole prompt, except the query itself
+            document_tokens: Maximum size of the documents section
+            max_document_tokens: Maximum size of one document
+            max_documents: Maximum number of documents
+            history_tokens: Maximum size of the recent messages
+            max_message_tokens: Maximum size of one recent message
+            summary_tokens: Maximum size of the summary of older messages
+            summary_line_tokens: Maximum size of the summary of one older message
+            max_summaries: Number of conversations whose summary is kept in memory
+        """
+        self.tokenizer = tokenizer or Tokenizer()
+        self.max_prompt_tokens = max_prompt_tokens
+        self.document_tokens = document_tokens
+        self.max_document_tokens = max_document_tokens
+        self.max_documents = max_documents
+        self.history_tokens = history_tokens
+        self.max_message_tokens = max_message_tokens
+        self.summaries = ConversationSummaries(self.tokenizer, summary_tokens, summary_line_tokens, max_summaries)
+
+        self._lock = threading.Lock()
+        self.prompts = 0
+        self.prompt_tokens = 0
+
+    def _rank_documents(self, query: str, documents: Sequence[Any]) -> List[Any]:
+        """
+        Order documents by how many of the query's words they contain.
+
+        Coverage is compared in steps of 10%, so retrieval order still decides
+        between documents that match the query about equally well.
+        """
+        query_words = set(_WORDS.findall(query.lower()))
+        if not query_words:
+            return list(documents)
+
+        def coverage(doc):
+            text = f"{doc.metadata.get('title', '')} {doc.page_content}".lower()
+            return round(len(query_words.intersection(_WORDS.findall(text))) / len(query_words), 1)
+
+        ranked = sorted(enumerate(documents), key=lambda item: (-coverage(item[1]), item[0]))
+        return [doc for _, doc in ranked]
+
+    def pack_documents(self, query: str, documents: Optional[Sequence[Any]], budget: int) -> List[str]:
+        """
+        Format the most relevant documents that fit in a token budget.
+
+        Args:
+            query: The query the documents were retrieved for
+            documents: Retrieved documents
+            budget: Tokens available for the documents
+
+        Returns:
+            Formatted documents
+        """
+        if not documents:
+            return []
+
+        count = self.tokenizer.count
+        formatted_docs = []
+        seen = set()
+        for doc in self._rank_documents(query, documents):
+            content = doc.page_content
+            content_key = normalize_text(content)
+            if content_key in seen:
+                continue
+            if len(formatted_docs) == self.max_documents:
+                formatted_docs.append(DOCUMENTS_OMITTED)
+                break
+
+            number = len(formatted_docs) + 1
+            header = (f"Document {number}: {doc.metadata.get('title', f'Document {number}')}\n"
+                      f"Source: {doc.metadata.get('source', 'Unknown')}\nContent: ")
+            content_budget = min(self.max_document_tokens, budget - count(header))
+            if content_budget < min(MIN_DOCUMENT_TOKENS, count(content)):
+                formatted_docs.append(DOCUMENTS_OMITTED)
+                break
+
+            formatted_doc = f"{header}{self.tokenizer.truncate(content, content_budget)}\n"
+            formatted_docs.append(formatted_doc)
+            seen.add(content_key)
+            budget -= count(formatted_doc)
+        return formatted_docs
+
+    def pack_history(self, history: Sequence[Any], conversation_id: Optional[str] = None) -> List[str]:
+        """
+        Format the newest messages that fit the history budget and summarize the rest.
+
+        Args:
+            history: Previous messages of the conversation, oldest first
+            conversation_id: Conversation the messages belong to, used to
+                reuse its running summary
+
+        Returns:
+            Lines of the conversation history section
+        """
+        recent = []
+        budget = self.history_tokens
+        split = 0
+        for i in range(len(history) - 1, -1, -1):
+            message = history[i]
+            if message == "...":
+                recent.append(MESSAGES_OMITTED)
+                continue
+            parts = _message_parts(message)
+            if parts is None:
+                continue
+            role, content = parts
+            role_name = "User" if role == "user" else "Assistant"
+            line = f"{role_name}: {self.tokenizer.truncate(content.strip(), self.max_message_tokens)}"
+            budget -= self.tokenizer.count(line)
+            if budget < 0:
+                split = i + 1
+                break
+            recent.append(line)
+        recent.reverse()
+
+        older = [parts for parts in map(_message_parts, (m for m in history[:split] if m != "..."))
+                 if parts is not None]
+        if not older:
+            return recent
+        key = conversation_id or _fingerprint(*older[0])
+        return self.summaries.summarize(key, older) + recent
+
+    def build(self, query: str, documents: Optional[Sequence[Any]], messages: Optional[Sequence[Any]] = None,
+              conversation_id: Optional[str] = None) -> str:
+        """
+        Build the prompt for a query.
+
+        Args:
+            query: The query to answer
+            documents: Retrieved documents
+            messages: Conversation messages, ending with the current query
+            conversation_id: Conversation the messages belong to
+
+        Returns:
+            The prompt
+        """
+        history = list(messages[:-1]) if messages and len(messages) > 1 else []
+        count = self.tokenizer.count
+
+        if history:
+            prompt_parts = [SYSTEM_INSTRUCTION_WITH_HISTORY]
+            final_instruction = FINAL_INSTRUCTION_WITH_HISTORY
+            conversation_parts = self.pack_history(history, conversation_id)
+        else:
+            prompt_parts = [SYSTEM_INSTRUCTION]
+            final_instruction = FINAL_INSTRUCTION
+            conversation_parts = []
+
+        # Whatever the history leaves of the prompt budget goes to the documents
+        used = (count(prompt_parts[0]) + count(final_instruction) + 10
+                + sum(count(part) + 1 for part in conversation_parts))
+        formatted_docs = self.pack_documents(query, documents, min(self.document_tokens, self.max_prompt_tokens - used))
+
+        if formatted_docs:
+            prompt_parts.append("\n\nRELEVANT DOCUMENTS:")
+            prompt_parts.extend(formatted_docs)
+        if conversation_parts:
+            prompt_parts.append("\n\nCONVERSATION HISTORY:")
+            prompt_parts.extend(conversation_parts)
+        prompt_parts.extend([
+            "\n\nCURRENT QUERY:",
+            f"User: {query}",
+            final_instruction
+        ])
+        prompt = "\n".join(prompt_parts)
+
+        with self._lock:
+            self.prompts += 1
+            self.prompt_tokens += count(prompt)
+        return prompt
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            prompts, prompt_tokens = self.prompts, self.prompt_tokens
+        return {
+            "tokenizer": self.tokenizer.name,
+            "prompts": prompts,
+            "avg_prompt_tokens": round(prompt_tokens / prompts, 1) if prompts else 0,
+            "token_cache": self.tokenizer.cache_info(),
+            "summaries": self.summaries.get_stats()
+        }
+
+
+_prompt_builder: Optional[PromptBuilder] = None
+_prompt_builder_lock = threading.Lock()
+
+
+def get_prompt_builder() -> PromptBuilder:
+    """
+    Get the shared prompt builder, configured from the prompt section of the config.
+
+    Returns:
+        The process-wide PromptBuilder
+    """
+    global _prompt_builder
+    if _prompt_builder is None:
+        with _prompt_builder_lock:
+            if _prompt_builder is None:
+                settings = get_config().section('prompt')
+                _prompt_builder = PromptBuilder(
+                    tokenizer=Tokenizer(settings.get('tokenizer', DEFAULT_ENCODING)),
+                    max_prompt_tokens=settings.get('max_prompt_tokens', 2500),
+                    document_tokens=settings.get('document_tokens', 1500),
+                    max_document_tokens=settings.get('max_document_tokens', 250),
+                    max_documents=settings.get('max_documents', 10),
+                    history_tokens=settings.get('history_tokens', 600),
+                    max_message_tokens=settings.get('max_message_tokens', 150),
+                    summary_tokens=settings.get('summary_tokens', 200),
+                    summary_line_tokens=settings.get('summary_line_tokens', 40),
+                    max_summaries=settings.get('max_summaries', 1000)
+                )
+    return _prompt_builder
+
+
+def count_tokens(text: str) -> int:
+    """Count the tokens of a text with the shared prompt builder's tokenizer."""
+    return get_prompt_builder().tokenizer.count(text)
+
+
+def get_prompt_stats() -> Dict[str, Any]:
+    """
+    Get prompt building statistics.
+
+    Returns:
+        Prompt sizes, tokenizer cache and running summary statistics, or
+        {"enabled": False} if no prompt has been built yet
+    """
+    if _prompt_builder is None:
+        return {"enabled": False}
+    return {"enabled": True, **_prompt_builder.get_stats()}
@@ -0,0 +1,325 @@
+"""
+Process-level vector store manager.
+
+The FAISS index and the embedding model are loaded once per process and
+shared by the agent, the RAG engine and the search API. The index directory
+is watched for changes; when the index files change on disk the new index is
+loaded by the first request that notices it and swapped in atomically. Other
+requests keep using the old index until the swap, so they never block on it.
+"""
+
+import os
+import json
+import time
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+from langchain_core.embeddings import Embeddings
+from langchain_community.vectorstores import FAISS
+
+from src.utils.logger import get_logger
+from src.utils.config import get_config
+from src.models.embeddings import SimpleEmbeddings, CachedHuggingFaceEmbeddings
+from src.core.incremental_index import IncrementalIndex, MANIFEST_FILE
+
+logger = get_logger(__name__)
+
+DEFAULT_INDEX_DIR = os.path.join("data", "vectordb")
+DEFAULT_EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+DEFAULT_CHECK_INTERVAL = 5.0  # Minimum seconds between index directory checks
+
+# Files written by FAISS.save_local
+INDEX_FILES = ("index.faiss", "index.pkl")
+
+# Embedding models keyed by model name, with their load times
+_embeddings: Dict[str, Embeddings] = {}
+_embedding_load_seconds: Dict[str, float] = {}
+_embeddings_lock = threading.Lock()
+
+
+def get_embeddings(model_name: str = DEFAULT_EMBEDDING_MODEL) -> Embeddings:
+    """
+    Get a shared embedding model, loading it on first use.
+
+    Falls back to SimpleEmbeddings when the HuggingFace model cannot be loaded.
+
+    Args:
+        model_name: Name of the sentence-transformer model
+
+    Returns:
+        The shared embeddings instance for that model
+    """
+    embeddings = _embeddings.get(model_name)
+    if embeddings is not None:
+        return embeddings
+
+    with _embeddings_lock:
+        embeddings = _embeddings.get(model_name)
+        if embeddings is not None:
+            return embeddings
+
+        start_time = time.time()
+        try:
+            if CachedHuggingFaceEmbeddings is None:
+                raise ImportError("HuggingFace embeddings are not installed")
+            embeddings = CachedHuggingFaceEmbeddings(model_name=model_name)
+            logger.info(f"Loaded HuggingFace embedding model {model_name}")
+        except Exception as e:
+            logger.warning(f"Could not load HuggingFace embeddings: {e}. Falling back to SimpleEmbeddings.")
+            embeddings = SimpleEmbeddings()
+
+        _embedding_load_seconds[model_name] = time.time() - start_time
+        _embeddings[model_name] = embeddings
+        return embeddings
+
+
+class VectorStoreManager:
+    """
+    Owns the shared FAISS store for one index directory.
+
+    The current store, its file fingerprint and its generation are kept in a
+    single tuple so that a reload replaces all three at once.
+    """
+
+    def __init__(
+        self,
+        index_dir: str = DEFAULT_INDEX_DIR,
+        embedding_model: str = DEFAULT_EMBEDDING_MODEL,
+        check_interval: float = DEFAULT_CHECK_INTERVAL
+    ):
+        """
+        Initialize the vector store manager.
+
+        Args:
+            index_dir: Directory containing index.faiss and index.pkl
+            embedding_model: Embedding model used if metadata.json does not name one
+            check_interval: Minimum seconds between index directory checks
+        """
+        self.index_dir = index_dir
+        self.embedding_model = embedding_model
+        self.check_interval = check_interval
+
+        # (store, fingerprint, generation)
+        self._current: Tuple[Optional[FAISS], Optional[tuple], int] = (None, None, 0)
+        self._load_lock = threading.Lock()
+        self._next_check = 0.0
+
+        # Metrics
+        self.loads = 0
+        self.errors = 0
+        self.cold_load_seconds: Optional[float] = None
+        self.last_load_seconds: Optional[float] = None
+        self.last_loaded_at: Optional[float] = None
+
+    def _fingerprint(self) -> Optional[tuple]:
+        """Get the modification times and sizes of the index files, or None if missing."""
+        fingerprint = []
+        for name in INDEX_FILES:
+            try:
+                stat = os.stat(os.path.join(self.index_dir, name))
+            except OSError:
+                return None
+            fingerprint.append((stat.st_mtime_ns, stat.st_size))
+        
+        # Incremental updates only rewrite the manifest, not the base index
+        try:
+            stat = os.stat(os.path.join(self.index_dir, MANIFEST_FILE))
+            fingerprint.append((stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            pass
+        return tuple(fingerprint)
+
+    def _resolve_embedding_model(self) -> str:
+        """Get the embedding model recorded with the index at training time."""
+        metadata_path = os.path.join(self.index_dir, "metadata.json")
+        try:
+            with open(metadata_path, "r") as f:
+                return json.load(f).get("embedding_model", self.embedding_model)
+        except (OSError, ValueError):
+            return self.embedding_model
+
+    def _load(self, fingerprint: tuple) -> None:
+        """Load the index from disk and swap it in."""
+        start_time = time.time()
+        embeddings = get_embeddings(self._resolve_embedding_model())
+        if os.path.exists(os.path.join(self.index_dir, MANIFEST_FILE)):
+            # Merge appended segments and drop deleted chunks
+            store = IncrementalIndex(self.index_dir, embeddings).load()
+        else:
+            store = FAISS.load_local(
+                self.index_dir,
+                embeddings,
+                allow_dangerous_deserialization=True  # We trust our own saved files
+            )
+        duration = time.time() - start_time
+
+        generation = self._current[2] + 1
+        self._current = (store, fingerprint, generation)
+
+        self.loads += 1
+        self.last_load_seconds = duration
+        self.last_loaded_at = time.time()
+        if self.cold_load_seconds is None:
+            self.cold_load_seconds = duration
+        logger.info(f"Loaded FAISS index from {self.index_dir} in {duration:.2f}s (generation {generation})")
+
+    def _refresh(self, force: bool = False, blocking: bool = True) -> None:
+        """Reload the index if its files changed since the last load."""
+        if not self._load_lock.acquire(blocking=blocking):
+            # Another thread is already checking or loading the index
+            return
+        try:
+            fingerprint = self._fingerprint()
+            store, current_fingerprint, generation = self._current
+
+            if fingerprint is None:
+                if store is None:
+                    logger.warning(f"No FAISS index found in {self.index_dir}")
+            elif force or fingerprint != current_fingerprint:
+                try:
+                    self._load(fingerprint)
+                except Exception as e:
+                    # Keep serving the previous index
+                    self.errors += 1
+                    logger.error(f"Error loading FAISS index from {self.index_dir}: {e}")
+
+            self._next_check = time.monotonic() + self.check_interval
+        finally:
+            self._load_lock.release()
+
+    def get(self) -> Optional[FAISS]:
+        """
+        Get the current vector store.
+
+        The index directory is checked at most once per check interval.
+        Only the first load blocks; later reloads happen while other callers
+        keep using the current store.
+
+        Returns:
+            The shared FAISS store, or None if no index exists
+        """
+        return self.snapshot()[0]
+
+    def snapshot(self) -> Tuple[Optional[FAISS], int]:
+        """
+        Get the current vector store together with its generation.
+
+        Both come from the same read, so results from the store can be
+        cached under the generation without a reload slipping in between.
+
+        Returns:
+            Tuple of the shared FAISS store (or None) and its generation
+        """
+        if time.monotonic() >= self._next_check:
+            self._refresh(blocking=self._current[0] is None)
+        store, _, generation = self._current
+        return store, generation
+
+    def reload(self) -> Optional[FAISS]:
+        """
+        Force the index to be re-read from disk.
+
+        Returns:
+            The new FAISS store, or None if no index exists
+        """
+        self._refresh(force=True)
+        return self._current[0]
+
+    @property
+    def generation(self) -> int:
+        """Number of times an index has been loaded; changes on every swap."""
+        return self._current[2]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get load statistics for this index.
+
+        Returns:
+            Dictionary with load counts and timings
+        """
+        store, _, generation = self._current
+        return {
+            "index_dir": self.index_dir,
+            "loaded": store is not None,
+            "generation": generation,
+            "loads": self.loads,
+            "errors": self.errors,
+            "cold_load_seconds": self.cold_load_seconds,
+            "last_load_seconds": self.last_load_seconds,
+            "last_loaded_at": self.last_loaded_at,
+            "documents": len(store.index_to_docstore_id) if store is not None else 0
+        }
+
+
+# Managers keyed by absolute index directory
+_managers: Dict[str, VectorStoreManager] = {}
+_managers_lock = threading.Lock()
+
+
+def _default_index_dir() -> str:
+    """Get the index directory from the vector_db configuration."""
+    return get_config().section('vector_db').get('persist_directory', DEFAULT_INDEX_DIR)
+
+
+def get_vectorstore_manager(index_dir: Optional[str] = None) -> VectorStoreManager:
+    """
+    Get the shared manager for an index directory.
+
+    Args:
+        index_dir: Index directory (defaults to vector_db.persist_directory)
+
+    Returns:
+        The process-wide VectorStoreManager for that directory
+    """
+    index_dir = index_dir or _default_index_dir()
+    key = os.path.abspath(index_dir)
+    manager = _managers.get(key)
+    if manager is None:
+        with _managers_lock:
+            manager = _managers.get(key)
+            if manager is None:
+                embedding_model = get_config().section('vector_db').get('embedding_model', DEFAULT_EMBEDDING_MODEL)
+                manager = VectorStoreManager(index_dir, embedding_model=embedding_model)
+                _managers[key] = manager
+    return manager
+
+
+def get_vectorstore(index_dir: Optional[str] = None) -> Optional[FAISS]:
+    """
+    Get the shared FAISS store.
+
+    Args:
+        index_dir: Index directory (defaults to vector_db.persist_directory)
+
+    Returns:
+        The shared FAISS store, or None if no index exists
+    """
+    return get_vectorstore_manager(index_dir).get()
+
+
+def warm_up_vectorstore(index_dir: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Load the index and embedding model ahead of the first query.
+
+    Args:
+        index_dir: Index directory (defaults to vector_db.persist_directory)
+
+    Returns:
+        Load statistics, including the cold-load time
+    """
+    manager = get_vectorstore_manager(index_dir)
+    manager.get()
+    return manager.get_stats()
+
+
+def get_vectorstore_stats() -> Dict[str, Any]:
+    """
+    Get load statistics for all indexes and embedding models.
+
+    Returns:
+        Dictionary with per-index statistics and embedding model load times
+    """
+    return {
+        "indexes": {manager.index_dir: manager.get_stats() for manager in list(_managers.values())},
+        "embedding_load_seconds": dict(_embedding_load_seconds)
+    }
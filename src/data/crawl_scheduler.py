@@ -0,0 +1,154 @@
+"""
+Shared connection budget for crawling many sites at once.
+
+Every request takes a slot of the scheduler for its host. At most
+max_connections slots are held at once in total, and at most
+max_connections_per_host per host. Requests that can't get a slot wait in
+a queue per host, and freed slots go to the waiting hosts in turn, so a
+site with many queued URLs doesn't starve the others. Requests to the same
+host are also spaced by per_host_delay.
+
+The scheduler belongs to one event loop and is not thread-safe.
+"""
+
+import time
+import asyncio
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Deque, Dict
+
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_MAX_CONNECTIONS = 16
+DEFAULT_MAX_CONNECTIONS_PER_HOST = 4
+
+
+class CrawlScheduler:
+    """Global and per-host connection limits with round-robin between hosts."""
+
+    def __init__(
+        self,
+        max_connections: int = DEFAULT_MAX_CONNECTIONS,
+        max_connections_per_host: int = DEFAULT_MAX_CONNECTIONS_PER_HOST,
+        per_host_delay: float = 0.0
+    ):
+        """
+        Initialize the scheduler.
+
+        Args:
+            max_connections: Requests in flight at once, over all hosts
+            max_connections_per_host: Requests in flight at once to one host
+            per_host_delay: Seconds between the starts of two requests to the same host
+        """
+        self.max_connections = max(1, int(max_connections))
+        self.max_connections_per_host = max(1, int(max_connections_per_host))
+        self.per_host_delay = float(per_host_delay)
+
+        self._active = 0
+        self._active_per_host: Dict[str, int] = {}
+        self._waiters: Dict[str, Deque[asyncio.Future]] = {}
+        # Hosts with waiters, in the order they get their next turn
+        self._turns: Deque[str] = deque()
+        self._next_request: Dict[str, float] = {}
+
+        # Metrics
+        self.granted = 0
+        self.queued = 0
+        self.peak_active = 0
+
+    def _can_grant(self, host: str) -> bool:
+        return (self._active < self.max_connections
+                and self._active_per_host.get(host, 0) < self.max_connections_per_host)
+
+    def _grant(self, host: str) -> None:
+        self._active += 1
+        self._active_per_host[host] = self._active_per_host.get(host, 0) + 1
+        self.granted += 1
+        self.peak_active = max(self.peak_active, self._active)
+
+    def _wake_waiters(self) -> None:
+        """Hand free slots to waiting hosts, one request per host per turn."""
+        skipped = 0
+        while self._turns and self._active < self.max_connections and skipped < len(self._turns):
+            host = self._turns.popleft()
+            waiters = self._waiters[host]
+            while waiters and waiters[0].done():
+                waiters.popleft()
+            if not waiters:
+                del self._waiters[host]
+                continue
+            if not self._can_grant(host):
+                # Host at its own limit: keep its place for the next freed slot
+                self._turns.append(host)
+                skipped += 1
+                continue
+            self._grant(host)
+            waiters.popleft().set_result(None)
+            skipped = 0
+            if waiters:
+                self._turns.append(host)
+            else:
+                del self._waiters[host]
+
+    async def acquire(self, host: str) -> None:
+        """Wait for a slot for a request to a host."""
+        if host not in self._waiters and self._can_grant(host):
+            self._grant(host)
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        if host not in self._waiters:
+            self._waiters[host] = deque()
+            self._turns.append(host)
+        self._waiters[host].append(future)
+        self.queued += 1
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Granted just as the request was cancelled
+                self.release(host)
+            else:
+                self._wake_waiters()
+            raise
+
+    def release(self, host: str) -> None:
+        """Free the slot of a finished request."""
+        self._active -= 1
+        self._active_per_host[host] -= 1
+        if not self._active_per_host[host]:
+            del self._active_per_host[host]
+        self._wake_waiters()
+
+    async def _wait_turn(self, host: str) -> None:
+        """Space the requests to a host by per_host_delay."""
+        if self.per_host_delay <= 0:
+            return
+        now = time.monotonic()
+        start = max(now, self._next_request.get(host, now))
+        self._next_request[host] = start + self.per_host_delay
+        if start > now:
+            await asyncio.sleep(start - now)
+
+    @asynccontextmanager
+    async def slot(self, host: str) -> AsyncIterator[None]:
+        """Hold a slot for a request to a host for the duration of the block."""
+        await self.acquire(host)
+        try:
+            await self._wait_turn(host)
+            yield
+        finally:
+            self.release(host)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "max_connections": self.max_connections,
+            "max_connections_per_host": self.max_connections_per_host,
+            "active": self._active,
+            "waiting": sum(len(waiters) for waiters in self._waiters.values()),
+            "granted": self.granted,
+            "queued": self.queued,
+            "peak_active": self.peak_active
+        }
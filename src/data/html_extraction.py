@@ -0,0 +1,276 @@
+"""
+Single-pass HTML extraction for crawled pages.
+
+A page is parsed once, and its links, title, cleaned text, sections and
+structured data are all read from the same tree. lxml is used as the
+parser backend when it is installed (pip install lxml), with html.parser
+as the fallback.
+
+Parsing is CPU-bound, so the asynchronous crawler runs extract_page in a
+shared process pool, sized by extraction_workers in the scraping section
+of the config. With extraction_workers set to 0, or where processes can't
+be started, pages are parsed in threads instead.
+"""
+
+import os
+import re
+import asyncio
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, List, Optional
+from urllib.parse import urljoin
+
+from bs4 import BeautifulSoup
+
+from src.utils.logger import get_logger
+from src.utils.config import get_config
+
+try:
+    import lxml  # noqa: F401
+    DEFAULT_PARSER = 'lxml'
+except ImportError:
+    DEFAULT_PARSER = 'html.parser'
+
+logger = get_logger(__name__)
+
+DEFAULT_EXTRACTION_WORKERS = min(4, os.cpu_count() or 1)
+
+# Patterns for specific information extraction
+PATTERNS = {
+    'email': re.compile(r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}'),
+    'phone': re.compile(r'\(?\d{3}\)?[-.\s]?\d{3}[-.\s]?\d{4}'),
+    'tuition_pattern': re.compile(r'\$\s?[\d,]+(\.\d{2})?|\d{1,3}(,\d{3})*(\.\d{2})?\s(dollars|CAD|CDN)'),
+    'deadline_pattern': re.compile(r'(January|February|March|April|May|June|July|August|September|October|November|December)\s+\d{1,2}(st|nd|rd|th)?,\s+\d{4}|\d{1,2}(st|nd|rd|th)?\s+(January|February|March|April|May|June|July|August|September|October|November|December),\s+\d{4}')
+}
+
+
+def parse_html(html: str, parser: Optional[str] = None) -> BeautifulSoup:
+    """
+    Parse an HTML page.
+
+    Args:
+        html: The page HTML
+        parser: BeautifulSoup parser backend, by default lxml if it is installed
+
+    Returns:
+        The parsed page
+    """
+    return BeautifulSoup(html, parser or DEFAULT_PARSER)
+
+
+def extract_links(soup: BeautifulSoup, base_url: str) -> List[str]:
+    """Get the absolute URLs of the links of a page."""
+    links = []
+    for a_tag in soup.find_all('a', href=True):
+        href = a_tag['href']
+        if href.startswith('javascript:') or href.startswith('#'):
+            continue
+        links.append(urljoin(base_url, href))
+    return links
+
+
+def extract_title(soup: BeautifulSoup) -> str:
+    """Get the title of a page."""
+    title = soup.title.string if soup.title else ""
+    return (title or "").strip()
+
+
+def extract_structured_data(soup: BeautifulSoup, html: str) -> Dict[str, Any]:
+    """
+    Get contact details, tuition and deadline passages, tables and lists of a page.
+
+    Args:
+        soup: The parsed page
+        html: The page HTML
+
+    Returns:
+        Dictionary with the kinds of data found on the page
+    """
+    structured_data = {}
+
+    emails = set(PATTERNS['email'].findall(html))
+    if emails:
+        structured_data['emails'] = list(emails)
+
+    phones = set(PATTERNS['phone'].findall(html))
+    if phones:
+        structured_data['phones'] = list(phones)
+
+    for key, pattern in (('tuition_info', 'tuition_pattern'), ('deadline_info', 'deadline_pattern')):
+        text = ""
+        for element in soup.find_all(string=PATTERNS[pattern]):
+            if element.parent:
+                text += element.parent.get_text(strip=True) + "\n"
+        if text:
+            structured_data[key] = text
+
+    # Tables often contain important structured information
+    tables = []
+    for table in soup.find_all('table'):
+        headers = [th.get_text(strip=True) for th in table.find_all('th')]
+        rows = []
+        for tr in table.find_all('tr'):
+            row = [td.get_text(strip=True) for td in tr.find_all(['td', 'th'])]
+            if row:
+                rows.append(row)
+        if rows:
+            tables.append({'headers': headers, 'rows': rows})
+    if tables:
+        structured_data['tables'] = tables
+
+    # Lists often contain program requirements or tuition breakdowns
+    lists = []
+    for list_element in soup.find_all(['ul', 'ol']):
+        # Avoid navigation menus
+        if list_element.find_parent(['nav', 'header', 'footer']):
+            continue
+        items = [text for text in (li.get_text(strip=True) for li in list_element.find_all('li')) if len(text) > 10]
+        if len(items) > 1:
+            lists.append(items)
+    if lists:
+        structured_data['lists'] = lists
+
+    return structured_data
+
+
+def extract_sections(soup: BeautifulSoup) -> Dict[str, str]:
+    """
+    Get the text of a page by section, a section starting at each heading.
+
+    Args:
+        soup: The parsed page
+
+    Returns:
+        Dictionary of section heading to section text, "main" for text before the first heading
+    """
+    sections = {"main": ""}
+    current_section = "main"
+    for element in soup.find_all(['h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'p', 'div', 'section']):
+        # Skip hidden elements
+        style = element.get('style', '')
+        if 'display: none' in style or 'visibility: hidden' in style:
+            continue
+
+        content = element.get_text(strip=True)
+        if element.name.startswith('h'):
+            if len(content) > 3:  # Skip very short headings
+                current_section = content
+                sections[current_section] = ""
+        elif len(content) > 20:
+            sections[current_section] += content + " "
+
+    return {name: text.strip() for name, text in sections.items() if text.strip()}
+
+
+def extract_text(soup: BeautifulSoup) -> str:
+    """
+    Get the readable text of a page.
+
+    Script and style elements are removed from the tree, so this must be
+    the last extraction made from it.
+    """
+    for element in soup(['script', 'style']):
+        element.extract()
+
+    # Remove excessive newlines and whitespace
+    lines = (line.strip() for line in soup.get_text().splitlines())
+    chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
+    return '\n'.join(chunk for chunk in chunks if chunk)
+
+
+def extract_page(html: str, url: str, structured: bool = True, parser: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Extract everything the scraper uses from a page, parsing it once.
+
+    Args:
+        html: The page HTML
+        url: URL of the page, to resolve relative links
+        structured: Whether to extract sections and structured data as well
+        parser: BeautifulSoup parser backend, by default lxml if it is installed
+
+    Returns:
+        Dictionary with the links, title and text of the page, and its sections and
+        structured_data if structured is set
+    """
+    page = {'links': [], 'title': '', 'text': ''}
+    if structured:
+        page.update(sections={}, structured_data={})
+    if not html:
+        return page
+
+    try:
+        soup = parse_html(html, parser)
+        page['links'] = extract_links(soup, url)
+        page['title'] = extract_title(soup)
+        if structured:
+            page['structured_data'] = extract_structured_data(soup, html)
+            page['sections'] = extract_sections(soup)
+        page['text'] = extract_text(soup)
+    except Exception as e:
+        logger.error(f"Error extracting content from {url}: {e}")
+    return page
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_disabled = False
+_pool_lock = threading.Lock()
+
+
+def get_extraction_pool() -> Optional[ProcessPoolExecutor]:
+    """
+    Get the shared process pool for page extraction, creating it on first use.
+
+    Returns:
+        The process pool, or None if pages are to be parsed in threads
+    """
+    global _pool, _pool_disabled
+    if _pool is None and not _pool_disabled:
+        with _pool_lock:
+            if _pool is None and not _pool_disabled:
+                workers = get_config().section('scraping').get('extraction_workers', DEFAULT_EXTRACTION_WORKERS)
+                if not workers:
+                    _pool_disabled = True
+                else:
+                    try:
+                        _pool = ProcessPoolExecutor(max_workers=int(workers))
+                    except (OSError, NotImplementedError) as e:
+                        logger.warning(f"Cannot start extraction processes, parsing in threads: {e}")
+                        _pool_disabled = True
+    return _pool
+
+
+def shutdown_extraction_pool() -> None:
+    """Stop the extraction processes; a new pool is created on next use."""
+    global _pool, _pool_disabled
+    with _pool_lock:
+        pool, _pool, _pool_disabled = _pool, None, False
+    if pool is not None:
+        pool.shutdown(wait=True)
+
+
+async def extract_page_async(html: str, url: str, structured: bool = True,
+                             parser: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Run extract_page in the extraction process pool without blocking the event loop.
+
+    Args:
+        html: The page HTML
+        url: URL of the page, to resolve relative links
+        structured: Whether to extract sections and structured data as well
+        parser: BeautifulSoup parser backend, by default lxml if it is installed
+
+    Returns:
+        The result of extract_page
+    """
+    global _pool_disabled
+    loop = asyncio.get_running_loop()
+    pool = get_extraction_pool()
+    if pool is not None:
+        try:
+            return await loop.run_in_executor(pool, extract_page, html, url, structured, parser)
+        except (BrokenProcessPool, OSError) as e:
+            logger.warning(f"Extraction process pool failed, parsing in threads: {e}")
+            shutdown_extraction_pool()
+            _pool_disabled = True
+    return await loop.run_in_executor(None, extract_page, html, url, structured, parser)
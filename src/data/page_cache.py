@@ -0,0 +1,226 @@
+"""
+Revalidating cache of crawled pages.
+
+For every page fetched, the cache stores the HTTP validators (ETag and
+Last-Modified) and the title and links of the page. Recrawls send
+conditional requests with the stored validators. A page answered with
+304 Not Modified is reported as unchanged: the crawler follows its stored
+links without extracting it, and the spider leaves it out of the documents
+to chunk and embed and lists it for the incremental indexer instead.
+
+A fingerprint of the extracted text is stored as well, to report how many
+refetched pages actually changed.
+
+Entries never expire; freshness is decided by the web server. The cache is
+a SQLite file, shared by crawl runs and safe to use from several threads.
+
+A 304 only helps if the page's content reached the search index, so the
+cache can be limited to revalidating a given set of URLs, such as the
+sources in the index manifest. Other pages are fetched in full, e.g. after
+a failed ingest or after the index was rebuilt. Without such a set every
+cached page is revalidated, which saves the most bandwidth but is only
+safe when the index is known to hold every page cached.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_DB_PATH = os.path.join("data", "cache", "pages.sqlite")
+
+
+def content_fingerprint(text: str) -> str:
+    """Fingerprint the extracted text of a page."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class PageCache:
+    """Validators, fingerprints and links of crawled pages, keyed by URL."""
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH, revalidate_urls: Optional[Iterable[str]] = None):
+        """
+        Initialize the cache.
+
+        Args:
+            db_path: Path of the SQLite file
+            revalidate_urls: URLs that may be revalidated with conditional requests,
+                or None for all cached pages
+        """
+        self.db_path = db_path
+        self.revalidate_urls: Optional[Set[str]] = set(revalidate_urls) if revalidate_urls is not None else None
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+        # Metrics
+        self.not_modified = 0
+        self.unchanged = 0
+        self.changed = 0
+        self.new = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open the database, creating the schema on first use."""
+        if self._conn is None:
+            directory = os.path.dirname(self.db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS pages (
+                    url TEXT PRIMARY KEY,
+                    etag TEXT,
+                    last_modified TEXT,
+                    fingerprint TEXT NOT NULL,
+                    title TEXT,
+                    links TEXT NOT NULL,
+                    fetched_at REAL NOT NULL,
+                    validated_at REAL NOT NULL
+                )
+            """)
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def get(self, url: str) -> Optional[Dict[str, Any]]:
+        """
+        Get the cache entry of a page.
+
+        Args:
+            url: The page URL
+
+        Returns:
+            Dictionary with etag, last_modified, fingerprint, title, links, fetched_at
+            and validated_at, or None if the page was never cached
+        """
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT etag, last_modified, fingerprint, title, links, fetched_at, validated_at "
+                "FROM pages WHERE url = ?", (url,)
+            ).fetchone()
+        if row is None:
+            return None
+        etag, last_modified, fingerprint, title, links, fetched_at, validated_at = row
+        return {
+            "etag": etag,
+            "last_modified": last_modified,
+            "fingerprint": fingerprint,
+            "title": title or "",
+            "links": json.loads(links),
+            "fetched_at": fetched_at,
+            "validated_at": validated_at
+        }
+
+    def conditional_headers(self, url: str) -> Dict[str, str]:
+        """
+        Get the headers of a conditional request for a page.
+
+        Args:
+            url: The page URL
+
+        Returns:
+            If-None-Match and If-Modified-Since headers for the stored validators, if any
+        """
+        if self.revalidate_urls is not None and url not in self.revalidate_urls:
+            return {}
+        entry = self.get(url)
+        headers = {}
+        if entry is not None:
+            if entry["etag"]:
+                headers["If-None-Match"] = entry["etag"]
+            if entry["last_modified"]:
+                headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def revalidated(self, url: str) -> Optional[Dict[str, Any]]:
+        """
+        Record a 304 Not Modified answer for a page.
+
+        Args:
+            url: The page URL
+
+        Returns:
+            The cache entry of the page, or None if it is not cached
+        """
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                updated = conn.execute(
+                    "UPDATE pages SET validated_at = ? WHERE url = ?", (time.time(), url)
+                ).rowcount
+            if updated:
+                self.not_modified += 1
+        return self.get(url) if updated else None
+
+    def store(self, url: str, headers: Dict[str, str], text: str, title: str, links: List[str]) -> bool:
+        """
+        Record a fetched page.
+
+        Args:
+            url: The page URL
+            headers: Response headers, for the ETag and Last-Modified validators
+            text: Extracted text of the page
+            title: Title of the page
+            links: Links of the page
+
+        Returns:
+            True if the text of the page is the same as when it was last stored
+        """
+        headers = {name.lower(): value for name, value in (headers or {}).items()}
+        fingerprint = content_fingerprint(text)
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute("SELECT fingerprint FROM pages WHERE url = ?", (url,)).fetchone()
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (url, headers.get("etag"), headers.get("last-modified"), fingerprint, title,
+                     json.dumps(links), now, now)
+                )
+            if row is None:
+                self.new += 1
+                return False
+            if row[0] == fingerprint:
+                self.unchanged += 1
+                return True
+            self.changed += 1
+            return False
+
+    def clear(self) -> int:
+        """
+        Remove all cached pages.
+
+        Returns:
+            Number of pages removed
+        """
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                return conn.execute("DELETE FROM pages").rowcount
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            pages = self._connect().execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+            return {
+                "pages": pages,
+                "db_path": self.db_path,
+                "not_modified": self.not_modified,
+                "unchanged": self.unchanged,
+                "changed": self.changed,
+                "new": self.new
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -12,14 +12,16 @@
 import hashlib
 import requests
 import uuid
+import queue
 import threading
 import asyncio
 import aiohttp
 import aiofiles
-from typing import List, Dict, Set, Any, Optional, Tuple, Callable, Union
+from typing import List, Dict, Set, Any, Optional, Tuple, Callable, Union, AsyncIterator, Iterable, Iterator
 from bs4 import BeautifulSoup
 from langchain.schema import Document
-from urllib.parse import urljoin, urlparse, urlunparse, parse_qs, urlencode
+from urllib.parse import urljoin, urlparse, urlunparse, urldefrag, parse_qs, urlencode
+from urllib.robotparser import RobotFileParser
 from concurrent.futures import ThreadPoolExecutor
 from tqdm import tqdm
 from datetime import datetime
@@ -36,6 +38,14 @@
 
 # Import project modules
 from src.utils.logger import get_logger, scraper_logger
+from src.utils.resilience import backoff_delay
+from src.data.page_cache import PageCache
+from src.data.crawl_scheduler import CrawlScheduler
+from src.core.near_duplicates import NearDuplicateIndex
+from src.data.html_extraction import (
+    PATTERNS, parse_html, extract_page, extract_page_async, extract_links, extract_title, extract_text,
+    extract_structured_data, extract_sections
+)
 
 # Set up logger
 logger = get_logger(__name__)
@@ -59,6 +69,8 @@ def __init__(self, max_depth=3, max_retries=3, timeout=30,
             self.exclude_patterns = config.get('exclude_patterns', [])
             self.enable_javascript = config.get('enable_javascript', False)
             self.quiet = config.get('quiet', False)
+            self.html_parser = config.get('html_parser')
+            self.extract_structured_data = config.get('extract_structured_data', True)
         else:
             # Handle the case where individual parameters are passed
             self.max_depth = max_depth
@@ -69,6 +81,8 @@ def __init__(self, max_depth=3, max_retries=3, timeout=30,
             self.exclude_patterns = exclude_patterns or []
             self.enable_javascript = enable_javascript
             self.quiet = quiet
+            self.html_parser = None
+            self.extract_structured_data = True
             
         self.visited_urls = set()
         self.failed_urls = {}  # Add failed_urls dictionary
@@ -186,13 +200,12 @@ def crawl(self, base_url, progress_bar=None, max_pages=100):
             # Fetch the URL
             result = self.fetch_url(url, depth)
             if result:
-                # Extract links from the page
-                links = self._extract_links(result['content'], url)
+                # Extract links, title, text and structured data from one parse of the page
+                page = extract_page(result['content'], url, self.extract_structured_data, self.html_parser)
+                links = page['links']
                 
                 # Add page to results
-                result['links'] = links
-                result['title'] = self._extract_title(result['content'])
-                result['text'] = self._extract_text(result['content'])
+                result.update(page)
                 result['html'] = result['content']
                 
                 # Remove the raw content to save memory
@@ -221,28 +234,16 @@ def crawl(self, base_url, progress_bar=None, max_pages=100):
         
     def _extract_links(self, html_content, base_url):
         """Extract links from HTML content."""
-        links = []
         try:
-            soup = BeautifulSoup(html_content, 'html.parser')
-            for a_tag in soup.find_all('a', href=True):
-                href = a_tag['href']
-                if href.startswith('javascript:') or href.startswith('#'):
-                    continue
-                    
-                # Normalize the URL
-                absolute_url = urljoin(base_url, href)
-                links.append(absolute_url)
+            return extract_links(parse_html(html_content, self.html_parser), base_url)
         except Exception as e:
             logger.error(f"Error extracting links: {e}")
-        
-        return links
+            return []
         
     def _extract_title(self, html_content):
         """Extract page title from HTML content."""
         try:
-            soup = BeautifulSoup(html_content, 'html.parser')
-            title = soup.title.string if soup.title else ""
-            return title.strip()
+            return extract_title(parse_html(html_content, self.html_parser))
         except Exception as e:
             logger.error(f"Error extracting title: {e}")
             return ""
@@ -250,29 +251,348 @@ def _extract_title(self, html_content):
     def _extract_text(self, html_content):
         """Extract readable text from HTML content."""
         try:
-            soup = BeautifulSoup(html_content, 'html.parser')
-            
-            # Remove script and style elements
-            for script in soup(['script', 'style']):
-                script.extract()
-                
-            # Get text
-            text = soup.get_text()
-            
-            # Remove excessive newlines and whitespace
-            lines = (line.strip() for line in text.splitlines())
-            chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-            text = '\n'.join(chunk for chunk in chunks if chunk)
-            
-            return text
+            return extract_text(parse_html(html_content, self.html_parser))
         except Exception as e:
             logger.error(f"Error extracting text: {e}")
             return ""
 
+# Defaults of the asynchronous crawler
+DEFAULT_USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+DEFAULT_CONCURRENCY = 16
+DEFAULT_MAX_CONNECTIONS_PER_HOST = 4
+DEFAULT_PER_HOST_DELAY = 0.5
+# Status codes worth retrying, and those whose content is kept (as in fetch_url)
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+KEEP_CONTENT_STATUS_CODES = {203, 206, 300, 301, 302, 303, 307, 308}
+
+
+def robots_crawl_delay(robots_txt: str, user_agent: str) -> Optional[float]:
+    """
+    Get the Crawl-delay of robots.txt for a user agent.
+
+    urllib.robotparser only understands whole seconds; fractional delays
+    such as "Crawl-delay: 0.5" are common, so they are read here.
+
+    Args:
+        robots_txt: Content of robots.txt
+        user_agent: User agent of the crawler
+
+    Returns:
+        The delay in seconds, or None if there is none
+    """
+    agent = user_agent.split('/')[0].lower()
+    delays: Dict[str, float] = {}
+    group: List[str] = []
+    in_agents = False
+    for line in robots_txt.splitlines():
+        field, _, value = line.split('#', 1)[0].partition(':')
+        field, value = field.strip().lower(), value.strip()
+        if field == 'user-agent':
+            if not in_agents:
+                group = []
+            group.append(value.lower())
+            in_agents = True
+        elif field:
+            in_agents = False
+            if field == 'crawl-delay':
+                try:
+                    for name in group:
+                        delays.setdefault(name, float(value))
+                except ValueError:
+                    pass
+
+    for name, delay in delays.items():
+        if name != '*' and name in agent:
+            return delay
+    return delays.get('*')
+
+
+class _HostPolicy:
+    """robots.txt rules and request pacing of one host."""
+
+    def __init__(self, delay: float, robots: Optional[RobotFileParser]):
+        self.delay = delay
+        self.robots = robots
+        self._next_request = 0.0
+
+    def allows(self, url: str, user_agent: str) -> bool:
+        return self.robots is None or self.robots.can_fetch(user_agent, url)
+
+    async def wait(self) -> None:
+        """Wait for the next request slot of the host."""
+        now = time.monotonic()
+        start = max(now, self._next_request)
+        self._next_request = start + self.delay
+        if start > now:
+            await asyncio.sleep(start - now)
+
+
+class AsyncFrontierCrawler(SimpleRequestsCrawler):
+    """
+    Concurrent crawler built on asyncio and aiohttp.
+
+    A pool of workers takes URLs from a FIFO frontier, so pages are still
+    crawled breadth-first, and fetches them over one pool of keep-alive
+    connections. The number of requests in flight is limited globally and
+    per host, and requests to the same host are spaced by per_host_delay or
+    the Crawl-delay of its robots.txt, whichever is longer. robots.txt is
+    fetched once per host. crawl() returns the same result dictionaries as
+    SimpleRequestsCrawler.crawl().
+    """
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None, **kwargs):
+        """
+        Initialize the crawler.
+
+        Args:
+            config: Crawler configuration; besides the SimpleRequestsCrawler settings it reads
+                concurrency, max_connections_per_host, per_host_delay, respect_robots_txt,
+                retry_delay, user_agent and page_cache, a PageCache to revalidate pages with
+            **kwargs: Settings overriding those of config
+        """
+        config = dict(config or {}, **kwargs)
+        super().__init__(config)
+        self.concurrency = int(config.get('concurrency', DEFAULT_CONCURRENCY))
+        self.max_connections_per_host = int(config.get('max_connections_per_host', DEFAULT_MAX_CONNECTIONS_PER_HOST))
+        self.per_host_delay = float(config.get('per_host_delay', DEFAULT_PER_HOST_DELAY))
+        self.respect_robots_txt = config.get('respect_robots_txt', True)
+        self.retry_delay = float(config.get('retry_delay', 1))
+        user_agent = config.get('user_agent')
+        self.user_agent = user_agent if user_agent and user_agent != 'random' else DEFAULT_USER_AGENT
+        self.page_cache: Optional[PageCache] = config.get('page_cache')
+
+        # (parsed robots.txt, Crawl-delay) per origin, (None, None) where there is none; kept across crawls
+        self._robots: Dict[str, Tuple[Optional[RobotFileParser], Optional[float]]] = {}
+        # Host policies of the running crawl, per origin
+        self._hosts: Dict[str, asyncio.Future] = {}
+
+    def crawl(self, base_url, progress_bar=None, max_pages=100):
+        """
+        Crawl from a base URL and return results.
+
+        Args:
+            base_url: Starting URL for the crawl
+            progress_bar: Optional tqdm progress bar
+            max_pages: Maximum number of pages to crawl
+
+        Returns:
+            List of page results
+        """
+        coroutine = self.crawl_async(base_url, progress_bar, max_pages)
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(coroutine)
+
+        # Called from a running event loop: crawl on a loop of its own
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            return executor.submit(asyncio.run, coroutine).result()
+
+    def _should_crawl(self, url: str) -> bool:
+        """Apply the scheme, domain and pattern filters of crawl()."""
+        parsed = urlparse(url)
+        if parsed.scheme not in ('http', 'https'):
+            return False
+        if self.allowed_domains and parsed.netloc not in self.allowed_domains:
+            return False
+        if any(re.search(pattern, url) for pattern in self.exclude_patterns):
+            return False
+        if self.include_patterns and not any(re.search(pattern, url) for pattern in self.include_patterns):
+            return False
+        return True
+
+    async def crawl_async(self, base_url, progress_bar=None, max_pages=100):
+        """
+        Crawl from a base URL and return results.
+
+        Args:
+            base_url: Starting URL for the crawl
+            progress_bar: Optional tqdm progress bar
+            max_pages: Maximum number of pages to crawl
+
+        Returns:
+            List of page results, in the format of SimpleRequestsCrawler.crawl()
+        """
+        self._log_info(f"AsyncFrontierCrawler: Starting crawl from {base_url} with {self.concurrency} workers")
+
+        if progress_bar:
+            progress_bar.total = max_pages
+            progress_bar.refresh()
+
+        results = []
+        frontier: asyncio.Queue = asyncio.Queue()
+        base_url = urldefrag(base_url)[0]
+        queued = {base_url}
+        if self._should_crawl(base_url):
+            frontier.put_nowait((base_url, 0))
+
+        async def worker(session):
+            while True:
+                url, depth = await frontier.get()
+                try:
+                    if len(results) >= max_pages or url in self.visited_urls:
+                        continue
+                    result = await self._crawl_page(session, url, depth)
+                    if result is None or len(results) >= max_pages:
+                        continue
+                    results.append(result)
+
+                    if progress_bar:
+                        progress_bar.update(1)
+                        if isinstance(max_pages, int):
+                            progress_percentage = int(len(results) / max_pages * 100)
+                            progress_bar.set_description(f"Crawling {len(results)}/{max_pages} pages: {progress_percentage}%")
+
+                    if depth < self.max_depth:
+                        for link in result['links']:
+                            link = urldefrag(link)[0]
+                            if link not in queued and self._should_crawl(link):
+                                queued.add(link)
+                                frontier.put_nowait((link, depth + 1))
+                except Exception as e:
+                    logger.error(f"AsyncFrontierCrawler: Error crawling {url}: {e}")
+                    self.failed_urls[url] = {
+                        'error': str(e),
+                        'error_type': type(e).__name__,
+                        'timestamp': datetime.now().isoformat()
+                    }
+                finally:
+                    frontier.task_done()
+
+        connector = aiohttp.TCPConnector(limit=self.concurrency, limit_per_host=self.max_connections_per_host)
+        async with aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+            headers={'User-Agent': self.user_agent}
+        ) as session:
+            workers = [asyncio.ensure_future(worker(session)) for _ in range(self.concurrency)]
+            try:
+                await frontier.join()
+            finally:
+                for task in workers:
+                    task.cancel()
+                await asyncio.gather(*workers, return_exceptions=True)
+                self._hosts.clear()
+
+        self._log_info(f"AsyncFrontierCrawler: Crawl completed. Scraped {len(results)} pages.")
+        return results
+
+    async def _crawl_page(self, session, url, depth):
+        """Fetch and parse one page, returning its result or None if it is skipped or fails."""
+        host = await self._host_policy(session, url)
+        if not host.allows(url, self.user_agent):
+            self._log_info(f"AsyncFrontierCrawler: Disallowed by robots.txt: {url}")
+            return None
+        if url in self.visited_urls:
+            return None
+        self.visited_urls.add(url)
+
+        start_time = time.time()
+        conditional = self.page_cache.conditional_headers(url) if self.page_cache is not None else {}
+        try:
+            status_code, headers, content = await self._fetch(session, host, url, conditional)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.error(f"AsyncFrontierCrawler: Error retrieving {url}: {e}")
+            self.failed_urls[url] = {
+                'error': str(e) or type(e).__name__,
+                'error_type': type(e).__name__,
+                'timestamp': datetime.now().isoformat()
+            }
+            return None
+        self._log_info(f"AsyncFrontierCrawler: Got response from {url} in {time.time() - start_time:.2f}s "
+                       f"with status code {status_code}")
+
+        if status_code == 304 and self.page_cache is not None:
+            entry = self.page_cache.revalidated(url)
+            if entry is not None:
+                # Unchanged since the last crawl: follow the stored links without extracting the page
+                page = {'links': entry['links'], 'title': entry['title'], 'text': ''}
+                if self.extract_structured_data:
+                    page.update(sections={}, structured_data={})
+                return {'url': url, 'status_code': status_code, 'headers': headers, 'depth': depth, **page,
+                        'html': '', 'not_modified': True}
+
+        if status_code != 200 and status_code not in KEEP_CONTENT_STATUS_CODES:
+            self.failed_urls[url] = {
+                'error': f"HTTP error {status_code}",
+                'error_type': 'http_error',
+                'timestamp': datetime.now().isoformat()
+            }
+            return None
+
+        # Parse in the extraction process pool so that the event loop keeps other fetches going
+        page = await extract_page_async(content, url, self.extract_structured_data, self.html_parser)
+        if self.page_cache is not None and status_code == 200:
+            self.page_cache.store(url, headers, page['text'], page['title'], page['links'])
+        return {'url': url, 'status_code': status_code, 'headers': headers, 'depth': depth, **page,
+                'html': content, 'not_modified': False}
+
+    async def _fetch(self, session, host, url, headers=None):
+        """GET a URL in the host's next slot, retrying connection errors and transient HTTP errors."""
+        attempt = 0
+        while True:
+            attempt += 1
+            await host.wait()
+            try:
+                async with session.get(url, headers=headers, allow_redirects=True) as response:
+                    if response.status not in RETRY_STATUS_CODES or attempt > self.max_retries:
+                        # Don't download documents, images and other binary content
+                        is_text = response.content_type.startswith('text/') or 'xml' in response.content_type
+                        content = await response.text(errors='replace') if is_text else ''
+                        return response.status, dict(response.headers), content
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                if attempt > self.max_retries:
+                    raise
+            await asyncio.sleep(backoff_delay(attempt, self.retry_delay))
+
+    async def _host_policy(self, session, url) -> _HostPolicy:
+        """Get the policy of a URL's host, loading its robots.txt on first use."""
+        parsed = urlparse(url)
+        origin = f"{parsed.scheme}://{parsed.netloc}"
+        policy = self._hosts.get(origin)
+        if policy is None:
+            # Workers reaching a new host at the same time share one robots.txt request
+            policy = asyncio.ensure_future(self._load_host_policy(session, origin))
+            self._hosts[origin] = policy
+        return await policy
+
+    async def _load_host_policy(self, session, origin) -> _HostPolicy:
+        robots, crawl_delay = None, None
+        if self.respect_robots_txt:
+            if origin not in self._robots:
+                self._robots[origin] = await self._fetch_robots(session, origin)
+            robots, crawl_delay = self._robots[origin]
+        return _HostPolicy(max(self.per_host_delay, crawl_delay or 0), robots)
+
+    async def _fetch_robots(self, session, origin) -> Tuple[Optional[RobotFileParser], Optional[float]]:
+        """Fetch and parse the robots.txt of an origin, returning its rules and Crawl-delay."""
+        robots_url = f"{origin}/robots.txt"
+        try:
+            async with session.get(robots_url) as response:
+                if response.status in (401, 403):
+                    robots = RobotFileParser(robots_url)
+                    robots.disallow_all = True
+                    return robots, None
+                if response.status >= 400:
+                    return None, None
+                text = await response.text(errors='replace')
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            self._log_info(f"AsyncFrontierCrawler: Could not fetch {robots_url}: {e}")
+            return None, None
+
+        robots = RobotFileParser(robots_url)
+        robots.parse(text.splitlines())
+        return robots, robots_crawl_delay(text, self.user_agent)
+
+
 # Update the spider import logic - remove all spider-rs code and only use SimpleRequestsCrawler
 def create_spider(config):
-    """Create a crawler instance with the given configuration."""
-    # Always use SimpleRequestsCrawler
+    """
+    Create a crawler instance with the given configuration.
+
+    The AsyncFrontierCrawler is used unless async_crawl is disabled or pages
+    need JavaScript rendering, which only SimpleRequestsCrawler supports.
+    """
     try:
         # Ensure max_pages is properly handled
         if isinstance(config, dict) and 'max_pages' in config:
@@ -286,6 +606,8 @@ def create_spider(config):
                 except (TypeError, ValueError):
                     logger.warning(f"Invalid max_pages value: {max_pages_config}. Using default value 100.")
                     config['max_pages'] = 100
+        if isinstance(config, dict) and config.get('async_crawl', True) and not config.get('enable_javascript', False):
+            return AsyncFrontierCrawler(config)
         return SimpleRequestsCrawler(config)
     except Exception as e:
         logger.error(f"Error creating crawler: {e}")
@@ -299,13 +621,25 @@ def create_spider(config):
 class UniversitySpider:
     """Enhanced web crawler for university websites using requests-based crawler."""
     
-    def __init__(self, config: Dict[str, Any], cache_dir: str = None):
-        """Initialize the crawler with configuration."""
+    def __init__(self, config: Dict[str, Any], cache_dir: str = None, indexed_sources: Optional[Iterable[str]] = None):
+        """
+        Initialize the crawler with configuration.
+        
+        Args:
+            config: Scraping configuration
+            cache_dir: Directory for the page cache, unless page_cache_path is set
+            indexed_sources: URLs whose pages are in the search index, e.g. from
+                DocumentProcessor.indexed_sources(); only these are revalidated
+                with conditional requests, since a 304 means their chunks are kept.
+                If None, every cached page is revalidated; pass it whenever
+                unchanged_urls feed an index update, or pages whose chunks never
+                reached the index (after a failed ingest or a rebuild) are
+                reported unchanged and stay missing
+        """
         self.config = config
         self.visited_urls: Set[str] = set()
         self.failed_urls: Dict[str, Dict[str, Any]] = {}
         self.content_cache: Dict[str, Dict[str, Any]] = {}
-        self.content_hashes: Set[str] = set()  # For deduplication
         
         # Initialize configuration variables
         self.timeout = config.get('timeout', 30)
@@ -344,6 +678,23 @@ def __init__(self, config: Dict[str, Any], cache_dir: str = None):
             os.makedirs(self.cache_dir, exist_ok=True)
             logger.info(f"Using cache directory: {self.cache_dir}")
         
+        # Revalidating page cache: recrawls send conditional requests and skip unchanged pages
+        page_cache_path = config.get('page_cache_path') or (
+            os.path.join(self.cache_dir, 'pages.sqlite') if self.cache_dir else None)
+        self.page_cache = PageCache(page_cache_path, revalidate_urls=indexed_sources) \
+            if page_cache_path and config.get('revalidate', True) else None
+        # Pages answered with 304 Not Modified, whose indexed chunks are still current
+        self.unchanged_urls: Set[str] = set()
+        
+        # Near-duplicate pages (same content behind different navigation, footers or dates), across crawl runs
+        self.near_duplicates = NearDuplicateIndex(
+            db_path=config.get('near_duplicate_db_path'),  # None to detect duplicates within a run only
+            namespace='pages',
+            max_distance=config.get('near_duplicate_distance', 6),
+            fold_digits=True
+        )
+        self.near_duplicate_pages = 0
+        
         logger.info(f"Initialized UniversitySpider with timeout {self.timeout}s, max depth {self.max_depth}, " +
                     f"max retries {self.max_retries}, retry delay {self.retry_delay}s, " +
                     f"max crawl duration {self.max_crawl_duration}s, " +
@@ -354,74 +705,52 @@ def _log(self, message, quiet_mode=False):
         if not quiet_mode:
             logger.info(message)
     
-    def get_cache_path(self, url: str) -> str:
-        """Generate a cache file path for a URL."""
-        if not self.cache_dir:
-            return None
-        url_hash = hashlib.md5(url.encode()).hexdigest()
-        return os.path.join(self.cache_dir, f"{url_hash}.json")
-    
     def load_from_cache(self, url: str) -> Optional[Dict[str, Any]]:
-        """Load page data from cache if available."""
-        if not self.cache_dir:
+        """
+        Load the cached validators, title and links of a page.
+
+        Cached pages don't expire: they are revalidated with a conditional request on every crawl.
+        """
+        if self.page_cache is None:
+            return None
+        try:
+            return self.page_cache.get(url)
+        except Exception as e:
+            logger.warning(f"Error loading cache for {url}: {e}")
             return None
-            
-        cache_path = self.get_cache_path(url)
-        if cache_path and os.path.exists(cache_path):
-            try:
-                with open(cache_path, 'r') as f:
-                    data = json.load(f)
-                    
-                # Check cache expiry (default 7 days)
-                if 'cached_at' in data:
-                    cache_time = datetime.fromisoformat(data['cached_at'])
-                    now = datetime.now()
-                    cache_age = (now - cache_time).total_seconds()
-                    max_age = self.config.get('cache_max_age', 7 * 24 * 60 * 60)  # 7 days in seconds
-                    
-                    if cache_age > max_age:
-                        logger.debug(f"Cache expired for {url}")
-                        return None
-                
-                logger.debug(f"Loaded from cache: {url}")
-                return data
-            except Exception as e:
-                logger.warning(f"Error loading cache for {url}: {e}")
-        
-        return None
     
     def save_to_cache(self, url: str, data: Dict[str, Any]):
-        """Save page data to cache."""
-        if not self.cache_dir:
+        """Save the validators, title and links of a crawled page."""
+        if self.page_cache is None:
             return
-            
-        cache_path = self.get_cache_path(url)
-        if cache_path:
-            try:
-                # Add cache timestamp
-                data_to_cache = dict(data)
-                data_to_cache['cached_at'] = datetime.now().isoformat()
-                
-                with open(cache_path, 'w') as f:
-                    json.dump(data_to_cache, f)
-                logger.debug(f"Saved to cache: {url}")
-            except Exception as e:
-                logger.warning(f"Error saving cache for {url}: {e}")
+        try:
+            self.page_cache.store(url, data.get('headers', {}), data.get('text', ''),
+                                  data.get('title', ''), data.get('links', []))
+        except Exception as e:
+            logger.warning(f"Error saving cache for {url}: {e}")
     
-    def is_duplicate_content(self, content: str) -> bool:
-        """Check if content is a duplicate based on content hash."""
-        if not content or len(content) < 100:
-            return False
-            
-        # Create a hash of the content
-        content_sample = content[:1000]  # Use first 1000 chars for faster comparison
-        content_hash = hashlib.md5(content_sample.encode()).hexdigest()
+    def is_duplicate_content(self, content: str, url: Optional[str] = None) -> bool:
+        """
+        Check if content is a near-duplicate of a page crawled before, in this or an earlier run.
         
-        if content_hash in self.content_hashes:
-            return True
+        Args:
+            content: Extracted text of the page
+            url: URL of the page; a page crawled again is not a duplicate of itself
             
-        self.content_hashes.add(content_hash)
-        return False
+        Returns:
+            True if the page should be skipped
+        """
+        return self._near_duplicate_of(content, url) is not None
+    
+    def _near_duplicate_of(self, content: str, url: Optional[str] = None) -> Optional[str]:
+        """Get the key of the page that content is a near-duplicate of, or add it to the index."""
+        if not content or len(content) < 100:
+            return None
+        key = url or hashlib.sha256(content.encode()).hexdigest()
+        duplicate = self.near_duplicates.check(key, content)
+        if duplicate is not None:
+            logger.debug(f"Skipping {key} - near-duplicate of {duplicate}")
+        return duplicate
     
     def crawl(self, base_url: str, focus_urls: List[str], 
               content_processor: Callable[[Dict[str, Any], str], Tuple[str, Dict[str, Any]]]) -> List[Document]:
@@ -625,28 +954,50 @@ def extract_content_from_crawler_result(result, url):
                 'max_url_processing_time': self.max_url_processing_time,
                 'enable_emergency_exit': self.enable_emergency_exit,
                 'max_pages': max_pages,  # Use the pre-validated value
+                'allowed_domains': allowed_domains,
+                'page_cache': self.page_cache,
             }
+            # Settings of the asynchronous crawler
+            for key in ('async_crawl', 'concurrency', 'max_connections_per_host', 'per_host_delay', 'respect_robots_txt',
+                        'html_parser', 'extract_structured_data'):
+                if key in self.config:
+                    crawler_config[key] = self.config[key]
             
             # Create the crawler
             crawler = create_spider(crawler_config)
             
             # Initialize documents list
             documents = []
+            # Pages kept in this run, whose fingerprints stay in the near-duplicate index
+            crawled_pages: Set[str] = set()
+            # Near-duplicates skipped in this run, with the page they duplicate
+            skipped_duplicates: List[Tuple[Document, str]] = []
+            crawl_errors = 0
             
             # Process each focus URL
             for focus_url in focus_urls:
                 logger.info(f"Crawling focus URL: {focus_url}")
                 try:
                     # Call the crawl method with the correct parameters
-                    results = crawler.crawl(focus_url, pbar)
+                    results = crawler.crawl(focus_url, pbar, max_pages=max_pages - len(documents))
                     
                     # Process the results
                     for result in results:
+                        if result.get('not_modified'):
+                            # Unchanged since the last crawl: nothing to extract, chunk or embed
+                            self.unchanged_urls.add(result['url'])
+                            continue
                         content, metadata = self.extract_content_from_crawler_result(result, result.get('url', ''))
                         if content and len(content) > 100:
                             metadata['university'] = university_name
                             doc = Document(page_content=content, metadata=metadata)
+                            duplicate = self._near_duplicate_of(content, result.get('url'))
+                            if duplicate is not None:
+                                self.near_duplicate_pages += 1
+                                skipped_duplicates.append((doc, duplicate))
+                                continue
                             documents.append(doc)
+                            crawled_pages.add(result.get('url'))
                             
                             # Update the progress counter and display
                             update_progress(len(documents))
@@ -666,6 +1017,7 @@ def extract_content_from_crawler_result(result, url):
                         
                 except Exception as e:
                     logger.error(f"Error crawling {focus_url}: {e}")
+                    crawl_errors += 1
                     self.failed_urls[focus_url] = {
                         'error': str(e),
                         'error_type': type(e).__name__,
@@ -678,9 +1030,31 @@ def extract_content_from_crawler_result(result, url):
             # Update failed URLs tracking
             self.failed_urls.update(crawler.failed_urls)
             
+            if not crawl_errors:
+                # Forget pages of this site that are gone or no longer indexed, so they don't hide the pages they duplicated
+                pruned = self.near_duplicates.retain(
+                    crawled_pages | self.unchanged_urls,
+                    scope=lambda key: urlparse(key).netloc in allowed_domains
+                )
+                if pruned:
+                    logger.info(f"Forgot {pruned} pages not seen in this crawl")
+                # Pages that duplicated a page which is gone now take its place
+                for doc, duplicate in skipped_duplicates:
+                    if duplicate in crawled_pages or duplicate in self.unchanged_urls or len(documents) >= max_pages:
+                        continue
+                    if self._near_duplicate_of(doc.page_content, doc.metadata['source']) is None:
+                        self.near_duplicate_pages -= 1
+                        documents.append(doc)
+                        crawled_pages.add(doc.metadata['source'])
+            
             # Log results
             print(f"\nScraped {len(documents)} pages from {university_name}")
             logger.info(f"Scraped {len(documents)} pages from {university_name}")
+            if self.unchanged_urls:
+                logger.info(f"{len(self.unchanged_urls)} pages not modified since the last crawl")
+            if self.near_duplicate_pages:
+                logger.info(f"Skipped {self.near_duplicate_pages} near-duplicate pages")
+            self.near_duplicates.flush()
             
             if crawler.failed_urls:
                 print(f"  Failed URLs: {len(crawler.failed_urls)}")
@@ -739,12 +1113,7 @@ class UniversityContentExtractor:
     def __init__(self):
         """Initialize the content extractor."""
         # Patterns for specific information extraction
-        self.patterns = {
-            'email': re.compile(r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}'),
-            'phone': re.compile(r'\(?\d{3}\)?[-.\s]?\d{3}[-.\s]?\d{4}'),
-            'tuition_pattern': re.compile(r'\$\s?[\d,]+(\.\d{2})?|\d{1,3}(,\d{3})*(\.\d{2})?\s(dollars|CAD|CDN)'),
-            'deadline_pattern': re.compile(r'(January|February|March|April|May|June|July|August|September|October|November|December)\s+\d{1,2}(st|nd|rd|th)?,\s+\d{4}|\d{1,2}(st|nd|rd|th)?\s+(January|February|March|April|May|June|July|August|September|October|November|December),\s+\d{4}')
-        }
+        self.patterns = PATTERNS
     
     def categorize_content(self, text: str, url: str) -> List[str]:
         """Categorize content by type of university information."""
@@ -789,161 +1158,23 @@ def identify_page_type(self, url: str, title: str, content: str) -> str:
     
     def extract_structured_data(self, html: str, url: str) -> Dict[str, Any]:
         """Extract structured data from HTML content."""
-        structured_data = {}
-        
         if not html:
-            return structured_data
-            
+            return {}
         try:
-            soup = BeautifulSoup(html, 'html.parser')
-            
-            # Extract emails
-            emails = set(self.patterns['email'].findall(html))
-            if emails:
-                structured_data['emails'] = list(emails)
-            
-            # Extract phone numbers
-            phones = set(self.patterns['phone'].findall(html))
-            if phones:
-                structured_data['phones'] = list(phones)
-            
-            # Extract tuition information
-            tuition_text = ""
-            tuition_elements = soup.find_all(string=self.patterns['tuition_pattern'])
-            for element in tuition_elements:
-                parent = element.parent
-                if parent:
-                    context = parent.get_text(strip=True)
-                    tuition_text += context + "\n"
-            
-            if tuition_text:
-                structured_data['tuition_info'] = tuition_text
-            
-            # Extract deadline information
-            deadline_text = ""
-            deadline_elements = soup.find_all(string=self.patterns['deadline_pattern'])
-            for element in deadline_elements:
-                parent = element.parent
-                if parent:
-                    context = parent.get_text(strip=True)
-                    deadline_text += context + "\n"
-            
-            if deadline_text:
-                structured_data['deadline_info'] = deadline_text
-            
-            # Extract tables - often contain important structured information
-            tables = []
-            for table in soup.find_all('table'):
-                try:
-                    # Get table headers
-                    headers = []
-                    for th in table.find_all('th'):
-                        headers.append(th.get_text(strip=True))
-                    
-                    # Get table rows
-                    rows = []
-                    for tr in table.find_all('tr'):
-                        row = []
-                        for td in tr.find_all(['td', 'th']):
-                            row.append(td.get_text(strip=True))
-                        if row:
-                            rows.append(row)
-                    
-                    if rows:
-                        tables.append({
-                            'headers': headers,
-                            'rows': rows
-                        })
-                except Exception:
-                    continue
-            
-            if tables:
-                structured_data['tables'] = tables
-                
-            # Extract lists - often contain program requirements or tuition breakdowns
-            lists = []
-            for list_element in soup.find_all(['ul', 'ol']):
-                # Avoid navigation menus
-                if list_element.find_parent(['nav', 'header', 'footer']):
-                    continue
-                    
-                # Get list items
-                items = []
-                for li in list_element.find_all('li'):
-                    text = li.get_text(strip=True)
-                    if text and len(text) > 10:  # Skip very short list items
-                        items.append(text)
-                
-                if items and len(items) > 1:  # At least 2 items
-                    lists.append(items)
-            
-            if lists:
-                structured_data['lists'] = lists
-            
+            return extract_structured_data(parse_html(html), html)
         except Exception as e:
-            pass
-            
-        return structured_data
+            logger.debug(f"Error extracting structured data from {url}: {e}")
+            return {}
     
     def extract_content_by_section(self, html: str) -> Dict[str, str]:
         """Extract content by section for better chunking and relevance."""
-        sections = {}
-        
         if not html:
-            return sections
-            
+            return {}
         try:
-            soup = BeautifulSoup(html, 'html.parser')
-            
-            # Process headings to identify sections
-            current_section = "main"
-            sections[current_section] = ""
-            
-            # Track all content elements in order
-            elements = []
-            for element in soup.find_all(['h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'p', 'div', 'section']):
-                # Skip hidden elements
-                style = element.get('style', '')
-                if 'display: none' in style or 'visibility: hidden' in style:
-                    continue
-                    
-                tag_name = element.name
-                
-                # Create a new section for headings
-                if tag_name.startswith('h') and len(element.get_text(strip=True)) > 0:
-                    level = int(tag_name[1])
-                    heading_text = element.get_text(strip=True)
-                    if len(heading_text) > 3:  # Skip very short headings
-                        current_section = heading_text
-                        sections[current_section] = ""
-                        elements.append((current_section, None))  # Mark as a heading
-                elif tag_name in ['p', 'div', 'section']:
-                    content = element.get_text(strip=True)
-                    # Only include non-empty content that's reasonably long
-                    if content and len(content) > 20:
-                        elements.append((current_section, content))
-            
-            # Consolidate content within each section
-            for section_name, content in elements:
-                if content is None:  # It's a heading
-                    continue
-                
-                if section_name in sections:
-                    sections[section_name] += content + " "
-                else:
-                    sections[section_name] = content + " "
-            
-            # Clean up sections
-            for section_name in list(sections.keys()):
-                sections[section_name] = sections[section_name].strip()
-                # Remove any empty sections
-                if not sections[section_name]:
-                    del sections[section_name]
-                    
+            return extract_sections(parse_html(html))
         except Exception as e:
-            pass
-            
-        return sections
+            logger.debug(f"Error extracting sections: {e}")
+            return {}
 
 def _normalize_string(text: str) -> str:
     """
@@ -1023,9 +1254,18 @@ def clear_memory(self):
 class AsyncWebScraper:
     """Asynchronous web scraper for better performance."""
     
-    def __init__(self, config: Dict[str, Any]):
+    def __init__(self, config: Dict[str, Any], scheduler: Optional[CrawlScheduler] = None):
+        """
+        Initialize the scraper.
+        
+        Args:
+            config: Scraping configuration
+            scheduler: Connection budget shared with other scrapers; by default requests
+                are only limited by MAX_CONCURRENT_REQUESTS
+        """
         self.config = config
         self.session = None
+        self.scheduler = scheduler
         self.semaphore = asyncio.Semaphore(config.get("MAX_CONCURRENT_REQUESTS", 10))
         self.cache_manager = CacheManager(
             config.get("CACHE_DIR", "data/cache"),
@@ -1050,7 +1290,8 @@ async def fetch_url(self, url: str) -> Dict[str, Any]:
         if cached_content:
             return cached_content
 
-        async with self.semaphore:
+        limit = self.scheduler.slot(urlparse(url).netloc) if self.scheduler is not None else self.semaphore
+        async with limit:
             for attempt in range(self.config.get("MAX_RETRIES", 3)):
                 try:
                     async with self.session.get(url, timeout=self.config.get("REQUEST_TIMEOUT", 30)) as response:
@@ -1127,7 +1368,15 @@ async def process_document(self, doc: Dict[str, Any]) -> Dict[str, Any]:
             return None
 
 class WebScraper:
-    """Main web scraper class that coordinates the scraping process."""
+    """
+    Main web scraper class that coordinates the scraping process.
+    
+    Universities are scraped concurrently. Their requests share one
+    CrawlScheduler, which bounds the connections in flight overall and per
+    host and hands free connections to the hosts in turn. Each university
+    stops at its max_pages and its max_crawl_duration deadline, and its
+    documents are handed on in batches as soon as they are processed.
+    """
     
     def __init__(self, config_path: str, max_pages: int = 100, quiet_mode: bool = False):
         self.config = self._load_config(config_path)
@@ -1141,39 +1390,105 @@ def _load_config(self, config_path: str) -> Dict[str, Any]:
         import yaml
         with open(config_path, 'r') as f:
             config = yaml.safe_load(f)
-        return config.get('scraping', {})
+        scraping = config.get('scraping', {})
+        # The universities to scrape are listed at the top level of config.yaml
+        scraping.setdefault('universities', config.get('universities', []))
+        return scraping
+    
+    def _create_scheduler(self) -> CrawlScheduler:
+        """Create the connection budget shared by the universities of a scrape."""
+        return CrawlScheduler(
+            max_connections=self.config.get("MAX_CONCURRENT_REQUESTS", self.config.get("concurrency", 10)),
+            max_connections_per_host=self.config.get("max_connections_per_host", 4),
+            per_host_delay=self.config.get("per_host_delay", 0)
+        )
         
     async def scrape_university(self, university_config: Dict[str, Any]) -> List[Dict[str, Any]]:
         """Scrape a university website with optimizations."""
-        async with AsyncWebScraper(self.config) as scraper:
-            # Initialize memory manager
-            memory_manager = MemoryManager(self.config.get("MAX_MEMORY_MB", 1024))
-            
-            # Get URLs to scrape
-            urls = self._get_urls_to_scrape(university_config)
+        documents = []
+        async for batch in self.iter_university(university_config):
+            documents.extend(batch)
+        return documents
+    
+    async def iter_university(self, university_config: Dict[str, Any],
+                              scraper: Optional[AsyncWebScraper] = None) -> AsyncIterator[List[Dict[str, Any]]]:
+        """
+        Scrape a university website, yielding batches of documents as they are processed.
+        
+        URLs are fetched concurrently, up to a batch at a time; the scraper's
+        scheduler decides when each request actually goes out. The scrape
+        stops at the university's max_pages and when its max_crawl_duration
+        (in seconds) has passed, cancelling the requests still in flight.
+        
+        Args:
+            university_config: University entry of the configuration
+            scraper: Open scraper to fetch with, shared with other universities;
+                by default one is opened with a scheduler of its own
             
-            # Process URLs in batches
-            documents = []
-            for i in range(0, len(urls), self.config.get("BATCH_SIZE", 50)):
-                # Check if we've reached max_pages
-                if len(documents) >= self.max_pages:
+        Yields:
+            Lists of processed documents, at most BATCH_SIZE each
+        """
+        if scraper is None:
+            async with AsyncWebScraper(self.config, scheduler=self._create_scheduler()) as scraper:
+                async for batch in self.iter_university(university_config, scraper):
+                    yield batch
+            return
+        
+        name = university_config.get('name', 'unknown')
+        max_pages = university_config.get('max_pages', self.max_pages)
+        batch_size = self.config.get("BATCH_SIZE", 50)
+        duration = university_config.get('max_crawl_duration', self.config.get('max_crawl_duration'))
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + duration if duration else None
+        memory_manager = MemoryManager(self.config.get("MAX_MEMORY_MB", 1024))
+        
+        urls = iter(dict.fromkeys(self._get_urls_to_scrape(university_config)))
+        pending: Set[asyncio.Future] = set()
+        produced = 0
+        batch: List[Dict[str, Any]] = []
+        try:
+            while True:
+                # Keep a batch of requests queued, but never more than the pages still wanted
+                while len(pending) < min(batch_size, max_pages - produced - len(batch)):
+                    url = next(urls, None)
+                    if url is None:
+                        break
+                    pending.add(asyncio.ensure_future(scraper.fetch_url(url)))
+                if not pending:
                     break
-                    
-                # Calculate remaining pages to scrape
-                remaining_pages = self.max_pages - len(documents)
-                batch_size = min(self.config.get("BATCH_SIZE", 50), remaining_pages)
-                batch_urls = urls[i:i + batch_size]
                 
-                # Check memory usage
-                if not memory_manager.check_memory():
-                    memory_manager.clear_memory()
+                timeout = None if deadline is None else deadline - loop.time()
+                if timeout is not None and timeout <= 0:
+                    logger.warning(f"Deadline of {duration}s reached for {name}, "
+                                   f"cancelling {len(pending)} requests")
+                    break
+                done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                
+                for task in done:
+                    if task.exception() is not None:
+                        logger.error(f"Error scraping {name}: {task.exception()}")
+                        continue
+                    result = task.result()
+                    if not result or produced + len(batch) >= max_pages:
+                        continue
+                    doc = await self.batch_processor.process_document(result)
+                    if doc:
+                        doc['metadata']['university'] = name
+                        batch.append(doc)
                 
-                # Process batch
-                batch_results = await scraper.process_urls(batch_urls)
-                processed_batch = await self.batch_processor.process_batch(batch_results)
-                documents.extend(processed_batch)
-            
-            return documents[:self.max_pages]  # Ensure we don't exceed max_pages
+                if len(batch) >= batch_size or (batch and not pending):
+                    if not memory_manager.check_memory():
+                        memory_manager.clear_memory()
+                    produced += len(batch)
+                    yield batch
+                    batch = []
+            
+            if batch:
+                yield batch
+        finally:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
             
     def _get_urls_to_scrape(self, university_config: Dict[str, Any]) -> List[str]:
         """Get list of URLs to scrape from university config."""
@@ -1189,20 +1504,115 @@ def _get_urls_to_scrape(self, university_config: Dict[str, Any]) -> List[str]:
         urls.extend(focus_urls)
         
         return urls
+    
+    async def stream_all_universities(self) -> AsyncIterator[Tuple[str, List[Dict[str, Any]]]]:
+        """
+        Scrape all universities in the configuration concurrently.
+        
+        Yields:
+            (university name, batch of documents) tuples, in the order the batches finish
+        """
+        universities = self.config.get('universities', [])
+        if not universities:
+            return
+        
+        # A full queue holds back the scrapers until the consumer catches up
+        batches: asyncio.Queue = asyncio.Queue(maxsize=len(universities))
+        
+        async def scrape(university, scraper):
+            name = university.get('name', 'unknown')
+            university_batches = self.iter_university(university, scraper)
+            try:
+                async for batch in university_batches:
+                    await batches.put((name, batch))
+            except asyncio.CancelledError:
+                # The consumer stopped; nobody waits for the end marker, and the queue may be full
+                raise
+            except Exception as e:
+                logger.error(f"Error scraping university {name}: {str(e)}")
+            finally:
+                await university_batches.aclose()
+            await batches.put((name, None))
+        
+        async with AsyncWebScraper(self.config, scheduler=self._create_scheduler()) as scraper:
+            tasks = [asyncio.ensure_future(scrape(university, scraper)) for university in universities]
+            try:
+                running = len(tasks)
+                while running:
+                    name, batch = await batches.get()
+                    if batch is None:
+                        running -= 1
+                    else:
+                        yield name, batch
+            finally:
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                logger.info(f"Scheduler stats: {scraper.scheduler.get_stats()}")
         
     async def scrape_all_universities(self) -> List[Dict[str, Any]]:
         """Scrape all universities in the configuration."""
         all_documents = []
-        universities = self.config.get('universities', [])
+        async for _, batch in self.stream_all_universities():
+            all_documents.extend(batch)
+        return all_documents
+    
+    def iter_documents(self) -> Iterator[Document]:
+        """
+        Scrape all universities, yielding documents for the ingest pipeline as batches finish.
         
-        for university in universities:
+        The scrape runs on an event loop in a background thread, so the
+        documents can be passed straight to DocumentProcessor.add_documents
+        and embedded while the remaining universities are still scraped.
+        
+        Yields:
+            Documents with the page text, and the URL as source in their metadata
+        """
+        # Batches waiting for the consumer; a full queue holds back the scrape until embedding catches up
+        batches: queue.Queue = queue.Queue(maxsize=max(1, self.config.get('max_pending_batches', 2)))
+        done = object()
+        running: Dict[str, Any] = {}
+        
+        async def produce():
+            loop = asyncio.get_running_loop()
+            running['loop'], running['task'] = loop, asyncio.current_task()
+            stream = self.stream_all_universities()
             try:
-                documents = await self.scrape_university(university)
-                all_documents.extend(documents)
+                async for _, batch in stream:
+                    # Wait for room off the event loop, so requests in flight keep going
+                    await loop.run_in_executor(None, batches.put, batch)
             except Exception as e:
-                logger.error(f"Error scraping university {university.get('name', 'unknown')}: {str(e)}")
-                
-        return all_documents
+                batches.put(e)
+            finally:
+                await stream.aclose()
+                batches.put(done)
+        
+        thread = threading.Thread(target=asyncio.run, args=(produce(),), name="web-scraper", daemon=True)
+        thread.start()
+        finished = False
+        try:
+            while True:
+                batch = batches.get()
+                if batch is done:
+                    finished = True
+                    break
+                if isinstance(batch, Exception):
+                    finished = True
+                    raise batch
+                for doc in batch:
+                    metadata = {key: value for key, value in doc['metadata'].items() if key != 'headers'}
+                    yield Document(page_content=doc['content'], metadata={'source': doc['url'], **metadata})
+        finally:
+            if not finished:
+                # The consumer stopped early: cancel the scrape still running
+                try:
+                    running['loop'].call_soon_threadsafe(running['task'].cancel)
+                except RuntimeError:
+                    pass  # The loop already finished
+                # Drain the queue, so puts blocked on it return and the scrape thread can end
+                while batches.get() is not done:
+                    pass
+            thread.join()
 
 if __name__ == "__main__":
     # Parse command line arguments
@@ -1235,7 +1645,7 @@ async def scrape_all_universities(self) -> List[Dict[str, Any]]:
         found = False
         for university in scraper.config['universities']:
             if university['name'].lower() == args.university.lower():
-                documents = scraper.scrape_university(university)
+                documents = asyncio.run(scraper.scrape_university(university))
                 found = True
                 break
         
@@ -1243,7 +1653,7 @@ async def scrape_all_universities(self) -> List[Dict[str, Any]]:
             print(f"University '{args.university}' not found in configuration")
             sys.exit(1)
     else:
-        documents = scraper.scrape_all_universities()
+        documents = asyncio.run(scraper.scrape_all_universities())
     
     # Print timing information
     elapsed = time.time() - start_time
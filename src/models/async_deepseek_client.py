@@ -0,0 +1,404 @@
+"""
+Async DeepSeek API client with native token streaming.
+
+Unlike DeepSeekAPI, which blocks a thread for the whole duration of a
+streaming response, this client runs on the event loop so that many
+concurrent streams can share a single loop.
+"""
+
+import os
+import json
+import time
+import asyncio
+import threading
+from typing import Any, AsyncGenerator, Dict, List, Optional, Union
+
+import httpx
+from httpx_sse import EventSource
+
+from src.utils.logger import get_logger, api_logger
+from src.models.deepseek_client import DeepSeekAPI, get_deepseek_client
+from src.models.response_cache import get_response_cache, request_key
+from src.utils.resilience import UpstreamError, get_upstream
+
+logger = get_logger(__name__)
+
+# Map LangChain message types to DeepSeek roles
+ROLE_MAPPING = {
+    "system": "system",
+    "human": "user",
+    "ai": "assistant",
+    "assistant": "assistant",
+    "user": "user",
+    "function": "function"
+}
+
+
+def to_api_messages(messages: Union[str, List[Any]]) -> List[Dict[str, str]]:
+    """
+    Convert a prompt or a list of messages to the DeepSeek chat format.
+
+    Args:
+        messages: A prompt string, LangChain messages or role/content dicts
+
+    Returns:
+        List of {"role", "content"} dictionaries
+    """
+    if isinstance(messages, str):
+        return [{"role": "user", "content": messages}]
+
+    api_messages = []
+    for message in messages:
+        if hasattr(message, "content") and hasattr(message, "type"):
+            api_messages.append({"role": ROLE_MAPPING.get(message.type, "user"), "content": message.content})
+        elif isinstance(message, dict) and "content" in message:
+            api_messages.append({"role": message.get("role", "user"), "content": message["content"]})
+
+    if not api_messages:
+        raise ValueError("Could not extract content from message list")
+    return api_messages
+
+
+class AsyncDeepSeekAPI:
+    """Async client for the DeepSeek chat completions API."""
+
+    def __init__(
+        self,
+        api_key: str,
+        model_name: str = "deepseek-chat",
+        temperature: float = 0.1,
+        max_tokens: int = 1000,
+        top_p: float = 0.95,
+        api_base: str = "https://api.deepseek.com/v1",
+        request_timeout: float = 60,
+        pool_maxsize: int = 16,
+        use_cache: bool = True,
+        max_retries: int = 1,
+        retry_delay: float = 2
+    ):
+        """
+        Initialize the async client.
+
+        Args:
+            api_key: DeepSeek API key
+            model_name: Name of the chat model
+            temperature: Sampling temperature
+            max_tokens: Maximum number of tokens to generate
+            top_p: Nucleus sampling parameter
+            api_base: Base URL of the API
+            request_timeout: Timeout in seconds for connecting and between chunks
+            pool_maxsize: Maximum number of connections kept to the API host
+            use_cache: Whether complete (non-streamed) answers are cached
+            max_retries: Attempts per request, including the first
+            retry_delay: Backoff delay cap after the first failed attempt
+        """
+        self.api_key = api_key
+        self.model_name = model_name
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+        self.top_p = top_p
+        self.api_base = api_base
+        self.request_timeout = request_timeout
+        self.pool_maxsize = pool_maxsize
+        self.use_cache = use_cache
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+
+        # httpx clients are bound to the event loop they were first used on
+        self._http_client: Optional[httpx.AsyncClient] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @classmethod
+    def from_llm(cls, llm: DeepSeekAPI) -> "AsyncDeepSeekAPI":
+        """
+        Create an async client with the same settings as a DeepSeekAPI instance.
+
+        Args:
+            llm: A configured synchronous client
+
+        Returns:
+            A new AsyncDeepSeekAPI
+        """
+        return cls(
+            api_key=llm.api_key,
+            model_name=llm.model_name,
+            temperature=llm.temperature,
+            max_tokens=llm.max_tokens,
+            top_p=llm.top_p,
+            api_base=llm.api_base,
+            request_timeout=llm.request_timeout,
+            pool_maxsize=llm.pool_maxsize,
+            use_cache=llm.use_cache,
+            max_retries=llm.max_retries,
+            retry_delay=llm.retry_delay
+        )
+
+    def _get_http_client(self) -> httpx.AsyncClient:
+        """Get the pooled httpx client for the running event loop."""
+        loop = asyncio.get_running_loop()
+        if self._http_client is None or self._loop is not loop or self._http_client.is_closed:
+            self._http_client = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.request_timeout),
+                limits=httpx.Limits(
+                    max_connections=self.pool_maxsize,
+                    max_keepalive_connections=self.pool_maxsize
+                )
+            )
+            self._loop = loop
+        return self._http_client
+
+    def _build_request(self, messages: Union[str, List[Any]], stream: bool, **kwargs) -> Dict[str, Any]:
+        """Build the request body for a chat completion."""
+        data = {
+            "model": self.model_name,
+            "messages": to_api_messages(messages),
+            "temperature": kwargs.get("temperature", self.temperature),
+            "max_tokens": kwargs.get("max_tokens", self.max_tokens),
+            "top_p": kwargs.get("top_p", self.top_p),
+            "frequency_penalty": kwargs.get("frequency_penalty", 0.2),
+            "presence_penalty": kwargs.get("presence_penalty", 0.1),
+            "stream": stream
+        }
+        if kwargs.get("stop"):
+            data["stop"] = kwargs["stop"]
+        return data
+
+    @property
+    def _headers(self) -> Dict[str, str]:
+        return {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {self.api_key}"
+        }
+
+    async def astream(self, messages: Union[str, List[Any]], **kwargs) -> AsyncGenerator[str, None]:
+        """
+        Stream the answer token by token.
+
+        Args:
+            messages: A prompt string, LangChain messages or role/content dicts
+            **kwargs: Overrides for temperature, max_tokens, top_p, stop and penalties
+
+        Yields:
+            Content tokens as they arrive from the API
+        """
+        data = self._build_request(messages, stream=True, **kwargs)
+        start_time = time.time()
+        first_token_received = False
+
+        # Only opening the stream is retried; tokens already yielded are not replayed
+        response = await get_upstream("deepseek").acall(
+            lambda: self._open_stream(data),
+            operation="stream",
+            max_attempts=self.max_retries,
+            base_delay=self.retry_delay
+        )
+        try:
+            async for event in EventSource(response).aiter_sse():
+                if event.data == "[DONE]":
+                    break
+
+                try:
+                    chunk = json.loads(event.data)
+                except json.JSONDecodeError as e:
+                    logger.warning(f"Error parsing streaming chunk: {e}")
+                    continue
+
+                choices = chunk.get("choices") or []
+                content = choices[0].get("delta", {}).get("content", "") if choices else ""
+                if not content:
+                    continue
+
+                if not first_token_received:
+                    first_token_received = True
+                    api_logger.info(f"DeepSeek first token received in {time.time() - start_time:.2f}s")
+
+                yield content
+        finally:
+            await response.aclose()
+
+        api_logger.info(f"DeepSeek async streaming response completed in {time.time() - start_time:.2f}s")
+
+    async def ainvoke(self, messages: Union[str, List[Any]], **kwargs) -> str:
+        """
+        Get a complete answer without streaming.
+
+        Args:
+            messages: A prompt string, LangChain messages or role/content dicts
+            **kwargs: Overrides for temperature, max_tokens, top_p, stop and penalties
+
+        Returns:
+            The generated text
+        """
+        data = self._build_request(messages, stream=False, **kwargs)
+        cache_key = request_key(data) if self.use_cache else None
+        if cache_key:
+            cached = get_response_cache().get(cache_key)
+            if cached is not None:
+                logger.debug("Using cached response")
+                return cached
+        start_time = time.time()
+
+        result = await get_upstream("deepseek").acall(
+            lambda: self._complete(data),
+            operation="chat",
+            max_attempts=self.max_retries,
+            base_delay=self.retry_delay
+        )
+
+        api_logger.info(f"DeepSeek async API response received in {time.time() - start_time:.2f}s")
+        if cache_key:
+            get_response_cache().put(cache_key, result)
+        return result
+
+    @staticmethod
+    async def _error_message(response: httpx.Response, prefix: str) -> str:
+        """Build an error message from a failed API response."""
+        await response.aread()
+        error_msg = f"{prefix} with status code {response.status_code}"
+        try:
+            error_data = response.json()
+            if "error" in error_data:
+                error_msg += f": {error_data['error']}"
+        except ValueError:
+            error_msg += f": {response.text}"
+        return error_msg
+
+    async def _open_stream(self, data: Dict[str, Any]) -> httpx.Response:
+        """
+        Open a streaming chat completion request.
+
+        Args:
+            data: Request body
+
+        Returns:
+            The response, with the event stream not yet read
+
+        Raises:
+            UpstreamError: If the request fails
+        """
+        client = self._get_http_client()
+        request = client.build_request(
+            "POST",
+            f"{self.api_base}/chat/completions",
+            headers={**self._headers, "Accept": "text/event-stream", "Cache-Control": "no-store"},
+            json=data
+        )
+        try:
+            response = await client.send(request, stream=True)
+        except httpx.HTTPError as e:
+            logger.error(f"Streaming request exception: {str(e)}")
+            raise UpstreamError(f"DeepSeek API streaming request failed: {str(e)}") from e
+
+        if response.status_code != 200:
+            error_msg = await self._error_message(response, "DeepSeek API streaming request failed")
+            await response.aclose()
+            logger.error(error_msg)
+            raise UpstreamError(error_msg, status_code=response.status_code)
+        return response
+
+    async def _complete(self, data: Dict[str, Any]) -> str:
+        """
+        Make a single chat completion request.
+
+        Args:
+            data: Request body
+
+        Returns:
+            The generated text
+
+        Raises:
+            UpstreamError: If the request fails or the response cannot be parsed
+        """
+        try:
+            response = await self._get_http_client().post(
+                f"{self.api_base}/chat/completions",
+                headers=self._headers,
+                json=data
+            )
+        except httpx.HTTPError as e:
+            logger.error(f"Request exception: {str(e)}")
+            raise UpstreamError(f"DeepSeek API request failed: {str(e)}") from e
+
+        if response.status_code != 200:
+            error_msg = await self._error_message(response, "DeepSeek API request failed")
+            logger.error(error_msg)
+            raise UpstreamError(error_msg, status_code=response.status_code)
+
+        try:
+            return response.json()["choices"][0]["message"]["content"]
+        except (KeyError, IndexError, ValueError) as e:
+            raise UpstreamError(f"Failed to parse DeepSeek API response: {e}") from e
+
+    async def aclose(self) -> None:
+        """Close the underlying connection pool."""
+        if self._http_client is not None:
+            await self._http_client.aclose()
+            self._http_client = None
+            self._loop = None
+
+
+# Async clients keyed by config path, rebuilt when the shared sync client changes
+_ASYNC_CLIENTS: Dict[str, tuple] = {}
+_ASYNC_CLIENTS_LOCK = threading.Lock()
+
+
+async def _close_later(client: AsyncDeepSeekAPI, delay: float) -> None:
+    """Close a replaced client once the requests still using it have had time to finish."""
+    await asyncio.sleep(delay)
+    await client.aclose()
+
+
+def _schedule_close(client: AsyncDeepSeekAPI, delay: float = 0.0) -> None:
+    """Close a client's connection pool on the event loop it is bound to, after delay seconds."""
+    loop = client._loop
+    if client._http_client is None or loop is None or loop.is_closed():
+        return
+    try:
+        asyncio.run_coroutine_threadsafe(_close_later(client, delay), loop)
+    except RuntimeError:
+        # The loop is shutting down and takes the pool with it
+        pass
+
+
+def get_async_deepseek_client(config_path: str = "config.yaml") -> AsyncDeepSeekAPI:
+    """
+    Get the shared async DeepSeek client for a configuration file.
+
+    Settings are taken from the shared DeepSeekAPI client, so both clients
+    pick up configuration reloads at the same time.
+
+    Args:
+        config_path: Path to the configuration file
+
+    Returns:
+        A shared AsyncDeepSeekAPI instance
+    """
+    llm = get_deepseek_client(config_path)
+    key = os.path.abspath(config_path)
+
+    with _ASYNC_CLIENTS_LOCK:
+        entry = _ASYNC_CLIENTS.get(key)
+        if entry is not None and entry[0] is llm:
+            return entry[1]
+
+        if entry is not None:
+            # Let requests in flight on the old client finish before closing its pool
+            _schedule_close(entry[1], delay=entry[1].request_timeout)
+        client = AsyncDeepSeekAPI.from_llm(llm)
+        _ASYNC_CLIENTS[key] = (llm, client)
+        logger.info(f"Created shared async DeepSeek client for {config_path}")
+        return client
+
+
+async def close_async_deepseek_clients() -> None:
+    """Close the connection pools of all shared async DeepSeek clients, e.g. on shutdown."""
+    with _ASYNC_CLIENTS_LOCK:
+        clients = [client for _, client in _ASYNC_CLIENTS.values()]
+        _ASYNC_CLIENTS.clear()
+
+    loop = asyncio.get_running_loop()
+    for client in clients:
+        if client._loop is loop:
+            await client.aclose()
+        else:
+            _schedule_close(client)
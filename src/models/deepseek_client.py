@@ -6,10 +6,8 @@
 import sys
 import json
 import requests
-import yaml
 import time
-import hashlib
-from typing import Any, Dict, List, Mapping, Optional, Union, ClassVar
+from typing import Any, Dict, List, Mapping, Optional, Union
 from functools import lru_cache
 from dotenv import load_dotenv
 from langchain.callbacks.manager import CallbackManagerForLLMRun
@@ -18,12 +16,18 @@
 import logging
 import sseclient
 import uuid
+import threading
 
 # Add parent directory to path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
 
 # Import project modules
 from src.utils.logger import get_logger, api_logger
+from src.utils.config import get_config
+from src.utils.http_pool import get_http_session, get_pool_stats
+from src.models.embedding_cache import get_embedding_cache
+from src.models.response_cache import get_response_cache, request_key
+from src.utils.resilience import UpstreamError, get_upstream
 
 # Load environment variables
 load_dotenv()
@@ -31,9 +35,7 @@
 # Configure module logger
 logger = get_logger(__name__)
 
-# Create a simple cache for API responses
-RESPONSE_CACHE = {}
-MAX_CACHE_SIZE = 100  # Maximum number of cached responses
+EMBEDDING_MODEL = "deepseek-embed"
 
 class DeepSeekAPI(LLM, BaseModel):
     """LangChain compatible client for the DeepSeek API."""
@@ -48,9 +50,9 @@ class DeepSeekAPI(LLM, BaseModel):
     max_retries: int = Field(default=3)
     retry_delay: int = Field(default=2)
     use_cache: bool = Field(default=True)  # Whether to use caching
-    
-    # Add class variables with proper type annotations
-    EMBEDDING_CACHE: ClassVar[Dict[str, List[float]]] = {}
+    pool_connections: int = Field(default=4)  # Number of per-host connection pools
+    pool_maxsize: int = Field(default=16)  # Maximum keep-alive connections per host
+    pool_block: bool = Field(default=False)  # Block instead of exceeding pool_maxsize
     
     model_config = {"arbitrary_types_allowed": True}
     
@@ -63,28 +65,31 @@ def validate_environment(cls, values: Dict) -> Dict:
         
         logger.info(f"Initializing DeepSeek API client using config from {config_path}")
         
-        if os.path.exists(config_path):
-            with open(config_path, 'r') as file:
-                config = yaml.safe_load(file)
-                llm_config = config.get('llm', {})
-                
-                # Set API key from config or environment variable
-                api_key = llm_config.get('api_key', '')
-                if not api_key:
-                    api_key = os.getenv('DEEPSEEK_API_KEY', '')
-                    logger.debug("Using API key from environment variable")
-                else:
-                    logger.debug("Using API key from config file")
-                
-                # Apply config values to dictionary
-                values["api_key"] = api_key
-                values["model_name"] = llm_config.get('model_name', values.get("model_name", "deepseek-chat"))
-                values["temperature"] = llm_config.get('temperature', values.get("temperature", 0.1))
-                values["max_tokens"] = llm_config.get('max_tokens', values.get("max_tokens", 1000))
-                values["request_timeout"] = llm_config.get('request_timeout', values.get("request_timeout", 60))
-                values["max_retries"] = llm_config.get('max_retries', values.get("max_retries", 3))
-                values["retry_delay"] = llm_config.get('retry_delay', values.get("retry_delay", 2))
-                values["use_cache"] = llm_config.get('use_cache', values.get("use_cache", True))
+        # Use the shared configuration snapshot instead of re-parsing the file
+        config = get_config(config_path)
+        if config.exists:
+            llm_config = config.section('llm')
+            
+            # Set API key from config or environment variable
+            api_key = llm_config.get('api_key', '')
+            if not api_key:
+                api_key = os.getenv('DEEPSEEK_API_KEY', '')
+                logger.debug("Using API key from environment variable")
+            else:
+                logger.debug("Using API key from config file")
+            
+            # Apply config values to dictionary
+            values["api_key"] = api_key
+            values["model_name"] = llm_config.get('model_name', values.get("model_name", "deepseek-chat"))
+            values["temperature"] = llm_config.get('temperature', values.get("temperature", 0.1))
+            values["max_tokens"] = llm_config.get('max_tokens', values.get("max_tokens", 1000))
+            values["request_timeout"] = llm_config.get('request_timeout', values.get("request_timeout", 60))
+            values["max_retries"] = llm_config.get('max_retries', values.get("max_retries", 3))
+            values["retry_delay"] = llm_config.get('retry_delay', values.get("retry_delay", 2))
+            values["use_cache"] = llm_config.get('use_cache', values.get("use_cache", True))
+            values["pool_connections"] = llm_config.get('pool_connections', values.get("pool_connections", 4))
+            values["pool_maxsize"] = llm_config.get('pool_maxsize', values.get("pool_maxsize", 16))
+            values["pool_block"] = llm_config.get('pool_block', values.get("pool_block", False))
         else:
             # Use environment variable if no config file
             logger.warning(f"Config file {config_path} not found, using environment variables")
@@ -103,32 +108,15 @@ def validate_environment(cls, values: Dict) -> Dict:
     def _llm_type(self) -> str:
         return "deepseek"
     
-    def _get_cache_key(self, prompt: str, stop: Optional[List[str]] = None, **kwargs) -> str:
-        """Generate a cache key for the prompt and parameters."""
-        # Create a string representation of the kwargs that affect the output
-        kwargs_str = json.dumps({
-            "model": self.model_name,
-            "temperature": self.temperature,
-            "max_tokens": self.max_tokens,
-            "top_p": self.top_p,
-            "stop": stop,
-            **{k: v for k, v in kwargs.items() if k not in ["stream", "timeout"]}
-        }, sort_keys=True)
-        
-        # Combine prompt and kwargs to create a hash
-        combined = f"{prompt}|{kwargs_str}"
-        return hashlib.md5(combined.encode()).hexdigest()
-    
-    def _manage_cache(self):
-        """Manage the cache size to prevent memory issues."""
-        global RESPONSE_CACHE
-        if len(RESPONSE_CACHE) > MAX_CACHE_SIZE:
-            # Remove oldest 20% of cache entries
-            items_to_remove = int(MAX_CACHE_SIZE * 0.2)
-            keys_to_remove = list(RESPONSE_CACHE.keys())[:items_to_remove]
-            for key in keys_to_remove:
-                del RESPONSE_CACHE[key]
-            logger.debug(f"Cache pruned, removed {items_to_remove} entries")
+    @property
+    def session(self):
+        """Shared keep-alive session used for all DeepSeek API requests."""
+        return get_http_session(
+            "deepseek",
+            pool_connections=self.pool_connections,
+            pool_maxsize=self.pool_maxsize,
+            pool_block=self.pool_block
+        )
     
     def _call(
         self,
@@ -142,13 +130,6 @@ def _call(
         stream = kwargs.get("stream", False)
         if stream:
             return self._streaming_call(prompt, stop, run_manager, **kwargs)
-            
-        # Check cache first if caching is enabled
-        if self.use_cache:
-            cache_key = self._get_cache_key(prompt, stop, **kwargs)
-            if cache_key in RESPONSE_CACHE:
-                logger.debug("Using cached response")
-                return RESPONSE_CACHE[cache_key]
         
         # Only log a preview of the prompt to reduce overhead
         prompt_preview = prompt[:50] + "..." if len(prompt) > 50 else prompt
@@ -179,119 +160,115 @@ def _call(
             if key in ["stream", "stop", "n", "logit_bias"]:
                 data[key] = value
         
+        # Check cache first if caching is enabled
+        if self.use_cache:
+            cache_key = request_key(data)
+            cached = get_response_cache().get(cache_key)
+            if cached is not None:
+                logger.debug("Using cached response")
+                return cached
+        
         # Start timing the API call
         start_time = time.time()
         
-        # Implement retry logic
-        for attempt in range(1, self.max_retries + 1):
-            try:
-                # Only log detailed debugging information on first attempt
-                if attempt == 1:
-                    logger.debug(f"Making API request to DeepSeek")
-                else:
-                    logger.debug(f"Retrying API request, attempt {attempt}/{self.max_retries}")
-                
-                # Make API request
-                response = requests.post(
-                    f"{self.api_base}/chat/completions",
-                    headers=headers,
-                    data=json.dumps(data),
-                    timeout=self.request_timeout
-                )
-                
-                # Handle API response
-                if response.status_code != 200:
-                    error_msg = f"DeepSeek API request failed with status code {response.status_code}"
-                    try:
-                        error_data = response.json()
-                        if "error" in error_data:
-                            error_msg += f": {error_data['error']}"
-                    except:
-                        error_msg += f": {response.text}"
-                    
-                    logger.error(error_msg)
-                    
-                    # If this is the last attempt, raise the error
-                    if attempt == self.max_retries:
-                        api_logger.error(f"API call failed after {self.max_retries} attempts: {error_msg}")
-                        raise ValueError(error_msg)
-                    
-                    # Otherwise, wait and retry with exponential backoff
-                    wait_time = self.retry_delay * (2 ** (attempt - 1))
-                    logger.warning(f"Retrying in {wait_time} seconds...")
-                    time.sleep(wait_time)
-                    continue
-                
-                # Extract and return the generated text
-                try:
-                    response_data = response.json()
-                    result = response_data["choices"][0]["message"]["content"]
-                    
-                    # Log API performance
-                    duration = time.time() - start_time
-                    api_logger.info(f"DeepSeek API response received in {duration:.2f}s")
-                    
-                    # Log the full response content to a dedicated file
-                    try:
-                        # Create a responses directory if it doesn't exist
-                        responses_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'responses')
-                        os.makedirs(responses_dir, exist_ok=True)
-                        
-                        # Write response to timestamped file
-                        timestamp = time.strftime("%Y%m%d-%H%M%S")
-                        response_file = os.path.join(responses_dir, f'response-{timestamp}.txt')
-                        
-                        with open(response_file, 'w') as f:
-                            f.write(f"===== DEEPSEEK RESPONSE AT {time.strftime('%Y-%m-%d %H:%M:%S')} =====\n\n")
-                            f.write(result)
-                            f.write("\n\n====== END OF RESPONSE ======\n")
-                        
-                        # Log that we saved the full response
-                        logger.info(f"Full response saved to {response_file}")
-                    except Exception as e:
-                        logger.error(f"Failed to save response to file: {e}")
-                    
-                    # Only log a preview of the result to reduce overhead
-                    if logger.level <= logging.DEBUG:
-                        result_preview = result[:50] + "..." if len(result) > 50 else result
-                        logger.debug(f"API response: {result_preview}")
-                    else:
-                        # Even at INFO level, log more of the content
-                        logger.info(f"API response (first 500 chars): {result[:500]}...")
-                    
-                    # Cache the result if caching is enabled
-                    if self.use_cache:
-                        RESPONSE_CACHE[cache_key] = result
-                        self._manage_cache()
-                        
-                    return result
-                except (KeyError, IndexError) as e:
-                    error_msg = f"Failed to parse DeepSeek API response: {e}"
-                    logger.error(error_msg)
-                    if attempt == self.max_retries:
-                        api_logger.error(f"Failed to parse API response: {error_msg}")
-                        raise ValueError(error_msg)
-                    
-                    # Use exponential backoff for retries
-                    wait_time = self.retry_delay * (2 ** (attempt - 1))
-                    logger.warning(f"Retrying in {wait_time} seconds...")
-                    time.sleep(wait_time)
-            
-            except requests.RequestException as e:
-                logger.error(f"Request exception: {str(e)}")
-                if attempt == self.max_retries:
-                    api_logger.error(f"API call failed due to request exception: {str(e)}")
-                    raise ValueError(f"DeepSeek API request failed: {str(e)}")
-                
-                # Use exponential backoff for retries
-                wait_time = self.retry_delay * (2 ** (attempt - 1))
-                logger.warning(f"Retrying in {wait_time} seconds...")
-                time.sleep(wait_time)
-        
-        # We should never reach here due to the raises above
-        error_msg = "Unexpected error in DeepSeek API call"
-        logger.critical(error_msg)
-        raise RuntimeError(error_msg)
+        # Retries, backoff and the circuit breaker are handled by the resilience layer
+        try:
+            result = get_upstream("deepseek").call(
+                lambda: self._complete(headers, data),
+                operation="chat",
+                max_attempts=self.max_retries,
+                base_delay=self.retry_delay
+            )
+        except ValueError as e:
+            api_logger.error(f"API call failed: {e}")
+            raise
+        
+        # Log API performance
+        duration = time.time() - start_time
+        api_logger.info(f"DeepSeek API response received in {duration:.2f}s")
+        
+        # Log the full response content to a dedicated file
+        try:
+            # Create a responses directory if it doesn't exist
+            responses_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'responses')
+            os.makedirs(responses_dir, exist_ok=True)
+            
+            # Write response to timestamped file
+            timestamp = time.strftime("%Y%m%d-%H%M%S")
+            response_file = os.path.join(responses_dir, f'response-{timestamp}.txt')
+            
+            with open(response_file, 'w') as f:
+                f.write(f"===== DEEPSEEK RESPONSE AT {time.strftime('%Y-%m-%d %H:%M:%S')} =====\n\n")
+                f.write(result)
+                f.write("\n\n====== END OF RESPONSE ======\n")
+            
+            # Log that we saved the full response
+            logger.info(f"Full response saved to {response_file}")
+        except Exception as e:
+            logger.error(f"Failed to save response to file: {e}")
+        
+        # Only log a preview of the result to reduce overhead
+        if logger.level <= logging.DEBUG:
+            result_preview = result[:50] + "..." if len(result) > 50 else result
+            logger.debug(f"API response: {result_preview}")
+        else:
+            # Even at INFO level, log more of the content
+            logger.info(f"API response (first 500 chars): {result[:500]}...")
+        
+        # Cache the result if caching is enabled
+        if self.use_cache:
+            get_response_cache().put(cache_key, result)
+            
+        return result
+    
+    @staticmethod
+    def _error_message(response: requests.Response, prefix: str) -> str:
+        """Build an error message from a failed API response."""
+        error_msg = f"{prefix} with status code {response.status_code}"
+        try:
+            error_data = response.json()
+            if "error" in error_data:
+                error_msg += f": {error_data['error']}"
+        except:
+            error_msg += f": {response.text}"
+        return error_msg
+    
+    def _complete(self, headers: Dict[str, str], data: Dict[str, Any]) -> str:
+        """
+        Make a single chat completion request.
+        
+        Args:
+            headers: Request headers
+            data: Request body
+            
+        Returns:
+            The generated text
+            
+        Raises:
+            UpstreamError: If the request fails or the response cannot be parsed
+        """
+        try:
+            response = self.session.post(
+                f"{self.api_base}/chat/completions",
+                headers=headers,
+                data=json.dumps(data),
+                timeout=self.request_timeout
+            )
+        except requests.RequestException as e:
+            logger.error(f"Request exception: {str(e)}")
+            raise UpstreamError(f"DeepSeek API request failed: {str(e)}") from e
+        
+        if response.status_code != 200:
+            error_msg = self._error_message(response, "DeepSeek API request failed")
+            logger.error(error_msg)
+            raise UpstreamError(error_msg, status_code=response.status_code)
+        
+        try:
+            return response.json()["choices"][0]["message"]["content"]
+        except (KeyError, IndexError, ValueError) as e:
+            error_msg = f"Failed to parse DeepSeek API response: {e}"
+            logger.error(error_msg)
+            raise UpstreamError(error_msg) from e
     
     def _streaming_call(
         self,
@@ -478,6 +455,10 @@ def invoke(self, input_data: Union[str, Dict[str, Any], List], **kwargs) -> Unio
                     # Start timing the API call
                     start_time = time.time()
                     
+                    # Check cache first if caching is enabled (streams are not cached)
+                    cache_key = request_key(data) if self.use_cache and not stream else None
+                    cached = get_response_cache().get(cache_key) if cache_key else None
+                    
                     if stream:
                         # Handle streaming response with the messages format
                         # Don't pass callbacks twice - remove it from kwargs if present
@@ -487,32 +468,18 @@ def invoke(self, input_data: Union[str, Dict[str, Any], List], **kwargs) -> Unio
                             result = self._streaming_call_with_messages(data, start_time, callbacks=kwargs.get("callbacks"), **filtered_kwargs)
                         else:
                             result = self._streaming_call_with_messages(data, start_time, **kwargs)
+                    elif cached is not None:
+                        logger.debug("Using cached response for message-based request")
+                        result = cached
                     else:
                         # Use single message format for direct API call
-                        response = requests.post(
-                            f"{self.api_base}/chat/completions",
-                            headers=headers,
-                            data=json.dumps(data),
-                            timeout=self.request_timeout
+                        result = get_upstream("deepseek").call(
+                            lambda: self._complete(headers, data),
+                            operation="chat",
+                            max_attempts=self.max_retries,
+                            base_delay=self.retry_delay
                         )
                         
-                        # Handle potential errors
-                        if response.status_code != 200:
-                            error_msg = f"DeepSeek API request failed with status code {response.status_code}"
-                            try:
-                                error_data = response.json()
-                                if "error" in error_data:
-                                    error_msg += f": {error_data['error']}"
-                            except:
-                                error_msg += f": {response.text}"
-                            
-                            logger.error(error_msg)
-                            raise ValueError(error_msg)
-                        
-                        # Extract and process response
-                        response_data = response.json()
-                        result = response_data["choices"][0]["message"]["content"]
-                        
                         # Log API performance
                         duration = time.time() - start_time
                         api_logger.info(f"DeepSeek API response received in {duration:.2f}s")
@@ -539,6 +506,10 @@ def invoke(self, input_data: Union[str, Dict[str, Any], List], **kwargs) -> Unio
                         
                         # Only log a preview of the result to reduce overhead
                         logger.info(f"API response (first 500 chars): {result[:500]}...")
+                        
+                        # Cache the result if caching is enabled
+                        if cache_key:
+                            get_response_cache().put(cache_key, result)
                 
                 logger.info(f"Generated result (list input): {result[:50]}...")
                 
@@ -605,19 +576,11 @@ def _streaming_call_with_messages(self, data, start_time, **kwargs):
         
         # Check cache first if caching is enabled (only check for non-stream requests)
         if self.use_cache and not data.get("stream", False):
-            # Create a cache key based on the messages and other relevant parameters
-            cache_key = json.dumps({
-                "messages": data.get("messages", []),
-                "temperature": data.get("temperature", self.temperature),
-                "max_tokens": data.get("max_tokens", self.max_tokens),
-                "top_p": data.get("top_p", self.top_p),
-                "model": data.get("model", self.model_name),
-                "stop": data.get("stop", None)
-            }, sort_keys=True)
-            
-            if cache_key in RESPONSE_CACHE:
+            cache_key = request_key(data)
+            cached = get_response_cache().get(cache_key)
+            if cached is not None:
                 logger.debug("Using cached response for message-based request")
-                return RESPONSE_CACHE[cache_key]
+                return cached
         
         headers = {
             "Content-Type": "application/json",
@@ -630,27 +593,14 @@ def _streaming_call_with_messages(self, data, start_time, **kwargs):
         full_response = ""
         
         try:
-            response = requests.post(
-                f"{self.api_base}/chat/completions",
-                headers=headers,
-                data=json.dumps(data),
-                timeout=self.request_timeout,
-                stream=True
+            # Only opening the stream is retried; tokens already streamed are not replayed
+            response = get_upstream("deepseek").call(
+                lambda: self._open_stream(headers, data),
+                operation="stream",
+                max_attempts=self.max_retries,
+                base_delay=self.retry_delay
             )
             
-            # Handle API response errors
-            if response.status_code != 200:
-                error_msg = f"DeepSeek API streaming request failed with status code {response.status_code}"
-                try:
-                    error_data = json.loads(response.text)
-                    if "error" in error_data:
-                        error_msg += f": {error_data['error']}"
-                except:
-                    error_msg += f": {response.text}"
-                
-                logger.error(error_msg)
-                raise ValueError(error_msg)
-            
             # Process the streaming response
             client = sseclient.SSEClient(response)
             
@@ -720,6 +670,9 @@ def _streaming_call_with_messages(self, data, start_time, **kwargs):
                     except Exception as e:
                         logger.warning(f"Error parsing streaming chunk: {e}")
             
+            # Return the connection to the pool even if we stopped before the end of the body
+            response.close()
+            
             # Log completion of streaming
             duration = time.time() - start_time
             api_logger.info(f"DeepSeek streaming response completed in {duration:.2f}s")
@@ -749,8 +702,7 @@ def _streaming_call_with_messages(self, data, start_time, **kwargs):
             
             # Cache the result if caching is enabled
             if self.use_cache and not data.get("stream", False):
-                RESPONSE_CACHE[cache_key] = full_response
-                self._manage_cache()
+                get_response_cache().put(cache_key, full_response)
             
             return full_response
             
@@ -758,14 +710,47 @@ def _streaming_call_with_messages(self, data, start_time, **kwargs):
             logger.error(f"Streaming request exception: {str(e)}")
             raise ValueError(f"DeepSeek API streaming request failed: {str(e)}")
     
+    def _open_stream(self, headers: Dict[str, str], data: Dict[str, Any]) -> requests.Response:
+        """
+        Open a streaming chat completion request.
+        
+        Args:
+            headers: Request headers
+            data: Request body
+            
+        Returns:
+            The response, with the event stream not yet read
+            
+        Raises:
+            UpstreamError: If the request fails
+        """
+        try:
+            response = self.session.post(
+                f"{self.api_base}/chat/completions",
+                headers=headers,
+                data=json.dumps(data),
+                timeout=self.request_timeout,
+                stream=True
+            )
+        except requests.RequestException as e:
+            logger.error(f"Streaming request exception: {str(e)}")
+            raise UpstreamError(f"DeepSeek API streaming request failed: {str(e)}") from e
+        
+        if response.status_code != 200:
+            error_msg = self._error_message(response, "DeepSeek API streaming request failed")
+            response.close()
+            logger.error(error_msg)
+            raise UpstreamError(error_msg, status_code=response.status_code)
+        return response
+    
     def get_embedding(self, text: str) -> List[float]:
         """Get embedding for the given text using DeepSeek's embedding API."""
-        # Check cache first
+        # Check the shared embedding cache first
         if self.use_cache:
-            cache_key = hashlib.md5(text.encode()).hexdigest()
-            if cache_key in self.EMBEDDING_CACHE:
+            cached = get_embedding_cache().get_many(EMBEDDING_MODEL, [text])[0]
+            if cached is not None:
                 logger.info("Using cached embedding")
-                return self.EMBEDDING_CACHE[cache_key]
+                return cached.tolist()
                 
         api_logger.info(f"Getting embedding for text: {text[:50]}...")
         
@@ -776,89 +761,66 @@ def get_embedding(self, text: str) -> List[float]:
         
         # Prepare request data
         data = {
-            "model": "deepseek-embed",
+            "model": EMBEDDING_MODEL,
             "input": text
         }
         
-        # Implement retry logic
-        for attempt in range(1, self.max_retries + 1):
-            try:
-                logger.debug(f"Making embedding API request to DeepSeek, attempt {attempt}/{self.max_retries}")
-                
-                # Make API request
-                response = requests.post(
-                    f"{self.api_base}/embeddings",
-                    headers=headers,
-                    data=json.dumps(data),
-                    timeout=self.request_timeout
-                )
-                
-                # Handle API response
-                if response.status_code != 200:
-                    error_msg = f"DeepSeek embedding API request failed with status code {response.status_code}"
-                    try:
-                        error_data = response.json()
-                        if "error" in error_data:
-                            error_msg += f": {error_data['error']}"
-                    except:
-                        error_msg += f": {response.text}"
-                    
-                    logger.error(error_msg)
-                    
-                    # If this is the last attempt, raise the error
-                    if attempt == self.max_retries:
-                        api_logger.error(f"Embedding API call failed after {self.max_retries} attempts: {error_msg}")
-                        raise ValueError(error_msg)
-                    
-                    # Otherwise, wait and retry
-                    wait_time = self.retry_delay * attempt
-                    logger.warning(f"Retrying in {wait_time} seconds...")
-                    time.sleep(wait_time)
-                    continue
-                
-                # Extract and return the embedding
-                try:
-                    response_data = response.json()
-                    embedding = response_data["data"][0]["embedding"]
-                    api_logger.info(f"Embedding received, dimension: {len(embedding)}")
-                    logger.debug("Embedding API call successful")
-                    
-                    # Cache the embedding
-                    if self.use_cache:
-                        cache_key = hashlib.md5(text.encode()).hexdigest()
-                        self.EMBEDDING_CACHE[cache_key] = embedding
-                        # Manage embedding cache size
-                        if len(self.EMBEDDING_CACHE) > MAX_CACHE_SIZE:
-                            keys_to_remove = list(self.EMBEDDING_CACHE.keys())[:int(MAX_CACHE_SIZE * 0.2)]
-                            for key in keys_to_remove:
-                                del self.EMBEDDING_CACHE[key]
-                    
-                    return embedding
-                except (KeyError, IndexError) as e:
-                    error_msg = f"Failed to parse DeepSeek embedding API response: {e}"
-                    logger.error(error_msg)
-                    if attempt == self.max_retries:
-                        api_logger.error(f"Failed to parse embedding API response after {self.max_retries} attempts: {error_msg}")
-                        raise ValueError(error_msg)
-                    
-                    wait_time = self.retry_delay * attempt
-                    logger.warning(f"Retrying in {wait_time} seconds...")
-                    time.sleep(wait_time)
-            
-            except requests.RequestException as e:
-                logger.error(f"Request exception in embedding API: {str(e)}")
-                if attempt == self.max_retries:
-                    api_logger.error(f"Embedding API call failed after {self.max_retries} attempts due to request exception: {str(e)}")
-                    raise ValueError(f"DeepSeek embedding API request failed: {str(e)}")
-                
-                wait_time = self.retry_delay * attempt
-                logger.warning(f"Retrying in {wait_time} seconds...")
-                time.sleep(wait_time)
-        
-        # We should never reach here due to the raises above
-        error_msg = "Unexpected error in DeepSeek embedding API call"
-        logger.critical(error_msg)
-        raise RuntimeError(error_msg)
+        try:
+            embedding = get_upstream("deepseek").call(
+                lambda: self._embed(headers, data),
+                operation="embedding",
+                max_attempts=self.max_retries,
+                base_delay=self.retry_delay
+            )
+        except ValueError as e:
+            api_logger.error(f"Embedding API call failed: {e}")
+            raise
+        
+        api_logger.info(f"Embedding received, dimension: {len(embedding)}")
+        logger.debug("Embedding API call successful")
+        
+        # Cache the embedding
+        if self.use_cache:
+            get_embedding_cache().put_many(EMBEDDING_MODEL, [text], [embedding])
+        
+        return embedding
+    
+    def _embed(self, headers: Dict[str, str], data: Dict[str, Any]) -> List[float]:
+        """
+        Make a single embedding request.
+        
+        Args:
+            headers: Request headers
+            data: Request body
+            
+        Returns:
+            The embedding
+            
+        Raises:
+            UpstreamError: If the request fails or the response cannot be parsed
+        """
+        try:
+            response = self.session.post(
+                f"{self.api_base}/embeddings",
+                headers=headers,
+                data=json.dumps(data),
+                timeout=self.request_timeout
+            )
+        except requests.RequestException as e:
+            logger.error(f"Request exception in embedding API: {str(e)}")
+            raise UpstreamError(f"DeepSeek embedding API request failed: {str(e)}") from e
+        
+        if response.status_code != 200:
+            error_msg = self._error_message(response, "DeepSeek embedding API request failed")
+            logger.error(error_msg)
+            raise UpstreamError(error_msg, status_code=response.status_code)
+        
+        try:
+            return response.json()["data"][0]["embedding"]
+        except (KeyError, IndexError, ValueError) as e:
+            error_msg = f"Failed to parse DeepSeek embedding API response: {e}"
+            logger.error(error_msg)
+            raise UpstreamError(error_msg) from e
     
     def _identifying_params(self) -> Mapping[str, Any]:
         """Return identifying parameters for logging."""
@@ -870,6 +832,60 @@ def _identifying_params(self) -> Mapping[str, Any]:
             "use_cache": self.use_cache
         }
 
+# Shared clients keyed by (config path, config version)
+_CLIENTS: Dict[tuple, "DeepSeekAPI"] = {}
+_CLIENTS_LOCK = threading.Lock()
+_CLIENT_STATS = {"created": 0, "reused": 0}
+
+
+def get_deepseek_client(config_path: str = "config.yaml") -> DeepSeekAPI:
+    """
+    Get the shared DeepSeek client for a configuration file.
+    
+    The client is built once and reused across requests. It is rebuilt only
+    when the configuration snapshot changes, so settings reloaded through the
+    admin API take effect without restarting the process.
+    
+    Args:
+        config_path: Path to the configuration file
+        
+    Returns:
+        A shared DeepSeekAPI instance
+    """
+    key = (os.path.abspath(config_path), get_config(config_path).version)
+    
+    with _CLIENTS_LOCK:
+        client = _CLIENTS.get(key)
+        if client is not None:
+            _CLIENT_STATS["reused"] += 1
+            return client
+        
+        client = DeepSeekAPI(config_path=config_path)
+        
+        # Drop clients built from older versions of the same config file
+        for stale_key in [k for k in _CLIENTS if k[0] == key[0]]:
+            del _CLIENTS[stale_key]
+        
+        _CLIENTS[key] = client
+        _CLIENT_STATS["created"] += 1
+        logger.info(f"Created shared DeepSeek client for {config_path} (config version {key[1]})")
+        return client
+
+
+def get_client_stats() -> Dict[str, Any]:
+    """
+    Get statistics about shared DeepSeek clients and their connection pool.
+    
+    Returns:
+        Dictionary with client reuse counts and connection pool statistics
+    """
+    with _CLIENTS_LOCK:
+        stats = dict(_CLIENT_STATS)
+        stats["active_clients"] = len(_CLIENTS)
+    stats["connection_pool"] = get_pool_stats("deepseek")
+    return stats
+
+
 if __name__ == "__main__":
     # Example usage
     try:
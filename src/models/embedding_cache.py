@@ -0,0 +1,401 @@
+"""
+Persistent embedding cache shared by all embedders.
+
+Embeddings are keyed by (model name, hash of the normalized text). Vectors are
+stored in one memory-mapped float32 file per dimension, and a SQLite database
+maps each key to its row in that file. The least recently used entries are
+evicted when the cache is full, and their rows are reused.
+
+Because the cache survives restarts, retraining or reindexing only embeds the
+chunks that changed.
+"""
+
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+import unicodedata
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from src.utils.logger import get_logger
+from src.utils.config import get_config
+
+logger = get_logger(__name__)
+
+DEFAULT_CACHE_DIR = os.path.join("data", "cache", "embeddings")
+DEFAULT_MAX_ENTRIES = 200000
+
+# Rows added to a vector file when it has to grow
+MIN_GROWTH_ROWS = 1024
+
+# Fraction of the cache evicted at once when it is full, to avoid evicting on every insert
+EVICTION_FRACTION = 0.1
+
+
+def normalize_text(text: str) -> str:
+    """Normalize unicode and whitespace so trivially different texts share an entry."""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def text_hash(text: str) -> str:
+    """Hash of the normalized text, used as the cache key."""
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Disk-backed LRU cache of embedding vectors.
+
+    All methods are thread-safe, and several processes can share a cache
+    directory: writes are serialized by the SQLite write lock.
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, max_entries: int = DEFAULT_MAX_ENTRIES,
+                 enabled: bool = True):
+        """
+        Initialize the embedding cache.
+
+        Args:
+            cache_dir: Directory for the SQLite index and the vector files
+            max_entries: Maximum number of cached embeddings
+            enabled: If False, embed() calls the embedding function directly
+        """
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.enabled = enabled
+
+        self._lock = threading.RLock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._vectors: Dict[int, np.memmap] = {}
+
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._model_stats: Dict[str, Dict[str, int]] = {}
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open the SQLite index, creating the schema on first use."""
+        if self._conn is None:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            conn = sqlite3.connect(os.path.join(self.cache_dir, "index.sqlite"), check_same_thread=False, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS entries (
+                    model TEXT NOT NULL,
+                    text_hash TEXT NOT NULL,
+                    dim INTEGER NOT NULL,
+                    slot INTEGER NOT NULL,
+                    last_used REAL NOT NULL,
+                    PRIMARY KEY (model, text_hash)
+                );
+                CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used);
+                CREATE TABLE IF NOT EXISTS free_slots (
+                    dim INTEGER NOT NULL,
+                    slot INTEGER NOT NULL,
+                    PRIMARY KEY (dim, slot)
+                );
+                CREATE TABLE IF NOT EXISTS slot_counters (
+                    dim INTEGER PRIMARY KEY,
+                    next_slot INTEGER NOT NULL
+                );
+            """)
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def _vector_file(self, dim: int, min_rows: int = 0) -> np.memmap:
+        """Get the memory-mapped vector file for a dimension, growing it to hold min_rows."""
+        vectors = self._vectors.get(dim)
+        capacity = vectors.shape[0] if vectors is not None else 0
+        if vectors is not None and capacity >= min_rows:
+            return vectors
+
+        path = os.path.join(self.cache_dir, f"vectors_{dim}.f32")
+        row_bytes = dim * np.dtype(np.float32).itemsize
+        file_rows = os.path.getsize(path) // row_bytes if os.path.exists(path) else 0
+
+        if file_rows < max(min_rows, 1):
+            new_rows = max(min_rows, file_rows * 2, MIN_GROWTH_ROWS)
+            if vectors is not None:
+                vectors.flush()
+            with open(path, "ab") as f:
+                f.truncate(new_rows * row_bytes)
+            file_rows = new_rows
+
+        vectors = np.memmap(path, dtype=np.float32, mode="r+", shape=(file_rows, dim))
+        self._vectors[dim] = vectors
+        return vectors
+
+    def _record(self, model: str, hits: int, misses: int) -> None:
+        """Update the hit and miss counters."""
+        self.hits += hits
+        self.misses += misses
+        stats = self._model_stats.setdefault(model, {"hits": 0, "misses": 0})
+        stats["hits"] += hits
+        stats["misses"] += misses
+
+    def get_many(self, model: str, texts: Sequence[str]) -> List[Optional[np.ndarray]]:
+        """
+        Look up cached embeddings.
+
+        Args:
+            model: Name of the embedding model
+            texts: Texts to look up
+
+        Returns:
+            One float32 vector per text, or None for texts that are not cached
+        """
+        hashes = [text_hash(text) for text in texts]
+        results: List[Optional[np.ndarray]] = [None] * len(texts)
+
+        with self._lock:
+            conn = self._connect()
+            found = {}
+            unique_hashes = list(dict.fromkeys(hashes))
+            # Stay below SQLite's bound parameter limit
+            for start in range(0, len(unique_hashes), 500):
+                batch = unique_hashes[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = conn.execute(
+                    f"SELECT text_hash, dim, slot FROM entries WHERE model = ? AND text_hash IN ({placeholders})",
+                    [model, *batch]
+                ).fetchall()
+                for hash_value, dim, slot in rows:
+                    found[hash_value] = (dim, slot)
+
+            if found:
+                now = time.time()
+                conn.executemany(
+                    "UPDATE entries SET last_used = ? WHERE model = ? AND text_hash = ?",
+                    [(now, model, hash_value) for hash_value in found]
+                )
+                conn.commit()
+
+            for i, hash_value in enumerate(hashes):
+                entry = found.get(hash_value)
+                if entry is not None:
+                    dim, slot = entry
+                    # Another process may have grown the file since it was mapped
+                    results[i] = np.array(self._vector_file(dim, slot + 1)[slot], dtype=np.float32)
+
+            hit_count = sum(1 for result in results if result is not None)
+            self._record(model, hit_count, len(texts) - hit_count)
+
+        return results
+
+    def _allocate_slots(self, conn: sqlite3.Connection, dim: int, count: int) -> List[int]:
+        """Take rows from the free list first, then from the end of the vector file."""
+        free = [row[0] for row in conn.execute(
+            "SELECT slot FROM free_slots WHERE dim = ? ORDER BY slot LIMIT ?", (dim, count)
+        )]
+        if free:
+            conn.executemany("DELETE FROM free_slots WHERE dim = ? AND slot = ?", [(dim, slot) for slot in free])
+
+        needed = count - len(free)
+        if needed:
+            row = conn.execute("SELECT next_slot FROM slot_counters WHERE dim = ?", (dim,)).fetchone()
+            next_slot = row[0] if row else 0
+            free.extend(range(next_slot, next_slot + needed))
+            conn.execute(
+                "INSERT OR REPLACE INTO slot_counters (dim, next_slot) VALUES (?, ?)",
+                (dim, next_slot + needed)
+            )
+        return free
+
+    def _evict(self, conn: sqlite3.Connection, incoming: int, keep: Set[Tuple[str, str]] = frozenset()) -> None:
+        """
+        Evict least recently used entries to make room for incoming entries.
+
+        Entries in keep are being rewritten by the caller and are never
+        evicted, so their slots can't be handed out to other texts.
+        """
+        count = conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        overflow = count + incoming - self.max_entries
+        if overflow <= 0:
+            return
+
+        to_evict = min(count - len(keep), overflow + int(self.max_entries * EVICTION_FRACTION))
+        if to_evict <= 0:
+            return
+        rows = [
+            row for row in conn.execute(
+                "SELECT model, text_hash, dim, slot FROM entries ORDER BY last_used LIMIT ?", (to_evict + len(keep),)
+            )
+            if (row[0], row[1]) not in keep
+        ][:to_evict]
+        conn.executemany("DELETE FROM entries WHERE model = ? AND text_hash = ?",
+                         [(model, hash_value) for model, hash_value, _, _ in rows])
+        conn.executemany("INSERT OR IGNORE INTO free_slots (dim, slot) VALUES (?, ?)",
+                         [(dim, slot) for _, _, dim, slot in rows])
+        self.evictions += len(rows)
+        logger.info(f"Evicted {len(rows)} embeddings from cache {self.cache_dir}")
+
+    def put_many(self, model: str, texts: Sequence[str], vectors: Any) -> None:
+        """
+        Store embeddings.
+
+        Args:
+            model: Name of the embedding model
+            texts: Texts the vectors belong to
+            vectors: One vector per text (array or list of lists)
+        """
+        if not texts:
+            return
+
+        matrix = np.asarray(vectors, dtype=np.float32)
+        if matrix.ndim != 2 or matrix.shape[0] != len(texts):
+            raise ValueError(f"Expected {len(texts)} vectors, got array of shape {matrix.shape}")
+
+        # Later duplicates of a text overwrite earlier ones
+        rows = {text_hash(text): i for i, text in enumerate(texts)}
+        dim = matrix.shape[1]
+
+        with self._lock:
+            conn = self._connect()
+            # Take the write lock before reading, so that processes sharing the cache can't claim the same slots
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                existing = {}
+                hashes = list(rows)
+                for start in range(0, len(hashes), 500):
+                    batch = hashes[start:start + 500]
+                    placeholders = ",".join("?" * len(batch))
+                    for hash_value, entry_dim, slot in conn.execute(
+                        f"SELECT text_hash, dim, slot FROM entries WHERE model = ? AND text_hash IN ({placeholders})",
+                        [model, *batch]
+                    ):
+                        if entry_dim == dim:
+                            existing[hash_value] = slot
+
+                new_hashes = [hash_value for hash_value in hashes if hash_value not in existing]
+                self._evict(conn, len(new_hashes), keep={(model, hash_value) for hash_value in existing})
+                slots = dict(existing)
+                slots.update(zip(new_hashes, self._allocate_slots(conn, dim, len(new_hashes))))
+
+                # Write the vectors before the index so the index never points at missing data
+                slot_array = np.fromiter((slots[h] for h in hashes), dtype=np.int64, count=len(hashes))
+                vector_file = self._vector_file(dim, int(slot_array.max()) + 1)
+                vector_file[slot_array] = matrix[[rows[h] for h in hashes]]
+                vector_file.flush()
+
+                now = time.time()
+                conn.executemany(
+                    "INSERT OR REPLACE INTO entries (model, text_hash, dim, slot, last_used) VALUES (?, ?, ?, ?, ?)",
+                    [(model, hash_value, dim, slots[hash_value], now) for hash_value in hashes]
+                )
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
+    def embed(self, model: str, texts: Sequence[str],
+              embed_fn: Callable[[List[str]], Any]) -> np.ndarray:
+        """
+        Embed texts, computing only the ones that are not cached.
+
+        Args:
+            model: Name of the embedding model (part of the cache key)
+            texts: Texts to embed
+            embed_fn: Function that embeds a list of texts
+
+        Returns:
+            float32 array of shape (len(texts), dimension)
+        """
+        texts = list(texts)
+        if not self.enabled:
+            return np.asarray(embed_fn(texts), dtype=np.float32)
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+
+        cached = self.get_many(model, texts)
+
+        # Embed each missing text once, even if it appears several times
+        missing = list(dict.fromkeys(text for text, vector in zip(texts, cached) if vector is None))
+        computed = {}
+        if missing:
+            vectors = np.asarray(embed_fn(missing), dtype=np.float32)
+            self.put_many(model, missing, vectors)
+            computed = dict(zip(missing, vectors))
+
+        return np.vstack([vector if vector is not None else computed[text]
+                          for text, vector in zip(texts, cached)]).astype(np.float32, copy=False)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get cache statistics.
+
+        Returns:
+            Dictionary with hit/miss counts, hit rate and size
+        """
+        with self._lock:
+            entries = self._connect().execute("SELECT COUNT(*) FROM entries").fetchone()[0] if self.enabled else 0
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "cache_dir": self.cache_dir,
+                "entries": entries,
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "models": {model: dict(stats) for model, stats in self._model_stats.items()}
+            }
+
+    def close(self) -> None:
+        """Flush the vector files and close the index."""
+        with self._lock:
+            for vectors in self._vectors.values():
+                vectors.flush()
+            self._vectors.clear()
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+# Caches keyed by absolute directory
+_caches: Dict[str, EmbeddingCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_embedding_cache(cache_dir: Optional[str] = None) -> EmbeddingCache:
+    """
+    Get the shared embedding cache for a directory.
+
+    Args:
+        cache_dir: Cache directory (defaults to embedding_cache.directory in the config)
+
+    Returns:
+        The process-wide EmbeddingCache for that directory
+    """
+    cache_config = get_config().section('embedding_cache')
+    cache_dir = cache_dir or cache_config.get('directory', DEFAULT_CACHE_DIR)
+    key = os.path.abspath(cache_dir)
+
+    cache = _caches.get(key)
+    if cache is None:
+        with _caches_lock:
+            cache = _caches.get(key)
+            if cache is None:
+                cache = EmbeddingCache(
+                    cache_dir,
+                    max_entries=cache_config.get('max_entries', DEFAULT_MAX_ENTRIES),
+                    enabled=cache_config.get('enabled', True)
+                )
+                _caches[key] = cache
+    return cache
+
+
+def get_embedding_cache_stats() -> Dict[str, Any]:
+    """
+    Get statistics for all embedding caches opened by this process.
+
+    Returns:
+        Dictionary of cache statistics keyed by cache directory
+    """
+    return {cache.cache_dir: cache.get_stats() for cache in list(_caches.values())}
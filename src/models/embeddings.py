@@ -4,12 +4,40 @@
 import hashlib
 from typing import List
 
+from src.models.embedding_cache import get_embedding_cache
+
+try:
+    from langchain_huggingface import HuggingFaceEmbeddings
+except ImportError:
+    HuggingFaceEmbeddings = None
+
 logger = logging.getLogger(__name__)
 
+# splitmix64 constants, used to turn (text seed, dimension) pairs into random bits
+_GOLDEN_GAMMA = np.uint64(0x9E3779B97F4A7C15)
+_MIX_1 = np.uint64(0xBF58476D1CE4E5B9)
+_MIX_2 = np.uint64(0x94D049BB133111EB)
+
+# Rows generated per NumPy pass, to bound temporary memory
+_BATCH_SIZE = 8192
+
+
+def _splitmix64(x: np.ndarray) -> np.ndarray:
+    """Hash an array of uint64 counters to uniformly distributed uint64 values."""
+    z = x + _GOLDEN_GAMMA
+    z = (z ^ (z >> np.uint64(30))) * _MIX_1
+    z = (z ^ (z >> np.uint64(27))) * _MIX_2
+    return z ^ (z >> np.uint64(31))
+
+
 class SimpleEmbeddings(Embeddings):
     """
     A simple embedding class that creates deterministic embeddings based on text content.
     This is used for testing purposes when more complex embedding models are not available.
+    
+    Each text is hashed to a 64-bit seed, and the whole batch is generated in a
+    few NumPy operations with a counter-based generator. No global random state
+    is used, so the embedder is safe to call from multiple threads.
     """
     def __init__(self, dimension=384):  # Increased dimension for better representation
         """
@@ -19,33 +47,47 @@ def __init__(self, dimension=384):  # Increased dimension for better representat
             dimension: Dimension of the embeddings (default: 384)
         """
         self.dimension = dimension
+        # Per-dimension counter offsets, shared by all batches
+        self._offsets = (np.arange(1, dimension + 1, dtype=np.uint64) * _GOLDEN_GAMMA)[np.newaxis, :]
         logger.info(f"Initialized SimpleEmbeddings with dimension {dimension}")
     
-    def _create_embedding(self, text: str) -> np.ndarray:
+    @staticmethod
+    def _seeds(texts: List[str]) -> np.ndarray:
+        """Hash each text to a 64-bit seed."""
+        return np.fromiter(
+            (int.from_bytes(hashlib.blake2b(text.encode(), digest_size=8).digest(), "little") for text in texts),
+            dtype=np.uint64,
+            count=len(texts)
+        )
+    
+    def _embed_batch(self, seeds: np.ndarray) -> np.ndarray:
+        """Create normalized embeddings for a batch of seeds."""
+        bits = _splitmix64(seeds[:, np.newaxis] + self._offsets)
+        
+        # Box-Muller transform of two 24-bit uniforms per value gives normally distributed components
+        u1 = ((bits >> np.uint64(40)).astype(np.float64) + 1.0) / float(1 << 24)
+        u2 = (bits & np.uint64(0xFFFFFF)).astype(np.float64) / float(1 << 24)
+        embeddings = np.sqrt(-2.0 * np.log(u1)) * np.cos(2.0 * np.pi * u2)
+        
+        # Normalize the embeddings
+        embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+        return embeddings.astype(np.float32)
+    
+    def embed_array(self, texts: List[str]) -> np.ndarray:
         """
-        Create a deterministic embedding for a text.
+        Create embeddings for a list of texts as a single matrix.
         
         Args:
-            text: Text to create embedding for
+            texts: List of texts to embed
             
         Returns:
-            Embedding vector
+            C-contiguous float32 array of shape (len(texts), dimension)
         """
-        # Create a more robust hash of the text
-        text_hash = hashlib.sha256(text.encode()).hexdigest()
-        
-        # Use the hash to create a deterministic seed
-        seed = int(text_hash[:8], 16) % 10000
-        
-        # Set random seed for reproducibility
-        np.random.seed(seed)
-        
-        # Create embedding with better distribution
-        embedding = np.random.normal(0, 1, self.dimension)
-        # Normalize the embedding
-        embedding = embedding / np.linalg.norm(embedding)
-        
-        return embedding.astype(np.float32)
+        seeds = self._seeds(texts)
+        result = np.empty((len(texts), self.dimension), dtype=np.float32)
+        for start in range(0, len(texts), _BATCH_SIZE):
+            result[start:start + _BATCH_SIZE] = self._embed_batch(seeds[start:start + _BATCH_SIZE])
+        return result
     
     def embed_documents(self, texts: List[str]) -> List[List[float]]:
         """
@@ -60,7 +102,7 @@ def embed_documents(self, texts: List[str]) -> List[List[float]]:
         logger.debug(f"Creating embeddings for {len(texts)} documents")
         
         try:
-            embeddings = [self._create_embedding(text).tolist() for text in texts]
+            embeddings = self.embed_array(texts).tolist()
             logger.debug(f"Successfully created {len(embeddings)} embeddings")
             return embeddings
         except Exception as e:
@@ -80,9 +122,28 @@ def embed_query(self, text: str) -> List[float]:
         logger.debug(f"Creating embedding for query: {text[:50]}...")
         
         try:
-            embedding = self._create_embedding(text).tolist()
+            embedding = self.embed_array([text])[0].tolist()
             logger.debug("Successfully created query embedding")
             return embedding
         except Exception as e:
             logger.error(f"Error creating query embedding: {e}")
-            raise 
\ No newline at end of file
+            raise 
+
+
+if HuggingFaceEmbeddings is not None:
+    class CachedHuggingFaceEmbeddings(HuggingFaceEmbeddings):
+        """HuggingFaceEmbeddings backed by the persistent embedding cache"""
+        
+        def embed_documents(self, texts):
+            """Embed documents, computing only the ones missing from the cache"""
+            cache = get_embedding_cache()
+            return cache.embed(self.model_name, texts, super().embed_documents).tolist()
+        
+        def embed_query(self, text):
+            """Embed a query with caching"""
+            # Query embeddings may use different instructions, so they get their own key space
+            cache = get_embedding_cache()
+            return cache.embed(f"{self.model_name}#query", [text],
+                               lambda texts: [super(CachedHuggingFaceEmbeddings, self).embed_query(texts[0])])[0].tolist()
+else:
+    CachedHuggingFaceEmbeddings = None
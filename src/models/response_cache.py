@@ -0,0 +1,326 @@
+"""
+Response cache for the DeepSeek client.
+
+Responses are keyed by a SHA-256 hash of the canonicalized request: the
+model, the messages and the sampling parameters that change the output,
+serialized with sorted keys. Transport options such as streaming, timeouts
+and callbacks are left out, so they do not split the cache. There are two
+tiers:
+
+    memory   A bounded LRU with a time to live. Lookups, inserts and
+             evictions are O(1).
+    disk     An optional SQLite database in WAL mode. It survives restarts
+             and is shared by the workers on one host. Memory misses are
+             looked up there and promoted to memory.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+from src.utils.logger import get_logger
+from src.utils.config import get_config
+
+logger = get_logger(__name__)
+
+DEFAULT_MAX_ENTRIES = 1000
+DEFAULT_TTL_SECONDS = 86400
+DEFAULT_DB_PATH = os.path.join("data", "cache", "llm_responses.sqlite")
+DEFAULT_DISK_MAX_ENTRIES = 100000
+
+# Expired and least recently used rows are removed from disk every this many inserts
+DISK_TRIM_INTERVAL = 100
+
+# Request parameters that do not change the response
+TRANSPORT_PARAMS = frozenset({"stream", "timeout", "request_timeout", "callbacks", "run_manager"})
+
+# Sampling parameters compared as floats, so that 1 and 1.0 share a key
+FLOAT_PARAMS = frozenset({"temperature", "top_p", "frequency_penalty", "presence_penalty"})
+
+
+def canonical_request(params: Mapping[str, Any]) -> str:
+    """
+    Serialize the parameters of a chat completion request canonically.
+
+    Args:
+        params: Request parameters, as sent to the chat completions endpoint
+
+    Returns:
+        Compact JSON with sorted keys, without transport options and unset values
+    """
+    canonical = {}
+    for name, value in params.items():
+        if name in TRANSPORT_PARAMS or value is None:
+            continue
+        if name == "messages":
+            value = [{"role": message.get("role", "user"), "content": message.get("content", "")}
+                     for message in value]
+        elif name in FLOAT_PARAMS and not isinstance(value, bool):
+            value = float(value)
+        canonical[name] = value
+    return json.dumps(canonical, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+def request_key(params: Mapping[str, Any]) -> str:
+    """
+    Cache key of a chat completion request.
+
+    Args:
+        params: Request parameters, as sent to the chat completions endpoint
+
+    Returns:
+        Hex SHA-256 digest of the canonical request
+    """
+    return hashlib.sha256(canonical_request(params).encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Two-tier cache of LLM responses.
+
+    All methods are thread-safe, and several processes may share the disk tier.
+    Errors in the disk tier are logged and treated as misses.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, ttl_seconds: float = DEFAULT_TTL_SECONDS,
+                 db_path: Optional[str] = None, disk_max_entries: int = DEFAULT_DISK_MAX_ENTRIES):
+        """
+        Initialize the cache.
+
+        Args:
+            max_entries: Maximum number of responses kept in memory
+            ttl_seconds: Time after which a response is no longer served
+            db_path: Path of the SQLite database of the disk tier, or None for memory only
+            disk_max_entries: Maximum number of responses kept on disk
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.db_path = db_path
+        self.disk_max_entries = disk_max_entries
+
+        # key -> (response, expiry time), least recently used first
+        self._memory: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        self._disk_inserts = 0
+
+        # Metrics
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.disk_evictions = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open the disk tier, creating the schema on first use."""
+        if self._conn is None:
+            directory = os.path.dirname(self.db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    response TEXT NOT NULL,
+                    created REAL NOT NULL,
+                    accessed REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed);
+            """)
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def _remember(self, key: str, response: str, expires: float) -> None:
+        """Add a response to the memory tier. Must be called with the lock held."""
+        self._memory[key] = (response, expires)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.evictions += 1
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Get a cached response.
+
+        Args:
+            key: Request key (see request_key)
+
+        Returns:
+            The response, or None if it is not cached or has expired
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if entry[1] > now:
+                    self._memory.move_to_end(key)
+                    self.memory_hits += 1
+                    return entry[0]
+                del self._memory[key]
+                self.expirations += 1
+
+        if self.db_path:
+            row = self._disk_get(key, now)
+            if row is not None:
+                response, created = row
+                with self._lock:
+                    self._remember(key, response, created + self.ttl_seconds)
+                    self.disk_hits += 1
+                return response
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def _disk_get(self, key: str, now: float) -> Optional[Tuple[str, float]]:
+        try:
+            with self._db_lock:
+                conn = self._connect()
+                row = conn.execute(
+                    "SELECT response, created FROM responses WHERE key = ? AND created > ?",
+                    (key, now - self.ttl_seconds)
+                ).fetchone()
+                if row is not None:
+                    conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+                    conn.commit()
+                return row
+        except sqlite3.Error as e:
+            logger.warning(f"LLM response cache lookup failed: {e}")
+            return None
+
+    def put(self, key: str, response: str) -> None:
+        """
+        Cache a response.
+
+        Args:
+            key: Request key (see request_key)
+            response: The response text
+        """
+        now = time.time()
+        with self._lock:
+            self._remember(key, response, now + self.ttl_seconds)
+
+        if self.db_path:
+            try:
+                with self._db_lock:
+                    conn = self._connect()
+                    conn.execute(
+                        "INSERT OR REPLACE INTO responses (key, response, created, accessed) VALUES (?, ?, ?, ?)",
+                        (key, response, now, now)
+                    )
+                    self._disk_inserts += 1
+                    if self._disk_inserts % DISK_TRIM_INTERVAL == 0:
+                        self._trim_disk(conn, now)
+                    conn.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"LLM response cache write failed: {e}")
+
+    def _trim_disk(self, conn: sqlite3.Connection, now: float) -> None:
+        """Remove expired rows, then the least recently used ones above the size limit."""
+        conn.execute("DELETE FROM responses WHERE created <= ?", (now - self.ttl_seconds,))
+        excess = conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0] - self.disk_max_entries
+        if excess > 0:
+            conn.execute(
+                "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY accessed LIMIT ?)",
+                (excess,)
+            )
+            self.disk_evictions += excess
+
+    def clear(self) -> int:
+        """
+        Remove all cached responses from both tiers.
+
+        Returns:
+            Number of responses removed from memory
+        """
+        with self._lock:
+            count = len(self._memory)
+            self._memory.clear()
+        if self.db_path:
+            try:
+                with self._db_lock:
+                    conn = self._connect()
+                    conn.execute("DELETE FROM responses")
+                    conn.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"Failed to clear LLM response cache on disk: {e}")
+        return count
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "entries": len(self._memory),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "disk_path": self.db_path,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "hits": self.memory_hits + self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "disk_evictions": self.disk_evictions
+            }
+
+    def close(self) -> None:
+        with self._db_lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+_cache: Optional[ResponseCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> ResponseCache:
+    """
+    Get the shared LLM response cache, configured from the response_cache section of the config.
+
+    Returns:
+        The process-wide ResponseCache
+    """
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                settings = get_config().section('response_cache')
+                _cache = ResponseCache(
+                    max_entries=settings.get('max_entries', DEFAULT_MAX_ENTRIES),
+                    ttl_seconds=settings.get('ttl_seconds', DEFAULT_TTL_SECONDS),
+                    db_path=settings.get('db_path', DEFAULT_DB_PATH) if settings.get('disk', True) else None,
+                    disk_max_entries=settings.get('disk_max_entries', DEFAULT_DISK_MAX_ENTRIES)
+                )
+    return _cache
+
+
+def clear_response_cache() -> int:
+    """
+    Clear the shared LLM response cache, if it has been opened.
+
+    Returns:
+        Number of responses removed from memory
+    """
+    return _cache.clear() if _cache is not None else 0
+
+
+def get_response_cache_stats() -> Dict[str, Any]:
+    """
+    Get LLM response cache statistics.
+
+    Returns:
+        Dictionary of cache statistics, empty if the cache is not open yet
+    """
+    return _cache.get_stats() if _cache is not None else {}
@@ -9,7 +9,7 @@
 import json
 import logging
 from pathlib import Path
-from typing import List, Dict, Any, Optional, Union, Tuple
+from typing import List, Dict, Any, Iterable, Optional, Set, Union, Tuple
 import yaml
 import shutil
 import glob
@@ -27,8 +27,6 @@
 from transformers import AutoTokenizer, AutoModel
 import torch
 from tqdm import tqdm
-import hashlib
-import pickle
 import concurrent.futures
 from contextlib import nullcontext
 
@@ -36,6 +34,8 @@
 from src.utils.logger import get_logger
 from src.data.scraper import WebScraper
 from src.core.document_processor import DocumentProcessor
+from src.models.embedding_cache import EmbeddingCache, get_embedding_cache
+from src.core.incremental_index import IncrementalIndex, MANIFEST_FILE
 
 # Set up logging
 logger = get_logger("trainer")
@@ -54,7 +54,7 @@
     "MAX_WORKERS": 4,
     "CACHE_DIR": os.path.join("data", "cache"),
     "USE_CACHE": True,
-    "CLEAR_CACHE_AFTER_BATCH": True
+    "INCREMENTAL": True  # Only embed new or changed chunks instead of rebuilding the index
 }
 
 class CustomHuggingFaceEmbeddings:
@@ -62,14 +62,22 @@ class CustomHuggingFaceEmbeddings:
     
     def __init__(self, model_name: str = DEFAULT_SETTINGS["EMBEDDING_MODEL"], 
                  batch_size: int = DEFAULT_SETTINGS["BATCH_SIZE"],
-                 device: str = DEFAULT_SETTINGS["DEVICE"]):
-        """Initialize the embeddings model."""
+                 device: str = DEFAULT_SETTINGS["DEVICE"],
+                 cache: Optional[EmbeddingCache] = None):
+        """Initialize the embeddings model.
+        
+        Args:
+            model_name: Name of the HuggingFace model
+            batch_size: Number of texts per forward pass
+            device: Device to run the model on
+            cache: Persistent embedding cache, or None to disable caching
+        """
         self.model_name = model_name
         self.batch_size = batch_size
         self.device = device
         self.tokenizer = None
         self.model = None
-        self.cache = {}
+        self.cache = cache
         self._load_model()
         
     def _load_model(self):
@@ -89,13 +97,8 @@ def _load_model(self):
             raise
             
     def _get_embeddings(self, texts: List[str]) -> List[List[float]]:
-        """Get embeddings for a batch of texts with optimized caching."""
+        """Get embeddings for a batch of texts."""
         try:
-            # Check cache first
-            cache_key = hashlib.md5("".join(texts).encode()).hexdigest()
-            if cache_key in self.cache:
-                return self.cache[cache_key]
-            
             # Tokenize texts with optimized settings
             encoded = self.tokenizer(
                 texts, 
@@ -116,10 +119,6 @@ def _get_embeddings(self, texts: List[str]) -> List[List[float]]:
             # Normalize embeddings
             embeddings = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
             
-            # Cache results if enabled
-            if DEFAULT_SETTINGS["USE_CACHE"]:
-                self.cache[cache_key] = embeddings.tolist()
-            
             return embeddings.tolist()
             
         except Exception as e:
@@ -127,6 +126,16 @@ def _get_embeddings(self, texts: List[str]) -> List[List[float]]:
             raise
             
     def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed a list of documents, computing only the ones missing from the cache."""
+        try:
+            if self.cache is not None:
+                return self.cache.embed(self.model_name, texts, self._embed_batches).tolist()
+            return self._embed_batches(texts)
+        except Exception as e:
+            logger.error(f"Error embedding documents: {e}")
+            raise
+    
+    def _embed_batches(self, texts: List[str]) -> List[List[float]]:
         """Embed a list of documents with optimized batching."""
         try:
             all_embeddings = []
@@ -150,6 +159,8 @@ def embed_documents(self, texts: List[str]) -> List[List[float]]:
     def embed_query(self, text: str) -> List[float]:
         """Embed a single query."""
         try:
+            if self.cache is not None:
+                return self.cache.embed(self.model_name, [text], self._get_embeddings)[0].tolist()
             return self._get_embeddings([text])[0]
         except Exception as e:
             logger.error(f"Error embedding query: {e}")
@@ -194,7 +205,9 @@ def __init__(self, document_processor, settings: Dict[str, Any] = None):
         self.embeddings = CustomHuggingFaceEmbeddings(
             model_name=self.settings["EMBEDDING_MODEL"],
             batch_size=self.settings["BATCH_SIZE"],
-            device=self.settings["DEVICE"]
+            device=self.settings["DEVICE"],
+            cache=get_embedding_cache(os.path.join(self.settings["CACHE_DIR"], "embeddings"))
+            if self.settings["USE_CACHE"] else None
         )
         
     def clean_documents(self, documents: List[Document]) -> List[Document]:
@@ -324,13 +337,10 @@ def create_vectordb(self, documents: List[Document]) -> VectorStore:
                     checkpoint_path = os.path.join(self.vectordb_path, f"checkpoint_{i + batch_size}")
                     vectordb.save_local(checkpoint_path)
                     logger.info(f"Saved checkpoint at {i + batch_size} chunks")
-                
-                # Clear cache if configured
-                if self.settings["CLEAR_CACHE_AFTER_BATCH"]:
-                    self.embeddings.cache.clear()
             
-            # Save the final index
+            # Save the final index, replacing any incrementally updated one
             logger.info(f"Saving FAISS index to {self.vectordb_path}")
+            IncrementalIndex(self.vectordb_path, self.embeddings).reset()
             vectordb.save_local(self.vectordb_path)
             
             # Save metadata about the vector database
@@ -346,11 +356,11 @@ def create_vectordb(self, documents: List[Document]) -> VectorStore:
             with open(os.path.join(self.vectordb_path, "metadata.json"), "w") as f:
                 json.dump(metadata, f, indent=2)
             
-            # Save embeddings cache if enabled
-            if self.settings["USE_CACHE"]:
-                cache_path = os.path.join(self.vectordb_path, "embeddings_cache.pkl")
-                with open(cache_path, "wb") as f:
-                    pickle.dump(self.embeddings.cache, f)
+            # Report how many chunks were reused from the embedding cache
+            if self.embeddings.cache is not None:
+                cache_stats = self.embeddings.cache.get_stats()
+                logger.info(f"Embedding cache hit rate: {cache_stats['hit_rate']:.1%} "
+                            f"({cache_stats['hits']} hits, {cache_stats['misses']} misses)")
             
             logger.info(f"Vector database creation complete with {len(chunks)} chunks")
             return vectordb
@@ -359,6 +369,56 @@ def create_vectordb(self, documents: List[Document]) -> VectorStore:
             logger.error(f"Error creating vector database: {e}")
             raise
     
+    def update_vectordb(self, documents: List[Document], unchanged_sources: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+        """
+        Update the vector database with the current documents.
+        
+        Only chunks that are not in the index yet are embedded, and chunks
+        that are no longer produced are deleted, so a re-scrape takes time
+        proportional to what changed.
+        
+        Args:
+            documents: The complete list of documents
+            unchanged_sources: Sources left out of documents because they did not change,
+                such as pages answered with 304 Not Modified; their chunks are kept
+            
+        Returns:
+            Counts of added, unchanged and deleted chunks
+        """
+        try:
+            logger.info("Updating vector database incrementally")
+            
+            chunks = self.create_chunks(self.clean_documents(documents))
+            if not chunks and not unchanged_sources:
+                raise ValueError("No chunks found after processing documents")
+            
+            index = IncrementalIndex(
+                self.vectordb_path,
+                self.embeddings,
+                embedding_model=self.settings["EMBEDDING_MODEL"]
+            )
+            stats = index.update(chunks, replace_all=True, unchanged_sources=unchanged_sources)
+            
+            metadata = {
+                "chunk_size": self.settings["CHUNK_SIZE"],
+                "chunk_overlap": self.settings["CHUNK_OVERLAP"],
+                "embedding_model": self.settings["EMBEDDING_MODEL"],
+                "num_chunks": stats["total"],
+                "created_at": datetime.now().isoformat(),
+                "last_update": stats,
+                "settings": self.settings
+            }
+            with open(os.path.join(self.vectordb_path, "metadata.json"), "w") as f:
+                json.dump(metadata, f, indent=2)
+            
+            logger.info(f"Vector database update complete: {stats['added']} added, "
+                        f"{stats['unchanged']} unchanged, {stats['deleted']} deleted")
+            return stats
+        
+        except Exception as e:
+            logger.error(f"Error updating vector database: {e}")
+            raise
+    
     def load_vectordb(self) -> VectorStore:
         """
         Load a vector database.
@@ -377,18 +437,15 @@ def load_vectordb(self) -> VectorStore:
             with open(metadata_path, "r") as f:
                 metadata = json.load(f)
             
-            # Load embeddings cache if available
-            cache_path = os.path.join(self.vectordb_path, "embeddings_cache.pkl")
-            if os.path.exists(cache_path):
-                with open(cache_path, "rb") as f:
-                    self.embeddings.cache = pickle.load(f)
-            
-            # Load the FAISS index
-            vectordb = FAISS.load_local(
-                self.vectordb_path,
-                self.embeddings,
-                allow_dangerous_deserialization=True  # We trust our own saved files
-            )
+            # Load the FAISS index, with any incremental updates applied
+            if os.path.exists(os.path.join(self.vectordb_path, MANIFEST_FILE)):
+                vectordb = IncrementalIndex(self.vectordb_path, self.embeddings).load()
+            else:
+                vectordb = FAISS.load_local(
+                    self.vectordb_path,
+                    self.embeddings,
+                    allow_dangerous_deserialization=True  # We trust our own saved files
+                )
             
             logger.info(f"Vector database loaded successfully")
             return vectordb
@@ -397,20 +454,46 @@ def load_vectordb(self) -> VectorStore:
             logger.error(f"Error loading vector database: {e}")
             raise
     
-    def train(self):
+    def indexed_sources(self) -> Set[str]:
+        """
+        Get the sources that have chunks in the vector database.
+        
+        Pass them to UniversitySpider, so that only pages whose content was
+        indexed are revalidated with conditional requests.
+        
+        Returns:
+            The sources, or an empty set if the next update rebuilds the index
+        """
+        index = IncrementalIndex(self.vectordb_path, self.embeddings, embedding_model=self.settings["EMBEDDING_MODEL"])
+        return index.indexed_sources()
+    
+    def train(self, documents: Optional[List[Document]] = None, unchanged_sources: Optional[Iterable[str]] = None):
         """
         Train the model by creating a vector database.
+        
+        Args:
+            documents: Documents to index, such as those of a crawl; by default
+                all documents of the document processor
+            unchanged_sources: Sources left out of documents because they did not
+                change, such as UniversitySpider.unchanged_urls; their chunks are kept
         """
         try:
             logger.info("Starting training")
             
             # Get all documents
-            documents = self.document_processor.get_all_documents()
-            if not documents:
+            if documents is None:
+                documents = self.document_processor.get_all_documents()
+            if not documents and not unchanged_sources:
                 raise ValueError("No documents found for training")
             
-            # Create the vector database
-            self.create_vectordb(documents)
+            # Create or update the vector database
+            if self.settings["INCREMENTAL"]:
+                self.update_vectordb(documents, unchanged_sources=unchanged_sources)
+            else:
+                if unchanged_sources:
+                    logger.warning("Rebuilding the vector database without the unchanged sources; "
+                                   "enable INCREMENTAL to keep their chunks")
+                self.create_vectordb(documents)
             
             logger.info("Training complete")
         
@@ -6,7 +6,6 @@
 import os
 import sys
 import yaml
-import json
 import logging
 import glob
 import tempfile
@@ -16,24 +15,25 @@
 from pathlib import Path
 import sqlite3
 import numpy as np
-import hashlib
 
 # Update imports - Remove ChromaDB and add FAISS
 from langchain_core.documents import Document
 from langchain_core.vectorstores import VectorStore
 from langchain_community.vectorstores import FAISS
-# Use HuggingFaceEmbeddings from langchain_huggingface
-from langchain_huggingface import HuggingFaceEmbeddings
 from langchain.chains import RetrievalQA
 from langchain_openai import ChatOpenAI
 
 # Import related modules with correct paths
 from utils.logger import get_logger
-from models.deepseek_client import DeepSeekAPI
-from core.document_processor import DocumentProcessor
+from models.deepseek_client import get_deepseek_client
+from src.core.vectorstore import get_vectorstore_manager
+from src.rag.retrieval_cache import (
+    DEFAULT_MAX_ENTRIES as DEFAULT_RETRIEVAL_CACHE_ENTRIES,
+    DEFAULT_TTL_SECONDS as DEFAULT_RETRIEVAL_CACHE_TTL,
+    RetrievalCache,
+    cache_key as retrieval_cache_key
+)
 
-# Local imports
-from models.embeddings import SimpleEmbeddings
 from langchain_core.retrievers import BaseRetriever
 from langchain.chains.combine_documents import create_stuff_documents_chain
 from langchain.chains.retrieval import create_retrieval_chain
@@ -57,8 +57,9 @@ def __init__(self, config_path: str):
         self.logger = get_logger("rag_engine")
         self.config_path = config_path
         self.has_vectordb = False
-        self.vectordb = None
-        self.retriever = None
+        self._vectorstore_manager = None
+        self._retriever = None
+        self._retriever_generation = None
         
         # Load configuration
         try:
@@ -95,8 +96,7 @@ def __init__(self, config_path: str):
             except Exception as e:
                 self.logger.error(f"Failed to initialize vector database: {e}")
                 self.has_vectordb = False
-                self.vectordb = None
-                self.retriever = None
+                self._vectorstore_manager = None
             
         # Initialize LLM
         try:
@@ -107,100 +107,53 @@ def __init__(self, config_path: str):
         
         self.logger.info(f"RAG Engine initialized with config from {config_path}")
         
-        # Initialize document cache
-        self._doc_cache = {}
+        # Initialize the retrieval cache, keyed by query, k, filters and index generation
+        retrieval_config = self.config.get('retrieval', {})
+        self._doc_cache = RetrievalCache(
+            max_entries=retrieval_config.get('cache_max_entries', DEFAULT_RETRIEVAL_CACHE_ENTRIES),
+            ttl_seconds=retrieval_config.get('cache_ttl_seconds', DEFAULT_RETRIEVAL_CACHE_TTL)
+        )
 
     def _initialize_vectordb(self) -> None:
-        """Initialize the vector database."""
+        """Attach to the shared vector store for the index directory."""
         logger.info(f"Initializing vector database from {self.vectordb_dir}")
         
         try:
-            # Load metadata to determine which embedding model was used during training
-            metadata_path = self.vectordb_dir / "metadata.json"
-            if metadata_path.exists():
-                with open(metadata_path, 'r') as f:
-                    metadata = json.load(f)
-                embedding_model = metadata.get('embedding_model', 'sentence-transformers/all-MiniLM-L6-v2')
-                logger.info(f"Using embedding model from metadata: {embedding_model}")
+            # The index and embedding model are loaded once per process and
+            # shared with the agent and the search API
+            manager = get_vectorstore_manager(str(self.vectordb_dir))
+            if manager.get() is None:
+                raise ValueError(f"No FAISS index could be loaded from {self.vectordb_dir}")
+            
+            self._vectorstore_manager = manager
+            logger.info(f"Vector database initialized successfully (generation {manager.generation})")
                 
-                # Create embeddings instance matching the one used in training
-                use_simple_embeddings = True  # Default to simple embeddings
-                
-                try:
-                    # First check if transformers has encoding issues
-                    try:
-                        import transformers
-                        use_simple_embeddings = False
-                    except UnicodeDecodeError:
-                        logger.warning("Detected UTF-8 encoding issues with transformers library. Using SimpleEmbeddings instead.")
-                        use_simple_embeddings = True
-                    
-                    if not use_simple_embeddings:
-                        # Add caching to embedding function
-                        class CachedHuggingFaceEmbeddings(HuggingFaceEmbeddings):
-                            """HuggingFaceEmbeddings with caching to improve performance"""
-                            def __init__(self, *args, **kwargs):
-                                super().__init__(*args, **kwargs)
-                                self._cache = {}
-                                
-                            def embed_documents(self, texts):
-                                """Embed documents with caching"""
-                                results = []
-                                texts_to_embed = []
-                                indices = []
-                                
-                                # Check cache for each text
-                                for i, text in enumerate(texts):
-                                    text_hash = hashlib.md5(text.encode()).hexdigest()
-                                    if text_hash in self._cache:
-                                        results.append(self._cache[text_hash])
-                                    else:
-                                        texts_to_embed.append(text)
-                                        indices.append(i)
-                                
-                                # If any texts need embedding, compute them
-                                if texts_to_embed:
-                                    new_embeddings = super().embed_documents(texts_to_embed)
-                                    
-                                    # Update cache with new embeddings
-                                    for j, embedding in enumerate(new_embeddings):
-                                        text = texts_to_embed[j]
-                                        text_hash = hashlib.md5(text.encode()).hexdigest()
-                                        self._cache[text_hash] = embedding
-                                        
-                                    # Insert new embeddings at the correct positions
-                                    for j, idx in enumerate(indices):
-                                        if idx >= len(results):
-                                            results.append(new_embeddings[j])
-                                        else:
-                                            results.insert(idx, new_embeddings[j])
-                                
-                                return results
-                        
-                        # Use cached embeddings for better performance
-                        embedding_function = CachedHuggingFaceEmbeddings(model_name=embedding_model)
-                        logger.info(f"Successfully loaded HuggingFace embedding model with caching: {embedding_model}")
-                    else:
-                        # Use simple embeddings if transformers has issues
-                        from models.embeddings import SimpleEmbeddings
-                        embedding_function = SimpleEmbeddings()
-                        logger.info("Using SimpleEmbeddings due to transformers library encoding issues")
-                except Exception as e:
-                    logger.warning(f"Could not load HuggingFace embeddings: {e}. Falling back to SimpleEmbeddings.")
-                    from models.embeddings import SimpleEmbeddings
-                    embedding_function = SimpleEmbeddings()
-            else:
-                logger.warning("No metadata.json found. Using SimpleEmbeddings as fallback.")
-                from models.embeddings import SimpleEmbeddings
-                embedding_function = SimpleEmbeddings()
-            
-            # Load the FAISS index
-            self.vectordb = FAISS.load_local(
-                self.vectordb_dir, 
-                embedding_function,
-                allow_dangerous_deserialization=True  # We trust our own saved files
-            )
-            
+        except Exception as e:
+            logger.error(f"Error initializing vector database: {e}")
+            self.has_vectordb = False
+            raise
+    
+    @property
+    def vectordb(self) -> Optional[FAISS]:
+        """The current shared vector store, picking up index swaps."""
+        if self._vectorstore_manager is None:
+            return None
+        return self._vectorstore_manager.get()
+    
+    def _vectordb_snapshot(self) -> Tuple[Optional[FAISS], Optional[int]]:
+        """The current vector store and its generation, read together."""
+        if self._vectorstore_manager is None:
+            return None, None
+        return self._vectorstore_manager.snapshot()
+    
+    @property
+    def retriever(self) -> Optional[BaseRetriever]:
+        """A retriever over the current vector store, rebuilt when the index is swapped."""
+        vectordb, generation = self._vectordb_snapshot()
+        if vectordb is None:
+            return None
+        
+        if self._retriever is None or self._retriever_generation != generation:
             # Get retrieval parameters from config
             top_k = self.config.get('retrieval', {}).get('top_k', self.top_k)
             fetch_k = self.config.get('retrieval', {}).get('fetch_k', top_k * 2)
@@ -211,7 +164,7 @@ def embed_documents(self, texts):
             similarity_top_k = self.config.get('vector_db', {}).get('similarity_top_k', top_k)
             
             # Create a retriever with improved search parameters
-            self.retriever = self.vectordb.as_retriever(
+            self._retriever = vectordb.as_retriever(
                 search_type=search_type,
                 search_kwargs={
                     "k": similarity_top_k,
@@ -219,37 +172,26 @@ def embed_documents(self, texts):
                     "fetch_k": fetch_k,
                 }
             )
-            
-            logger.info(f"Vector database initialized successfully with retriever (k={top_k}, search_type={search_type})")
-            
-            # Skip verification to save time - only do minimal check
-            # Safe check that doesn't rely on internal attributes like _index
-            try:
-                # Simple check to see if the vectordb works - query with an empty string
-                self.vectordb.similarity_search("test", k=1)
-                logger.info("Vector database verification passed")
-            except Exception as e:
-                logger.warning(f"Vector database may not be properly initialized: {e}")
-                
-        except Exception as e:
-            logger.error(f"Error initializing vector database: {e}")
-            self.has_vectordb = False
-            raise
+            self._retriever_generation = generation
+            logger.info(f"Created retriever (k={similarity_top_k}, search_type={search_type}, generation={generation})")
+        
+        return self._retriever
     
     def _initialize_llm(self):
         """Initialize the language model for generation."""
         self.logger.info("Initializing language model...")
         
         # Initialize DeepSeek API
-        self.llm = DeepSeekAPI()
+        self.llm = get_deepseek_client()
         
-    def retrieve_documents(self, query: str, k: int = 5) -> List[Document]:
+    def retrieve_documents(self, query: str, k: int = 5, filters: Optional[Dict[str, Any]] = None) -> List[Document]:
         """
         Retrieve relevant documents for a query.
         
         Args:
             query: The query to search for
             k: Number of documents to retrieve
+            filters: Metadata filters passed to the similarity search
             
         Returns:
             List of relevant documents
@@ -261,32 +203,30 @@ def retrieve_documents(self, query: str, k: int = 5) -> List[Document]:
             return []
         
         try:
-            # Check if we have a cache and if this query is cached
-            cache_key = f"query_cache_{hashlib.md5(query.encode()).hexdigest()}"
-            
-            # Try to get from cache first
-            if hasattr(self, '_doc_cache') and cache_key in self._doc_cache:
-                self.logger.info("Using cached document results")
-                return self._doc_cache[cache_key]
-            
-            # Initialize cache if not exists
-            if not hasattr(self, '_doc_cache'):
-                self._doc_cache = {}
-            
             # Get retrieval parameters from config
             top_k = self.config.get('retrieval', {}).get('top_k', k)
             score_threshold = self.config.get('retrieval', {}).get('score_threshold', 0.25)
             
-            # Check if vectordb is available
-            if not hasattr(self, 'vectordb') or self.vectordb is None:
+            # Check if vectordb is available; reading it also picks up a rebuilt index
+            vectordb, generation = self._vectordb_snapshot()
+            if vectordb is None:
                 self.logger.error("Vector database not properly initialized")
                 return []
-                
+            
+            # Results are only reused for the index generation they were retrieved from
+            cache_key = retrieval_cache_key(query, top_k, filters, generation)
+            cached = self._doc_cache.get(cache_key)
+            if cached is not None:
+                self.logger.info("Using cached document results")
+                return cached
+            
             # Use direct vector similarity search with optimized parameters
-            docs = self.vectordb.similarity_search(
+            search_kwargs = {"filter": filters} if filters else {}
+            docs = vectordb.similarity_search(
                 query, 
                 k=top_k,
-                distance_threshold=score_threshold  # Higher threshold for better relevance
+                distance_threshold=score_threshold,  # Higher threshold for better relevance
+                **search_kwargs
             )
             
             # Log retrieval results
@@ -294,19 +234,16 @@ def retrieve_documents(self, query: str, k: int = 5) -> List[Document]:
             for i, doc in enumerate(docs):
                 self.logger.debug(f"Document {i+1}: {doc.metadata.get('source', 'Unknown source')}")
             
-            # Limit document length to reduce processing time
-            for doc in docs:
-                if len(doc.page_content) > 2000:  # Limit to 2000 chars
-                    doc.page_content = doc.page_content[:2000] + "..."
-            
-            # Cache the results
-            self._doc_cache[cache_key] = docs
+            # Limit document length to reduce processing time. The documents
+            # belong to the shared docstore, so truncate copies rather than the originals
+            docs = [
+                Document(page_content=doc.page_content[:2000] + "...", metadata=dict(doc.metadata))
+                if len(doc.page_content) > 2000 else doc  # Limit to 2000 chars
+                for doc in docs
+            ]
             
-            # Limit cache size
-            if len(self._doc_cache) > 100:
-                # Remove oldest items (first 20 items)
-                for old_key in list(self._doc_cache.keys())[:20]:
-                    del self._doc_cache[old_key]
+            # The cache keeps its own frozen copy, so callers may modify the returned documents
+            self._doc_cache.put(cache_key, docs)
             
             return docs
             
@@ -0,0 +1,168 @@
+"""
+Retrieval result cache for the RAG engine.
+
+Results are cached per normalized query, number of documents, search filters
+and index generation. The generation of the shared vector store changes
+whenever the index is reloaded, so a rebuilt index never serves results
+retrieved from the previous one; entries of older generations are dropped
+as soon as a newer generation is seen.
+
+Cached documents are stored as (content, metadata) tuples holding deep
+copies of the metadata, and every lookup returns new Document objects with
+fresh copies, so callers may truncate or annotate the documents they get,
+including nested metadata values, without changing the cache.
+"""
+
+import copy
+import json
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+from langchain_core.documents import Document
+
+from src.utils.web_search import normalize_query
+
+DEFAULT_MAX_ENTRIES = 256
+DEFAULT_TTL_SECONDS = 3600
+
+# (normalized query, k, filters as JSON, index generation)
+CacheKey = Tuple[str, int, str, int]
+# (page_content, private copy of the metadata) per document
+FrozenDocuments = Tuple[Tuple[str, Dict[str, Any]], ...]
+
+
+def cache_key(query: str, k: int, filters: Optional[Mapping[str, Any]], generation: int) -> CacheKey:
+    """
+    Build the cache key of a retrieval.
+
+    Args:
+        query: The query
+        k: Number of documents retrieved
+        filters: Metadata filters of the search, if any
+        generation: Generation of the index searched
+
+    Returns:
+        The cache key
+    """
+    filters_key = json.dumps(filters, sort_keys=True, default=str) if filters else ""
+    return normalize_query(query), k, filters_key, generation
+
+
+def _freeze(documents: List[Document]) -> FrozenDocuments:
+    return tuple((doc.page_content, copy.deepcopy(doc.metadata)) for doc in documents)
+
+
+def _thaw(documents: FrozenDocuments) -> List[Document]:
+    return [Document(page_content=content, metadata=copy.deepcopy(metadata)) for content, metadata in documents]
+
+
+class RetrievalCache:
+    """
+    LRU cache of retrieved documents with a time to live.
+
+    All methods are thread-safe.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, ttl_seconds: float = DEFAULT_TTL_SECONDS):
+        """
+        Initialize the cache.
+
+        Args:
+            max_entries: Maximum number of cached retrievals
+            ttl_seconds: Time cached results are served for
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+
+        # key -> (frozen documents, expiry time), least recently used first
+        self._entries: "OrderedDict[CacheKey, Tuple[FrozenDocuments, float]]" = OrderedDict()
+        self._generation: Optional[int] = None
+        self._lock = threading.Lock()
+
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _check_generation(self, generation: int) -> None:
+        """Drop all entries once a newer index generation is seen."""
+        if self._generation is not None and generation > self._generation and self._entries:
+            self._entries.clear()
+            self.invalidations += 1
+        if self._generation is None or generation > self._generation:
+            self._generation = generation
+
+    def get(self, key: CacheKey) -> Optional[List[Document]]:
+        """
+        Get cached documents.
+
+        Args:
+            key: Key built by cache_key
+
+        Returns:
+            Copies of the cached documents, or None on a miss
+        """
+        with self._lock:
+            self._check_generation(key[3])
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[1] > time.time():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return _thaw(entry[0])
+                del self._entries[key]
+                self.expirations += 1
+            self.misses += 1
+            return None
+
+    def put(self, key: CacheKey, documents: List[Document]) -> None:
+        """
+        Cache retrieved documents.
+
+        Args:
+            key: Key built by cache_key
+            documents: The retrieved documents; later changes to them don't affect the cache
+        """
+        frozen = _freeze(documents)
+        with self._lock:
+            self._check_generation(key[3])
+            if key[3] < self._generation:
+                # Retrieved from an index that has since been replaced
+                return
+            self._entries[key] = (frozen, time.time() + self.ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> int:
+        """
+        Remove all cached retrievals.
+
+        Returns:
+            Number of entries removed
+        """
+        with self._lock:
+            count = len(self._entries)
+            self._entries.clear()
+            return count
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "generation": self._generation,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "expirations": self.expirations,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations
+            }
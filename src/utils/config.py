@@ -0,0 +1,280 @@
+"""
+Shared configuration snapshot for the University Information Agent.
+
+The configuration file is parsed once and exposed as an immutable snapshot.
+It is only re-read when the file's modification time changes (checked at most
+once per ``check_interval`` seconds) or when a reload is forced, e.g. from the
+admin API.
+"""
+
+import os
+import copy
+import time
+import threading
+from types import MappingProxyType
+from typing import Any, Dict, Mapping, Optional
+
+import yaml
+
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_CONFIG_PATH = "config.yaml"
+DEFAULT_CHECK_INTERVAL = 2.0  # Minimum seconds between mtime checks
+
+_EMPTY_SECTION: Mapping[str, Any] = MappingProxyType({})
+
+
+def _freeze(value: Any) -> Any:
+    """Recursively convert dicts and lists into read-only equivalents."""
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def thaw(value: Any) -> Any:
+    """
+    Return a mutable deep copy of a frozen configuration value.
+
+    Args:
+        value: A snapshot, section or value taken from a snapshot
+
+    Returns:
+        The same data as plain dicts and lists
+    """
+    if isinstance(value, ConfigSnapshot):
+        value = value.data
+    if isinstance(value, Mapping):
+        return {key: thaw(item) for key, item in value.items()}
+    if isinstance(value, tuple):
+        return [thaw(item) for item in value]
+    return copy.deepcopy(value)
+
+
+class ConfigSnapshot:
+    """An immutable, versioned view of the configuration file."""
+
+    __slots__ = ("data", "path", "mtime", "version", "loaded_at")
+
+    def __init__(self, data: Mapping[str, Any], path: str, mtime: Optional[float], version: int):
+        self.data = data
+        self.path = path
+        self.mtime = mtime
+        self.version = version
+        self.loaded_at = time.time()
+
+    @property
+    def exists(self) -> bool:
+        """Whether the snapshot was loaded from an existing file."""
+        return self.mtime is not None
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Get a top-level configuration value."""
+        return self.data.get(key, default)
+
+    def section(self, name: str) -> Mapping[str, Any]:
+        """
+        Get a top-level configuration section.
+
+        Args:
+            name: Name of the section (e.g. 'llm', 'web_search')
+
+        Returns:
+            A read-only mapping, empty if the section is missing
+        """
+        value = self.data.get(name)
+        return value if isinstance(value, Mapping) else _EMPTY_SECTION
+
+    def __getitem__(self, key: str) -> Any:
+        return self.data[key]
+
+    def __contains__(self, key: object) -> bool:
+        return key in self.data
+
+    def __repr__(self) -> str:
+        return f"ConfigSnapshot(path={self.path!r}, version={self.version})"
+
+
+class ConfigManager:
+    """
+    Loads a YAML configuration file and hands out shared snapshots.
+
+    Snapshots are replaced atomically, so readers never observe a partially
+    loaded configuration.
+    """
+
+    def __init__(self, path: str = DEFAULT_CONFIG_PATH, check_interval: float = DEFAULT_CHECK_INTERVAL):
+        """
+        Initialize the configuration manager.
+
+        Args:
+            path: Path to the YAML configuration file
+            check_interval: Minimum seconds between modification time checks
+        """
+        self.path = path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._snapshot: Optional[ConfigSnapshot] = None
+        self._next_check = 0.0
+
+        # Counters
+        self.reloads = 0
+        self.mtime_checks = 0
+        self.errors = 0
+
+    def _stat_mtime(self) -> Optional[float]:
+        """Get the file's modification time, or None if it does not exist."""
+        self.mtime_checks += 1
+        try:
+            return os.stat(self.path).st_mtime
+        except OSError:
+            return None
+
+    def _load(self, mtime: Optional[float]) -> ConfigSnapshot:
+        """Parse the configuration file and build a new snapshot."""
+        version = self._snapshot.version + 1 if self._snapshot else 1
+
+        if mtime is None:
+            logger.warning(f"Config file {self.path} not found, using empty configuration")
+            return ConfigSnapshot(_EMPTY_SECTION, self.path, None, version)
+
+        with open(self.path, 'r') as file:
+            data = yaml.safe_load(file) or {}
+
+        if not isinstance(data, dict):
+            raise ValueError(f"Config file {self.path} must contain a mapping at the top level")
+
+        self.reloads += 1
+        logger.info(f"Loaded configuration from {self.path} (version {version})")
+        return ConfigSnapshot(_freeze(data), self.path, mtime, version)
+
+    def get(self) -> ConfigSnapshot:
+        """
+        Get the current configuration snapshot.
+
+        The file is only stat'ed once the check interval has elapsed and only
+        re-parsed if its modification time changed.
+
+        Returns:
+            The current snapshot
+        """
+        snapshot = self._snapshot
+        if snapshot is not None and time.monotonic() < self._next_check:
+            return snapshot
+
+        with self._lock:
+            # Another thread may have refreshed the snapshot while we waited
+            if self._snapshot is not None and time.monotonic() < self._next_check:
+                return self._snapshot
+
+            mtime = self._stat_mtime()
+            if self._snapshot is None or mtime != self._snapshot.mtime:
+                self._refresh(mtime)
+            self._next_check = time.monotonic() + self.check_interval
+            return self._snapshot
+
+    def reload(self) -> ConfigSnapshot:
+        """
+        Force the configuration file to be re-read.
+
+        Returns:
+            The new snapshot (or the previous one if the file could not be parsed)
+        """
+        with self._lock:
+            self._refresh(self._stat_mtime())
+            self._next_check = time.monotonic() + self.check_interval
+            return self._snapshot
+
+    def _refresh(self, mtime: Optional[float]) -> None:
+        """Replace the current snapshot, keeping the old one on parse errors."""
+        try:
+            self._snapshot = self._load(mtime)
+        except Exception as e:
+            self.errors += 1
+            logger.error(f"Error loading config file {self.path}: {e}")
+            if self._snapshot is None:
+                self._snapshot = ConfigSnapshot(_EMPTY_SECTION, self.path, mtime, 1)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get statistics about configuration loading.
+
+        Returns:
+            Dictionary with reload counters and the current version
+        """
+        snapshot = self._snapshot
+        return {
+            "path": self.path,
+            "version": snapshot.version if snapshot else 0,
+            "loaded_at": snapshot.loaded_at if snapshot else None,
+            "reloads": self.reloads,
+            "mtime_checks": self.mtime_checks,
+            "errors": self.errors,
+            "check_interval": self.check_interval
+        }
+
+
+# Managers keyed by absolute config path
+_managers: Dict[str, ConfigManager] = {}
+_managers_lock = threading.Lock()
+
+
+def get_config_manager(path: Optional[str] = None) -> ConfigManager:
+    """
+    Get the shared manager for a configuration file.
+
+    Args:
+        path: Path to the configuration file (defaults to config.yaml)
+
+    Returns:
+        The process-wide ConfigManager for that file
+    """
+    path = path or DEFAULT_CONFIG_PATH
+    key = os.path.abspath(path)
+    manager = _managers.get(key)
+    if manager is None:
+        with _managers_lock:
+            manager = _managers.get(key)
+            if manager is None:
+                manager = ConfigManager(path)
+                _managers[key] = manager
+    return manager
+
+
+def get_config(path: Optional[str] = None) -> ConfigSnapshot:
+    """
+    Get the current configuration snapshot.
+
+    Args:
+        path: Path to the configuration file (defaults to config.yaml)
+
+    Returns:
+        An immutable ConfigSnapshot
+    """
+    return get_config_manager(path).get()
+
+
+def reload_config(path: Optional[str] = None) -> ConfigSnapshot:
+    """
+    Force a configuration file to be re-read.
+
+    Args:
+        path: Path to the configuration file (defaults to config.yaml)
+
+    Returns:
+        The new ConfigSnapshot
+    """
+    return get_config_manager(path).reload()
+
+
+def get_config_stats() -> Dict[str, Any]:
+    """
+    Get loading statistics for all configuration files.
+
+    Returns:
+        Dictionary mapping config paths to their statistics
+    """
+    return {manager.path: manager.get_stats() for manager in list(_managers.values())}
@@ -0,0 +1,181 @@
+"""
+Shared keep-alive HTTP sessions for outbound API calls.
+
+Each named session owns a urllib3 connection pool so that repeated calls to
+the same host reuse TCP/TLS connections instead of opening a new one per
+request. Connection reuse is tracked per session.
+"""
+
+import threading
+from typing import Any, Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_POOL_CONNECTIONS = 10  # Number of per-host pools to keep
+DEFAULT_POOL_MAXSIZE = 10      # Maximum keep-alive connections per host
+
+
+class PoolStats:
+    """Thread-safe counters for requests and newly opened connections."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.connections_created = 0
+        self.errors = 0
+
+    def record_request(self) -> None:
+        with self._lock:
+            self.requests += 1
+
+    def record_connection(self) -> None:
+        with self._lock:
+            self.connections_created += 1
+
+    def record_error(self) -> None:
+        with self._lock:
+            self.errors += 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the counters along with derived reuse figures."""
+        with self._lock:
+            requests_made = self.requests
+            created = self.connections_created
+            errors = self.errors
+        reused = max(requests_made - created, 0)
+        return {
+            "requests": requests_made,
+            "connections_created": created,
+            "connections_reused": reused,
+            "reuse_ratio": reused / requests_made if requests_made else 0.0,
+            "errors": errors
+        }
+
+
+def _counting_pool_classes(stats: PoolStats) -> Dict[str, type]:
+    """Build connection pool classes that report new connections to ``stats``."""
+
+    class CountingHTTPConnectionPool(HTTPConnectionPool):
+        def _new_conn(self):
+            stats.record_connection()
+            return super()._new_conn()
+
+    class CountingHTTPSConnectionPool(HTTPSConnectionPool):
+        def _new_conn(self):
+            stats.record_connection()
+            return super()._new_conn()
+
+    return {"http": CountingHTTPConnectionPool, "https": CountingHTTPSConnectionPool}
+
+
+class PooledHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter that records request and connection counts."""
+
+    def __init__(self, stats: PoolStats, **kwargs):
+        self.stats = stats
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = _counting_pool_classes(self.stats)
+
+    def send(self, request, **kwargs):
+        self.stats.record_request()
+        try:
+            return super().send(request, **kwargs)
+        except Exception:
+            self.stats.record_error()
+            raise
+
+
+# Registry of named sessions
+_sessions: Dict[str, requests.Session] = {}
+_stats: Dict[str, PoolStats] = {}
+_pool_settings: Dict[str, Dict[str, Any]] = {}
+_registry_lock = threading.Lock()
+
+
+def get_http_session(
+    name: str,
+    pool_connections: int = DEFAULT_POOL_CONNECTIONS,
+    pool_maxsize: int = DEFAULT_POOL_MAXSIZE,
+    pool_block: bool = False
+) -> requests.Session:
+    """
+    Get a shared keep-alive session, creating it on first use.
+
+    Args:
+        name: Name of the session (e.g. 'deepseek', 'tavily')
+        pool_connections: Number of per-host connection pools to keep
+        pool_maxsize: Maximum number of connections kept per host
+        pool_block: Whether to block instead of opening extra connections
+            once a host has ``pool_maxsize`` connections in use
+
+    Returns:
+        A requests.Session shared across the process
+    """
+    settings = {
+        "pool_connections": pool_connections,
+        "pool_maxsize": pool_maxsize,
+        "pool_block": pool_block
+    }
+
+    session = _sessions.get(name)
+    if session is not None and _pool_settings.get(name) == settings:
+        return session
+
+    with _registry_lock:
+        session = _sessions.get(name)
+        if session is not None and _pool_settings.get(name) == settings:
+            return session
+
+        if session is not None:
+            logger.info(f"Pool settings for HTTP session '{name}' changed, recreating session")
+            session.close()
+
+        stats = _stats.setdefault(name, PoolStats())
+        adapter = PooledHTTPAdapter(stats, **settings)
+
+        session = requests.Session()
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+
+        _sessions[name] = session
+        _pool_settings[name] = settings
+        logger.info(f"Created HTTP session '{name}' (pool_connections={pool_connections}, "
+                    f"pool_maxsize={pool_maxsize}, pool_block={pool_block})")
+        return session
+
+
+def get_pool_stats(name: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Get connection reuse statistics.
+
+    Args:
+        name: Session name, or None for all sessions
+
+    Returns:
+        Statistics for one session, or a mapping of session name to statistics
+    """
+    if name is not None:
+        stats = _stats.get(name)
+        result = stats.to_dict() if stats else PoolStats().to_dict()
+        result.update(_pool_settings.get(name, {}))
+        return result
+    return {session_name: get_pool_stats(session_name) for session_name in list(_stats)}
+
+
+def close_http_sessions() -> None:
+    """Close all shared sessions and reset their statistics."""
+    with _registry_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
+        _stats.clear()
+        _pool_settings.clear()
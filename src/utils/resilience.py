@@ -0,0 +1,526 @@
+"""
+Retries, hedging and circuit breaking for calls to upstream services.
+
+Each upstream (DeepSeek, Tavily) gets an Upstream object shared by all
+callers in the process:
+
+- A circuit breaker opens after a run of consecutive failures and then
+  fails calls immediately, instead of letting every request wait out the
+  full timeout against a service that is down. After a recovery period it
+  lets a single probe call through and closes again if that succeeds.
+- Failed attempts are retried with exponential backoff and full jitter.
+  The async variant sleeps with asyncio.sleep, so it never blocks the
+  event loop.
+- Optionally, an attempt that is slower than the 95th percentile of recent
+  latencies is hedged: a second attempt is started and whichever finishes
+  first wins.
+
+Settings are read from the resilience section of the config, per upstream.
+"""
+
+import time
+import random
+import asyncio
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+
+import httpx
+import requests
+
+from src.utils.logger import get_logger
+from src.utils.config import get_config
+
+logger = get_logger(__name__)
+
+DEFAULT_FAILURE_THRESHOLD = 5
+DEFAULT_RECOVERY_SECONDS = 30.0
+DEFAULT_MAX_ATTEMPTS = 3
+DEFAULT_BASE_DELAY = 1.0
+DEFAULT_MAX_DELAY = 10.0
+DEFAULT_HEDGE_QUANTILE = 0.95
+DEFAULT_HEDGE_MIN_SAMPLES = 20
+DEFAULT_LATENCY_WINDOW = 200
+
+# HTTP status codes worth retrying: timeouts, rate limits and server errors
+RETRYABLE_STATUS_CODES = frozenset({408, 409, 425, 429, 500, 502, 503, 504})
+
+# Runs the first attempt of hedged calls, so the hedge can start while it is still running
+_HEDGE_EXECUTOR = ThreadPoolExecutor(max_workers=32, thread_name_prefix="hedge")
+
+
+class UpstreamError(ValueError):
+    """
+    A failed call to an upstream service.
+
+    Subclasses ValueError, which the API clients raised for failed requests before.
+    """
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+    @property
+    def retryable(self) -> bool:
+        """Whether another attempt may succeed: no response at all, or a transient status."""
+        return self.status_code is None or self.status_code in RETRYABLE_STATUS_CODES
+
+
+class CircuitOpenError(UpstreamError):
+    """Raised without calling the upstream while its circuit breaker is open."""
+
+    @property
+    def retryable(self) -> bool:
+        return False
+
+
+def is_retryable(error: BaseException) -> bool:
+    """
+    Decide whether a failed attempt should be retried.
+
+    Args:
+        error: The exception raised by the attempt
+
+    Returns:
+        True for transport errors and retryable upstream errors
+    """
+    if isinstance(error, UpstreamError):
+        return error.retryable
+    return isinstance(error, (requests.RequestException, httpx.TransportError, TimeoutError, ConnectionError))
+
+
+def backoff_delay(attempt: int, base_delay: float, max_delay: float = DEFAULT_MAX_DELAY) -> float:
+    """
+    Delay before the next attempt, with exponential backoff and full jitter.
+
+    Args:
+        attempt: Number of the attempt that just failed, starting at 1
+        base_delay: Delay cap after the first attempt
+        max_delay: Upper bound for the delay cap
+
+    Returns:
+        A random delay between 0 and min(max_delay, base_delay * 2 ** (attempt - 1)) seconds
+    """
+    return random.uniform(0, min(max_delay, base_delay * 2 ** (attempt - 1)))
+
+
+def _release_result(future) -> None:
+    """Close the result of a hedged attempt that lost, such as an HTTP response."""
+    if not future.cancelled() and future.exception() is None:
+        close = getattr(future.result(), "close", None)
+        if callable(close):
+            close()
+
+
+class CircuitBreaker:
+    """Fails calls fast after consecutive failures, until a probe call succeeds."""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = DEFAULT_FAILURE_THRESHOLD,
+                 recovery_seconds: float = DEFAULT_RECOVERY_SECONDS):
+        """
+        Initialize the circuit breaker.
+
+        Args:
+            name: Name of the upstream, used in errors and logs
+            failure_threshold: Consecutive failures that open the circuit
+            recovery_seconds: Time the circuit stays open before a probe call is let through
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_seconds = recovery_seconds
+
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+
+        # Metrics
+        self.rejected = 0
+        self.opened = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state
+
+    def before_call(self) -> None:
+        """
+        Check that a call may be made.
+
+        Raises:
+            CircuitOpenError: If the circuit is open, or half open with a probe in progress
+        """
+        with self._lock:
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.recovery_seconds:
+                self._state = self.HALF_OPEN
+                self._probing = False
+            if self._state == self.CLOSED:
+                return
+            if self._state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return
+            self.rejected += 1
+        raise CircuitOpenError(f"{self.name} is unavailable (circuit open)")
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self._state != self.CLOSED:
+                logger.info(f"Circuit for {self.name} closed")
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    self.opened += 1
+                    logger.warning(f"Circuit for {self.name} opened after {self._failures} consecutive failures")
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._probing = False
+
+    def record_abandoned(self) -> None:
+        """Record a call given up without an outcome, e.g. cancelled, so another probe may follow."""
+        with self._lock:
+            self._probing = False
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "state": self._state,
+                "consecutive_failures": self._failures,
+                "opened": self.opened,
+                "rejected": self.rejected
+            }
+
+
+class LatencyTracker:
+    """Latencies of the most recent successful calls."""
+
+    def __init__(self, window: int = DEFAULT_LATENCY_WINDOW, min_samples: int = DEFAULT_HEDGE_MIN_SAMPLES):
+        self.min_samples = min_samples
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """
+        Get a latency quantile.
+
+        Args:
+            q: The quantile, between 0 and 1
+
+        Returns:
+            The latency in seconds, or None until enough calls have been seen
+        """
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return None
+            samples = sorted(self._samples)
+        return samples[min(int(q * len(samples)), len(samples) - 1)]
+
+
+class Upstream:
+    """Circuit breaker, retries and hedging for one upstream service."""
+
+    def __init__(self, name: str, failure_threshold: int = DEFAULT_FAILURE_THRESHOLD,
+                 recovery_seconds: float = DEFAULT_RECOVERY_SECONDS, max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+                 base_delay: float = DEFAULT_BASE_DELAY, max_delay: float = DEFAULT_MAX_DELAY,
+                 hedge: bool = False, hedge_quantile: float = DEFAULT_HEDGE_QUANTILE,
+                 hedge_min_samples: int = DEFAULT_HEDGE_MIN_SAMPLES, latency_window: int = DEFAULT_LATENCY_WINDOW):
+        """
+        Initialize the upstream.
+
+        Args:
+            name: Name of the upstream service
+            failure_threshold: Consecutive failures that open the circuit
+            recovery_seconds: Time the circuit stays open before a probe call
+            max_attempts: Default number of attempts per call
+            base_delay: Default backoff delay cap after the first failed attempt
+            max_delay: Upper bound for backoff delays
+            hedge: Whether slow attempts are hedged with a second one
+            hedge_quantile: Latency quantile after which an attempt is hedged
+            hedge_min_samples: Calls to observe before hedging starts
+            latency_window: Number of recent latencies kept per operation
+        """
+        self.name = name
+        self.breaker = CircuitBreaker(name, failure_threshold, recovery_seconds)
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_samples = hedge_min_samples
+        self.latency_window = latency_window
+
+        self._latencies: Dict[str, LatencyTracker] = {}
+        self._lock = threading.Lock()
+
+        # Metrics
+        self.calls = 0
+        self.failures = 0
+        self.retries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def _tracker(self, operation: str) -> LatencyTracker:
+        with self._lock:
+            tracker = self._latencies.get(operation)
+            if tracker is None:
+                tracker = LatencyTracker(self.latency_window, self.hedge_min_samples)
+                self._latencies[operation] = tracker
+            return tracker
+
+    def _count(self, metric: str) -> None:
+        with self._lock:
+            setattr(self, metric, getattr(self, metric) + 1)
+
+    def _hedge_after(self, operation: str, hedge: Optional[bool]) -> Optional[float]:
+        if not (self.hedge if hedge is None else hedge):
+            return None
+        return self._tracker(operation).quantile(self.hedge_quantile)
+
+    def _timed(self, fn: Callable[[], Any], tracker: LatencyTracker) -> Any:
+        start = time.monotonic()
+        result = fn()
+        tracker.record(time.monotonic() - start)
+        return result
+
+    def _attempt(self, fn: Callable[[], Any], operation: str, hedge: Optional[bool]) -> Any:
+        tracker = self._tracker(operation)
+        threshold = self._hedge_after(operation, hedge)
+        if threshold is None:
+            return self._timed(fn, tracker)
+
+        first = _HEDGE_EXECUTOR.submit(self._timed, fn, tracker)
+        try:
+            return first.result(timeout=threshold)
+        except FutureTimeoutError:
+            pass
+
+        self._count("hedges")
+        second = _HEDGE_EXECUTOR.submit(self._timed, fn, tracker)
+        pending = {first, second}
+        error = None
+        # The slower attempt cannot be cancelled once running; its result is released when it finishes
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is second:
+                        self._count("hedge_wins")
+                    for loser in (done | pending) - {future}:
+                        loser.add_done_callback(_release_result)
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    async def _atimed(self, fn: Callable[[], Awaitable[Any]], tracker: LatencyTracker) -> Any:
+        start = time.monotonic()
+        result = await fn()
+        tracker.record(time.monotonic() - start)
+        return result
+
+    async def _aattempt(self, fn: Callable[[], Awaitable[Any]], operation: str, hedge: Optional[bool]) -> Any:
+        tracker = self._tracker(operation)
+        threshold = self._hedge_after(operation, hedge)
+        first = asyncio.ensure_future(self._atimed(fn, tracker))
+        if threshold is None:
+            return await first
+
+        try:
+            done, _ = await asyncio.wait({first}, timeout=threshold)
+        except asyncio.CancelledError:
+            first.cancel()
+            raise
+        if done:
+            return first.result()
+
+        self._count("hedges")
+        second = asyncio.ensure_future(self._atimed(fn, tracker))
+        pending = {first, second}
+        error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is second:
+                            self._count("hedge_wins")
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def _failed(self, error: BaseException, attempt: int, max_attempts: int) -> bool:
+        """Record a failed attempt and decide whether to retry it."""
+        retryable = is_retryable(error)
+        if retryable:
+            self.breaker.record_failure()
+        else:
+            # The upstream answered; the request itself was bad
+            self.breaker.record_success()
+        self._count("failures")
+        if not retryable or attempt >= max_attempts:
+            return False
+        self._count("retries")
+        logger.warning(f"{self.name} call failed (attempt {attempt}/{max_attempts}): {error}")
+        return True
+
+    def call(self, fn: Callable[[], Any], operation: str = "default", max_attempts: Optional[int] = None,
+             base_delay: Optional[float] = None, hedge: Optional[bool] = None) -> Any:
+        """
+        Call the upstream with retries and, if enabled, hedging.
+
+        Blocks the calling thread while backing off, so it should not be
+        called on an event loop; use acall there.
+
+        Args:
+            fn: Makes one attempt; raises on failure
+            operation: Kind of call, latencies are tracked per operation
+            max_attempts: Attempts for this call (defaults to the upstream's setting)
+            base_delay: Backoff delay cap after the first failure (defaults to the upstream's setting)
+            hedge: Whether to hedge this call (defaults to the upstream's setting)
+
+        Returns:
+            The result of the first successful attempt
+
+        Raises:
+            CircuitOpenError: If the circuit is open
+            Exception: The error of the last attempt
+        """
+        max_attempts = max(max_attempts or self.max_attempts, 1)
+        base_delay = self.base_delay if base_delay is None else base_delay
+        self._count("calls")
+
+        for attempt in range(1, max_attempts + 1):
+            self.breaker.before_call()
+            try:
+                result = self._attempt(fn, operation, hedge)
+            except Exception as e:
+                if not self._failed(e, attempt, max_attempts):
+                    raise
+                time.sleep(backoff_delay(attempt, base_delay, self.max_delay))
+            except BaseException:
+                # Cancelled or interrupted: no outcome to record, but a probe must not stay in progress
+                self.breaker.record_abandoned()
+                raise
+            else:
+                self.breaker.record_success()
+                return result
+
+    async def acall(self, fn: Callable[[], Awaitable[Any]], operation: str = "default",
+                    max_attempts: Optional[int] = None, base_delay: Optional[float] = None,
+                    hedge: Optional[bool] = None) -> Any:
+        """
+        Async version of call; backs off without blocking the event loop.
+
+        Args:
+            fn: Coroutine function making one attempt; raises on failure
+            operation: Kind of call, latencies are tracked per operation
+            max_attempts: Attempts for this call (defaults to the upstream's setting)
+            base_delay: Backoff delay cap after the first failure (defaults to the upstream's setting)
+            hedge: Whether to hedge this call (defaults to the upstream's setting)
+
+        Returns:
+            The result of the first successful attempt
+
+        Raises:
+            CircuitOpenError: If the circuit is open
+            Exception: The error of the last attempt
+        """
+        max_attempts = max(max_attempts or self.max_attempts, 1)
+        base_delay = self.base_delay if base_delay is None else base_delay
+        self._count("calls")
+
+        for attempt in range(1, max_attempts + 1):
+            self.breaker.before_call()
+            try:
+                result = await self._aattempt(fn, operation, hedge)
+            except Exception as e:
+                if not self._failed(e, attempt, max_attempts):
+                    raise
+                await asyncio.sleep(backoff_delay(attempt, base_delay, self.max_delay))
+            except BaseException:
+                # Cancelled or interrupted: no outcome to record, but a probe must not stay in progress
+                self.breaker.record_abandoned()
+                raise
+            else:
+                self.breaker.record_success()
+                return result
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = {
+                "calls": self.calls,
+                "failures": self.failures,
+                "retries": self.retries,
+                "hedges": self.hedges,
+                "hedge_wins": self.hedge_wins,
+                "hedge_enabled": self.hedge
+            }
+            trackers = dict(self._latencies)
+        stats["circuit"] = self.breaker.get_stats()
+        stats["p95_seconds"] = {
+            operation: tracker.quantile(DEFAULT_HEDGE_QUANTILE) for operation, tracker in trackers.items()
+        }
+        return stats
+
+
+_upstreams: Dict[str, Upstream] = {}
+_upstreams_lock = threading.Lock()
+
+
+def get_upstream(name: str) -> Upstream:
+    """
+    Get the shared resilience settings and state for an upstream service.
+
+    Args:
+        name: Name of the upstream, as in the resilience section of the config
+
+    Returns:
+        The process-wide Upstream for that name
+    """
+    upstream = _upstreams.get(name)
+    if upstream is None:
+        with _upstreams_lock:
+            upstream = _upstreams.get(name)
+            if upstream is None:
+                settings = get_config().section('resilience').get(name) or {}
+                upstream = Upstream(
+                    name,
+                    failure_threshold=settings.get('failure_threshold', DEFAULT_FAILURE_THRESHOLD),
+                    recovery_seconds=settings.get('recovery_seconds', DEFAULT_RECOVERY_SECONDS),
+                    max_attempts=settings.get('max_attempts', DEFAULT_MAX_ATTEMPTS),
+                    base_delay=settings.get('base_delay', DEFAULT_BASE_DELAY),
+                    max_delay=settings.get('max_delay', DEFAULT_MAX_DELAY),
+                    hedge=settings.get('hedge', False),
+                    hedge_quantile=settings.get('hedge_quantile', DEFAULT_HEDGE_QUANTILE),
+                    hedge_min_samples=settings.get('hedge_min_samples', DEFAULT_HEDGE_MIN_SAMPLES)
+                )
+                _upstreams[name] = upstream
+    return upstream
+
+
+def get_resilience_stats() -> Dict[str, Any]:
+    """
+    Get retry, hedging and circuit breaker statistics.
+
+    Returns:
+        Dictionary of statistics keyed by upstream name
+    """
+    return {name: upstream.get_stats() for name, upstream in list(_upstreams.items())}
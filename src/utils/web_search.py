@@ -1,19 +1,39 @@
 """
 Web search utilities using the Tavily API.
+
+Searches go through a shared WebSearchService, which keeps one provider
+client with a pooled keep-alive session and caches normalized results per
+(query, search depth, max results). News-like queries ("latest", "today",
+a year, ...) are cached for a shorter time than evergreen ones. Result URLs
+are normalized, so the same page is returned once and pages that were
+already retrieved from the vector store can be left out.
+
+Set web_search.provider to "fake" to run without network access.
 """
 
 import os
+import re
 import sys
 import json
 import requests
-import yaml
 import time
 import random
+import threading
 import urllib.parse
-from typing import List, Dict, Any, Optional
+from collections import OrderedDict
+from typing import List, Dict, Any, Iterable, Optional, Set, Tuple
 from dotenv import load_dotenv
 from langchain.schema import Document
 from tavily import TavilyClient
+try:
+    from tavily.errors import TimeoutError as TavilyTimeoutError
+except ImportError:  # Older tavily-python versions let requests timeouts through
+    TavilyTimeoutError = requests.Timeout
+try:
+    from tavily.errors import UsageLimitExceededError as TavilyUsageLimitError
+except ImportError:  # Older tavily-python versions raise HTTPError with status 429
+    class TavilyUsageLimitError(Exception):
+        """Placeholder that is never raised."""
 from fake_useragent import UserAgent
 
 # Add parent directory to path
@@ -21,6 +41,9 @@
 
 # Import project modules
 from src.utils.logger import get_logger, api_logger
+from src.utils.config import get_config
+from src.utils.http_pool import get_http_session
+from src.utils.resilience import CircuitOpenError, UpstreamError, get_upstream
 
 # Load environment variables
 load_dotenv()
@@ -28,91 +51,473 @@
 # Configure module logger
 logger = get_logger(__name__)
 
-def search_web(query: str, max_results: int = 5, search_depth: str = "basic") -> List[Document]:
+DEFAULT_CACHE_MAX_ENTRIES = 500
+DEFAULT_CACHE_TTL_SECONDS = 6 * 3600
+DEFAULT_NEWS_CACHE_TTL_SECONDS = 900
+
+# Queries about recent events are cached for DEFAULT_NEWS_CACHE_TTL_SECONDS only
+NEWS_QUERY_PATTERN = re.compile(
+    r"\b(recent|recently|latest|news|current|currently|today|tonight|yesterday|this (week|month|year)"
+    r"|update[sd]?|announce[sd]?|breaking|deadlines?|20\d\d)\b"
+)
+
+# Query parameters that only track where a visitor came from
+TRACKING_PARAMS = frozenset({"fbclid", "gclid", "msclkid", "mc_cid", "mc_eid", "ref", "ref_src"})
+
+
+def normalize_url(url: str) -> str:
     """
-    Search the web using Tavily and return results as documents.
-    
+    Normalize a URL so that different spellings of the same page compare equal.
+
+    The scheme, a leading "www.", default ports, fragments, tracking parameters,
+    repeated and trailing slashes are dropped, and the query is sorted.
+    Values that are not http(s) URLs, such as file paths, are only stripped.
+
     Args:
-        query: The search query
-        max_results: Maximum number of results to return
-        search_depth: Search depth ('basic' or 'comprehensive')
-        
+        url: The URL to normalize
+
     Returns:
-        List of Document objects with search results
+        The normalized URL
     """
-    # Load config
-    try:
-        with open("config.yaml", 'r') as file:
-            config = yaml.safe_load(file)
-        web_search_config = config.get('web_search', {})
-    except Exception as e:
-        logger.error(f"Error loading configuration: {e}")
-        web_search_config = {}
-    
-    # Get API key from config or environment
-    api_key = web_search_config.get('tavily_api_key', '')
-    if not api_key:
-        api_key = os.getenv('TAVILY_API_KEY', '')
-    
-    if not api_key:
-        logger.error("No Tavily API key found")
-        return []
-    
-    # Use configured values if provided
-    max_results = web_search_config.get('max_results', max_results)
-    search_depth = web_search_config.get('search_depth', search_depth)
-    
-    # Initialize Tavily client
-    client = TavilyClient(api_key=api_key)
-    
-    logger.info(f"Searching web for: {query}")
-    api_logger.info(f"Tavily search: {query[:100]}...")
-    
+    url = (url or "").strip()
+    parts = urllib.parse.urlsplit(url)
+    if parts.scheme.lower() not in ("http", "https") or not parts.hostname:
+        return url
+
+    host = parts.hostname.lower()
+    if host.startswith("www."):
+        host = host[4:]
     try:
-        start_time = time.time()
-        
-        # Perform search
-        response = client.search(
-            query=query,
-            search_depth=search_depth,
-            max_results=max_results
+        port = parts.port
+    except ValueError:
+        port = None
+    if port and port not in (80, 443):
+        host = f"{host}:{port}"
+
+    path = re.sub(r"/{2,}", "/", parts.path).rstrip("/")
+    query = urllib.parse.urlencode(sorted(
+        (name, value) for name, value in urllib.parse.parse_qsl(parts.query, keep_blank_values=True)
+        if not name.lower().startswith("utm_") and name.lower() not in TRACKING_PARAMS
+    ))
+    return f"//{host}{path}" + (f"?{query}" if query else "")
+
+
+def normalize_query(query: str) -> str:
+    """Normalize a query for use in cache keys: lower case, single spaces, no trailing punctuation."""
+    return " ".join(query.lower().split()).rstrip("?!. ")
+
+
+def is_news_query(query: str) -> bool:
+    """Whether a query asks about recent events, so its results go stale quickly."""
+    return bool(NEWS_QUERY_PATTERN.search(query.lower()))
+
+
+def document_urls(documents: Iterable[Document]) -> Set[str]:
+    """
+    Collect the normalized source URLs of documents.
+
+    Args:
+        documents: Documents, e.g. from the vector store
+
+    Returns:
+        Normalized values of their source and url metadata
+    """
+    urls = set()
+    for doc in documents:
+        for key in ("source", "url"):
+            value = doc.metadata.get(key)
+            if isinstance(value, str) and value:
+                urls.add(normalize_url(value))
+    return urls
+
+
+def exclude_known_sources(web_documents: List[Document], documents: Iterable[Document]) -> List[Document]:
+    """
+    Drop web results for pages that were already retrieved.
+
+    Args:
+        web_documents: Web search results
+        documents: Documents retrieved from other sources
+
+    Returns:
+        The web results whose URL is not among the sources of the other documents
+    """
+    known = document_urls(documents)
+    if not known:
+        return web_documents
+    return [doc for doc in web_documents if normalize_url(doc.metadata.get("source", "")) not in known]
+
+
+def normalize_results(response: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Normalize the results of a search provider.
+
+    Results without a URL or content are dropped, whitespace is collapsed and
+    results for the same page are merged, keeping the best-scored one.
+
+    Args:
+        response: Provider response with a "results" list
+
+    Returns:
+        Result dictionaries with url, normalized_url, title, content and score, best first
+    """
+    best: Dict[str, Dict[str, Any]] = {}
+    for result in response.get("results") or []:
+        url = (result.get("url") or "").strip()
+        content = " ".join((result.get("content") or "").split())
+        if not url or not content:
+            continue
+        normalized = {
+            "url": url,
+            "normalized_url": normalize_url(url),
+            "title": " ".join((result.get("title") or "").split()) or "No Title",
+            "content": content,
+            "score": float(result.get("score") or 0)
+        }
+        current = best.get(normalized["normalized_url"])
+        if current is None or normalized["score"] > current["score"]:
+            best[normalized["normalized_url"]] = normalized
+    return sorted(best.values(), key=lambda result: result["score"], reverse=True)
+
+
+class TavilySearchProvider:
+    """Tavily search over the shared keep-alive "tavily" HTTP session."""
+
+    name = "tavily"
+
+    def __init__(self, api_key: str):
+        """
+        Initialize the provider.
+
+        Args:
+            api_key: Tavily API key
+        """
+        try:
+            self.client = TavilyClient(api_key=api_key, session=get_http_session("tavily"))
+        except TypeError:  # tavily-python versions without a session argument keep their own
+            self.client = TavilyClient(api_key=api_key)
+
+    def _search_once(self, query: str, search_depth: str, max_results: int) -> Dict[str, Any]:
+        """Make a single search request, raising UpstreamError for failures worth retrying."""
+        try:
+            return self.client.search(query=query, search_depth=search_depth, max_results=max_results)
+        except requests.HTTPError as e:
+            status_code = e.response.status_code if e.response is not None else None
+            raise UpstreamError(f"Tavily search failed: {e}", status_code=status_code) from e
+        except TavilyTimeoutError as e:
+            raise UpstreamError(f"Tavily search timed out: {e}") from e
+        except TavilyUsageLimitError as e:
+            # tavily-python turns 429 responses into this error; keep them retryable
+            raise UpstreamError(f"Tavily usage limit exceeded: {e}", status_code=429) from e
+
+    def search(self, query: str, search_depth: str, max_results: int) -> Dict[str, Any]:
+        """
+        Search the web.
+
+        Args:
+            query: The search query
+            search_depth: Search depth ('basic' or 'advanced')
+            max_results: Maximum number of results
+
+        Returns:
+            The Tavily response
+        """
+        # Retried, hedged and short-circuited by the resilience layer
+        return get_upstream("tavily").call(
+            lambda: self._search_once(query, search_depth, max_results),
+            operation="search"
         )
-        
-        elapsed_time = time.time() - start_time
-        logger.info(f"Web search completed in {elapsed_time:.2f}s, found {len(response['results'])} results")
-        
-        # Convert results to documents
+
+
+class FakeSearchProvider:
+    """Offline search provider returning canned or generated results, for tests and local runs."""
+
+    name = "fake"
+
+    def __init__(self, results: Optional[Dict[str, List[Dict[str, Any]]]] = None):
+        """
+        Initialize the provider.
+
+        Args:
+            results: Canned results by normalized query; other queries get generated results
+        """
+        self.results = {normalize_query(query): value for query, value in (results or {}).items()}
+        self.calls: List[Tuple[str, str, int]] = []
+        self._lock = threading.Lock()
+
+    def search(self, query: str, search_depth: str, max_results: int) -> Dict[str, Any]:
+        with self._lock:
+            self.calls.append((query, search_depth, max_results))
+        key = normalize_query(query)
+        if key in self.results:
+            return {"query": query, "results": self.results[key][:max_results]}
+
+        slug = urllib.parse.quote("-".join(key.split()), safe="-")
+        return {
+            "query": query,
+            "results": [
+                {
+                    "url": f"https://search.example.com/{slug}/{i + 1}",
+                    "title": f"Result {i + 1} for {query}",
+                    "content": f"Offline search result {i + 1} about {query}.",
+                    "score": round(1.0 - i / (max_results + 1), 3)
+                }
+                for i in range(max_results)
+            ]
+        }
+
+
+class WebSearchService:
+    """
+    Cached web search over a single provider.
+
+    Results are cached in memory per normalized query, search depth and
+    number of results, with a shorter time to live for news-like queries.
+    All methods are thread-safe.
+    """
+
+    def __init__(self, provider, max_entries: int = DEFAULT_CACHE_MAX_ENTRIES,
+                 ttl_seconds: float = DEFAULT_CACHE_TTL_SECONDS,
+                 news_ttl_seconds: float = DEFAULT_NEWS_CACHE_TTL_SECONDS):
+        """
+        Initialize the service.
+
+        Args:
+            provider: Search provider with a search(query, search_depth, max_results) method
+            max_entries: Maximum number of cached searches
+            ttl_seconds: Time cached results are served for
+            news_ttl_seconds: Time cached results of news-like queries are served for
+        """
+        self.provider = provider
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.news_ttl_seconds = news_ttl_seconds
+
+        # key -> (normalized results, expiry time), least recently used first
+        self._cache: "OrderedDict[Tuple[str, str, int], Tuple[Tuple[Dict[str, Any], ...], float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.evictions = 0
+        self.provider_errors = 0
+        self.excluded_results = 0
+
+    def _lookup(self, key: Tuple[str, str, int]) -> Optional[Tuple[Dict[str, Any], ...]]:
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None:
+                if entry[1] > time.time():
+                    self._cache.move_to_end(key)
+                    self.hits += 1
+                    return entry[0]
+                del self._cache[key]
+                self.expirations += 1
+            self.misses += 1
+            return None
+
+    def _store(self, key: Tuple[str, str, int], results: Tuple[Dict[str, Any], ...], ttl: float) -> None:
+        with self._lock:
+            self._cache[key] = (results, time.time() + ttl)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+                self.evictions += 1
+
+    def search(self, query: str, max_results: int = 5, search_depth: str = "basic",
+               exclude_urls: Optional[Iterable[str]] = None) -> List[Document]:
+        """
+        Search the web, serving repeated searches from the cache.
+
+        Args:
+            query: The search query
+            max_results: Maximum number of results
+            search_depth: Search depth ('basic' or 'advanced')
+            exclude_urls: URLs of pages that were already retrieved and should be left out
+
+        Returns:
+            List of Document objects with search results; empty if the search failed
+        """
+        key = (normalize_query(query), search_depth, max_results)
+        results = self._lookup(key)
+
+        if results is None:
+            logger.info(f"Searching web for: {query}")
+            api_logger.info(f"Web search ({getattr(self.provider, 'name', 'provider')}): {query[:100]}...")
+            start_time = time.time()
+            try:
+                response = self.provider.search(query, search_depth, max_results)
+            except CircuitOpenError as e:
+                logger.warning(f"Skipping web search: {e}")
+                return []
+            except Exception as e:
+                with self._lock:
+                    self.provider_errors += 1
+                logger.error(f"Error searching the web: {e}", exc_info=True)
+                api_logger.error(f"Web search failed: {str(e)}")
+                return []
+
+            results = tuple(normalize_results(response))
+            self._store(key, results, self.news_ttl_seconds if is_news_query(query) else self.ttl_seconds)
+            logger.info(f"Web search completed in {time.time() - start_time:.2f}s, found {len(results)} results")
+        else:
+            logger.debug(f"Using cached web search results for: {query}")
+
+        excluded = {normalize_url(url) for url in exclude_urls or ()}
         documents = []
-        for result in response.get('results', []):
-            content = f"Title: {result.get('title', 'No Title')}\n\n{result.get('content', '')}"
+        for result in results:
+            if result["normalized_url"] in excluded:
+                with self._lock:
+                    self.excluded_results += 1
+                continue
             documents.append(
                 Document(
-                    page_content=content,
+                    page_content=f"Title: {result['title']}\n\n{result['content']}",
                     metadata={
-                        'source': result.get('url', ''),
-                        'title': result.get('title', 'No Title'),
-                        'score': result.get('score', 0),
+                        'source': result['url'],
+                        'title': result['title'],
+                        'score': result['score'],
                         'search_query': query
                     }
                 )
             )
-        
         return documents
-    
-    except Exception as e:
-        logger.error(f"Error searching the web: {e}", exc_info=True)
-        api_logger.error(f"Tavily search failed: {str(e)}")
+
+    def clear(self) -> int:
+        """
+        Remove all cached results.
+
+        Returns:
+            Number of cached searches removed
+        """
+        with self._lock:
+            count = len(self._cache)
+            self._cache.clear()
+            return count
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "provider": getattr(self.provider, "name", type(self.provider).__name__),
+                "entries": len(self._cache),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "news_ttl_seconds": self.news_ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "expirations": self.expirations,
+                "evictions": self.evictions,
+                "provider_errors": self.provider_errors,
+                "excluded_results": self.excluded_results
+            }
+
+
+_service: Optional[WebSearchService] = None
+_service_settings: Optional[Dict[str, Any]] = None
+_service_lock = threading.Lock()
+
+
+def _create_provider(settings: Dict[str, Any]):
+    """Create the configured search provider, or None if it cannot be used."""
+    provider = settings.get('provider', 'tavily')
+    if provider == 'fake':
+        return FakeSearchProvider()
+    if provider != 'tavily':
+        logger.error(f"Unknown web search provider: {provider}")
+        return None
+
+    # Get API key from config or environment
+    api_key = settings.get('tavily_api_key', '') or os.getenv('TAVILY_API_KEY', '')
+    if not api_key:
+        logger.error("No Tavily API key found")
+        return None
+    return TavilySearchProvider(api_key)
+
+
+def get_web_search_service() -> Optional[WebSearchService]:
+    """
+    Get the shared web search service, configured from the web_search section of the config.
+
+    The service is recreated when that section changes.
+
+    Returns:
+        The process-wide WebSearchService, or None if no provider is available
+    """
+    global _service, _service_settings
+    settings = get_config().section('web_search')
+    if settings == _service_settings:
+        return _service
+
+    with _service_lock:
+        if settings != _service_settings:
+            provider = _create_provider(settings)
+            _service = WebSearchService(
+                provider,
+                max_entries=settings.get('cache_max_entries', DEFAULT_CACHE_MAX_ENTRIES),
+                ttl_seconds=settings.get('cache_ttl_seconds', DEFAULT_CACHE_TTL_SECONDS),
+                news_ttl_seconds=settings.get('news_cache_ttl_seconds', DEFAULT_NEWS_CACHE_TTL_SECONDS)
+            ) if provider is not None else None
+            _service_settings = settings
+        return _service
+
+
+def search_web(query: str, max_results: int = 5, search_depth: str = "basic",
+               exclude_urls: Optional[Iterable[str]] = None) -> List[Document]:
+    """
+    Search the web and return results as documents.
+
+    Args:
+        query: The search query
+        max_results: Maximum number of results to return
+        search_depth: Search depth ('basic' or 'advanced')
+        exclude_urls: URLs of pages that were already retrieved and should be left out
+
+    Returns:
+        List of Document objects with search results
+    """
+    service = get_web_search_service()
+    if service is None:
         return []
 
+    # Use configured values if provided
+    web_search_config = get_config().section('web_search')
+    max_results = web_search_config.get('max_results', max_results)
+    search_depth = web_search_config.get('search_depth', search_depth)
+
+    return service.search(query, max_results=max_results, search_depth=search_depth, exclude_urls=exclude_urls)
+
+
+def clear_web_search_cache() -> int:
+    """
+    Clear the cached web search results, if the service has been created.
+
+    Returns:
+        Number of cached searches removed
+    """
+    return _service.clear() if _service is not None else 0
+
+
+def get_web_search_stats() -> Dict[str, Any]:
+    """
+    Get web search cache statistics.
+
+    Returns:
+        Dictionary of statistics, empty if the service has not been created
+    """
+    return _service.get_stats() if _service is not None else {}
+
 if __name__ == "__main__":
     # Example usage
-    search_tool = WebSearchTool()
     query = "scholarship opportunities for international students at Canadian universities"
-    results = search_tool.search(query)
-    
+    results = search_web(query)
+
     for i, doc in enumerate(results):
         print(f"Result {i+1}:")
         print(f"Source: {doc.metadata.get('source')}")
         print(f"Title: {doc.metadata.get('title')}")
         print(f"Content snippet: {doc.page_content[:200]}...")
-        print("-" * 80) 
\ No newline at end of file
+        print("-" * 80)
@@ -45,6 +45,30 @@
     from src.api.app import app
 
 
+@pytest.fixture(autouse=True)
+def conversation_store():
+    """
+    Keep conversations in memory so tests don't write to the configured database.
+    """
+    from src.api.services.conversation_store import MemoryConversationStore, set_conversation_store
+    store = MemoryConversationStore()
+    previous = set_conversation_store(store)
+    yield store
+    set_conversation_store(previous)
+
+
+@pytest.fixture(autouse=True)
+def document_registry():
+    """
+    Keep documents in memory only so tests don't write to the configured database.
+    """
+    from src.api.services.documents import DocumentRegistry, set_document_registry
+    registry = DocumentRegistry(db_path=None)
+    previous = set_document_registry(registry)
+    yield registry
+    set_document_registry(previous)
+
+
 @pytest.fixture
 def test_client():
     """
@@ -174,4 +174,30 @@ def test_admin_action_error(test_client):
         assert response.status_code == 500
         data = response.json()
         assert "detail" in data
-        assert "Test error" in data["detail"] 
\ No newline at end of file
+        assert "Test error" in data["detail"] 
+
+def test_admin_reload_config(test_client):
+    """Test the reload config admin action."""
+    with patch('src.api.routers.admin.reload_config', autospec=True) as mock_reload:
+        mock_reload.return_value = {
+            "message": "Configuration reloaded (version 2)",
+            "details": {
+                "path": "config.yaml",
+                "version": 2
+            }
+        }
+        
+        request_data = {
+            "action": "reload_config",
+            "parameters": None
+        }
+        
+        response = test_client.post("/api/admin", json=request_data)
+        
+        assert response.status_code == 200
+        data = response.json()
+        assert data["success"] == True
+        assert "Configuration reloaded" in data["message"]
+        assert data["details"]["version"] == 2
+        
+        mock_reload.assert_called_once()
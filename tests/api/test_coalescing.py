@@ -0,0 +1,169 @@
+"""
+Tests for coalescing identical in-flight chat queries.
+"""
+
+import asyncio
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from src.api.services.coalescing import SingleFlight, StreamFlights, coalescing_key
+from src.api.services.streaming import StreamEvent
+
+
+def _run_concurrently(fn, count):
+    results = [None] * count
+    errors = [None] * count
+
+    def worker(i):
+        try:
+            results[i] = fn()
+        except Exception as e:
+            errors[i] = e
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=10)
+    return results, errors
+
+
+def test_key_ignores_case_and_whitespace_but_not_options():
+    """Trivially different queries share a key; web search does not."""
+    assert coalescing_key("UBC tuition fees", False) == coalescing_key("  ubc  Tuition fees ", False)
+    assert coalescing_key("UBC tuition fees", False) != coalescing_key("UBC tuition fees", True)
+    assert coalescing_key("UBC tuition fees", False) != coalescing_key("UBC tuition fees", False, ["earlier"])
+
+
+def test_single_flight_runs_once_for_concurrent_callers():
+    """Callers that arrive while a computation runs share its result."""
+    flights = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        release.wait(5)
+        return "answer"
+
+    def call():
+        return flights.do("key", compute)
+
+    threading.Timer(0.2, release.set).start()
+    results, errors = _run_concurrently(call, 5)
+
+    assert errors == [None] * 5
+    assert len(calls) == 1
+    assert sorted(shared for _, shared in results) == [False, True, True, True, True]
+    assert all(result == "answer" for result, _ in results)
+    assert flights.get_stats() == {"leaders": 1, "coalesced": 4, "in_flight": 0}
+
+
+def test_single_flight_shares_errors():
+    """Waiting callers see the error of the computation they waited for."""
+    flights = SingleFlight()
+
+    def compute():
+        time.sleep(0.2)
+        raise RuntimeError("LLM unavailable")
+
+    _, errors = _run_concurrently(lambda: flights.do("key", compute), 3)
+
+    assert all(isinstance(error, RuntimeError) for error in errors)
+    # The next call starts a new computation
+    assert flights.do("key", lambda: "recovered") == ("recovered", False)
+
+
+@pytest.mark.asyncio
+async def test_late_subscriber_receives_the_whole_stream():
+    """A request that joins mid-stream gets the earlier tokens and the rest."""
+    flights = StreamFlights()
+    runs = []
+
+    async def produce(flight):
+        runs.append(1)
+        for token in ["UBC ", "tuition ", "is ..."]:
+            await flight.add_event(StreamEvent.ANSWER_CHUNK, {"chunk": token})
+            await asyncio.sleep(0.05)
+        return "UBC tuition is ..."
+
+    async def consume(delay):
+        await asyncio.sleep(delay)
+        flight = flights.join("key", produce)
+        chunks = [data["chunk"] async for _, data in flight.subscribe()]
+        return chunks, flight.result()
+
+    first, second = await asyncio.gather(consume(0), consume(0.07))
+
+    assert runs == [1]
+    assert first == second == (["UBC ", "tuition ", "is ..."], "UBC tuition is ...")
+    assert flights.get_stats() == {"leaders": 1, "coalesced": 1, "in_flight": 0}
+
+
+@patch('src.api.services.chat.add_to_cache')
+@patch('src.api.services.chat.get_from_cache', return_value=None)
+@patch('src.api.services.chat.get_agent')
+def test_process_chat_coalesces_identical_queries(mock_get_agent, mock_get_from_cache, mock_add_to_cache):
+    """Concurrent identical queries run the agent and fill the cache once."""
+    from src.api.services.chat import process_chat
+    from src.api.services.coalescing import get_chat_flights
+
+    def slow_query(*args, **kwargs):
+        time.sleep(0.3)
+        return {"answer": "UBC tuition is ...", "thinking_steps": [], "documents": []}
+
+    agent = MagicMock()
+    agent.query.side_effect = slow_query
+    mock_get_agent.return_value = agent
+    coalesced_before = get_chat_flights().coalesced
+
+    results, errors = _run_concurrently(lambda: process_chat("UBC tuition fees", use_memory=False), 4)
+
+    assert errors == [None] * 4
+    assert agent.query.call_count == 1
+    mock_add_to_cache.assert_called_once()
+    assert {result[0] for result in results} == {"UBC tuition is ..."}
+    # Every request keeps its own conversation
+    assert len({result[1] for result in results}) == 4
+    assert get_chat_flights().coalesced - coalesced_before == 3
+
+
+@pytest.mark.asyncio
+@patch('src.api.services.chat.add_to_cache')
+@patch('src.api.services.chat.get_from_cache', return_value=None)
+@patch('src.api.services.chat.build_llm_messages', return_value=[])
+@patch('src.api.services.chat.get_async_deepseek_client')
+@patch('src.api.services.chat.get_agent')
+async def test_streaming_duplicates_share_one_token_stream(mock_get_agent, mock_get_client, mock_build_messages,
+                                                           mock_get_from_cache, mock_add_to_cache):
+    """A second streaming request for the same query receives the first request's tokens."""
+    from src.api.services.chat import process_chat_stream
+    from src.api.services.streaming import StreamManager
+
+    async def astream(messages):
+        for token in ["UBC ", "tuition"]:
+            await asyncio.sleep(0.05)
+            yield token
+
+    agent = MagicMock()
+    agent.prepare_query.return_value = {"documents": [], "web_documents": [], "thinking_steps": []}
+    mock_get_agent.return_value = agent
+    mock_get_client.return_value.astream = astream
+
+    managers = [StreamManager(), StreamManager()]
+    results = await asyncio.gather(*(
+        process_chat_stream("UBC tuition fees", stream_manager=manager, use_memory=False) for manager in managers
+    ))
+
+    assert agent.prepare_query.call_count == 1
+    mock_add_to_cache.assert_called_once()
+    assert [result[0] for result in results] == ["UBC tuition", "UBC tuition"]
+    for manager in managers:
+        events = []
+        while not manager.queue.empty():
+            events.append(manager.queue.get_nowait())
+        assert [data["chunk"] for event, data in events if event == StreamEvent.ANSWER_CHUNK] == ["UBC ", "tuition"]
+        assert events[-1][0] == StreamEvent.DONE
@@ -0,0 +1,114 @@
+"""
+Tests for the conversation stores.
+"""
+
+import pytest
+
+from src.api.services.conversation_store import MemoryConversationStore, SQLiteConversationStore
+
+
+def _message(i, role=None):
+    return {"role": role or ("user" if i % 2 == 0 else "assistant"), "content": f"message {i}", "timestamp": float(i)}
+
+
+@pytest.fixture
+def sqlite_store(tmp_path):
+    store = SQLiteConversationStore(str(tmp_path / "conversations.sqlite"), hot_conversations=2, tail_size=4)
+    yield store
+    store.close()
+
+
+@pytest.fixture(params=["sqlite", "memory"])
+def store(request, sqlite_store):
+    return sqlite_store if request.param == "sqlite" else MemoryConversationStore(max_conversations=2)
+
+
+def test_messages_round_trip(store):
+    """All fields of a message are returned by get_messages."""
+    store.append("c1", {"role": "user", "content": "UBC tuition?", "timestamp": 1.0})
+    count = store.append("c1", {"role": "assistant", "content": "About $6k", "timestamp": 2.0,
+                                "thinking_steps": [{"step": 1}], "from_cache": False})
+
+    assert count == 2
+    messages = store.get_messages("c1")
+    assert [m["content"] for m in messages] == ["UBC tuition?", "About $6k"]
+    assert messages[1]["thinking_steps"] == [{"step": 1}]
+    assert store.get_messages("missing") == []
+
+
+def test_recent_messages_keep_the_first_one(store):
+    """get_recent returns the last messages plus the first, without extra fields."""
+    for i in range(10):
+        store.append("c1", dict(_message(i), documents=[{"id": i}]))
+
+    recent = store.get_recent("c1", 3, keep_first=True)
+
+    assert [m["content"] for m in recent] == ["message 0", "message 7", "message 8", "message 9"]
+    assert all(set(m) == {"role", "content", "timestamp"} for m in recent)
+    assert [m["content"] for m in store.get_recent("c1", 20, keep_first=True)] == [f"message {i}" for i in range(10)]
+
+
+def test_history_survives_restart(tmp_path):
+    """A new store on the same database sees earlier conversations."""
+    path = str(tmp_path / "conversations.sqlite")
+    first = SQLiteConversationStore(path)
+    first.append("c1", _message(0))
+    first.close()
+
+    second = SQLiteConversationStore(path)
+    assert second.get_recent("c1", 5) == [_message(0)]
+    second.close()
+
+
+def test_appends_from_other_workers_are_seen(tmp_path):
+    """A cached conversation tail is refreshed when another process appended to it."""
+    path = str(tmp_path / "conversations.sqlite")
+    worker_a = SQLiteConversationStore(path)
+    worker_b = SQLiteConversationStore(path)
+    worker_a.append("c1", _message(0))
+    assert len(worker_a.get_recent("c1", 5)) == 1
+
+    worker_b.append("c1", _message(1))
+    worker_a.append("c1", _message(2))
+
+    assert [m["content"] for m in worker_a.get_recent("c1", 5)] == ["message 0", "message 1", "message 2"]
+    worker_a.close()
+    worker_b.close()
+
+
+def test_hot_conversations_are_bounded(sqlite_store):
+    """Only the most recently used conversation tails stay in memory."""
+    for conversation_id in ["c1", "c2", "c3"]:
+        sqlite_store.append(conversation_id, _message(0))
+        sqlite_store.get_recent(conversation_id, 2)
+
+    stats = sqlite_store.get_stats()
+    assert stats["hot_conversations"] == 2
+    assert stats["tail_hits"] == 3
+    # Evicted conversations are read back from disk
+    assert sqlite_store.get_recent("c1", 2) == [_message(0)]
+
+
+def test_memory_store_evicts_least_recently_used():
+    """The memory backend drops the least recently used conversation when full."""
+    store = MemoryConversationStore(max_conversations=2)
+    store.append("c1", _message(0))
+    store.append("c2", _message(0))
+    store.get_recent("c1", 1)
+    store.append("c3", _message(0))
+
+    assert store.get_messages("c2") == []
+    assert store.get_messages("c1") == [_message(0)]
+    assert store.get_stats()["evictions"] == 1
+
+
+def test_formatted_history_skips_current_query(conversation_store):
+    """The agent gets the first message and recent turns, without the query being processed."""
+    from src.api.services.chat import _get_formatted_history, add_message_to_history
+
+    for i in range(40):
+        add_message_to_history("c1", "user" if i % 2 == 0 else "assistant", f"message {i}")
+
+    history = _get_formatted_history("c1")
+
+    assert [m.content for m in history] == ["message 0"] + [f"message {i}" for i in range(8, 39)]
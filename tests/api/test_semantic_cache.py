@@ -165,9 +165,12 @@ def test_save_and_load(self, mock_json_load, mock_path_exists, mock_open_file, m
         mock_json_dump.reset_mock()
         
         # Save to file - this should call our mocked json.dump at least once
-        success = self.cache.save_cache()
+        # The sidecar is written to a temporary file that never exists under the mocked open
+        with patch('os.replace') as mock_replace:
+            success = self.cache.save_cache()
         self.assertTrue(success)
         self.assertTrue(mock_json_dump.called)
+        mock_replace.assert_called_once_with(self.temp_file + ".tmp", self.temp_file)
         
         # Create a new cache instance
         new_cache = SemanticCache(
@@ -0,0 +1,125 @@
+"""
+Tests for the semantic cache's vector index and on-disk layout.
+"""
+
+import json
+import os
+
+import numpy as np
+import pytest
+
+from src.api.services.cache.semantic_cache import SemanticCache, VECTORS_SUFFIX
+
+
+def _vector(seed, dim=16):
+    return np.random.default_rng(seed).standard_normal(dim)
+
+
+def _cache(index_type, **kwargs):
+    cache = SemanticCache(similarity_threshold=0.9, index_type=index_type, **kwargs)
+    vectors = {}
+    cache.compute_embedding = lambda text: vectors.setdefault(text, _vector(len(vectors)))
+    return cache, vectors
+
+
+@pytest.mark.parametrize("index_type", ["hnsw", "flat"])
+def test_similar_query_is_served(index_type):
+    """A query whose embedding is close to a cached one gets its response."""
+    cache, vectors = _cache(index_type)
+    for i in range(50):
+        cache.add(f"query {i}", {"answer": f"answer {i}"})
+    vectors["paraphrase of query 7"] = vectors["query 7"] + 0.05 * _vector(1000)
+
+    assert cache.get("paraphrase of query 7")["answer"] == "answer 7"
+    assert cache.get("unrelated question") is None
+    assert cache.get("QUERY  7")["answer"] == "answer 7"
+    assert cache.get_stats()["hits"] == 2
+
+
+@pytest.mark.parametrize("index_type", ["hnsw", "flat"])
+def test_lru_eviction_reuses_rows_without_rebuilding(index_type):
+    """A full cache evicts the least recently used entry and reuses its row."""
+    cache, _ = _cache(index_type, max_cache_size=3)
+    for i in range(3):
+        cache.add(f"query {i}", {"answer": i})
+    index = cache._hnsw
+    cache.get("query 0")
+
+    cache.add("query 3", {"answer": 3})
+
+    assert cache.get("query 1") is None
+    assert cache.get("query 0") == {"answer": 0}
+    assert cache.get("query 3") == {"answer": 3}
+    stats = cache.get_stats()
+    assert stats["evictions"] == 1
+    assert stats["rows"] == 3
+    assert cache._hnsw is index
+
+
+def test_responses_with_other_settings_are_skipped():
+    """A response cached with web search is not served to a request without it."""
+    cache, _ = _cache("hnsw")
+    cache.add("query", {"answer": "with web"}, {"use_web_search": True, "conversation_id": "a"})
+
+    assert cache.get("query", {"use_web_search": False, "conversation_id": "b"}) is None
+    assert cache.get("query", {"use_web_search": True, "conversation_id": "b"}) == {"answer": "with web"}
+
+
+def test_cache_survives_restart(tmp_path):
+    """Vectors are stored in a separate file and mapped back on load."""
+    cache_file = str(tmp_path / "semantic_cache.json")
+    cache, vectors = _cache("hnsw", cache_file=cache_file, save_interval_seconds=3600)
+    for i in range(10):
+        cache.add(f"query {i}", {"answer": i})
+    assert cache.save_cache()
+
+    with open(cache_file) as f:
+        sidecar = json.load(f)
+    assert "embedding" not in sidecar["entries"][0]
+    assert os.path.getsize(str(tmp_path / ("semantic_cache" + VECTORS_SUFFIX))) == 10 * 16 * 4
+
+    reopened = SemanticCache(similarity_threshold=0.9, cache_file=cache_file)
+    reopened.compute_embedding = lambda text: vectors[text] + 0.01
+    assert reopened.get_stats()["entries"] == 10
+    assert reopened.get("query 4") == {"answer": 4}
+    vectors["close to query 5"] = vectors["query 5"]
+    assert reopened.get("close to query 5") == {"answer": 5}
+
+
+def test_freed_rows_are_reused_after_a_save(tmp_path):
+    """Rows the saved sidecar still refers to are not overwritten before the next save."""
+    cache_file = str(tmp_path / "semantic_cache.json")
+    cache, vectors = _cache("flat", cache_file=cache_file, max_cache_size=2, save_interval_seconds=3600)
+    cache.add("query 0", {"answer": 0})
+    cache.add("query 1", {"answer": 1})
+    cache.save_cache()
+
+    cache.add("query 2", {"answer": 2})
+    assert cache.get_stats()["rows"] == 3
+
+    cache.save_cache()
+    cache.add("query 3", {"answer": 3})
+    assert cache.get_stats()["rows"] == 3
+
+    reopened = SemanticCache(similarity_threshold=0.9, cache_file=cache_file, index_type="flat")
+    reopened.compute_embedding = lambda text: vectors[text]
+    assert reopened.get("query 1") == {"answer": 1}
+    assert reopened.get("query 2") == {"answer": 2}
+
+
+def test_legacy_json_cache_is_migrated(tmp_path):
+    """A cache file with inline embeddings is loaded and saved in the new layout."""
+    cache_file = str(tmp_path / "semantic_cache.json")
+    with open(cache_file, "w") as f:
+        json.dump({
+            "old query": {"embedding": [0.1, 0.2, 0.3], "response": {"answer": "old"},
+                          "timestamp": 4102444800, "metadata": {}}
+        }, f)
+
+    cache = SemanticCache(cache_file=cache_file)
+    cache.compute_embedding = lambda text: np.array([0.11, 0.21, 0.29])
+
+    assert cache.get("similar query") == {"answer": "old"}
+    assert cache.save_cache()
+    with open(cache_file) as f:
+        assert json.load(f)["version"] == 2
@@ -318,4 +318,46 @@ def test_func():
     mock_stream_manager.add_event.assert_called_with(
         StreamEvent.ERROR, 
         {"error": "Test error"}
-    ) 
\ No newline at end of file
+    ) 
+
+
+@pytest.mark.asyncio
+async def test_stream_tokens():
+    """Test forwarding tokens from an async generator into the stream manager."""
+    from src.api.services.streaming import StreamManager, StreamEvent, stream_tokens
+    
+    async def tokens():
+        for token in ["Hello", " ", "world"]:
+            yield token
+    
+    stream_manager = StreamManager()
+    answer = await stream_tokens(stream_manager, tokens())
+    
+    assert answer == "Hello world"
+    
+    events = []
+    while not stream_manager.queue.empty():
+        events.append(await stream_manager.queue.get())
+    
+    assert events[0] == (StreamEvent.ANSWER_START, {})
+    assert events[1:4] == [(StreamEvent.ANSWER_CHUNK, {"chunk": token}) for token in ["Hello", " ", "world"]]
+    assert events[4] == (StreamEvent.ANSWER_END, {})
+
+
+@pytest.mark.asyncio
+async def test_sync_to_async_adapter_runs_coroutines_on_loop():
+    """Test that coroutine functions are scheduled on the event loop without a thread."""
+    from src.api.services.streaming import StreamManager, StreamEvent, SyncToAsyncAdapter
+    
+    stream_manager = StreamManager()
+    adapter = SyncToAsyncAdapter(stream_manager)
+    
+    async def produce(manager):
+        await manager.add_event(StreamEvent.DONE, {})
+    
+    adapter.run_in_background(produce, stream_manager)
+    await adapter.task
+    
+    assert adapter.executor is None
+    assert stream_manager.is_done
+
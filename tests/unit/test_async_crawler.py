@@ -0,0 +1,117 @@
+"""
+Tests for the asynchronous frontier crawler, against a local fixture site.
+"""
+
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src.data.scraper import AsyncFrontierCrawler, SimpleRequestsCrawler, create_spider
+
+ROBOTS_TXT = "User-agent: *\nDisallow: /private/\nCrawl-delay: 0.1\n"
+
+PAGES = {
+    "/": ("Home", ["/a", "/b", "/a#apply", "/private/staff", "mailto:info@example.com"]),
+    "/a": ("Admissions", ["/c", "/", "/missing"]),
+    "/b": ("Programs", ["/c"]),
+    "/c": ("Tuition", ["/d"]),
+    "/d": ("Deadlines", []),
+    "/private/staff": ("Staff", []),
+}
+
+
+def _page(title, links):
+    anchors = "".join(f'<a href="{link}">{link}</a>' for link in links)
+    return f"<html><head><title>{title}</title></head><body><p>{title} information.</p>{anchors}</body></html>"
+
+
+class _SiteHandler(BaseHTTPRequestHandler):
+    """Fixture university site that records the requests it serves."""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.server.requests.append((self.path, time.monotonic()))
+        if self.path == "/robots.txt":
+            status, content_type, body = 200, "text/plain", ROBOTS_TXT
+        elif self.path in PAGES:
+            status, content_type, body = 200, "text/html", _page(*PAGES[self.path])
+        else:
+            status, content_type, body = 404, "text/html", "<html><body>Not found</body></html>"
+
+        data = body.encode()
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def site():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _SiteHandler)
+    server.requests = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server, f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def _crawler(**settings):
+    config = {"max_depth": 3, "max_retries": 0, "timeout": 5, "concurrency": 4, "per_host_delay": 0, "quiet": True}
+    return AsyncFrontierCrawler(config, **settings)
+
+
+def test_results_match_the_sequential_crawler(site):
+    """Every allowed page is crawled once, with the result dictionaries of crawl()."""
+    server, base_url = site
+    crawler = _crawler()
+    results = crawler.crawl(base_url + "/")
+
+    assert {result["url"] for result in results} == {base_url + path for path in ("/", "/a", "/b", "/c", "/d")}
+    home = next(result for result in results if result["url"] == base_url + "/")
+    assert set(home) == {
+        "url", "status_code", "headers", "depth", "links", "title", "text", "html", "sections", "structured_data",
+        "not_modified"
+    }
+    assert (home["status_code"], home["depth"], home["title"]) == (200, 0, "Home")
+    assert base_url + "/b" in home["links"]
+    assert base_url + "/missing" in crawler.failed_urls
+
+    paths = [path for path, _ in server.requests]
+    assert paths.count("/robots.txt") == 1
+    assert "/private/staff" not in paths
+    assert len(paths) == len(set(paths))
+
+
+def test_requests_to_a_host_are_spaced_by_its_crawl_delay(site):
+    """Concurrent workers still wait for the host's Crawl-delay between requests."""
+    server, base_url = site
+    _crawler().crawl(base_url + "/")
+
+    times = [at for path, at in server.requests if path != "/robots.txt"]
+    assert len(times) == 6
+    assert min(later - earlier for earlier, later in zip(times, times[1:])) >= 0.09
+
+
+def test_depth_and_page_limits(site):
+    """The crawl stops at max_depth and max_pages."""
+    server, base_url = site
+    shallow = _crawler(max_depth=1).crawl(base_url + "/")
+    assert {result["url"] for result in shallow} == {base_url + "/", base_url + "/a", base_url + "/b"}
+
+    limited = _crawler(respect_robots_txt=False).crawl(base_url + "/", max_pages=2)
+    assert len(limited) == 2
+
+
+def test_create_spider_uses_the_async_crawler_unless_disabled():
+    """UniversitySpider gets the asynchronous crawler by default."""
+    assert isinstance(create_spider({"max_pages": 10}), AsyncFrontierCrawler)
+    assert type(create_spider({"max_pages": 10, "async_crawl": False})) is SimpleRequestsCrawler
+    assert type(create_spider({"max_pages": 10, "enable_javascript": True})) is SimpleRequestsCrawler
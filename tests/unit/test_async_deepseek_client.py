@@ -0,0 +1,145 @@
+"""
+Tests for the async DeepSeek client.
+"""
+
+import json
+import asyncio
+import threading
+from types import SimpleNamespace
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src.models import async_deepseek_client
+from src.models.async_deepseek_client import (
+    AsyncDeepSeekAPI, close_async_deepseek_clients, get_async_deepseek_client, to_api_messages
+)
+
+TOKENS = ["Hello", ", ", "world", "!"]
+
+
+class _SSEHandler(BaseHTTPRequestHandler):
+    """Stub chat completions endpoint that streams TOKENS as SSE chunks."""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length))
+        self.server.requests.append(request)
+
+        if self.server.fail:
+            body = json.dumps({"error": "rate limited"}).encode()
+            self.send_response(429)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+
+        events = [json.dumps({"choices": [{"delta": {"content": token}}]}) for token in TOKENS]
+        body = "".join(f"data: {event}\n\n" for event in events + ["[DONE]"]).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def stub_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _SSEHandler)
+    server.requests = []
+    server.fail = False
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server, f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_to_api_messages():
+    """Prompts, dicts and LangChain messages are converted to API roles."""
+    from langchain_core.messages import HumanMessage, SystemMessage
+
+    assert to_api_messages("hi") == [{"role": "user", "content": "hi"}]
+    assert to_api_messages([SystemMessage(content="sys"), HumanMessage(content="q")]) == [
+        {"role": "system", "content": "sys"},
+        {"role": "user", "content": "q"}
+    ]
+    with pytest.raises(ValueError):
+        to_api_messages([])
+
+
+@pytest.mark.asyncio
+async def test_astream_yields_tokens(stub_server):
+    """Tokens are yielded in order and the request asks for a stream."""
+    server, url = stub_server
+    client = AsyncDeepSeekAPI(api_key="test-key", api_base=url)
+
+    tokens = [token async for token in client.astream("What is UBC?")]
+    await client.aclose()
+
+    assert tokens == TOKENS
+    assert server.requests[0]["stream"] is True
+    assert server.requests[0]["messages"] == [{"role": "user", "content": "What is UBC?"}]
+
+
+@pytest.mark.asyncio
+async def test_astream_error_status(stub_server):
+    """Non-200 responses raise a ValueError with the API error."""
+    server, url = stub_server
+    server.fail = True
+    client = AsyncDeepSeekAPI(api_key="test-key", api_base=url)
+
+    with pytest.raises(ValueError, match="429"):
+        async for _ in client.astream("What is UBC?"):
+            pass
+    await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_concurrent_streams_share_loop(stub_server):
+    """Many streams run concurrently on a single event loop and client."""
+    server, url = stub_server
+    client = AsyncDeepSeekAPI(api_key="test-key", api_base=url, pool_maxsize=8)
+
+    async def run_stream():
+        return [token async for token in client.astream("q")]
+
+    results = await asyncio.gather(*(run_stream() for _ in range(20)))
+    await client.aclose()
+
+    assert len(server.requests) == 20
+    assert all(tokens == TOKENS for tokens in results)
+
+
+def _llm(url):
+    """Settings of a shared sync client, as read by AsyncDeepSeekAPI.from_llm."""
+    return SimpleNamespace(api_key="test-key", model_name="deepseek-chat", temperature=0.7, max_tokens=100,
+                           top_p=1.0, api_base=url, request_timeout=0.05, pool_maxsize=4, use_cache=False,
+                           max_retries=0, retry_delay=0)
+
+
+@pytest.mark.asyncio
+async def test_replaced_shared_client_is_closed(stub_server, monkeypatch):
+    """A config reload closes the old client's pool, and shutdown closes the current one."""
+    server, url = stub_server
+    llm = _llm(url)
+    monkeypatch.setattr(async_deepseek_client, "get_deepseek_client", lambda config_path: llm)
+
+    first = get_async_deepseek_client("test-config.yaml")
+    assert [token async for token in first.astream("q")] == TOKENS
+
+    llm = _llm(url)
+    second = get_async_deepseek_client("test-config.yaml")
+    assert second is not first
+    assert [token async for token in second.astream("q")] == TOKENS
+    await asyncio.sleep(0.2)
+    assert first._http_client is None
+
+    await close_async_deepseek_clients()
+    assert second._http_client is None
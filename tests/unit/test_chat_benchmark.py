@@ -0,0 +1,77 @@
+"""
+Tests for the offline chat API benchmark.
+"""
+
+import asyncio
+
+import pytest
+
+from src.benchmarks.chat_api import Scenario, WARM_QUERIES, compare_results, percentile, run_benchmark
+from src.benchmarks.stubs import StubLLM
+
+ZERO_LATENCIES = {"retrieval": 0, "web_search": 0, "first_token": 0, "prompt_token": 0, "answer_token": 0}
+
+
+def _results(p95: float, throughput: float) -> dict:
+    return {
+        "schema_version": 1,
+        "settings": {"endpoint": "stream"},
+        "scenarios": [{
+            "name": "c4-h8-hit0.5",
+            "latency_ms": {"p50": 100.0, "p95": p95, "p99": 300.0},
+            "ttft_ms": {"p50": None, "p95": None},
+            "throughput_rps": throughput
+        }]
+    }
+
+
+def test_percentiles_interpolate():
+    """Percentiles interpolate between the two nearest values."""
+    assert percentile([4, 1, 3, 2], 50) == 2.5
+    assert percentile([1, 2, 3, 4, 5], 95) == pytest.approx(4.8)
+    assert percentile([], 50) is None
+
+
+def test_scenarios_have_the_requested_hit_ratio():
+    """The share of warm queries matches the hit ratio, and other queries are unique."""
+    queries = Scenario(4, 8, 0.25).queries(40)
+    warm = [query for query in queries if query in WARM_QUERIES]
+    cold = [query for query in queries if query not in WARM_QUERIES]
+    assert len(warm) == 10
+    assert len(set(cold)) == 30
+
+
+def test_stub_llm_is_deterministic():
+    """The same prompt always gets the same answer, streamed or not."""
+    llm = StubLLM(ZERO_LATENCIES, answer_tokens=5)
+
+    async def collect():
+        return "".join([token async for token in llm.astream("What does UBC offer?")])
+
+    assert llm.invoke("What does UBC offer?").content == asyncio.run(collect())
+    assert llm.invoke("What does UBC offer?").content != llm.invoke("Where is McGill?").content
+
+
+def test_regressions_are_reported_beyond_the_threshold():
+    """Slower latencies and lower throughput than the baseline are regressions."""
+    baseline = _results(p95=200.0, throughput=20.0)
+
+    assert compare_results(_results(p95=220.0, throughput=19.0), baseline, threshold=0.15) == []
+    regressions = compare_results(_results(p95=260.0, throughput=15.0), baseline, threshold=0.15)
+    assert [(r["metric"], round(r["change"], 2)) for r in regressions] == [
+        ("latency_ms.p95", 0.3), ("throughput_rps", -0.25)
+    ]
+
+    with pytest.raises(ValueError):
+        compare_results(_results(200.0, 20.0), {**baseline, "schema_version": 0})
+
+
+def test_cache_hits_skip_the_llm():
+    """A fully cached run answers every request without calling the LLM."""
+    results = run_benchmark(concurrency=[2], history_turns=[2], cache_hit_ratios=[1.0], requests=4,
+                            warmup=0, latencies=ZERO_LATENCIES)
+
+    scenario, = results["scenarios"]
+    assert (scenario["requests"], scenario["errors"]) == (4, 0)
+    assert scenario["semantic_cache_hits"] == 4 and scenario["llm_calls"] == 0
+    assert scenario["ttft_ms"]["p50"] is not None
@@ -0,0 +1,103 @@
+"""
+Tests for the shared configuration snapshot.
+"""
+
+import os
+import pytest
+import yaml
+
+from src.utils.config import ConfigManager, thaw
+
+
+def _write_config(path, data, mtime=None):
+    with open(path, "w") as f:
+        yaml.dump(data, f)
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+
+
+@pytest.fixture
+def config_file(tmp_path):
+    path = tmp_path / "config.yaml"
+    _write_config(path, {"llm": {"model_name": "deepseek-chat"}, "web_search": {"max_results": 3}}, mtime=1000)
+    return str(path)
+
+
+def test_snapshot_is_loaded_once(config_file):
+    """Repeated reads are served from the snapshot without re-parsing."""
+    manager = ConfigManager(config_file, check_interval=60)
+
+    first = manager.get()
+    for _ in range(100):
+        assert manager.get() is first
+
+    assert manager.reloads == 1
+    assert manager.mtime_checks == 1
+    assert first.section("llm")["model_name"] == "deepseek-chat"
+
+
+def test_snapshot_is_immutable(config_file):
+    """Snapshots cannot be mutated by consumers."""
+    snapshot = ConfigManager(config_file).get()
+
+    with pytest.raises(TypeError):
+        snapshot.section("llm")["model_name"] = "other"
+
+    # thaw() returns a mutable copy
+    data = thaw(snapshot)
+    data["llm"]["model_name"] = "other"
+    assert snapshot.section("llm")["model_name"] == "deepseek-chat"
+
+
+def test_reload_on_mtime_change(config_file):
+    """The file is re-parsed only when its modification time changes."""
+    manager = ConfigManager(config_file, check_interval=0)
+    first = manager.get()
+
+    # Unchanged mtime - no reload
+    assert manager.get() is first
+    assert manager.reloads == 1
+
+    _write_config(config_file, {"llm": {"model_name": "deepseek-reasoner"}}, mtime=2000)
+    second = manager.get()
+
+    assert second is not first
+    assert second.version == first.version + 1
+    assert second.section("llm")["model_name"] == "deepseek-reasoner"
+    assert manager.reloads == 2
+
+
+def test_check_interval_skips_stat(config_file):
+    """Within the check interval the file is not even stat'ed."""
+    manager = ConfigManager(config_file, check_interval=60)
+    manager.get()
+
+    _write_config(config_file, {"llm": {"model_name": "changed"}}, mtime=2000)
+    assert manager.get().section("llm")["model_name"] == "deepseek-chat"
+    assert manager.mtime_checks == 1
+
+    # A forced reload picks up the change immediately
+    assert manager.reload().section("llm")["model_name"] == "changed"
+    assert manager.reloads == 2
+
+
+def test_parse_error_keeps_previous_snapshot(config_file):
+    """A broken file does not replace a good snapshot."""
+    manager = ConfigManager(config_file, check_interval=0)
+    first = manager.get()
+
+    with open(config_file, "w") as f:
+        f.write("llm: [unclosed")
+    os.utime(config_file, (3000, 3000))
+
+    assert manager.get() is first
+    assert manager.errors == 1
+
+
+def test_missing_file(tmp_path):
+    """A missing file yields an empty snapshot."""
+    snapshot = ConfigManager(str(tmp_path / "missing.yaml")).get()
+
+    assert not snapshot.exists
+    assert snapshot.section("llm") == {}
+    assert snapshot.get("llm") is None
@@ -0,0 +1,148 @@
+"""
+Tests for the shared crawl scheduler and concurrent multi-university scraping.
+"""
+
+import time
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import yaml
+
+from src.data.crawl_scheduler import CrawlScheduler
+from src.data.scraper import WebScraper
+
+
+def test_free_slots_go_to_waiting_hosts_in_turn():
+    """A host with many queued requests does not starve the others."""
+    async def run():
+        scheduler = CrawlScheduler(max_connections=1)
+        order = []
+
+        async def request(host):
+            async with scheduler.slot(host):
+                order.append(host)
+                await asyncio.sleep(0)
+
+        await asyncio.gather(*(request(host) for host in ["a", "a", "a", "a", "b", "b"]))
+        return order, scheduler.get_stats()
+
+    order, stats = asyncio.run(run())
+    assert order == ["a", "a", "b", "a", "b", "a"]
+    assert (stats["granted"], stats["queued"], stats["peak_active"], stats["active"]) == (6, 5, 1, 0)
+
+
+def test_per_host_limit_leaves_budget_to_other_hosts():
+    """A host at its own limit waits while requests to other hosts use the free budget."""
+    async def run():
+        scheduler = CrawlScheduler(max_connections=4, max_connections_per_host=1)
+        await scheduler.acquire("a")
+        second = asyncio.ensure_future(scheduler.acquire("a"))
+        await asyncio.wait_for(scheduler.acquire("b"), timeout=1)
+        assert not second.done()
+
+        scheduler.release("a")
+        await asyncio.wait_for(second, timeout=1)
+        return scheduler.get_stats()
+
+    stats = asyncio.run(run())
+    assert (stats["active"], stats["waiting"], stats["peak_active"]) == (2, 0, 2)
+
+
+class _SlowHandler(BaseHTTPRequestHandler):
+    """Fixture university site that takes server.delay seconds per page."""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        time.sleep(self.server.delay)
+        data = f"<html><body><p>Page {self.path} of port {self.server.server_address[1]}</p></body></html>".encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def sites():
+    servers = []
+    for delay in (0.3, 0.3, 3):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), _SlowHandler)
+        server.daemon_threads = True
+        server.delay = delay
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+    yield [f"http://127.0.0.1:{server.server_address[1]}" for server in servers]
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def _scraper(tmp_path, sites):
+    universities = [
+        {"name": "Fast", "base_url": sites[0] + "/", "focus_urls": [sites[0] + f"/{i}" for i in range(3)]},
+        {"name": "Capped", "base_url": sites[1] + "/", "focus_urls": [sites[1] + f"/{i}" for i in range(5)],
+         "max_pages": 2},
+        {"name": "Slow", "base_url": sites[2] + "/", "max_crawl_duration": 0.5},
+    ]
+    scraping = {"MAX_CONCURRENT_REQUESTS": 8, "max_connections_per_host": 4, "per_host_delay": 0, "MAX_RETRIES": 1,
+                "BATCH_SIZE": 2, "CACHE_DIR": str(tmp_path / "cache"), "CACHE_DURATION": 0}
+    config_path = tmp_path / "config.yaml"
+    config_path.write_text(yaml.safe_dump({"scraping": scraping, "universities": universities}))
+    return WebScraper(str(config_path), max_pages=10, quiet_mode=True)
+
+
+def test_universities_are_scraped_concurrently_within_their_limits(tmp_path, sites):
+    """Batches stream out per university, capped by max_pages and cut off at the deadline."""
+    scraper = _scraper(tmp_path, sites)
+
+    async def run():
+        return [(name, len(batch)) async for name, batch in scraper.stream_all_universities()]
+
+    start = time.monotonic()
+    batches = asyncio.run(run())
+    elapsed = time.monotonic() - start
+
+    # Sequentially, the two fast sites alone would take 6 x 0.3s and the slow one 3s more
+    assert elapsed < 1.5
+    assert batches.count(("Fast", 2)) == 2
+    assert [size for name, size in batches if name == "Capped"] == [2]
+    assert all(name != "Slow" for name, _ in batches)
+
+
+def test_documents_stream_to_the_ingest_pipeline(tmp_path, sites):
+    """iter_documents yields Documents tagged with their university and source URL."""
+    documents = list(_scraper(tmp_path, sites).iter_documents())
+
+    assert sorted(doc.metadata["university"] for doc in documents) == ["Capped"] * 2 + ["Fast"] * 4
+    assert {doc.metadata["source"] for doc in documents if doc.metadata["university"] == "Fast"} == {
+        sites[0] + path for path in ("/", "/0", "/1", "/2")
+    }
+    assert all("Page" in doc.page_content and "headers" not in doc.metadata for doc in documents)
+
+
+def test_consumer_stopping_early_does_not_hang(tmp_path, sites):
+    """Stopping a stream while scrapers wait on the full queue cancels them promptly."""
+    scraper = _scraper(tmp_path, sites)
+    scraper.config["universities"] = scraper.config["universities"][:1]
+
+    async def run():
+        stream = scraper.stream_all_universities()
+        await stream.__anext__()
+        # The other batch of the university fills the queue meanwhile
+        await asyncio.sleep(1)
+        await stream.aclose()
+
+    asyncio.run(asyncio.wait_for(run(), timeout=5))
+
+    documents = _scraper(tmp_path, sites).iter_documents()
+    start = time.monotonic()
+    next(documents)
+    time.sleep(1)
+    documents.close()
+    assert time.monotonic() - start < 3
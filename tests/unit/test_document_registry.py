@@ -0,0 +1,59 @@
+"""
+Tests for the bounded document registry.
+"""
+
+from langchain_core.documents import Document
+
+from src.api.services.documents import DocumentRegistry, make_document_id
+from src.core.incremental_index import chunk_id
+
+
+def _document(i: int) -> Document:
+    return Document(
+        page_content=f"UBC residence option {i}. " * 20,
+        metadata={"source": f"https://www.ubc.ca/housing/{i}/", "title": f"Housing {i}"}
+    )
+
+
+def test_ids_are_the_vector_store_chunk_ids():
+    """The same chunk always gets the ID it has in the vector store."""
+    registry = DocumentRegistry(db_path=None)
+    doc = _document(1)
+
+    doc_id = registry.add(doc)
+    assert doc_id == chunk_id(doc)
+    assert registry.add({"content": doc.page_content, "metadata": dict(doc.metadata)}) == doc_id
+    assert make_document_id({"id": "chunk-7", "content": "", "metadata": {}}) == "chunk-7"
+    assert registry.get_stats()["documents"] == 1
+
+
+def test_least_recently_used_documents_are_evicted_by_size():
+    """Memory is bounded in bytes, evicting the documents used least recently."""
+    registry = DocumentRegistry(max_bytes=2500, db_path=None)
+    ids = [registry.add(_document(i)) for i in range(3)]
+    registry.get(ids[0])
+    registry.add(_document(3))
+
+    stats = registry.get_stats()
+    assert stats["bytes"] <= 2500 and stats["evictions"] >= 1
+    assert registry.get(ids[0]) is not None
+    assert registry.get(ids[1]) is None
+
+
+def test_evicted_documents_are_resolved_from_disk(tmp_path):
+    """IDs and URLs handed out earlier still resolve after their documents were evicted."""
+    db_path = str(tmp_path / "documents.sqlite")
+    registry = DocumentRegistry(max_bytes=1000, db_path=db_path)
+    first_id = registry.add(_document(0))
+    for i in range(1, 5):
+        registry.add(_document(i))
+
+    document = registry.get(first_id)
+    assert document["content"] == _document(0).page_content
+    assert registry.get_by_url("http://ubc.ca/housing/1")["metadata"]["title"] == "Housing 1"
+    assert registry.get_stats()["disk_hits"] == 2
+
+    reopened = DocumentRegistry(max_bytes=1000, db_path=db_path)
+    assert reopened.get_by_url("https://ubc.ca/housing/2")["metadata"]["title"] == "Housing 2"
+    assert registry.clear() >= 5
+    assert registry.get(first_id) is None
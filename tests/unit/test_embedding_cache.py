@@ -0,0 +1,150 @@
+"""
+Tests for the persistent embedding cache.
+"""
+
+import threading
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+
+from src.models.embedding_cache import EmbeddingCache, text_hash
+from src.models.embeddings import SimpleEmbeddings
+
+
+class CountingEmbedder:
+    """Embedder that records which texts it was asked to embed."""
+
+    def __init__(self, dimension=8):
+        self.embeddings = SimpleEmbeddings(dimension=dimension)
+        self.calls = []
+
+    def __call__(self, texts):
+        self.calls.append(list(texts))
+        return self.embeddings.embed_array(texts)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), max_entries=100)
+    yield cache
+    cache.close()
+
+
+def test_only_missing_texts_are_embedded(cache):
+    """Cached texts are served from the cache, new ones are embedded once."""
+    embedder = CountingEmbedder()
+
+    first = cache.embed("model", ["a", "b"], embedder)
+    second = cache.embed("model", ["b", "c", "c"], embedder)
+
+    assert embedder.calls == [["a", "b"], ["c"]]
+    assert second.dtype == np.float32
+    assert np.array_equal(second[0], first[1])
+    assert np.array_equal(second[1], second[2])
+    stats = cache.get_stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 4
+    assert stats["entries"] == 3
+
+
+def test_keys_include_model_and_normalized_text(cache):
+    """Whitespace differences share an entry, different models do not."""
+    embedder = CountingEmbedder()
+
+    cache.embed("model-a", ["hello  world"], embedder)
+    cache.embed("model-a", [" hello world\n"], embedder)
+    cache.embed("model-b", ["hello world"], embedder)
+
+    assert embedder.calls == [["hello  world"], ["hello world"]]
+    assert text_hash("hello  world") == text_hash(" hello world\n")
+
+
+def test_cache_survives_restart(tmp_path):
+    """Embeddings are read back from disk by a new cache instance."""
+    embedder = CountingEmbedder()
+    cache = EmbeddingCache(str(tmp_path))
+    expected = cache.embed("model", ["UBC", "SFU"], embedder)
+    cache.close()
+
+    reopened = EmbeddingCache(str(tmp_path))
+    actual = reopened.embed("model", ["UBC", "SFU"], embedder)
+    reopened.close()
+
+    assert len(embedder.calls) == 1
+    assert np.array_equal(actual, expected)
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    """When full, the least recently used entries are evicted and their rows reused."""
+    embedder = CountingEmbedder()
+    cache = EmbeddingCache(str(tmp_path), max_entries=10)
+
+    texts = [f"text {i}" for i in range(10)]
+    cache.embed("model", texts, embedder)
+    # Touch the first text so it is the most recently used
+    cache.embed("model", ["text 0"], embedder)
+    cache.embed("model", ["new text"], embedder)
+
+    stats = cache.get_stats()
+    assert stats["evictions"] > 0
+    assert stats["entries"] <= 10
+    assert cache.get_many("model", ["text 0"])[0] is not None
+    assert cache.get_many("model", ["text 1"])[0] is None
+    assert np.array_equal(cache.get_many("model", ["new text"])[0], embedder.embeddings.embed_array(["new text"])[0])
+    cache.close()
+
+
+def test_rewriting_the_least_recently_used_entry_keeps_its_own_slot(tmp_path):
+    """A batch that re-puts the entry due for eviction never shares its slot with a new text."""
+    cache = EmbeddingCache(str(tmp_path), max_entries=4)
+    vectors = {text: np.full(4, i, dtype=np.float32) for i, text in enumerate("abcde")}
+
+    with patch("src.models.embedding_cache.time.time", return_value=1.0):
+        cache.put_many("model", list("abcd"), [vectors[text] for text in "abcd"])
+    with patch("src.models.embedding_cache.time.time", return_value=2.0):
+        cache.put_many("model", list("bcd"), [vectors[text] for text in "bcd"])
+    # "a" is now the least recently used entry and is rewritten alongside a new text
+    cache.put_many("model", ["a", "e"], [vectors["a"], vectors["e"]])
+
+    found = cache.get_many("model", ["a", "e"])
+    assert np.array_equal(found[0], vectors["a"])
+    assert np.array_equal(found[1], vectors["e"])
+    cache.close()
+
+
+def test_disabled_cache_passes_through(tmp_path):
+    """A disabled cache always calls the embedding function."""
+    embedder = CountingEmbedder()
+    cache = EmbeddingCache(str(tmp_path), enabled=False)
+
+    cache.embed("model", ["a"], embedder)
+    cache.embed("model", ["a"], embedder)
+
+    assert len(embedder.calls) == 2
+
+
+def test_caches_sharing_a_directory_see_each_others_writes(tmp_path):
+    """A cache reads rows another writer appended after it mapped the vector file, and slots never collide."""
+    reader = EmbeddingCache(str(tmp_path / "emb"))
+    reader.put_many("m", ["first"], np.ones((1, 4)))
+    assert reader.get_many("m", ["first"])[0] is not None
+
+    writers = [EmbeddingCache(str(tmp_path / "emb")) for _ in range(4)]
+
+    def write(index, cache):
+        for batch in range(10):
+            texts = [f"text {index} {batch} {i}" for i in range(100)]
+            cache.put_many("m", texts, np.full((100, 4), index * 1000 + batch, dtype=np.float32))
+
+    threads = [threading.Thread(target=write, args=(index, cache)) for index, cache in enumerate(writers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    texts = [f"text {index} {batch} 99" for index in range(4) for batch in range(10)]
+    vectors = reader.get_many("m", texts)
+    assert [vector[0] for vector in vectors] == [index * 1000 + batch for index in range(4) for batch in range(10)]
+    slots = reader._connect().execute("SELECT COUNT(DISTINCT slot), COUNT(*) FROM entries").fetchone()
+    assert slots == (4001, 4001)
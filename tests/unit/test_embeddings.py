@@ -0,0 +1,72 @@
+"""
+Tests for the SimpleEmbeddings fallback embedder.
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from src.models.embeddings import SimpleEmbeddings
+
+
+def test_embed_array_shape_and_dtype():
+    """Batches are returned as one contiguous float32 matrix of unit vectors."""
+    embeddings = SimpleEmbeddings(dimension=64)
+
+    matrix = embeddings.embed_array(["UBC", "SFU", "UVic"])
+
+    assert matrix.shape == (3, 64)
+    assert matrix.dtype == np.float32
+    assert matrix.flags["C_CONTIGUOUS"]
+    assert np.allclose(np.linalg.norm(matrix, axis=1), 1.0, atol=1e-5)
+
+
+def test_embeddings_are_deterministic_and_distinct():
+    """The same text always gets the same vector, different texts get different ones."""
+    embeddings = SimpleEmbeddings()
+
+    first = embeddings.embed_documents(["UBC", "SFU"])
+    second = embeddings.embed_documents(["SFU", "UBC"])
+
+    assert first[0] == second[1]
+    assert first[1] == second[0]
+    assert first[0] != first[1]
+    assert embeddings.embed_query("UBC") == first[0]
+
+
+def test_global_random_state_untouched():
+    """Embedding does not reseed NumPy's global generator."""
+    np.random.seed(1234)
+    expected = np.random.random(3)
+
+    np.random.seed(1234)
+    SimpleEmbeddings().embed_documents(["UBC", "SFU"])
+    actual = np.random.random(3)
+
+    assert np.array_equal(expected, actual)
+
+
+def test_thread_safe():
+    """Concurrent calls give the same results as a single serial call."""
+    embeddings = SimpleEmbeddings()
+    texts = [f"text {i}" for i in range(200)]
+    expected = embeddings.embed_array(texts)
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(lambda chunk: embeddings.embed_array(texts[chunk:chunk + 25]),
+                                    range(0, 200, 25)))
+
+    assert np.array_equal(np.vstack(results), expected)
+
+
+def test_bulk_embedding_speed():
+    """100k chunks embed in a few seconds."""
+    embeddings = SimpleEmbeddings()
+    texts = [f"chunk number {i} about universities" for i in range(100000)]
+
+    start = time.time()
+    matrix = embeddings.embed_array(texts)
+
+    assert matrix.shape == (100000, 384)
+    assert time.time() - start < 10
@@ -0,0 +1,65 @@
+"""
+Tests for single-pass HTML extraction.
+"""
+
+import asyncio
+from unittest.mock import patch
+
+from bs4 import BeautifulSoup
+
+from src.data import html_extraction
+from src.data.html_extraction import extract_page, extract_page_async
+
+PAGE = """
+<html>
+    <head><title> Tuition and Fees </title><script>var tracking = 1;</script></head>
+    <body>
+        <nav><ul><li>Home page of the site</li><li>Admissions overview</li></ul></nav>
+        <h1>Undergraduate tuition</h1>
+        <p>Domestic students pay $6,500 per year for a full course load.</p>
+        <p>Applications close on January 15, 2025 for September entry.</p>
+        <table><tr><th>Program</th><th>Fee</th></tr><tr><td>Arts</td><td>$6,500</td></tr></table>
+        <h2>Contact us</h2>
+        <p>Email tuition@example.edu or call (604) 555-1234 for help.</p>
+        <a href="/apply">Apply</a> <a href="#top">Top</a> <a href="javascript:void(0)">Menu</a>
+    </body>
+</html>
+"""
+
+
+def test_page_is_extracted_in_one_parse():
+    """Links, title, text, sections and structured data all come from one tree."""
+    with patch.object(html_extraction, "BeautifulSoup", wraps=BeautifulSoup) as parse:
+        page = extract_page(PAGE, "https://www.ubc.ca/tuition/")
+    assert parse.call_count == 1
+
+    assert page["links"] == ["https://www.ubc.ca/apply"]
+    assert page["title"] == "Tuition and Fees"
+    assert "tracking" not in page["text"] and "Domestic students pay" in page["text"]
+    assert page["sections"]["Contact us"].startswith("Email tuition@example.edu")
+    assert "$6,500" in page["sections"]["Undergraduate tuition"]
+
+    structured = page["structured_data"]
+    assert structured["emails"] == ["tuition@example.edu"]
+    assert "January 15, 2025" in structured["deadline_info"]
+    assert structured["tables"] == [{"headers": ["Program", "Fee"], "rows": [["Program", "Fee"], ["Arts", "$6,500"]]}]
+    assert "lists" not in structured  # Navigation menus are skipped
+
+
+def test_structured_extraction_can_be_skipped():
+    """Crawls that only need links and text don't get sections or structured data."""
+    page = extract_page(PAGE, "https://www.ubc.ca/tuition/", structured=False)
+    assert set(page) == {"links", "title", "text"}
+    assert extract_page("", "https://www.ubc.ca/")["text"] == ""
+
+
+def test_async_extraction_matches_in_processes_and_threads():
+    """The process pool and the thread fallback give the same result."""
+    expected = extract_page(PAGE, "https://www.ubc.ca/tuition/")
+    try:
+        assert asyncio.run(extract_page_async(PAGE, "https://www.ubc.ca/tuition/")) == expected
+    finally:
+        html_extraction.shutdown_extraction_pool()
+
+    with patch.object(html_extraction, "get_extraction_pool", return_value=None):
+        assert asyncio.run(extract_page_async(PAGE, "https://www.ubc.ca/tuition/")) == expected
@@ -0,0 +1,110 @@
+"""
+Tests for pooled HTTP sessions and the shared DeepSeek client.
+"""
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import yaml
+
+from src.utils.http_pool import get_http_session, get_pool_stats, close_http_sessions
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    """Minimal keep-alive JSON endpoint that records client connections."""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        self.rfile.read(length)
+        self.server.client_ports.add(self.client_address[1])
+
+        body = json.dumps({"data": [{"embedding": [0.1, 0.2, 0.3]}]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = do_POST
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def stub_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StubHandler)
+    server.client_ports = set()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server, f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(autouse=True)
+def reset_sessions():
+    close_http_sessions()
+    yield
+    close_http_sessions()
+
+
+def test_session_is_shared():
+    """Sessions are created once per name."""
+    assert get_http_session("test") is get_http_session("test")
+    assert get_http_session("test") is not get_http_session("other")
+
+
+def test_connections_are_reused(stub_server):
+    """Sequential requests reuse a single keep-alive connection."""
+    server, url = stub_server
+    session = get_http_session("test", pool_connections=1, pool_maxsize=2)
+
+    for _ in range(5):
+        response = session.post(f"{url}/echo", data="{}")
+        assert response.status_code == 200
+
+    stats = get_pool_stats("test")
+    assert stats["requests"] == 5
+    assert stats["connections_created"] == 1
+    assert stats["connections_reused"] == 4
+    assert stats["reuse_ratio"] == pytest.approx(0.8)
+    assert stats["pool_maxsize"] == 2
+    assert len(server.client_ports) == 1
+
+
+def test_changed_pool_settings_recreate_session():
+    """Changing pool limits replaces the session but keeps its statistics."""
+    first = get_http_session("test", pool_maxsize=2)
+    second = get_http_session("test", pool_maxsize=8)
+
+    assert first is not second
+    assert get_pool_stats("test")["pool_maxsize"] == 8
+
+
+def test_deepseek_client_is_shared(stub_server, tmp_path):
+    """The shared DeepSeek client is reused and sends requests over the pool."""
+    from src.models import deepseek_client
+    from src.utils.config import reload_config
+
+    _, url = stub_server
+    config_path = tmp_path / "config.yaml"
+    with open(config_path, "w") as f:
+        yaml.dump({"llm": {"api_key": "test-key", "use_cache": False, "pool_maxsize": 4}}, f)
+    reload_config(str(config_path))
+
+    client = deepseek_client.get_deepseek_client(str(config_path))
+    assert deepseek_client.get_deepseek_client(str(config_path)) is client
+
+    client.api_base = url
+    for _ in range(3):
+        assert client.get_embedding("hello") == [0.1, 0.2, 0.3]
+
+    stats = deepseek_client.get_client_stats()
+    assert stats["connection_pool"]["requests"] == 3
+    assert stats["connection_pool"]["connections_created"] == 1
+    assert stats["connection_pool"]["pool_maxsize"] == 4
@@ -0,0 +1,124 @@
+"""
+Tests for incremental vector index updates.
+"""
+
+import os
+
+import pytest
+from langchain_core.documents import Document
+
+from src.core.incremental_index import IncrementalIndex, SEGMENTS_DIR, chunk_id
+from src.models.embeddings import SimpleEmbeddings
+
+
+class CountingEmbeddings(SimpleEmbeddings):
+    """SimpleEmbeddings that counts how many texts were embedded."""
+
+    def __init__(self):
+        super().__init__(dimension=16)
+        self.embedded = 0
+        self.batches = []
+
+    def embed_documents(self, texts):
+        self.embedded += len(texts)
+        self.batches.append(len(texts))
+        return super().embed_documents(texts)
+
+
+def _doc(text, source="ubc.ca"):
+    return Document(page_content=text, metadata={"source": source})
+
+
+def _contents(store):
+    return sorted(doc.page_content for doc in store.docstore._dict.values())
+
+
+@pytest.fixture
+def embeddings():
+    return CountingEmbeddings()
+
+
+def test_only_new_chunks_are_embedded(tmp_path, embeddings):
+    """A second update with one changed chunk embeds only that chunk."""
+    index = IncrementalIndex(str(tmp_path), embeddings, max_segments=100, max_deleted_fraction=10)
+    index.update([_doc("a"), _doc("b"), _doc("c")], replace_all=True)
+    base_mtime = os.path.getmtime(tmp_path / "index.faiss")
+
+    stats = index.update([_doc("a"), _doc("b"), _doc("c2")], replace_all=True)
+
+    assert embeddings.embedded == 4
+    assert stats["added"] == 1
+    assert stats["unchanged"] == 2
+    assert stats["deleted"] == 1
+    # The change went to a segment; the base index was not rewritten
+    assert os.path.getmtime(tmp_path / "index.faiss") == base_mtime
+    assert os.listdir(tmp_path / SEGMENTS_DIR)
+    assert _contents(index.load()) == ["a", "b", "c2"]
+
+
+def test_partial_update_only_prunes_given_sources(tmp_path, embeddings):
+    """Without replace_all, only chunks from the updated sources are deleted."""
+    index = IncrementalIndex(str(tmp_path), embeddings, max_segments=100, max_deleted_fraction=10)
+    index.update([_doc("ubc old", "ubc.ca"), _doc("sfu", "sfu.ca")])
+
+    stats = index.update([_doc("ubc new", "ubc.ca")])
+
+    assert stats["deleted"] == 1
+    assert _contents(index.load()) == ["sfu", "ubc new"]
+
+
+def test_unchanged_sources_are_kept_by_a_full_update(tmp_path, embeddings):
+    """Chunks of pages that were not modified survive replace_all without being passed in."""
+    index = IncrementalIndex(str(tmp_path), embeddings, max_segments=100, max_deleted_fraction=10)
+    index.update([_doc("ubc", "ubc.ca"), _doc("sfu", "sfu.ca"), _doc("uvic", "uvic.ca")], replace_all=True)
+
+    stats = index.update([_doc("ubc new", "ubc.ca")], replace_all=True, unchanged_sources=["sfu.ca"])
+
+    assert (stats["added"], stats["unchanged"], stats["deleted"]) == (1, 1, 2)
+    assert _contents(index.load()) == ["sfu", "ubc new"]
+
+
+def test_compaction_folds_segments_into_base(tmp_path, embeddings):
+    """Too many segments trigger a compaction that keeps the same content."""
+    index = IncrementalIndex(str(tmp_path), embeddings, max_segments=2, max_deleted_fraction=10)
+    for i in range(4):
+        index.update([_doc(f"chunk {i}", f"source {i}")])
+
+    manifest = index.read_manifest()
+    assert len(manifest["segments"]) <= 2
+    assert _contents(index.load()) == [f"chunk {i}" for i in range(4)]
+
+
+def test_reverted_chunk_is_restored(tmp_path, embeddings):
+    """A chunk that is deleted and then comes back is served again."""
+    index = IncrementalIndex(str(tmp_path), embeddings, max_segments=100, max_deleted_fraction=10)
+    index.update([_doc("a"), _doc("b")], replace_all=True)
+    index.update([_doc("a")], replace_all=True)
+
+    index.update([_doc("a"), _doc("b")], replace_all=True)
+
+    assert _contents(index.load()) == ["a", "b"]
+
+
+def test_new_chunks_are_embedded_in_bounded_batches(tmp_path, embeddings):
+    """A stream of chunks is embedded and written a batch at a time, not collected first."""
+    index = IncrementalIndex(str(tmp_path / "index"), embeddings, embed_batch_size=2, max_segments=10)
+
+    def stream():
+        for i in range(5):
+            yield _doc(f"UBC chunk {i}")
+
+    stats = index.update(stream(), replace_all=True)
+    assert (stats["added"], stats["total"]) == (5, 5)
+    assert embeddings.batches == [2, 2, 1]
+    assert len(index.read_manifest()["segments"]) == 2
+    assert _contents(index.load()) == [f"UBC chunk {i}" for i in range(5)]
+
+
+def test_chunk_ids_are_stable(tmp_path):
+    """IDs depend on source and content only."""
+    first = Document(page_content="x", metadata={"source": "s", "cleaned_at": "today"})
+    second = Document(page_content="x", metadata={"source": "s", "cleaned_at": "tomorrow"})
+
+    assert chunk_id(first) == chunk_id(second)
+    assert chunk_id(first) != chunk_id(_doc("x", "other"))
@@ -0,0 +1,90 @@
+"""
+Tests for the parallel document ingest pipeline.
+"""
+
+from unittest.mock import patch
+
+import pytest
+from langchain_core.documents import Document
+
+from src.core import document_processor
+from src.core.document_processor import DocumentProcessor
+from src.utils.logger import get_logger
+
+
+def _processor(tmp_path, max_workers):
+    return DocumentProcessor({
+        "data": {"data_dir": str(tmp_path)},
+        "chunking": {"chunk_size": 50, "chunk_overlap": 0},
+        "ingest": {"max_workers": max_workers, "max_pending": 2}
+    })
+
+
+@pytest.fixture
+def raw_dir(tmp_path):
+    raw = tmp_path / "raw"
+    raw.mkdir()
+    for i in range(6):
+        (raw / f"doc{i}.txt").write_text(" ".join(f"file{i}-word{j}" for j in range(40)))
+    (raw / "notes.xyz").write_text("unsupported")
+    return raw
+
+
+def test_parallel_load_matches_serial(tmp_path, raw_dir):
+    """Documents and chunks come out in the same order as a serial run."""
+    serial = _processor(tmp_path, 1)
+    parallel = _processor(tmp_path, 3)
+
+    assert [d.page_content for d in parallel.get_all_documents()] == \
+           [d.page_content for d in serial.get_all_documents()]
+    chunks = list(parallel.iter_documents(split=True))
+    assert [c.page_content for c in chunks] == [c.page_content for c in serial.iter_documents(split=True)]
+    assert len(chunks) > 6
+    assert all(c.metadata["source"].startswith(str(raw_dir)) for c in chunks)
+
+
+def _failing_loader(file_path):
+    if file_path.endswith("doc0.txt"):
+        raise ValueError("corrupt file")
+    return [Document(page_content="ok", metadata={"source": file_path})]
+
+
+def test_load_errors_are_skipped(tmp_path, raw_dir, monkeypatch):
+    """A file that fails to load is logged and skipped; the others still load."""
+    monkeypatch.setattr(DocumentProcessor, "_load_text_file", staticmethod(_failing_loader))
+
+    documents = _processor(tmp_path, 2).get_all_documents()
+
+    assert len(documents) == 5
+    assert not any(d.metadata["source"].endswith("doc0.txt") for d in documents)
+
+
+class _FailingSplitter:
+    def split_documents(self, documents):
+        if documents[0].metadata["source"].endswith("doc0.txt"):
+            raise ValueError("cannot split")
+        return documents
+
+
+def test_chunk_errors_are_logged_with_their_file(tmp_path, raw_dir, monkeypatch):
+    """A document that fails to chunk while streaming is logged with its file; the others still load."""
+    monkeypatch.setattr(document_processor, "_get_splitter", lambda chunk_size, chunk_overlap: _FailingSplitter())
+
+    with patch.object(get_logger("core.document_processor"), "error") as log_error:
+        chunks = list(_processor(tmp_path, 1).iter_documents(split=True))
+
+    assert len(chunks) == 5
+    log_error.assert_called_once_with(f"Error chunking document from {raw_dir / 'doc0.txt'}: cannot split")
+
+
+def test_chunk_documents_keeps_order(tmp_path):
+    """Parallel chunking returns chunks in input order and skips empty documents."""
+    documents = [Document(page_content=f"document {i} " * 20, metadata={"source": str(i)}) for i in range(100)]
+    documents.insert(10, Document(page_content="   ", metadata={"source": "empty"}))
+
+    chunks = _processor(tmp_path, 3).chunk_documents(documents)
+
+    sources = [c.metadata["source"] for c in chunks]
+    assert "empty" not in sources
+    assert sources == sorted(sources, key=int)
+    assert chunks == _processor(tmp_path, 1).chunk_documents(documents)
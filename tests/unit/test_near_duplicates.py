@@ -0,0 +1,92 @@
+"""
+Tests for SimHash near-duplicate detection.
+"""
+
+import random
+import string
+from unittest.mock import patch
+
+from langchain_core.documents import Document
+
+from src.core.document_processor import DocumentProcessor
+from src.core.near_duplicates import NearDuplicateIndex, hamming_distance, simhash
+from src.models.embeddings import SimpleEmbeddings
+
+_random = random.Random(7)
+VOCABULARY = ["".join(_random.choice(string.ascii_lowercase) for _ in range(7)) for _ in range(3000)]
+
+
+def _text(words, seed):
+    rng = random.Random(seed)
+    return " ".join(rng.choice(VOCABULARY) for _ in range(words))
+
+
+BODY = _text(400, 1)
+PAGE = f"Home Admissions Programs Tuition Contact {BODY} Last updated October 3, 2025 at 10:42"
+SAME_PAGE_NEW_DATE = f"Home Admissions Programs Tuition Contact {BODY} Last updated October 9, 2025 at 11:13"
+SAME_PAGE_NEW_FOOTER = f"Menu Search {BODY} Copyright University privacy accessibility"
+
+
+def test_fingerprints_of_near_duplicates_are_close():
+    """Boilerplate and dates move few bits; different content moves about half of them."""
+    assert simhash(PAGE, fold_digits=True) == simhash(SAME_PAGE_NEW_DATE, fold_digits=True)
+    assert hamming_distance(simhash(PAGE), simhash(SAME_PAGE_NEW_FOOTER)) <= 6
+    assert hamming_distance(simhash(PAGE), simhash(_text(400, 2))) > 16
+
+
+def test_index_finds_near_duplicates_under_other_keys(tmp_path):
+    """A near-duplicate is reported with the key it duplicates; a recrawled page is not its own duplicate."""
+    index = NearDuplicateIndex(db_path=str(tmp_path / "dups.sqlite"), namespace="pages", max_distance=6,
+                               fold_digits=True)
+    assert index.check("https://ubc.ca/a", PAGE) is None
+    assert index.check("https://ubc.ca/a", SAME_PAGE_NEW_DATE) is None
+    assert index.check("https://ubc.ca/b", SAME_PAGE_NEW_FOOTER) == "https://ubc.ca/a"
+    assert index.check("https://ubc.ca/c", _text(400, 3)) is None
+
+    # Short texts only match exactly
+    assert index.check("https://ubc.ca/d", "Tuition is 6500 dollars") is None
+    assert index.check("https://ubc.ca/e", "Tuition is 6500 dollars per year") is None
+    assert index.get_stats()["duplicates"] == 1
+    index.close()
+
+    reopened = NearDuplicateIndex(db_path=str(tmp_path / "dups.sqlite"), namespace="pages", max_distance=6,
+                                  fold_digits=True)
+    assert reopened.check("https://ubc.ca/f", PAGE) == "https://ubc.ca/a"
+    assert reopened.retain(["https://ubc.ca/c"]) == 3
+    assert reopened.check("https://ubc.ca/f", PAGE) is None
+
+
+def test_near_duplicate_chunks_are_not_embedded(tmp_path):
+    """add_documents skips chunks that repeat indexed content and reports how many vectors it avoided."""
+    processor = DocumentProcessor({"data": {"data_dir": str(tmp_path)}})
+    chunk = _text(150, 4)
+    documents = [
+        Document(page_content=chunk, metadata={"source": "https://ubc.ca/a"}),
+        Document(page_content=chunk + " Apply", metadata={"source": "https://ubc.ca/b"}),
+        Document(page_content=_text(150, 5), metadata={"source": "https://ubc.ca/b"}),
+    ]
+
+    with patch("src.core.document_processor.get_embeddings", return_value=SimpleEmbeddings(dimension=16)):
+        stats = processor.add_documents(documents, replace_all=True)
+        assert (stats["added"], stats["near_duplicates"]) == (2, 1)
+
+        stats = processor.add_documents(documents, replace_all=True)
+        assert (stats["added"], stats["unchanged"], stats["near_duplicates"]) == (0, 2, 1)
+
+
+def test_edited_chunk_replaces_its_old_version(tmp_path):
+    """A chunk edited in place is embedded again instead of being skipped as a duplicate of itself."""
+    processor = DocumentProcessor({"data": {"data_dir": str(tmp_path)}})
+    body = _text(150, 6)
+    before = Document(page_content=f"{body} Tuition is 50000 dollars", metadata={"source": "https://ubc.ca/fees"})
+    after = Document(page_content=f"{body} Tuition is 52000 dollars", metadata={"source": "https://ubc.ca/fees"})
+
+    with patch("src.core.document_processor.get_embeddings", return_value=SimpleEmbeddings(dimension=16)):
+        processor.add_documents([before], replace_all=True)
+        stats = processor.add_documents([after], replace_all=True)
+        assert (stats["added"], stats["deleted"], stats["near_duplicates"]) == (1, 1, 0)
+
+        # The new version now hides near-duplicates from other pages
+        copy = Document(page_content=after.page_content + " Apply", metadata={"source": "https://ubc.ca/copy"})
+        stats = processor.add_documents([after, copy], replace_all=True)
+        assert (stats["added"], stats["unchanged"], stats["near_duplicates"]) == (0, 1, 1)
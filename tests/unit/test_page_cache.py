@@ -0,0 +1,187 @@
+"""
+Tests for the revalidating page cache.
+"""
+
+import random
+import string
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from unittest.mock import patch
+
+import pytest
+
+from src.core.document_processor import DocumentProcessor
+from src.data.page_cache import PageCache
+from src.data.scraper import AsyncFrontierCrawler, UniversitySpider
+from src.models.embeddings import SimpleEmbeddings
+
+
+def _paragraph(title):
+    """Text of a page, distinct for every title."""
+    rng = random.Random(title)
+    return " ".join("".join(rng.choice(string.ascii_lowercase) for _ in range(6)) for _ in range(40))
+
+
+class _RevalidatingHandler(BaseHTTPRequestHandler):
+    """Fixture site with ETags that answers conditional requests with 304."""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        if self.path not in self.server.pages:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        title, links = self.server.pages[self.path]
+        anchors = "".join(f'<a href="{link}">{link}</a>' for link in links)
+        body = f"<html><head><title>{title}</title></head><body><p>{title}. {_paragraph(title)}</p>{anchors}</body></html>"
+        etag = '"' + hashlib.md5(body.encode()).hexdigest() + '"'
+
+        if self.headers.get("If-None-Match") == etag:
+            self.server.statuses.append((self.path, 304))
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+
+        self.server.statuses.append((self.path, 200))
+        data = body.encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", str(len(data)))
+        self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def site():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _RevalidatingHandler)
+    server.pages = {"/": ("Home", ["/a", "/b"]), "/a": ("Admissions", []), "/b": ("Tuition", [])}
+    server.statuses = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server, f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def _crawler(page_cache):
+    return AsyncFrontierCrawler({"max_retries": 0, "timeout": 5, "concurrency": 2, "per_host_delay": 0,
+                                 "respect_robots_txt": False, "quiet": True, "page_cache": page_cache})
+
+
+def test_validators_are_stored_and_sent_back(tmp_path):
+    """Stored ETag and Last-Modified values become conditional request headers."""
+    cache = PageCache(str(tmp_path / "pages.sqlite"))
+    url = "https://www.ubc.ca/admissions/"
+    assert cache.conditional_headers(url) == {}
+    assert cache.revalidated(url) is None
+
+    headers = {"ETag": '"v1"', "Last-Modified": "Wed, 01 Oct 2025 10:00:00 GMT"}
+    assert cache.store(url, headers, "Apply by January 15.", "Admissions", ["https://www.ubc.ca/apply/"]) is False
+    assert cache.conditional_headers(url) == {
+        "If-None-Match": '"v1"', "If-Modified-Since": "Wed, 01 Oct 2025 10:00:00 GMT"
+    }
+    assert cache.store(url, {"ETag": '"v2"'}, "Apply by January 15.", "Admissions", []) is True
+
+    entry = cache.revalidated(url)
+    assert (entry["etag"], entry["title"], entry["links"]) == ('"v2"', "Admissions", [])
+    assert cache.get_stats()["not_modified"] == 1
+
+
+def test_recrawl_revalidates_unchanged_pages(site, tmp_path):
+    """A recrawl gets 304s for unchanged pages, follows their stored links and refetches changed ones."""
+    server, base_url = site
+    db_path = str(tmp_path / "pages.sqlite")
+    _crawler(PageCache(db_path)).crawl(base_url + "/")
+
+    server.pages["/b"] = ("Tuition 2026", [])
+    server.statuses.clear()
+    results = {result["url"]: result for result in _crawler(PageCache(db_path)).crawl(base_url + "/")}
+
+    assert sorted(server.statuses) == [("/", 304), ("/a", 304), ("/b", 200)]
+    assert results[base_url + "/"]["not_modified"] and results[base_url + "/"]["links"] == [
+        base_url + "/a", base_url + "/b"
+    ]
+    assert results[base_url + "/a"]["text"] == ""
+    assert not results[base_url + "/b"]["not_modified"]
+    assert results[base_url + "/b"]["title"] == "Tuition 2026"
+
+
+def test_recrawl_keeps_unchanged_pages_in_the_index(site, tmp_path):
+    """Crawl, index, recrawl with 304s and update: unchanged pages keep their chunks, edited ones are replaced."""
+    server, base_url = site
+    config = {"page_cache_path": str(tmp_path / "pages.sqlite"), "max_pages": 10, "max_retries": 0,
+              "per_host_delay": 0, "respect_robots_txt": False, "quiet": True}
+    processor = DocumentProcessor({"data": {"data_dir": str(tmp_path / "data")}})
+
+    with patch("src.core.document_processor.get_embeddings", return_value=SimpleEmbeddings(dimension=16)):
+        spider = UniversitySpider(config, indexed_sources=processor.indexed_sources())
+        documents = spider.crawl(base_url, [base_url + "/"], None)
+        assert len(documents) == 3
+        assert processor.add_documents(documents, replace_all=True)["added"] == 3
+
+        server.pages["/a"] = ("Admissions 2026", [])
+        server.statuses.clear()
+        spider = UniversitySpider(config, indexed_sources=processor.indexed_sources())
+        documents = spider.crawl(base_url, [base_url + "/"], None)
+
+        assert [doc.metadata["source"] for doc in documents] == [base_url + "/a"]
+        assert spider.unchanged_urls == {base_url + "/", base_url + "/b"}
+        stats = processor.add_documents(documents, replace_all=True, unchanged_sources=spider.unchanged_urls)
+        assert (stats["added"], stats["unchanged"], stats["deleted"], stats["total"]) == (1, 2, 1, 3)
+        assert processor.indexed_sources() == {base_url + path for path in ("/", "/a", "/b")}
+
+
+def test_pages_missing_from_the_index_are_fetched_in_full(site, tmp_path):
+    """After a failed ingest or an index rebuild, cached pages are not revalidated but fetched again."""
+    server, base_url = site
+    config = {"page_cache_path": str(tmp_path / "pages.sqlite"), "max_pages": 10, "max_retries": 0,
+              "per_host_delay": 0, "respect_robots_txt": False, "quiet": True}
+    UniversitySpider(config).crawl(base_url, [base_url + "/"], None)
+
+    server.statuses.clear()
+    spider = UniversitySpider(config, indexed_sources=[base_url + "/b"])
+    assert len(spider.crawl(base_url, [base_url + "/"], None)) == 2
+    assert sorted(server.statuses) == [("/", 200), ("/a", 200), ("/b", 304)]
+
+
+def test_all_cached_pages_are_revalidated_by_default(site, tmp_path):
+    """A spider given no indexed sources sends conditional requests for every cached page."""
+    server, base_url = site
+    config = {"page_cache_path": str(tmp_path / "pages.sqlite"), "max_pages": 10, "max_retries": 0,
+              "per_host_delay": 0, "respect_robots_txt": False, "quiet": True}
+    UniversitySpider(config).crawl(base_url, [base_url + "/"], None)
+
+    server.statuses.clear()
+    spider = UniversitySpider(config)
+    assert spider.crawl(base_url, [base_url + "/"], None) == []
+    assert sorted(server.statuses) == [("/", 304), ("/a", 304), ("/b", 304)]
+    assert spider.unchanged_urls == {base_url + path for path in ("/", "/a", "/b")}
+
+
+def test_page_that_duplicated_a_removed_page_is_crawled(site, tmp_path):
+    """When the original of a near-duplicate disappears from the site, the duplicate is no longer skipped."""
+    server, base_url = site
+    config = {"near_duplicate_db_path": str(tmp_path / "near_duplicates.sqlite"), "max_pages": 10, "max_retries": 0,
+              "per_host_delay": 0, "respect_robots_txt": False, "quiet": True}
+    server.pages = {"/": ("Home", ["/a"]), "/a": ("Admissions", [])}
+    UniversitySpider(config).crawl(base_url, [base_url + "/"], None)
+
+    # The same page moved to a new URL
+    server.pages = {"/": ("Home", ["/c"]), "/c": ("Admissions", [])}
+    spider = UniversitySpider(config)
+    documents = spider.crawl(base_url, [base_url + "/"], None)
+
+    assert sorted(doc.metadata["source"] for doc in documents) == [base_url + "/", base_url + "/c"]
+    assert spider.near_duplicate_pages == 0
+    # The fingerprint of the removed page is forgotten
+    assert spider.near_duplicates.get_stats()["fingerprints"] == 2
@@ -0,0 +1,75 @@
+"""
+Tests for parallel vector store and web retrieval in the agent.
+"""
+
+import time
+from unittest.mock import patch
+
+from langchain_core.documents import Document
+
+from src.core import agent
+
+
+def _vector_node(delay):
+    def node(state):
+        time.sleep(delay)
+        state["documents"] = [Document(page_content="kb", metadata={"source": "kb"})]
+        state["thinking_steps"].append({"type": "vector", "description": "vector done"})
+        return state
+    return node
+
+
+def _web_node(delay, documents=True):
+    def node(state):
+        time.sleep(delay)
+        state["web_documents"] = [Document(page_content="web", metadata={"source": "web"})] if documents else []
+        if not documents:
+            state["thinking_steps"].append({"type": "no_results", "description": "No information found"})
+        state["thinking_steps"].append({"type": "web", "description": "web done"})
+        return state
+    return node
+
+
+def _state():
+    return {"query": "What is UBC?", "messages": [], "documents": [], "web_documents": [],
+            "thinking_steps": [], "use_web_search": True}
+
+
+def test_sources_run_concurrently():
+    """Total latency is bounded by the slowest source, not the sum."""
+    with patch.object(agent, "retrieve_from_vectorstore", _vector_node(0.3)), \
+         patch.object(agent, "web_search", _web_node(0.3)):
+        start = time.time()
+        state = agent.parallel_retrieve(_state(), deadline=5.0)
+        elapsed = time.time() - start
+
+    assert elapsed < 0.55
+    assert len(state["documents"]) == 1
+    assert len(state["web_documents"]) == 1
+    step_types = [step["type"] for step in state["thinking_steps"]]
+    assert step_types == ["vector", "web", "parallel_retrieval"]
+
+
+def test_late_results_are_dropped():
+    """A source that misses the deadline is dropped and recorded as a thinking step."""
+    with patch.object(agent, "retrieve_from_vectorstore", _vector_node(0.0)), \
+         patch.object(agent, "web_search", _web_node(1.0)):
+        start = time.time()
+        state = agent.parallel_retrieve(_state(), deadline=0.2)
+        elapsed = time.time() - start
+
+    assert elapsed < 0.6
+    assert len(state["documents"]) == 1
+    assert state["web_documents"] == []
+    dropped = [step for step in state["thinking_steps"] if step["type"] == "retrieval_deadline"]
+    assert len(dropped) == 1
+    assert "web search" in dropped[0]["description"]
+
+
+def test_no_results_note_dropped_when_vector_found_documents():
+    """The web branch's 'no results' note is removed when the knowledge base found documents."""
+    with patch.object(agent, "retrieve_from_vectorstore", _vector_node(0.0)), \
+         patch.object(agent, "web_search", _web_node(0.0, documents=False)):
+        state = agent.parallel_retrieve(_state(), deadline=5.0)
+
+    assert "no_results" not in [step["type"] for step in state["thinking_steps"]]
@@ -0,0 +1,112 @@
+"""
+Tests for token-budgeted prompt building.
+"""
+
+from unittest.mock import patch
+
+from langchain.schema import Document
+from langchain_core.messages import AIMessage, HumanMessage
+
+from src.core.prompt_builder import (
+    ConversationSummaries, PromptBuilder, Tokenizer, DOCUMENTS_OMITTED, HISTORY_TRUNCATED, SUMMARY_HEADER
+)
+
+
+def _builder(**kwargs):
+    return PromptBuilder(tokenizer=Tokenizer("approximate"), **kwargs)
+
+
+def _conversation(turns, query="What about scholarships?"):
+    messages = []
+    for i in range(turns):
+        messages.append(HumanMessage(content=f"Question {i} about admission to university {i}. " * 8))
+        messages.append(AIMessage(content=f"Answer {i} explaining the admission rules. " * 8))
+    messages.append(HumanMessage(content=query))
+    return messages
+
+
+def test_tokenizer_counts_and_truncates():
+    """Approximate tokens join back into the text, and truncation marks the cut."""
+    tokenizer = Tokenizer("approximate")
+    text = "The University of British Columbia, Vancouver campus."
+
+    assert tokenizer._decode(tokenizer._encode(text)) == text
+    assert tokenizer.count(text) > len(text.split())
+    assert tokenizer.truncate(text, 100) == text
+    truncated = tokenizer.truncate(text, 5)
+    assert truncated.endswith("...") and tokenizer.count(truncated) <= 6
+
+    tokenizer.count(text)
+    assert tokenizer.cache_info()["hits"] >= 1
+
+
+def test_documents_are_packed_by_relevance_within_budget():
+    """The documents that match the query best come first; the rest are left out once the budget is spent."""
+    builder = _builder(document_tokens=120, max_document_tokens=60)
+    documents = [
+        Document(page_content="Campus housing and residence life. " * 10, metadata={"source": "housing"}),
+        Document(page_content="Tuition fees for international students. " * 10, metadata={"source": "fees"}),
+        Document(page_content="Tuition fees for international students. " * 10, metadata={"source": "fees-copy"}),
+        Document(page_content="Library opening hours. " * 10, metadata={"source": "library"}),
+    ]
+
+    docs = builder.pack_documents("What are tuition fees for international students?", documents, 120)
+
+    assert docs[0].startswith("Document 1: Document 1\nSource: fees\n")
+    assert "fees-copy" not in "".join(docs)
+    assert docs[-1] == DOCUMENTS_OMITTED
+    assert sum(builder.tokenizer.count(doc) for doc in docs[:-1]) <= 120
+
+
+def test_prompt_size_stops_growing_with_conversation_length():
+    """Long conversations fit the budget: recent messages verbatim, older ones summarized."""
+    builder = _builder()
+    document = [Document(page_content="Admission requires a GPA of 3.0", metadata={"source": "doc1"})]
+
+    sizes = [builder.tokenizer.count(builder.build("What about scholarships?", document, _conversation(turns)))
+             for turns in (1, 10, 20, 40)]
+    prompt = builder.build("What about scholarships?", document, _conversation(40))
+
+    assert sizes[1] > sizes[0]
+    assert abs(sizes[3] - sizes[2]) < 0.05 * sizes[2]
+    assert sizes[3] <= builder.max_prompt_tokens + builder.tokenizer.count("What about scholarships?")
+    assert "CONVERSATION HISTORY:" in prompt
+    assert SUMMARY_HEADER in prompt and HISTORY_TRUNCATED in prompt
+    # The opening of the conversation stays in the summary
+    assert "- User: Question 0 about admission to university 0." in prompt
+    assert "User: Question 39 about admission" in prompt
+    assert "Admission requires a GPA of 3.0" in prompt
+
+
+def test_summary_is_extended_incrementally():
+    """Only the messages that dropped out since the last request are summarized."""
+    summaries = ConversationSummaries(Tokenizer("approximate"), summary_tokens=1000)
+    messages = [("user" if i % 2 == 0 else "assistant", f"Message {i}. Details {i}.") for i in range(12)]
+
+    with patch.object(summaries, "_line", wraps=summaries._line) as line:
+        first = summaries.summarize("c1", messages[:6])
+        # The next request sends a window of the conversation that starts later
+        second = summaries.summarize("c1", messages[:1] + messages[4:10])
+        assert line.call_count == 10
+
+    assert first == [SUMMARY_HEADER] + [f"- {'User' if i % 2 == 0 else 'Assistant'}: Message {i}." for i in range(6)]
+    assert second[1:] == [f"- {'User' if i % 2 == 0 else 'Assistant'}: Message {i}." for i in range(10)]
+    assert summaries.summarize("c1", messages[:10]) == second
+    assert summaries.get_stats() == {"conversations": 1, "hits": 1, "updates": 1, "rebuilds": 1}
+
+
+def test_build_llm_messages_reuses_the_conversation_summary():
+    """The agent passes the conversation ID so its summary is reused across requests."""
+    from src.core import agent
+
+    builder = _builder(history_tokens=100)
+    state = {"query": "What about scholarships?", "messages": _conversation(10), "documents": [],
+             "conversation_id": "c1"}
+
+    with patch.object(agent, "get_prompt_builder", return_value=builder):
+        messages = agent.build_llm_messages(state)
+        agent.build_llm_messages(state)
+
+    assert "CONVERSATION HISTORY:" in messages[0].content
+    assert messages[1].content == "What about scholarships?"
+    assert builder.summaries.get_stats() == {"conversations": 1, "hits": 1, "updates": 0, "rebuilds": 1}
@@ -150,7 +150,7 @@ async def test_rag_engine_document_retrieval(mock_config, temp_vectordb_dir, moc
     try:
         # Initialize RAG engine with mocked components
         with patch('src.rag.engine.FAISS') as mock_faiss, \
-             patch('src.rag.engine.DeepSeekAPI', return_value=mock_llm):
+             patch('src.rag.engine.get_deepseek_client', return_value=mock_llm):
             
             # Create and configure the mock database
             mock_db = MagicMock()
@@ -188,7 +188,7 @@ async def test_rag_engine_answer_generation(mock_config, temp_vectordb_dir, mock
         # Initialize RAG engine with mocked components
         with patch('src.rag.engine.Path') as mock_path, \
              patch('src.rag.engine.FAISS') as mock_faiss, \
-             patch('src.rag.engine.DeepSeekAPI', return_value=mock_llm):
+             patch('src.rag.engine.get_deepseek_client', return_value=mock_llm):
             
             # Mock paths and existence checks
             mock_path.return_value.exists.return_value = True
@@ -226,7 +226,7 @@ async def test_rag_engine_process_query(mock_config, temp_vectordb_dir, mock_llm
     try:
         # Initialize RAG engine with mocked components
         with patch('src.rag.engine.FAISS') as mock_faiss, \
-             patch('src.rag.engine.DeepSeekAPI', return_value=mock_llm):
+             patch('src.rag.engine.get_deepseek_client', return_value=mock_llm):
             
             # Create and configure the mock database
             mock_db = MagicMock()
@@ -307,7 +307,7 @@ async def test_rag_engine_interactive_session(mock_config, temp_vectordb_dir, mo
         
         # Initialize RAG engine with mocked components
         with patch('src.rag.engine.FAISS') as mock_faiss, \
-             patch('src.rag.engine.DeepSeekAPI', return_value=mock_llm):
+             patch('src.rag.engine.get_deepseek_client', return_value=mock_llm):
             
             # Create and configure the mock database
             mock_db = MagicMock()
@@ -0,0 +1,126 @@
+"""
+Tests for per-request agent contexts.
+"""
+
+import time
+import inspect
+import threading
+from unittest.mock import patch
+
+import pytest
+
+from src.core import agent
+from src.core.agent import RequestContext, UniversityAgent
+
+
+def _slow_retrieve(state):
+    time.sleep(0.05)
+    state["thinking_steps"].append({"type": "retrieve", "description": f"retrieved {state['query']}"})
+    agent._publish_thinking_steps(state["thinking_steps"])
+    return state
+
+
+def _fake_answer(state):
+    time.sleep(0.05)
+    state["thinking_steps"].append({"type": "completion", "description": f"answered {state['query']}"})
+    agent._publish_thinking_steps(state["thinking_steps"])
+    agent.get_request_context().last_answer = f"answer to {state['query']}"
+    state["answer"] = f"answer to {state['query']}"
+    return state
+
+
+@pytest.fixture
+def university_agent():
+    with patch.object(UniversityAgent, "_retrieve", lambda self, state: _slow_retrieve(state)), \
+         patch.object(agent, "generate_answer", _fake_answer):
+        yield UniversityAgent()
+
+
+def test_concurrent_queries_do_not_share_steps(university_agent):
+    """Each query's callback only sees its own thinking steps."""
+    received = {"q1": [], "q2": []}
+    results = {}
+
+    def run(question):
+        results[question] = university_agent.query(
+            question, thinking_step_callback=received[question].append
+        )
+
+    threads = [threading.Thread(target=run, args=(question,)) for question in received]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    for question, steps in received.items():
+        assert results[question]["answer"] == f"answer to {question}"
+        descriptions = [step["description"] for step in steps]
+        assert f"retrieved {question}" in descriptions
+        assert f"answered {question}" in descriptions
+        other = "q2" if question == "q1" else "q1"
+        assert not any(other in description for description in descriptions)
+
+
+def test_steps_are_published_once():
+    """Publishing the same list repeatedly only reports new steps."""
+    received = []
+    context = RequestContext(received.append)
+    steps = [{"description": "a"}]
+
+    context.publish(steps)
+    steps.append({"description": "b"})
+    context.publish(steps)
+
+    assert [step["description"] for step in received] == ["a", "b"]
+    assert context.thinking_steps == steps
+
+
+def test_latest_thinking_steps_outside_query(university_agent):
+    """Pollers outside a query see the most recent query's steps."""
+    university_agent.query("q1")
+
+    assert university_agent.last_answer == "answer to q1"
+    assert university_agent.latest_thinking_steps[-1]["description"] == "answered q1"
+
+
+def _find_agent_by_stack():
+    """The stack walk the nodes used to find the agent before request contexts."""
+    for frame in inspect.stack():
+        if 'self' in frame.frame.f_locals and isinstance(frame.frame.f_locals['self'], UniversityAgent):
+            return frame.frame.f_locals['self']
+    return None
+
+
+def _at_depth(depth, func):
+    if depth == 0:
+        return func()
+    return _at_depth(depth - 1, func)
+
+
+def test_benchmark_node_overhead():
+    """Context lookup is much cheaper per node than walking the stack."""
+    iterations = 200
+    steps = [{"description": f"step {i}"} for i in range(10)]
+    context = RequestContext()
+
+    def stack_lookup():
+        start = time.perf_counter()
+        for _ in range(iterations):
+            _find_agent_by_stack()
+        return (time.perf_counter() - start) / iterations
+
+    def context_lookup():
+        token = agent._request_context.set(context)
+        try:
+            start = time.perf_counter()
+            for _ in range(iterations):
+                agent._publish_thinking_steps(steps)
+            return (time.perf_counter() - start) / iterations
+        finally:
+            agent._request_context.reset(token)
+
+    # Nodes run about 30 frames deep under FastAPI and the workflow
+    before = _at_depth(30, stack_lookup)
+    after = _at_depth(30, context_lookup)
+
+    assert after < before
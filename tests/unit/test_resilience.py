@@ -0,0 +1,233 @@
+"""
+Tests for retries, hedging and circuit breaking of upstream calls.
+"""
+
+import json
+import time
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+import pytest
+import requests
+
+from src.utils.resilience import CircuitBreaker, CircuitOpenError, Upstream
+
+
+class _FaultyHandler(BaseHTTPRequestHandler):
+    """Stub DeepSeek endpoint that fails or stalls the next requests as scripted."""
+
+    protocol_version = "HTTP/1.1"
+
+    def _respond(self):
+        length = int(self.headers.get("Content-Length", 0))
+        self.rfile.read(length)
+        with self.server.lock:
+            self.server.requests += 1
+            status, delay = self.server.faults.pop(0) if self.server.faults else (200, 0)
+        threading.Event().wait(delay)
+
+        if status == 200:
+            body = {
+                "choices": [{"message": {"content": "UBC tuition is ..."}}],
+                "data": [{"embedding": [0.1, 0.2, 0.3]}]
+            }
+        else:
+            body = {"error": "injected fault"}
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    do_GET = _respond
+    do_POST = _respond
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def stub_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _FaultyHandler)
+    server.lock = threading.Lock()
+    server.requests = 0
+    server.faults = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server, f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def _sync_client(url, max_retries, retry_delay=2):
+    from src.models.deepseek_client import DeepSeekAPI
+    client = DeepSeekAPI(api_key="test-key")
+    # The validator reads these from the config, so they are set afterwards
+    client.api_base = url
+    client.use_cache = False
+    client.max_retries = max_retries
+    client.retry_delay = retry_delay
+    return client
+
+
+def test_transient_failures_are_retried_with_jittered_backoff(stub_server):
+    """Server errors are retried after random delays within the exponential cap."""
+    server, url = stub_server
+    server.faults = [(503, 0), (502, 0)]
+    client = _sync_client(url, max_retries=3, retry_delay=2)
+
+    with patch("src.models.deepseek_client.get_upstream", return_value=Upstream("deepseek")), \
+         patch("src.utils.resilience.time.sleep") as sleep:
+        assert client.get_embedding("UBC tuition") == [0.1, 0.2, 0.3]
+
+    delays = [call.args[0] for call in sleep.call_args_list]
+    assert len(delays) == 2 and server.requests == 3
+    assert 0 <= delays[0] <= 2 and 0 <= delays[1] <= 4
+
+
+def test_circuit_opens_and_fails_fast(stub_server):
+    """Once the upstream keeps failing, calls fail without waiting for it."""
+    server, url = stub_server
+    server.faults = [(503, 0.2)] * 3
+    client = _sync_client(url, max_retries=1)
+    upstream = Upstream("deepseek", failure_threshold=3, recovery_seconds=60)
+
+    with patch("src.models.deepseek_client.get_upstream", return_value=upstream):
+        for _ in range(3):
+            with pytest.raises(ValueError, match="503"):
+                client.get_embedding("UBC tuition")
+
+        start = time.monotonic()
+        with pytest.raises(CircuitOpenError):
+            client.get_embedding("UBC tuition")
+        assert time.monotonic() - start < 0.1
+
+    assert server.requests == 3
+    assert upstream.get_stats()["circuit"] == {"state": "open", "consecutive_failures": 3, "opened": 1,
+                                               "rejected": 1}
+
+
+def test_half_open_circuit_lets_one_probe_through():
+    """After the recovery period a single probe decides whether the circuit closes."""
+    breaker = CircuitBreaker("tavily", failure_threshold=2, recovery_seconds=30)
+    breaker.record_failure()
+    breaker.record_failure()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    with patch("src.utils.resilience.time.monotonic", return_value=time.monotonic() + 31):
+        breaker.before_call()
+        with pytest.raises(CircuitOpenError):
+            breaker.before_call()
+        breaker.record_failure()
+        assert breaker.state == CircuitBreaker.OPEN
+
+    with patch("src.utils.resilience.time.monotonic", return_value=time.monotonic() + 62):
+        breaker.before_call()
+        breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.before_call()
+
+
+@pytest.mark.asyncio
+async def test_cancelled_probe_lets_the_next_call_probe():
+    """A probe cancelled mid-call, e.g. by a client disconnecting, doesn't leave the circuit stuck half open."""
+    upstream = Upstream("deepseek", failure_threshold=1, recovery_seconds=0, hedge=False)
+    upstream.breaker.record_failure()
+    started = asyncio.Event()
+
+    async def hang():
+        started.set()
+        await asyncio.sleep(10)
+
+    probe = asyncio.ensure_future(upstream.acall(hang))
+    await started.wait()
+    probe.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await probe
+    assert upstream.breaker.state == CircuitBreaker.HALF_OPEN
+
+    async def answer():
+        return "ok"
+
+    assert await upstream.acall(answer) == "ok"
+    assert upstream.breaker.get_stats()["state"] == CircuitBreaker.CLOSED
+
+
+def test_losing_hedged_response_is_closed():
+    """The response of the slower hedged attempt is closed once it arrives."""
+    upstream = Upstream("tavily", hedge=True, hedge_min_samples=5)
+    for _ in range(5):
+        upstream.call(lambda: None, operation="search")
+
+    closed = threading.Event()
+    attempts = []
+
+    class Response:
+        def __init__(self, delay):
+            time.sleep(delay)
+
+        def close(self):
+            closed.set()
+
+    def fetch():
+        attempts.append(len(attempts))
+        return Response(0.5 if len(attempts) == 1 else 0)
+
+    assert isinstance(upstream.call(fetch, operation="search"), Response)
+    assert closed.wait(timeout=2)
+
+
+@pytest.mark.asyncio
+async def test_async_backoff_does_not_block_the_event_loop(stub_server):
+    """The async client backs off on the event loop, so other tasks keep running."""
+    from src.models.async_deepseek_client import AsyncDeepSeekAPI
+
+    server, url = stub_server
+    server.faults = [(429, 0), (503, 0)]
+    client = AsyncDeepSeekAPI(api_key="test-key", api_base=url, use_cache=False, max_retries=3)
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        while True:
+            await asyncio.sleep(0.01)
+            ticks += 1
+
+    task = asyncio.create_task(ticker())
+    with patch("src.models.async_deepseek_client.get_upstream", return_value=Upstream("deepseek")), \
+         patch("src.utils.resilience.backoff_delay", return_value=0.2), \
+         patch("src.utils.resilience.time.sleep", side_effect=AssertionError("blocking sleep")):
+        assert await client.ainvoke("UBC tuition?") == "UBC tuition is ..."
+    task.cancel()
+    await client.aclose()
+
+    assert server.requests == 3
+    assert ticks >= 20
+
+
+def test_slow_attempts_are_hedged_after_the_p95_latency(stub_server):
+    """An attempt slower than usual gets a second one, and the faster answer wins."""
+    server, url = stub_server
+    upstream = Upstream("tavily", hedge=True, hedge_min_samples=5)
+
+    def search():
+        response = requests.get(f"{url}/search", timeout=5)
+        response.raise_for_status()
+        return response.json()
+
+    for _ in range(5):
+        upstream.call(search, operation="search")
+    assert upstream.get_stats()["hedges"] == 0
+
+    server.faults = [(200, 2.0)]
+    start = time.monotonic()
+    assert upstream.call(search, operation="search")["choices"]
+    assert time.monotonic() - start < 1.0
+
+    stats = upstream.get_stats()
+    assert (stats["hedges"], stats["hedge_wins"]) == (1, 1)
+    assert server.requests == 7
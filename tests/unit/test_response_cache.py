@@ -0,0 +1,141 @@
+"""
+Tests for the two-tier LLM response cache.
+"""
+
+import json
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+import pytest
+import yaml
+
+from src.models.response_cache import ResponseCache, request_key
+
+REQUEST = {
+    "model": "deepseek-chat",
+    "messages": [{"role": "system", "content": "You are helpful."}, {"role": "user", "content": "UBC tuition?"}],
+    "temperature": 0.2,
+    "max_tokens": 800,
+    "top_p": 1,
+    "stream": False
+}
+
+
+class _ChatHandler(BaseHTTPRequestHandler):
+    """Stub chat completions endpoint that counts requests."""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        self.server.requests.append(json.loads(self.rfile.read(length)))
+
+        body = json.dumps({"choices": [{"message": {"content": "UBC tuition is ..."}}]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def stub_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _ChatHandler)
+    server.requests = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server, f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_key_ignores_transport_options_and_parameter_order():
+    """Requests that produce the same answer share a key."""
+    reordered = dict(reversed(list(REQUEST.items())))
+    reordered.update(stream=True, timeout=30, top_p=1.0)
+
+    assert request_key(reordered) == request_key(REQUEST)
+    assert request_key(dict(REQUEST, temperature=0.7)) != request_key(REQUEST)
+    assert request_key(dict(REQUEST, messages=REQUEST["messages"][1:])) != request_key(REQUEST)
+
+
+def test_memory_tier_is_lru_with_ttl():
+    """The least recently used response is evicted, and expired ones are not served."""
+    cache = ResponseCache(max_entries=2, ttl_seconds=60)
+    cache.put("a", "answer a")
+    cache.put("b", "answer b")
+    cache.get("a")
+    cache.put("c", "answer c")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "answer a"
+
+    with patch("src.models.response_cache.time.time", return_value=cache._memory["c"][1] + 1):
+        assert cache.get("c") is None
+
+    stats = cache.get_stats()
+    assert (stats["memory_hits"], stats["misses"], stats["evictions"], stats["expirations"]) == (2, 2, 1, 1)
+
+
+def test_disk_tier_is_shared_and_survives_restarts(tmp_path):
+    """Responses written by one process are served to another from disk."""
+    db_path = str(tmp_path / "responses.sqlite")
+    worker_a = ResponseCache(db_path=db_path)
+    worker_a.put("key", "cached answer")
+    worker_a.close()
+
+    worker_b = ResponseCache(db_path=db_path)
+    assert worker_b.get("key") == "cached answer"
+    assert worker_b.get("key") == "cached answer"
+    assert worker_b.get("other") is None
+
+    stats = worker_b.get_stats()
+    assert (stats["disk_hits"], stats["memory_hits"], stats["misses"]) == (1, 1, 1)
+
+
+def test_disk_tier_is_bounded(tmp_path):
+    """Least recently used rows are removed once the disk tier is over its limit."""
+    cache = ResponseCache(max_entries=1, db_path=str(tmp_path / "responses.sqlite"), disk_max_entries=50)
+    for i in range(100):
+        cache.put(f"key {i}", f"answer {i}")
+
+    assert cache._connect().execute("SELECT COUNT(*) FROM responses").fetchone()[0] == 50
+    assert cache.get("key 10") is None
+    assert cache.get("key 99") == "answer 99"
+    assert cache.get_stats()["disk_evictions"] == 50
+
+
+def test_sync_and_async_clients_share_cached_answers(stub_server, tmp_path):
+    """A cached answer is served without calling the API, whichever client asks."""
+    from langchain_core.messages import HumanMessage, SystemMessage
+    from src.models.deepseek_client import DeepSeekAPI
+    from src.models.async_deepseek_client import AsyncDeepSeekAPI
+    from src.utils.config import reload_config
+
+    server, url = stub_server
+    config_path = tmp_path / "config.yaml"
+    with open(config_path, "w") as f:
+        yaml.dump({"llm": {"api_key": "test-key", "use_cache": True}}, f)
+    reload_config(str(config_path))
+
+    cache = ResponseCache(db_path=str(tmp_path / "responses.sqlite"))
+    messages = [SystemMessage(content="You are helpful."), HumanMessage(content="UBC tuition?")]
+    with patch("src.models.deepseek_client.get_response_cache", return_value=cache), \
+         patch("src.models.async_deepseek_client.get_response_cache", return_value=cache), \
+         patch("src.models.deepseek_client.os.makedirs"), \
+         patch("builtins.open"):
+        client = DeepSeekAPI(config_path=str(config_path))
+        client.api_base = url
+        assert client.invoke(messages) == "UBC tuition is ..."
+        assert client.invoke(messages) == "UBC tuition is ..."
+
+        async_client = AsyncDeepSeekAPI.from_llm(client)
+        assert asyncio.run(async_client.ainvoke(messages)) == "UBC tuition is ..."
+
+    assert len(server.requests) == 1
+    assert cache.get_stats()["hits"] == 2
@@ -0,0 +1,86 @@
+"""
+Tests for the RAG engine retrieval cache.
+"""
+
+import time
+from unittest.mock import patch
+
+from langchain_core.documents import Document
+
+from src.rag.retrieval_cache import RetrievalCache, cache_key
+
+DOCS = [
+    Document(page_content="UBC offers over 200 undergraduate programs.", metadata={"source": "ubc.ca"}),
+    Document(page_content="UofT is Canada's largest university.", metadata={"source": "utoronto.ca"}),
+]
+
+
+def test_keys_include_query_k_filters_and_generation():
+    """Equivalent queries share a key; k, filters and the index generation separate keys."""
+    assert cache_key("UBC programs?", 3, None, 1) == cache_key("  ubc  PROGRAMS ", 3, {}, 1)
+    assert cache_key("UBC programs", 3, {"source": "ubc.ca"}, 1) != cache_key("UBC programs", 3, None, 1)
+    assert cache_key("UBC programs", 3, None, 1) != cache_key("UBC programs", 5, None, 1)
+    assert cache_key("UBC programs", 3, None, 1) != cache_key("UBC programs", 3, None, 2)
+
+
+def test_cached_documents_cannot_be_modified_by_callers():
+    """Truncating returned or stored documents leaves the cached copy intact."""
+    cache = RetrievalCache()
+    key = cache_key("UBC programs", 2, None, 1)
+    docs = [Document(page_content=doc.page_content, metadata=dict(doc.metadata)) for doc in DOCS]
+    cache.put(key, docs)
+    docs[0].page_content = "changed"
+
+    first = cache.get(key)
+    first[0].page_content = first[0].page_content[:3]
+    first[1].metadata["source"] = "changed"
+
+    second = cache.get(key)
+    assert [doc.page_content for doc in second] == [doc.page_content for doc in DOCS]
+    assert second[1].metadata == {"source": "utoronto.ca"}
+
+
+def test_nested_metadata_cannot_be_modified_by_callers():
+    """Nested metadata values are copied in and out of the cache as well."""
+    cache = RetrievalCache()
+    key = cache_key("UBC programs", 1, None, 1)
+    docs = [Document(page_content="UBC", metadata={"tags": ["admissions"], "location": {"city": "Vancouver"}})]
+    cache.put(key, docs)
+    docs[0].metadata["tags"].append("stored")
+
+    first = cache.get(key)
+    first[0].metadata["tags"].append("returned")
+    first[0].metadata["location"]["city"] = "changed"
+
+    assert cache.get(key)[0].metadata == {"tags": ["admissions"], "location": {"city": "Vancouver"}}
+
+
+def test_lru_eviction_and_ttl():
+    """The least recently used entry is evicted first, and entries expire."""
+    cache = RetrievalCache(max_entries=2, ttl_seconds=60)
+    keys = [cache_key(f"query {i}", 2, None, 1) for i in range(3)]
+    cache.put(keys[0], DOCS)
+    cache.put(keys[1], DOCS)
+    cache.get(keys[0])
+    cache.put(keys[2], DOCS)
+
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0]) is not None
+    with patch("src.rag.retrieval_cache.time.time", return_value=time.time() + 120):
+        assert cache.get(keys[0]) is None
+    stats = cache.get_stats()
+    assert (stats["evictions"], stats["expirations"]) == (1, 1)
+
+
+def test_new_index_generation_invalidates_the_cache():
+    """Results of a replaced index are dropped and never stored again."""
+    cache = RetrievalCache()
+    cache.put(cache_key("UBC programs", 2, None, 1), DOCS)
+    cache.put(cache_key("UofT size", 2, None, 1), DOCS)
+
+    assert cache.get(cache_key("UBC programs", 2, None, 2)) is None
+    assert cache.get_stats()["entries"] == 0 and cache.get_stats()["invalidations"] == 1
+
+    # A retrieval that started before the rebuild finishes after it
+    cache.put(cache_key("UofT size", 2, None, 1), DOCS)
+    assert cache.get_stats()["entries"] == 0
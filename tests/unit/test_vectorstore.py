@@ -0,0 +1,84 @@
+"""
+Tests for the shared vector store manager.
+"""
+
+import os
+import time
+
+import pytest
+from langchain_community.vectorstores import FAISS
+
+from src.core import vectorstore
+from src.core.vectorstore import VectorStoreManager
+from src.models.embeddings import SimpleEmbeddings
+
+
+def _write_index(index_dir, texts):
+    FAISS.from_texts(texts, SimpleEmbeddings()).save_local(str(index_dir))
+
+
+@pytest.fixture(autouse=True)
+def simple_embeddings(monkeypatch):
+    """Avoid loading a real sentence-transformer model."""
+    monkeypatch.setattr(vectorstore, "get_embeddings", lambda model_name=None: SimpleEmbeddings())
+
+
+def test_store_loaded_once(tmp_path):
+    """Repeated calls share the same loaded store."""
+    _write_index(tmp_path, ["UBC is in Vancouver", "SFU is in Burnaby"])
+    manager = VectorStoreManager(str(tmp_path), check_interval=0)
+
+    first = manager.get()
+    second = manager.get()
+
+    assert first is not None
+    assert first is second
+    assert manager.generation == 1
+    stats = manager.get_stats()
+    assert stats["loads"] == 1
+    assert stats["documents"] == 2
+    assert stats["cold_load_seconds"] is not None
+
+
+def test_index_change_swaps_store(tmp_path):
+    """Rewriting the index files swaps in a new store with a new generation."""
+    _write_index(tmp_path, ["UBC is in Vancouver"])
+    manager = VectorStoreManager(str(tmp_path), check_interval=0)
+    first = manager.get()
+
+    _write_index(tmp_path, ["UBC is in Vancouver", "SFU is in Burnaby", "UVic is in Victoria"])
+    # Make sure the fingerprint changes even on coarse filesystem timestamps
+    future = time.time() + 10
+    os.utime(tmp_path / "index.faiss", (future, future))
+    second = manager.get()
+
+    assert second is not first
+    assert manager.generation == 2
+    assert manager.snapshot() == (second, 2)
+    assert len(second.index_to_docstore_id) == 3
+
+
+def test_missing_index_returns_none(tmp_path):
+    """A directory without an index yields no store."""
+    manager = VectorStoreManager(str(tmp_path / "missing"), check_interval=0)
+
+    assert manager.get() is None
+    assert manager.get_stats()["loaded"] is False
+
+
+def test_incremental_update_is_picked_up(tmp_path):
+    """Chunks appended as segments are served after the manifest changes."""
+    from langchain_core.documents import Document
+    from src.core.incremental_index import IncrementalIndex
+
+    index = IncrementalIndex(str(tmp_path), SimpleEmbeddings())
+    index.update([Document(page_content="UBC is in Vancouver", metadata={"source": "ubc"})])
+    manager = VectorStoreManager(str(tmp_path), check_interval=0)
+    assert len(manager.get().index_to_docstore_id) == 1
+
+    index.update([Document(page_content="SFU is in Burnaby", metadata={"source": "sfu"})])
+    future = time.time() + 10
+    os.utime(tmp_path / "manifest.json", (future, future))
+
+    assert len(manager.get().index_to_docstore_id) == 2
+    assert manager.generation == 2
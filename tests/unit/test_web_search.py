@@ -0,0 +1,129 @@
+"""
+Tests for the cached web search service.
+"""
+
+import time
+from unittest.mock import patch
+
+import pytest
+import yaml
+from langchain.schema import Document
+
+from src.utils.web_search import (
+    FakeSearchProvider, TavilySearchProvider, WebSearchService, exclude_known_sources, normalize_results,
+    normalize_url
+)
+
+
+def test_urls_and_results_are_normalized():
+    """Spellings of the same page compare equal, and duplicate results are merged."""
+    assert normalize_url("HTTPS://www.UBC.ca/admissions/?utm_source=x&b=2&a=1#fees") == \
+        normalize_url("http://ubc.ca//admissions?a=1&b=2")
+    assert normalize_url("https://ubc.ca/admissions") != normalize_url("https://ubc.ca/admissions/fees")
+    assert normalize_url(" data/ubc.txt ") == "data/ubc.txt"
+
+    results = normalize_results({"results": [
+        {"url": "https://ubc.ca/fees", "title": "Fees", "content": "Tuition  is\n high", "score": 0.4},
+        {"url": "https://www.ubc.ca/fees/", "title": "Fees", "content": "Tuition is high", "score": 0.9},
+        {"url": "https://ubc.ca/empty", "title": "Empty", "content": "", "score": 1.0},
+        {"url": "https://sfu.ca/fees", "title": None, "content": "SFU tuition", "score": 0.5},
+    ]})
+
+    assert [(r["url"], r["title"], r["content"]) for r in results] == [
+        ("https://www.ubc.ca/fees/", "Fees", "Tuition is high"),
+        ("https://sfu.ca/fees", "No Title", "SFU tuition"),
+    ]
+
+
+def test_repeated_searches_are_served_from_the_cache():
+    """The provider is called once per query, depth and size, with a shorter TTL for news."""
+    provider = FakeSearchProvider()
+    service = WebSearchService(provider, ttl_seconds=3600, news_ttl_seconds=60)
+
+    first = service.search("UBC tuition fees", max_results=3)
+    repeated = service.search("  ubc TUITION fees? ", max_results=3)
+    assert [doc.page_content for doc in repeated] == [doc.page_content for doc in first]
+    service.search("UBC tuition fees", max_results=5)
+    service.search("latest UBC admission news", max_results=3)
+    assert len(provider.calls) == 3
+
+    now = time.time()
+    with patch("src.utils.web_search.time.time", return_value=now + 120):
+        service.search("UBC tuition fees", max_results=3)
+        service.search("latest UBC admission news", max_results=3)
+    assert len(provider.calls) == 4
+
+    stats = service.get_stats()
+    assert (stats["hits"], stats["misses"], stats["expirations"]) == (2, 4, 1)
+    assert len(first) == 3 and first[0].metadata["search_query"] == "UBC tuition fees"
+
+
+def test_pages_already_retrieved_are_left_out():
+    """Web results for pages the vector store returned are not added again."""
+    provider = FakeSearchProvider({"ubc residence": [
+        {"url": "https://www.ubc.ca/housing/", "title": "Housing", "content": "Residence options", "score": 0.9},
+        {"url": "https://ubc.ca/dining", "title": "Dining", "content": "Meal plans", "score": 0.8},
+    ]})
+    service = WebSearchService(provider)
+    vector_docs = [Document(page_content="Housing", metadata={"source": "http://ubc.ca/housing"})]
+
+    docs = service.search("UBC residence", exclude_urls=["http://ubc.ca/housing"])
+    assert [doc.metadata["source"] for doc in docs] == ["https://ubc.ca/dining"]
+    assert service.get_stats()["excluded_results"] == 1
+
+    all_docs = service.search("UBC residence")
+    assert exclude_known_sources(all_docs, vector_docs) == docs
+
+
+def test_search_web_uses_the_configured_provider(tmp_path):
+    """The shared service is built once from the config and rebuilt when it changes."""
+    from src.utils.config import get_config, reload_config
+    from src.utils.web_search import get_web_search_service, search_web
+
+    config_path = tmp_path / "config.yaml"
+    with open(config_path, "w") as f:
+        yaml.dump({"web_search": {"provider": "fake", "max_results": 2}}, f)
+
+    with patch("src.utils.web_search.get_config", side_effect=lambda: get_config(str(config_path))):
+        service = get_web_search_service()
+        assert isinstance(service.provider, FakeSearchProvider)
+        assert len(search_web("UBC tuition")) == 2
+        assert len(search_web("UBC tuition")) == 2
+        assert get_web_search_service() is service
+        assert service.get_stats()["hits"] == 1
+
+        with open(config_path, "w") as f:
+            yaml.dump({"web_search": {"provider": "fake", "max_results": 2, "cache_ttl_seconds": 60}}, f)
+        reload_config(str(config_path))
+        assert get_web_search_service() is not service
+
+
+def test_tavily_provider_reuses_one_pooled_client():
+    """The Tavily client is created once, on the shared keep-alive session."""
+    from src.utils.http_pool import get_http_session
+
+    with patch("src.utils.web_search.TavilyClient") as client_class:
+        client_class.return_value.search.return_value = {"results": [
+            {"url": "https://ubc.ca/fees", "title": "Fees", "content": "Tuition", "score": 0.9}
+        ]}
+        service = WebSearchService(TavilySearchProvider("test-key"))
+        service.search("UBC tuition")
+        service.search("UBC scholarships")
+
+    client_class.assert_called_once_with(api_key="test-key", session=get_http_session("tavily"))
+    assert client_class.return_value.search.call_count == 2
+
+
+def test_tavily_usage_limit_is_a_retryable_rate_limit():
+    """Tavily's usage limit error surfaces as a retryable 429 upstream error."""
+    from src.utils.resilience import UpstreamError
+    from src.utils.web_search import TavilyUsageLimitError
+
+    with patch("src.utils.web_search.TavilyClient") as client_class:
+        client_class.return_value.search.side_effect = TavilyUsageLimitError("Usage limit exceeded")
+        provider = TavilySearchProvider("test-key")
+        with pytest.raises(UpstreamError) as error:
+            provider._search_once("UBC tuition", "basic", 2)
+
+    assert error.value.status_code == 429
+    assert error.value.retryable